@@ -6,17 +6,45 @@ import logging
 from datastructures import specification
 from datastructures.specification import ArchitectureGuarantee
 from helpers import automata_helper
+from helpers.disk_cache import DiskCache, get_cache_key
+from helpers.instrumentation import SynthesisStatistics, PHASE_CUTOFF, \
+    PHASE_INSTANTIATION, PHASE_TRANSLATION, PHASE_ENCODE, \
+    PHASE_ENCODE_AUTOMATA, PHASE_CHECK, COUNTER_ASSERTIONS, \
+    COUNTER_AST_SIZE, COUNTER_AUTOMATON_STATES, COUNTER_CACHED_ROUNDS, \
+    COUNTER_LAZY_CONSTRAINTS, COUNTER_ADDED_LAZY_CONSTRAINTS, \
+    COUNTER_LAZY_CHECKS, COUNTER_DUPLICATE_CONSTRAINTS
 from helpers.ast_visitor import ASTInstantiateFormulaVisitor
-from interfaces.parser_expr import and_expressions, BinOp
+from interfaces.parser_expr import and_expressions, BinOp, UnaryOp, Bool
 from translation2uct.ltl2automaton import Ltl2UCW
 from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import EncodingOptimization
+from smt.api.encoder import PyZ3IncrementalContext
+from smt.api.grounding import count_terms
+from smt.api.lazy import LazyConstraintSolver
+from smt.api.solverprofile import get_spec_family, load_solver_profile
 import config
 
 LOG = logging.getLogger("bosy")
 
+# strategies of the search over the number of bound increments
+SEARCH_LINEAR = "linear"
+SEARCH_GALLOP = "gallop"
+SEARCH_BISECT = "bisect"
+SEARCH_STRATEGIES = [SEARCH_LINEAR, SEARCH_GALLOP, SEARCH_BISECT]
+
+# version of the encoding, part of the keys of the persistent result cache
+# (increase it whenever a change of the encoders can change round results)
+ENCODING_VERSION = 1
+
 
 class BoundedSynthesis:
 
+    # options that are copied to synthesis instances in other processes
+    SETTING_NAMES = ["min_bound", "max_increments", "encoder_type",
+                     "instance_count", "encoder_optimization", "test_mode",
+                     "incremental", "split_properties", "search_strategy",
+                     "use_result_cache", "solver_profile", "count_ast_size"]
+
     def __init__(self, spec_filename, architecture):
         """
         :param spec_filename: path of LTL specification
@@ -29,15 +57,62 @@ class BoundedSynthesis:
         self.instance_count = None
         self.encoder_optimization = None
         self.test_mode = False
+        self.incremental = False
+        self.search_strategy = SEARCH_LINEAR
+        # translate each conjunct of an instantiated property separately
+        self.split_properties = False
+        # look up and store round results in the persistent result cache
+        # (e.g., switched off for repeated benchmark runs)
+        self.use_result_cache = True
+        # count the distinct terms of each round (COUNTER_AST_SIZE), which
+        # traverses all assertions and is only done if the statistics are
+        # written or debug output is enabled
+        self.count_ast_size = False
+
+        # state that is kept across rounds in incremental mode
+        self._incremental_context = None
+        self._round_cache = {}
+
+        # timing and counters of the last call of solve()
+        self.statistics = SynthesisStatistics()
+        # whether the last round found no model without proving that
+        # there is none (e.g., solver timeout)
+        self.has_unknown_result = False
 
         self.spec_filename = spec_filename
 
+        # tactics and parameters of the solver of the quantified encoding
+        # (:class:`smt.api.solverprofile.SolverProfile`, None: default)
+        self.solver_profile = load_solver_profile(
+            config.SOLVER_PROFILE_PATH, get_spec_family(spec_filename))
+
         # load specification
         self.spec = specification.Specification(filename=spec_filename)
         # initialize architecture
         self.arch = architecture(self.spec)
 
-        self.ltl2ucw = Ltl2UCW(config.LTL3BA_PATH)
+        self.ltl2ucw = Ltl2UCW(config.LTL3BA_PATH,
+                               cache_path=config.LTL3BA_CACHE_PATH,
+                               cache_size=config.LTL3BA_CACHE_SIZE)
+
+        self.result_cache = None
+        if config.RESULT_CACHE_PATH is not None:
+            self.result_cache = DiskCache(config.RESULT_CACHE_PATH,
+                                          config.RESULT_CACHE_SIZE)
+        self._spec_key = get_cache_key(self.spec.get_normalized_content())
+
+    def get_settings(self):
+        '''
+        Returns the dictionary of the options in :data:`SETTING_NAMES`
+        '''
+        return {name: getattr(self, name) for name in self.SETTING_NAMES}
+
+    def apply_settings(self, settings):
+        '''
+        Sets the options returned by :meth:`get_settings`
+        '''
+        for name, value in settings.items():
+            setattr(self, name, value)
 
     def solve(self):
         '''
@@ -52,138 +127,438 @@ class BoundedSynthesis:
         * Encode formula in SMT
         * Solve
 
+        In incremental mode (see :attr:`incremental`), rounds that keep the
+        same cut-off share one solver instance and reuse the instantiated
+        property automata.
+
+        The order of the bounds depends on :attr:`search_strategy`:
+
+        * linear: increase the bound of all templates by one per round
+        * gallop: double the increment until a model is found, then
+          bisect between the last bound without and the bound with model
+        * bisect: bisect the whole range of increments
+
+        All strategies return a model of the smallest bound (assuming that
+        a model for a bound can be extended to larger bounds).
+
+        Rounds whose result is stored in the persistent result cache are
+        skipped unless :attr:`use_result_cache` is switched off.
+
         :return: model or None if no model was found
         '''
         self.spec.bound = self.min_bound
 
-        status = None
-        model = None
-
-        for round_index in range(self.max_increments + 1):
-            # increase bound for all templates
-            self.spec.bound = tuple([b + round_index for b in self.min_bound])
-            LOG.info("Set bound to %s", str(self.spec.bound))
-
-            # recalculate cut-off
-            self.spec.cutoff, guarantee_cutoffs_list = \
-                self.arch.determine_cutoffs(self.spec.bound)
-
-            # avoid that cut-off becomes larger than instance count
-            if any([self.spec.cutoff[i] > self.instance_count[i] for i in
-                    range(len(self.spec.cutoff))]):
-                orig_spec_cutoff = self.spec.cutoff
-                self.spec.cutoff = self._truncate_cutoff(self.spec.cutoff)
-                LOG.info("Truncate maximum cut-off from %s to %s",
-                             orig_spec_cutoff, self.spec.cutoff)
-                guarantee_cutoffs_list = \
-                    [(guarantee, self._truncate_cutoff(cutoff))
-                     for guarantee, cutoff in guarantee_cutoffs_list]
-
-            if self.test_mode:
-                # in test mode, we set the cut-off to the instance count
-                self.spec.cutoff = self.instance_count
-                guarantee_cutoffs_list = [(guarantee, self.spec.cutoff)
-                                          for guarantee, _ in
-                                          guarantee_cutoffs_list]
-
-            LOG.info("Cut-Off: %s", str(self.spec.cutoff))
-
-            # add architecture guarantees with max. cut-off
-            # (architecture guarantees must hold for all
-            # instances in the system)
-            arch_guarantees = self.arch.get_architecture_guarantees(
-                range(0, self.spec.templates_count))
-            arch_guarantee_cutoffs_list = [(guarantee, self.spec.cutoff)
-                                           for guarantee in arch_guarantees]
-            guarantee_cutoffs_list = (arch_guarantee_cutoffs_list +
-                                      guarantee_cutoffs_list)
-
-            LOG.debug("-------------------------------------------")
-            LOG.debug("Guarantees")
-            for guarantee, guarantee_cutoff in guarantee_cutoffs_list:
-                LOG.debug("%s --> cut-off: %s)",
-                          guarantee, guarantee_cutoff)
-            LOG.debug("-------------------------------------------")
-
-            # build assumptions set
-            if len(self.spec.assumptions) > 0:
-                raise Exception("Specification assumptions are "
-                                "currently not supported!")
-
-            arch_assumptions = self.arch.get_architecture_assumptions(
-                range(0, self.spec.templates_count))
-            assumptions = self.spec.assumptions + arch_assumptions
-
-            # create properties
-            # properties are either tuples (assumption, guarantee) of
-            # quadruples (assumption, guarantee, cutoff, ignore_cutoff)
-            # ignore_cutoff is set if the guarantee-specific cut-off is
-            # larger than the number of specified instances
-            properties = [(assumptions,
-                           guarantee,
-                           guarantee_cutoff,
-                           any([guarantee_cutoff[i] > self.spec.cutoff[i]
-                                for i in range(len(self.spec.cutoff))]))
-                          for (guarantee, guarantee_cutoff)
-                          in guarantee_cutoffs_list]
-
-            # add architecture properties
-            arch_properties = [tuple(list(p) + [self.spec.cutoff, False])
-                               for p in self.arch.get_architecture_properties(
-                                   range(0, self.spec.templates_count))]
-            properties = arch_properties + properties
-
-            LOG.info("-------------------------------------------")
-            LOG.info("Properties")
-            for assumptions, guarantee, \
-                    guarantee_cutoff, ignore_cutoff in properties:
-                LOG.info("(%s, %s) --> cut-off: %s, ignore: %s)",
-                         assumptions, guarantee,
-                         guarantee_cutoff, ignore_cutoff)
-            LOG.info("-------------------------------------------")
-
-            # instantiate properties
-            instantiated_properties = \
-                self.instantiate_properties(properties,
-                                            self.spec.cutoff)
-
-            # get automaton for each property
-            property_automata = [self.ltl2ucw.convert(prop)
-                                 for prop in instantiated_properties]
-
-            for i, prop in enumerate(instantiated_properties):
-                LOG.info(prop)
-                LOG.info("\t states: %s", len(property_automata[i].nodes))
-
-            # encode automata
-            encoder = SMTEncoderFactory().create(self.encoder_type)(
-                self.spec, self.arch, self.encoder_optimization)
+        self._incremental_context = \
+            PyZ3IncrementalContext() if self.incremental else None
+        self._round_cache = {}
+        self.statistics = SynthesisStatistics()
+
+        if self.search_strategy == SEARCH_LINEAR:
+            for increment in range(self.max_increments + 1):
+                model = self._solve_increment(increment)
+                # extract solution
+                if model is not None:
+                    return model
+            return None
+
+        if self.search_strategy == SEARCH_GALLOP:
+            lower, upper, model = self._gallop_increments()
+        elif self.search_strategy == SEARCH_BISECT:
+            lower, upper, model = 0, self.max_increments + 1, None
+        else:
+            raise Exception("Unknown search strategy '%s'" %
+                            self.search_strategy)
+        return self._bisect_increments(lower, upper, model)
+
+    def _solve_increment(self, increment):
+        '''
+        Executes the synthesis round where the bound of each template is
+        increased by the given increment
+
+        :return: model or None if no model was found
+        '''
+        bound = tuple([b + increment for b in self.min_bound])
+        status, model = self._solve_bound(bound)
+        return model if status else None
+
+    def _gallop_increments(self):
+        '''
+        Tries the increments 0, 1, 3, 7, ... until a model is found
+
+        :return: tuple (lower, upper, model) where all increments below
+                 lower have no model and upper is the increment of the model
+                 (max_increments + 1 if no model was found)
+        '''
+        lower = 0
+        increment = 0
+        while True:
+            model = self._solve_increment(increment)
+            if model is not None:
+                return lower, increment, model
+            lower = increment + 1
+            if increment >= self.max_increments:
+                return lower, self.max_increments + 1, None
+            increment = min(2 * increment + 1, self.max_increments)
+
+    def _bisect_increments(self, lower, upper, model):
+        '''
+        Bisects the increments between lower (inclusive) and upper
+        (exclusive), where upper is the smallest increment with a model so
+        far (max_increments + 1 if no model was found)
+
+        The bound and the cut-off of the specification are reset to the
+        ones of the returned model.
+
+        :param model: model of the upper increment (found in the last
+                      round)
+        :return: model of the smallest increment or None
+        '''
+        cutoff = self.spec.cutoff
+        while lower < upper:
+            increment = (lower + upper) // 2
+            increment_model = self._solve_increment(increment)
+            if increment_model is not None:
+                upper, model = increment, increment_model
+                cutoff = self.spec.cutoff
+            else:
+                lower = increment + 1
+
+        if model is not None:
+            self.spec.bound = tuple([b + upper for b in self.min_bound])
+            self.spec.cutoff = cutoff
+        return model
+
+    def solve_bound(self, bound):
+        '''
+        Executes a single synthesis round for the given bound, independent
+        of :attr:`min_bound` and :attr:`max_increments`
+
+        :param bound: tuple of template sizes
+        :return: model or None if no model was found (see
+                 :attr:`has_unknown_result`)
+        '''
+        self._incremental_context = None
+        self._round_cache = {}
+        self.statistics = SynthesisStatistics()
+
+        status, model = self._solve_bound(bound)
+        return model if status else None
+
+    def _solve_bound(self, bound):
+        '''
+        Executes one synthesis round for the given bound
+
+        :param bound: tuple of template sizes
+        :return: tuple (status, model)
+        '''
+        self.spec.bound = bound
+        LOG.info("Set bound to %s", str(self.spec.bound))
+        self.statistics.start_round(bound)
+
+        properties, arch_property_count = self._get_round_properties()
+
+        round_key = self._get_round_key(properties)
+
+        result_key = None
+        if self.use_result_cache and self.result_cache is not None:
+            result_key = self._get_result_key(round_key)
+            cached_result = self.result_cache.get(result_key)
+            if cached_result is not None:
+                status, model = cached_result
+                LOG.info("Reuse cached result: %s", status)
+                self.has_unknown_result = False
+                self.statistics.add_counter(COUNTER_CACHED_ROUNDS, 1)
+                self.statistics.end_round(status)
+                return status, model
+
+        # instantiate properties and get automaton for each property
+        # (or for each conjunct of a property in split mode)
+        property_indices, instantiated_properties, property_automata = \
+            self._get_property_automata(properties, round_key)
+
+        for i, prop in enumerate(instantiated_properties):
+            LOG.info(prop)
+            LOG.info("\t states: %s", len(property_automata[i].nodes))
+        self.statistics.add_counter(COUNTER_AUTOMATON_STATES,
+                                    sum(len(automaton.nodes) for automaton
+                                        in property_automata))
+
+        # encode automata
+        encoder = SMTEncoderFactory().create(self.encoder_type)(
+            self.spec, self.arch, self.encoder_optimization,
+            incremental_context=self._incremental_context)
+        encoder.statistics = self.statistics
+        encoder.solver_profile = self.solver_profile
+        with self.statistics.phase(PHASE_ENCODE):
             encoder.encode()
 
+        # checking is expensive, thus only done if the result is logged
+        if LOG.isEnabledFor(logging.DEBUG):
             LOG.debug(encoder.encoder_info.solver.check())
 
-            encoder.encode_automata([(property_automata[i],
-                                      i,
-                                      i < len(arch_properties),
-                                      properties[i][2] if not properties[i][3]
-                                      else self.spec.cutoff)
-                                     for i in range(len(property_automata))],
-                                    self.spec.cutoff)
+        with self.statistics.phase(PHASE_ENCODE_AUTOMATA):
+            encoder.encode_automata(
+                self._get_automata_infos(properties, arch_property_count,
+                                         property_indices,
+                                         property_automata),
+                self.spec.cutoff)
+        assertions = encoder.encoder_info.solver.assertions()
+        self.statistics.add_counter(COUNTER_ASSERTIONS, len(assertions))
+        # number of distinct terms that are passed to the solver
+        if self.count_ast_size or LOG.isEnabledFor(logging.DEBUG):
+            self.statistics.add_counter(COUNTER_AST_SIZE,
+                                        count_terms(assertions))
+
+        with self.statistics.phase(PHASE_CHECK):
             status, model = encoder.check()
-
+        self.has_unknown_result = encoder.has_unknown_result
+
+        solver = encoder.encoder_info.solver
+        if isinstance(solver, LazyConstraintSolver):
+            self.statistics.add_counter(COUNTER_LAZY_CONSTRAINTS,
+                                        solver.lazy_count)
+            self.statistics.add_counter(COUNTER_ADDED_LAZY_CONSTRAINTS,
+                                        solver.added_count)
+            self.statistics.add_counter(COUNTER_LAZY_CHECKS,
+                                        solver.iterations)
+        if self.encoder_optimization & EncodingOptimization.CONSTRAINT_IR:
+            # the IR solver may be wrapped by the lazy constraint solver
+            self.statistics.add_counter(COUNTER_DUPLICATE_CONSTRAINTS,
+                                        solver.duplicate_count)
+
+        if LOG.isEnabledFor(logging.DEBUG):
             for a in encoder.encoder_info.solver.assertions():
                 LOG.debug(a)
 
+        # remove template size dependent constraints
+        if self._incremental_context is not None:
+            self._incremental_context.end_round()
+
 #             m = encoder.encoder_info.solver.model()
 #             for m in model:
 #                 print(m)
 
-            LOG.info("Status: %s", status)
-            LOG.info("Model: %s", model)
+        LOG.info("Status: %s", status)
+        LOG.info("Model: %s", model)
+
+        # an unknown result may differ in later runs (e.g., timeouts)
+        if result_key is not None and not self.has_unknown_result:
+            self.result_cache.put(result_key, (status, model))
+
+        self.statistics.end_round(status)
+        return status, model
+
+    def estimate(self, bound=None):
+        '''
+        Predicts the size of the encoding of the synthesis round for the
+        given bound without encoding or solving it
+
+        The cut-offs are determined and the properties are translated as
+        in a synthesis round (translations are cached), thus the estimate
+        is cheap compared to the round itself.
+
+        :param bound: tuple of template sizes (default: :attr:`min_bound`)
+        :return: :class:`smt.costmodel.CostEstimate`
+        '''
+        self.spec.bound = tuple(self.min_bound if bound is None else bound)
+        properties, arch_property_count = self._get_round_properties()
+        property_indices, _, property_automata = \
+            self._get_property_automata(properties,
+                                        self._get_round_key(properties))
+
+        encoder = SMTEncoderFactory().create(self.encoder_type)(
+            self.spec, self.arch, self.encoder_optimization)
+        return encoder.estimate(
+            self._get_automata_infos(properties, arch_property_count,
+                                     property_indices, property_automata),
+            self.spec.cutoff)
+
+    def _get_round_properties(self):
+        '''
+        Determines the cut-offs for the current bound and returns the
+        properties of the round
+
+        Properties are quadruples (assumptions, guarantee, cutoff,
+        ignore_cutoff), the architecture properties come first.
+
+        :return: tuple (properties, number of architecture properties)
+        '''
+        with self.statistics.phase(PHASE_CUTOFF):
+            guarantee_cutoffs_list = self._determine_cutoffs()
+
+        LOG.info("Cut-Off: %s", str(self.spec.cutoff))
+        self.statistics.set_cutoff(self.spec.cutoff)
+
+        # add architecture guarantees with max. cut-off
+        # (architecture guarantees must hold for all
+        # instances in the system)
+        arch_guarantees = self.arch.get_architecture_guarantees(
+            range(0, self.spec.templates_count))
+        arch_guarantee_cutoffs_list = [(guarantee, self.spec.cutoff)
+                                       for guarantee in arch_guarantees]
+        guarantee_cutoffs_list = (arch_guarantee_cutoffs_list +
+                                  guarantee_cutoffs_list)
+
+        LOG.debug("-------------------------------------------")
+        LOG.debug("Guarantees")
+        for guarantee, guarantee_cutoff in guarantee_cutoffs_list:
+            LOG.debug("%s --> cut-off: %s)",
+                      guarantee, guarantee_cutoff)
+        LOG.debug("-------------------------------------------")
+
+        # build assumptions set
+        if len(self.spec.assumptions) > 0:
+            raise Exception("Specification assumptions are "
+                            "currently not supported!")
+
+        arch_assumptions = self.arch.get_architecture_assumptions(
+            range(0, self.spec.templates_count))
+        assumptions = self.spec.assumptions + arch_assumptions
+
+        # create properties
+        # properties are either tuples (assumption, guarantee) of
+        # quadruples (assumption, guarantee, cutoff, ignore_cutoff)
+        # ignore_cutoff is set if the guarantee-specific cut-off is
+        # larger than the number of specified instances
+        properties = [(assumptions,
+                       guarantee,
+                       guarantee_cutoff,
+                       any([guarantee_cutoff[i] > self.spec.cutoff[i]
+                            for i in range(len(self.spec.cutoff))]))
+                      for (guarantee, guarantee_cutoff)
+                      in guarantee_cutoffs_list]
+
+        # add architecture properties
+        arch_properties = [tuple(list(p) + [self.spec.cutoff, False])
+                           for p in self.arch.get_architecture_properties(
+                               range(0, self.spec.templates_count))]
+        properties = arch_properties + properties
+
+        LOG.info("-------------------------------------------")
+        LOG.info("Properties")
+        for assumptions, guarantee, \
+                guarantee_cutoff, ignore_cutoff in properties:
+            LOG.info("(%s, %s) --> cut-off: %s, ignore: %s)",
+                     assumptions, guarantee,
+                     guarantee_cutoff, ignore_cutoff)
+        LOG.info("-------------------------------------------")
+
+        return properties, len(arch_properties)
+
+    def _get_round_key(self, properties):
+        '''
+        Returns the key of the property automata of a round (global
+        cut-off, property cut-offs)
+        '''
+        return (tuple(self.spec.cutoff),
+                tuple(tuple(prop[2]) for prop in properties))
+
+    def _get_property_automata(self, properties, round_key):
+        '''
+        Instantiates the properties and translates them into automata
+
+        In incremental mode, the automata of rounds with the same key are
+        reused.
+
+        :return: tuple (property index of each automaton, instantiated
+                 properties, automata)
+        '''
+        if self.incremental and round_key in self._round_cache:
+            LOG.info("Reuse property automata of previous round")
+            property_indices, instantiated_properties, property_automata = \
+                self._round_cache[round_key]
+        else:
+            with self.statistics.phase(PHASE_INSTANTIATION):
+                property_formulas = \
+                    self.instantiate_properties(properties,
+                                                self.spec.cutoff)
+            property_indices = [i for i, formulas
+                                in enumerate(property_formulas)
+                                for _ in formulas]
+            instantiated_properties = [formula for formulas
+                                       in property_formulas
+                                       for formula in formulas]
+            with self.statistics.phase(PHASE_TRANSLATION):
+                property_automata = [self.ltl2ucw.convert(prop)
+                                     for prop in instantiated_properties]
+            if self.incremental:
+                self._round_cache[round_key] = (property_indices,
+                                                instantiated_properties,
+                                                property_automata)
+
+        return property_indices, instantiated_properties, property_automata
+
+    def _get_automata_infos(self, properties, arch_property_count,
+                            property_indices, property_automata):
+        '''
+        Returns the automata infos of :meth:`SMTEncoder.encode_automata`
+        '''
+        return [(property_automata[i],
+                 i,
+                 property_indices[i] < arch_property_count,
+                 properties[property_indices[i]][2]
+                 if not properties[property_indices[i]][3]
+                 else self.spec.cutoff)
+                for i in range(len(property_automata))]
+
+    def _get_result_key(self, round_key):
+        '''
+        Returns the content key of the result of the current round
+
+        The key identifies the encoding version, the normalized
+        specification, the architecture, the bound, the effective (i.e.,
+        truncated) cut-offs, the encoder options, and the settings of the
+        solver backend, thus different instance counts that yield the same
+        cut-offs share the result.
 
-            # extract solution
-            if status:
-                return model
+        :param round_key: tuple (global cut-off, property cut-offs)
+        '''
+        return get_cache_key(ENCODING_VERSION, self._spec_key,
+                             type(self.arch).__name__,
+                             tuple(self.spec.bound), round_key,
+                             self.encoder_type, self.encoder_optimization,
+                             self._get_backend_settings())
+
+    def _get_backend_settings(self):
+        '''
+        Returns the settings of the solver backend of the encoder options
+        that can change the result of a round
+        '''
+        if self.encoder_optimization & EncodingOptimization.SAT_SOLVER:
+            return ("sat", config.SAT_SOLVER_PATH, config.SAT_RANK_WIDTH)
+        if self.encoder_optimization & EncodingOptimization.EXTERNAL_SOLVER:
+            return ("external", config.EXTERNAL_SOLVER_PATH,
+                    config.EXTERNAL_SOLVER_CHECK_COMMAND)
+        return ("z3", str(self.solver_profile))
+
+    def _determine_cutoffs(self):
+        '''
+        Determines the cut-off for the current bound
+
+        Sets the global cut-off of the specification and returns the list
+        of tuples (guarantee, guarantee cut-off)
+        '''
+        self.spec.cutoff, guarantee_cutoffs_list = \
+            self.arch.determine_cutoffs(self.spec.bound)
+
+        # avoid that cut-off becomes larger than instance count
+        if any([self.spec.cutoff[i] > self.instance_count[i] for i in
+                range(len(self.spec.cutoff))]):
+            orig_spec_cutoff = self.spec.cutoff
+            self.spec.cutoff = self._truncate_cutoff(self.spec.cutoff)
+            LOG.info("Truncate maximum cut-off from %s to %s",
+                         orig_spec_cutoff, self.spec.cutoff)
+            guarantee_cutoffs_list = \
+                [(guarantee, self._truncate_cutoff(cutoff))
+                 for guarantee, cutoff in guarantee_cutoffs_list]
+
+        if self.test_mode:
+            # in test mode, we set the cut-off to the instance count
+            self.spec.cutoff = self.instance_count
+            guarantee_cutoffs_list = [(guarantee, self.spec.cutoff)
+                                      for guarantee, _ in
+                                      guarantee_cutoffs_list]
+        return guarantee_cutoffs_list
 
     def _truncate_cutoff(self, cutoff):
         return tuple([min(self.instance_count[i], cutoff[i])
@@ -193,12 +568,20 @@ class BoundedSynthesis:
         '''
         Instantiates the quantified property formulas
 
+        Returns a list of instantiated formulas for each property. The
+        list contains a single formula unless :attr:`split_properties` is
+        set, in which case it contains one formula per conjunct.
+
         :param properties: list of tuples (assumption, guarantee) or
                (assumption, guarantee, guarantee_cutoff,
                 ignore_guarantee_cutoff)
         :param cutoff: global cut-off
         '''
-        return [self.instantiate_property(prop, cutoff) for prop in properties]
+        if self.split_properties:
+            return [self.instantiate_property_conjuncts(prop, cutoff)
+                    for prop in properties]
+        return [[self.instantiate_property(prop, cutoff)]
+                for prop in properties]
 
     def instantiate_property(self, prop, cutoff):
         '''
@@ -207,6 +590,69 @@ class BoundedSynthesis:
         :param prop: See ``properties`` in :func:`instantiate_properties`
         :param cutoff:
         '''
+        guarantee_conjuncts, instantiate_assumptions = \
+            self._instantiate_guarantees(prop, cutoff)
+
+        instantiated_guarantees = and_expressions(guarantee_conjuncts)
+        LOG.debug("Guarantees instantiated: %s", instantiated_guarantees)
+
+        instantiated_assumptions = None
+        if instantiate_assumptions is not None and \
+                self.is_liveness_property(instantiated_guarantees):
+            instantiated_assumptions = instantiate_assumptions()
+
+        LOG.debug("Assumptions instantiated: %s", instantiated_assumptions)
+
+        # return implication or just guarantees
+        if instantiated_assumptions is not None:
+            return BinOp('->', instantiated_assumptions,
+                         instantiated_guarantees)
+        else:
+            return instantiated_guarantees
+
+    def instantiate_property_conjuncts(self, prop, cutoff):
+        '''
+        Instantiates the given property and splits the instantiated
+        guarantee into its conjuncts
+
+        A UCW of a conjunction is the union of the UCWs of the conjuncts,
+        thus each returned formula can be translated separately. If the
+        property is a liveness property, i.e., if any conjunct is one, each
+        conjunct is guarded by the instantiated assumptions.
+
+        :param prop: See ``properties`` in :func:`instantiate_properties`
+        :param cutoff:
+        :return: list of instantiated formulas
+        '''
+        guarantee_conjuncts, instantiate_assumptions = \
+            self._instantiate_guarantees(prop, cutoff)
+
+        guarantee_conjuncts = [conjunct for formula in guarantee_conjuncts
+                               for conjunct in _get_conjuncts(formula)
+                               if conjunct != Bool(True)]
+        if not guarantee_conjuncts:
+            guarantee_conjuncts = [Bool(True)]
+        LOG.debug("Guarantees instantiated: %s", guarantee_conjuncts)
+
+        instantiated_assumptions = None
+        if instantiate_assumptions is not None and \
+                any(self.is_liveness_property(conjunct)
+                    for conjunct in guarantee_conjuncts):
+            instantiated_assumptions = instantiate_assumptions()
+
+        LOG.debug("Assumptions instantiated: %s", instantiated_assumptions)
+
+        if instantiated_assumptions is not None:
+            return [BinOp('->', instantiated_assumptions, conjunct)
+                    for conjunct in guarantee_conjuncts]
+        return guarantee_conjuncts
+
+    def _instantiate_guarantees(self, prop, cutoff):
+        '''
+        Returns the list of instantiated guarantees of the given property
+        and a function that instantiates the assumptions (or None if
+        the property has no assumptions)
+        '''
         # extract assumptions and guarantees
         assumptions, guarantee = prop[:2]
 
@@ -236,39 +682,43 @@ class BoundedSynthesis:
             guarantee_instances_dict = \
                 self.arch.determine_guarantee_instances_dict(guarantee)
 
-        instantiated_guarantees = and_expressions(
-            [conjunct for conjunct in
-             ast_visitor.visit(guarantee, guarantee_instances_dict)])
-        LOG.debug("Guarantees instantiated: %s", instantiated_guarantees)
+        guarantee_conjuncts = \
+            list(ast_visitor.visit(guarantee, guarantee_instances_dict))
 
-        instantiated_assumptions = None
-        if len(assumptions) and \
-                self.is_liveness_property(instantiated_guarantees):
-            # instantiate assumptions
-            instantiated_assumptions = \
-                and_expressions([conjunct for formula in assumptions
-                                 for conjunct in
-                                 ast_visitor.visit(formula,
-                                                   assumption_instances_dict)])
+        if not len(assumptions):
+            return guarantee_conjuncts, None
 
-        LOG.debug("Assumptions instantiated: %s", instantiated_assumptions)
+        def instantiate_assumptions():
+            return and_expressions([conjunct for formula in assumptions
+                                    for conjunct in
+                                    ast_visitor.visit(formula,
+                                                      assumption_instances_dict)])
 
-        # return implication or just guarantees
-        if instantiated_assumptions is not None:
-            return BinOp('->', instantiated_assumptions,
-                         instantiated_guarantees)
-        else:
-            return instantiated_guarantees
+        return guarantee_conjuncts, instantiate_assumptions
 
     def is_liveness_property(self, guarantee):
         '''
         Checks whether the given guarantee is a liveness guarantee
         :param guarantee:
         '''
-        automaton = self.ltl2ucw.convert(guarantee)
+        with self.statistics.phase(PHASE_TRANSLATION):
+            automaton = self.ltl2ucw.convert(guarantee)
         return not automata_helper.is_safety_automaton(automaton)
 
 
+def _get_conjuncts(formula):
+    '''
+    Returns the top-level conjuncts of the given formula, where globally
+    operators are distributed over conjunctions (G(a * b) = G(a) * G(b))
+    '''
+    if isinstance(formula, BinOp) and formula.name == '*':
+        return _get_conjuncts(formula.arg1) + _get_conjuncts(formula.arg2)
+    if isinstance(formula, UnaryOp) and formula.name == 'G':
+        return [UnaryOp('G', conjunct)
+                for conjunct in _get_conjuncts(formula.arg)]
+    return [formula]
+
+
 def print_spec_formulas(*spec_formulas):
     '''
     Prints some information for the given specification formulas
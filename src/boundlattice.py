@@ -0,0 +1,190 @@
+'''
+Search over the lattice of per-template bounds
+
+Instead of increasing the bounds of all templates together, all bound
+vectors between the minimal bound and the minimal bound plus the maximum
+number of increments are explored in the order of their total size
+(sum of template sizes) on a pool of processes.
+
+If there is no model for a bound vector, there is no model for any
+smaller vector either (a smaller template can be padded by unreachable
+states), thus all vectors that are dominated by a vector without model
+are pruned. Vectors with unknown result (e.g., solver timeout) do not
+prune other vectors. The search returns the first model found at the
+minimal total size.
+'''
+import logging
+import sys
+
+from collections import deque
+from itertools import product
+from multiprocessing import cpu_count
+from multiprocessing.connection import wait
+
+from bosy import BoundedSynthesis
+from helpers.process_job import ProcessJob
+
+LOG = logging.getLogger("lattice")
+
+
+def get_bound_vectors(min_bound, max_increments):
+    '''
+    Returns all bound vectors between the minimal bound and the minimal
+    bound plus max_increments (per template), ordered by total size
+    '''
+    vectors = product(*[range(template_bound,
+                              template_bound + max_increments + 1)
+                        for template_bound in min_bound])
+    return sorted(vectors, key=lambda bound: (sum(bound), bound))
+
+
+def is_dominated(bound, other_bound):
+    '''
+    Returns whether each template bound is at most the other template bound
+    '''
+    return all(template_bound <= other_template_bound
+               for template_bound, other_template_bound
+               in zip(bound, other_bound))
+
+
+def _execute_bound(spec_filename, architecture, settings, bound,
+                   connection):
+    try:
+        bosy = BoundedSynthesis(spec_filename, architecture)
+        bosy.apply_settings(settings)
+        model = bosy.solve_bound(bound)
+        connection.send((model, bosy.has_unknown_result, bosy.statistics))
+    except Exception as ex:
+        connection.send(ex)
+        sys.exit(1)
+
+
+class BoundJob(ProcessJob):
+    '''
+    Synthesis round of one bound vector in a separate process
+
+    The result is the tuple (model, has_unknown_result, statistics) or the
+    exception of the round.
+    '''
+    def __init__(self, bosy, bound):
+        self.bound = bound
+        super().__init__(_execute_bound,
+                         (bosy.spec_filename, type(bosy.arch),
+                          bosy.get_settings(), bound))
+
+    def _on_exit(self, exitcode):
+        return Exception("Round of bound %s exited with code %s" %
+                         (self.bound, exitcode))
+
+
+class BoundLatticeSearch(object):
+    '''
+    Searches the bound lattice of a bounded synthesis instance
+    '''
+    def __init__(self, bosy, jobs=None):
+        '''
+        :param bosy: :class:`BoundedSynthesis` instance, its minimal bound
+                     and maximum increments span the lattice
+        :param jobs: number of parallel processes (default: CPU count)
+        '''
+        self.bosy = bosy
+        self.jobs = cpu_count() if jobs is None else max(jobs, 1)
+
+        # bound vectors with model, without model, and with unknown result
+        self.sat_bounds = []
+        self.unsat_bounds = []
+        self.unknown_bounds = []
+        self.pruned_count = 0
+
+    def _is_pruned(self, bound, best_bound):
+        if best_bound is not None and sum(bound) >= sum(best_bound):
+            return True
+        return any(is_dominated(bound, unsat_bound)
+                   for unsat_bound in self.unsat_bounds)
+
+    def solve(self):
+        '''
+        Returns the first model found at the minimal total size
+        (None if there is no model in the lattice)
+
+        The bound and the round statistics of the model are stored in the
+        synthesis instance.
+        '''
+        pending = deque(get_bound_vectors(self.bosy.min_bound,
+                                          self.bosy.max_increments))
+        running = []
+        failures = []
+        best = None
+
+        self.sat_bounds = []
+        self.unsat_bounds = []
+        self.unknown_bounds = []
+        self.pruned_count = 0
+        try:
+            while True:
+                best_bound = None if best is None else best[0]
+                for job in [job for job in running
+                            if self._is_pruned(job.bound, best_bound)]:
+                    LOG.debug("Cancel bound %s", job.bound)
+                    job.terminate()
+                    running.remove(job)
+                    self.pruned_count += 1
+
+                # pending vectors are checked once when they are due
+                while pending and len(running) < self.jobs:
+                    bound = pending.popleft()
+                    if self._is_pruned(bound, best_bound):
+                        self.pruned_count += 1
+                        continue
+                    LOG.info("Start bound %s", bound)
+                    running.append(BoundJob(self.bosy, bound))
+
+                if not running:
+                    break
+
+                wait([wait_object for job in running
+                      for wait_object in job.wait_objects])
+
+                for job in list(running):
+                    result = job.get_result()
+                    if result is None:
+                        continue
+                    running.remove(job)
+                    if isinstance(result, Exception):
+                        LOG.warning("Bound %s failed: %s", job.bound, result)
+                        failures.append(result)
+                        continue
+
+                    model, has_unknown_result, statistics = result
+                    if model is None and has_unknown_result:
+                        # the vector may have a model, which cannot be
+                        # extended to dominated vectors
+                        LOG.info("Bound %s: unknown", job.bound)
+                        self.unknown_bounds.append(job.bound)
+                        continue
+                    LOG.info("Bound %s: %s", job.bound,
+                             ["no model", "model found"][model is not None])
+                    if model is None:
+                        self.unsat_bounds.append(job.bound)
+                        continue
+                    self.sat_bounds.append(job.bound)
+                    if best is None or sum(job.bound) < sum(best[0]):
+                        best = (job.bound, model, statistics)
+        finally:
+            for job in running:
+                job.terminate()
+
+        LOG.info("Lattice search: %d rounds (%d unknown), %d bound vectors "
+                 "pruned", len(self.sat_bounds) + len(self.unsat_bounds) +
+                 len(self.unknown_bounds), len(self.unknown_bounds),
+                 self.pruned_count)
+
+        if best is None:
+            if failures:
+                raise failures[0]
+            return None
+
+        bound, model, statistics = best
+        self.bosy.spec.bound = bound
+        self.bosy.statistics = statistics
+        return model
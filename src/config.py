@@ -1,6 +1,44 @@
+import os
+
 Z3_PATH = "/usr/bin/z3"
 LTL3BA_PATH = "/usr/local/src/ltl3ba/ltl3ba"
 
+# persistent cache of ltl3ba translations (set to None to disable)
+LTL3BA_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "guardedsynthesis", "ltl3ba")
+LTL3BA_CACHE_SIZE = 64 * 1024 * 1024
+
+# external SMT solver that is called with an SMT-LIB2 file
+EXTERNAL_SOLVER_PATH = Z3_PATH
+# hard timeout of each external solver call in seconds (None: no timeout)
+EXTERNAL_SOLVER_TIMEOUT = None
+# e.g. "(check-sat-using (then qe smt))" to force quantifier elimination
+EXTERNAL_SOLVER_CHECK_COMMAND = "(check-sat)"
+# directory where the SMT-LIB2 files are kept (None: delete them)
+SMT2_DUMP_PATH = None
+
+# SAT solver that is called with a DIMACS file (None: z3's sat tactic)
+SAT_SOLVER_PATH = None
+# timeout of each SAT solver call in seconds (None: no timeout)
+SAT_SOLVER_TIMEOUT = None
+# number of bits of the ranks lambda_s in the CNF (None: derived from the
+# number of product states), unsatisfiable rounds are unknown if the width
+# is too small
+SAT_RANK_WIDTH = None
+# directory where the DIMACS files are kept (None: delete them)
+DIMACS_DUMP_PATH = None
+
+# directory where the deduplicated constraints of each check are pickled
+# (constraint IR only, None: no dumps)
+IR_DUMP_PATH = None
+
+# JSON file with the tuned solver profile of each specification family, see
+# solver_tuning.py (None: default tactics and parameters)
+SOLVER_PROFILE_PATH = None
+
+# persistent cache of synthesis round results (set to None to disable)
+RESULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "guardedsynthesis", "results")
+RESULT_CACHE_SIZE = 256 * 1024 * 1024
+
 
 if __name__ == '__main__':
     print('open me and modify paths')
@@ -8,7 +8,8 @@ import parsing.par_parser as par_parser
 import parsing.par_lexer_desc as par_lexer_desc
 from interfaces.parser_expr import Signal
 from datastructures.exceptions import SpecificationException
-from parsing.helpers import ASTSignalCollectorVisitor
+from parsing.helpers import ASTSignalCollectorVisitor, \
+    ASTNormalizedStringVisitor
 
 
 class Specification(object):
@@ -166,6 +167,28 @@ class Specification(object):
         return [Signal('sched_%d' % i)
                 for i in reversed(range(0, self.get_scheduling_size()))]
 
+    def get_normalized_content(self):
+        '''
+        Returns a textual representation of the parsed specification which
+        does not depend on comments and formatting of the specification file
+        '''
+        lines = ["templates: %d" % self.templates_count]
+        for template in self.templates:
+            lines.append("inputs %d: %s" % (template.template_index,
+                                            ", ".join(map(str,
+                                                          template.inputs))))
+            lines.append("outputs %d: %s" % (template.template_index,
+                                             ", ".join(map(str,
+                                                           template.outputs))))
+        formula_visitor = ASTNormalizedStringVisitor()
+        lines.extend("assumption: %s" %
+                     formula_visitor.dispatch(assumption.formula)
+                     for assumption in self.assumptions)
+        lines.extend("guarantee: %s" %
+                     formula_visitor.dispatch(guarantee.formula)
+                     for guarantee in self.guarantees)
+        return "\n".join(lines)
+
 
 class Template:
     '''
@@ -0,0 +1,137 @@
+'''
+encoding_benchmark -- Micro-benchmark of the automaton encoding
+
+Measures the Python-side time of :meth:`smt.api.encoder.PyZ3Encoder.encode`
+and :meth:`smt.api.encoder.PyZ3Encoder.encode_automata` for increasing
+cut-offs. The automata are generated (mutual exclusion of each pair of
+processes and a response property of each process), such that neither
+ltl3ba nor a solver call is required.
+'''
+import sys
+import time
+
+from argparse import ArgumentParser
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture, \
+    DisjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import InstanceSignal
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+def get_benchmark_automaton(process_count):
+    '''
+    Returns a UCW that rejects if two processes are granted at the same time
+    or if a scheduled process with a request is never granted afterwards
+
+    :param process_count: number of processes of the single template
+    '''
+    init = Node('init')
+    init.add_transition({}, {(init, False)})
+    rejecting = Node('rejecting')
+    rejecting.add_transition({}, {(rejecting, True)})
+    nodes = [init, rejecting]
+    for i in range(process_count):
+        grant = InstanceSignal('g', 0, i)
+        waiting = Node('waiting_%d' % i)
+        waiting.add_transition({grant: False}, {(waiting, True)})
+        init.add_transition({InstanceSignal('active', 0, i): True,
+                             InstanceSignal('r', 0, i): True,
+                             grant: False}, {(waiting, True)})
+        nodes.append(waiting)
+        for j in range(i + 1, process_count):
+            init.add_transition({grant: True, InstanceSignal('g', 0, j): True},
+                                {(rejecting, True)})
+    return Automaton([{init}], [rejecting], nodes, name="benchmark")
+
+
+def measure(arch_type, encoder_type, encoding_optimization, bound, cutoff):
+    '''
+    Returns the tuple (automaton edges, encode time, encode_automata time)
+    for a single template with the given bound and cut-off
+    '''
+    spec = Specification(content=_SPEC)
+    spec.bound = (bound,)
+    spec.cutoff = (cutoff,)
+    automaton = get_benchmark_automaton(cutoff)
+
+    encoder = SMTEncoderFactory().create(encoder_type)(
+        spec, arch_type(spec), encoding_optimization)
+
+    encode_time = time.perf_counter()
+    encoder.encode()
+    encode_time = time.perf_counter() - encode_time
+
+    encode_automata_time = time.perf_counter()
+    encoder.encode_automata([(automaton, 0, False, spec.cutoff)],
+                            spec.cutoff)
+    encode_automata_time = time.perf_counter() - encode_automata_time
+
+    edges = sum(len(target_node_infos[0]) for node in automaton.nodes
+                for target_node_infos in node.transitions.values())
+    return edges, encode_time, encode_automata_time
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measures the encoding time "
+                            "against the cut-off")
+    parser.add_argument("-t", "--system-type", default="conjunctive_guards",
+                        choices=["conjunctive_guards", "disjunctive_guards"])
+    parser.add_argument("--label-guards", action='store_true',
+                        help="Encode label guards instead of state guards")
+    parser.add_argument("--grounded", action='store_true',
+                        help="Expand all quantifiers")
+    parser.add_argument("--symmetry-reduction", action='store_true',
+                        help="Count the local states of unnamed processes")
+    parser.add_argument("--bound", type=int, default=2,
+                        help="Template size [default: %(default)s]")
+    parser.add_argument("--cutoffs", type=int, nargs='+',
+                        default=[2, 3, 4, 5, 6],
+                        help="Cut-offs to measure [default: %(default)s]")
+    parser.add_argument("--runs", type=int, default=3,
+                        help="Runs per cut-off, the fastest run is "
+                        "reported [default: %(default)s]")
+    args = parser.parse_args(argv)
+
+    arch_type = {"conjunctive_guards": ConjunctiveGuardedArchitecture,
+                 "disjunctive_guards": DisjunctiveGuardedArchitecture}[
+                     args.system_type]
+    encoder_type = [SMTEncoder.STATE_GUARD_ENCODER,
+                    SMTEncoder.LABEL_GUARD_ENCODER][args.label_guards]
+    encoding_optimization = EncodingOptimization.NONE
+    if args.grounded:
+        encoding_optimization |= EncodingOptimization.GROUNDED
+    if args.symmetry_reduction:
+        encoding_optimization |= EncodingOptimization.SYMMETRY_REDUCTION
+
+    print("%8s %8s %12s %18s" % ("cut-off", "edges", "encode [s]",
+                                 "encode_automata [s]"))
+    for cutoff in args.cutoffs:
+        measurements = [measure(arch_type, encoder_type,
+                                encoding_optimization, args.bound, cutoff)
+                        for _ in range(args.runs)]
+        print("%8d %8d %12.3f %18.3f" %
+              (cutoff, measurements[0][0],
+               min(measurement[1] for measurement in measurements),
+               min(measurement[2] for measurement in measurements)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
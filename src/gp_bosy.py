@@ -21,13 +21,18 @@ import os
 from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 import logging
-from bosy import BoundedSynthesis
+from bosy import BoundedSynthesis, SEARCH_STRATEGIES, SEARCH_LINEAR
+from portfolio import PortfolioSynthesis, get_portfolio_configurations
+from boundlattice import BoundLatticeSearch
+from modelchecker import ExplicitStateModelChecker
+from simulation import BulkSimulation, OutputCountMonitor
 from smt.encoder_base import SMTEncoder, EncodingOptimization
 import time
 from architecture import guarded_system
 from visualization.dotvisualization import model_to_dot
 import config
 import helpers
+from helpers.instrumentation import COUNTER_CACHED_ROUNDS
 from architecture.guarded_system import GuardedArchitectureType
 
 __all__ = []
@@ -108,9 +113,40 @@ USAGE
                             type=int, nargs="+", required=True)
         parser.add_argument('-V', '--version', action='version',
                             version=program_version_message)
-#         parser.add_argument('--smt2', action='store_true',
-#                             help="Use SMT2 encoder [default: %(default)s]",
-#                             default=False)
+        parser.add_argument('--smt2', action='store_true',
+                            help=("Solve each round by an external solver "
+                                  "on an SMT-LIB2 file "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--solver-path', dest="solver_path",
+                            help=("External solver binary "
+                                  "[default: %(default)s]"),
+                            default=config.EXTERNAL_SOLVER_PATH)
+        parser.add_argument('--solver-timeout', dest="solver_timeout",
+                            type=float,
+                            help=("Hard timeout of each external solver "
+                                  "call in seconds [default: %(default)s]"),
+                            default=config.EXTERNAL_SOLVER_TIMEOUT)
+        parser.add_argument('--smt2-dump', dest="smt2_dump_path",
+                            help=("Keep the SMT-LIB2 files of the external "
+                                  "solver in the given directory"),
+                            default=config.SMT2_DUMP_PATH)
+        parser.add_argument('--sat', action='store_true',
+                            help=("Bit-blast each round to CNF and solve it "
+                                  "by a SAT solver [default: %(default)s]"),
+                            default=False)
+        parser.add_argument('--sat-solver-path', dest="sat_solver_path",
+                            help=("SAT solver binary that is called with a "
+                                  "DIMACS file (default: z3's sat tactic)"),
+                            default=config.SAT_SOLVER_PATH)
+        parser.add_argument('--rank-width', dest="rank_width", type=int,
+                            help=("Number of bits of the ranks in the CNF "
+                                  "(default: derived from the number of "
+                                  "product states)"),
+                            default=config.SAT_RANK_WIDTH)
+        parser.add_argument('--dimacs-dump', dest="dimacs_dump_path",
+                            help=("Keep the DIMACS files of the SAT solver "
+                                  "in the given directory"),
+                            default=config.DIMACS_DUMP_PATH)
         parser.add_argument('--test', action='store_true',
                             help=("Use test mode (ignore cut-offs) "
                                   "[default: %(default)s]"), default=False)
@@ -121,6 +157,116 @@ USAGE
                             action='store_true',
                             help=("Synthesize label guards "
                                   "instead of state guards"))
+        parser.add_argument('--grounded', action='store_true',
+                            help=("Expand all quantifiers and solve the "
+                                  "quantifier-free encoding "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--symmetry-reduction', action='store_true',
+                            help=("Count the local states of processes "
+                                  "that are not named by a property "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--symmetry-breaking', action='store_true',
+                            help=("Fix the guard bits of the states and "
+                                  "number the states of the templates in "
+                                  "breadth-first order "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--aux-bisection', action='store_true',
+                            help=("Binary search over the number of "
+                                  "auxiliary labels (label guards only) "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--lazy-transitions', action='store_true',
+                            help=("Only add the automaton transition "
+                                  "constraints that are violated by a "
+                                  "candidate model "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--constraint-ir', action='store_true',
+                            help=("Lift the constraints into the "
+                                  "solver-independent IR and assert "
+                                  "identical constraints only once "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--ir-dump', dest="ir_dump_path",
+                            help=("Pickle the constraints of each check in "
+                                  "the given directory (constraint IR only)"),
+                            default=config.IR_DUMP_PATH)
+        parser.add_argument('--solver-profile', dest="solver_profile",
+                            help=("JSON file with the tuned solver profile "
+                                  "of each specification family (see "
+                                  "solver_tuning.py)"),
+                            default=config.SOLVER_PROFILE_PATH)
+        parser.add_argument('--incremental', action='store_true',
+                            help=("Reuse the solver for rounds with the "
+                                  "same cut-off [default: %(default)s]"),
+                            default=False)
+        parser.add_argument('--search', dest="search_strategy",
+                            choices=SEARCH_STRATEGIES, default=SEARCH_LINEAR,
+                            help=("Order in which the bound increments "
+                                  "are tried [default: %(default)s]"))
+        parser.add_argument('--no-result-cache', dest="use_result_cache",
+                            action='store_false',
+                            help=("Solve all rounds even if their result "
+                                  "is stored in the result cache"))
+        parser.add_argument('--split-properties', action='store_true',
+                            help=("Translate each conjunct of an "
+                                  "instantiated property into a separate "
+                                  "automaton [default: %(default)s]"),
+                            default=False)
+        parser.add_argument('--portfolio', action='store_true',
+                            help=("Race state and label guards with and "
+                                  "without optimization in parallel "
+                                  "processes [default: %(default)s]"),
+                            default=False)
+        parser.add_argument('--seeds', dest="seeds", type=int, nargs='+',
+                            default=[0],
+                            help=("Z3 random seeds of the portfolio "
+                                  "configurations [default: %(default)s]"))
+        parser.add_argument('--portfolio-record', dest="portfolio_record",
+                            help=("JSON file that records the winning "
+                                  "portfolio configuration per "
+                                  "specification"),
+                            default=None)
+        parser.add_argument('--bound-lattice', dest="bound_lattice",
+                            action='store_true',
+                            help=("Search all per-template bound vectors "
+                                  "in order of their total size "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('-j', '--jobs', dest="jobs", type=int,
+                            help=("Number of parallel processes of the "
+                                  "portfolio and the bound lattice search "
+                                  "[default: one per configuration or "
+                                  "CPU]"), default=None)
+        parser.add_argument('--dry-run', dest="dry_run", action='store_true',
+                            help=("Print the predicted encoding size of "
+                                  "the first round instead of solving "
+                                  "[default: %(default)s]"), default=False)
+        parser.add_argument('--stats-path', dest="stats_path",
+                            help=("Append per-round timing statistics as "
+                                  "JSON lines to the given file"),
+                            default=None)
+        parser.add_argument('--check-instances', dest="check_instances",
+                            help=("Model check the synthesized system for "
+                                  "the given number of instances of each "
+                                  "template"),
+                            type=int, nargs="+", default=None)
+        parser.add_argument('--simulate-instances', dest="simulate_instances",
+                            help=("Simulate random fair schedules of the "
+                                  "synthesized system for the given number "
+                                  "of instances of each template "
+                                  "(requires NumPy)"),
+                            type=int, nargs="+", default=None)
+        parser.add_argument('--simulation-steps', dest="simulation_steps",
+                            help=("Number of simulated steps "
+                                  "[default: %(default)s]"),
+                            type=int, default=10000)
+        parser.add_argument('--simulation-runs', dest="simulation_runs",
+                            help=("Number of simulated runs "
+                                  "[default: %(default)s]"),
+                            type=int, default=100)
+        parser.add_argument('--simulation-monitor', dest="simulation_monitors",
+                            help=("Report simulation steps in which more "
+                                  "than MAX processes set the output "
+                                  "(e.g., g_0 1)"),
+                            nargs=2, metavar=("OUTPUT", "MAX"),
+                            action="append", default=[])
 
         args = parser.parse_args()
 
@@ -138,6 +284,7 @@ USAGE
         if arch_type is None:
             sys.exit("Invalid system type")
 
+        config.SOLVER_PROFILE_PATH = args.solver_profile
         bosy = BoundedSynthesis(ltl_filepath, arch_type)
 
         # set minimal bound
@@ -163,12 +310,65 @@ USAGE
                                     if len(instance_count) == 1
                                     else instance_count)
 
+        check_instances = args.check_instances
+        if check_instances is not None:
+            if len(check_instances) > 1 and \
+                    len(check_instances) != templates_count:
+                sys.exit("Invalid number of instances to check: Please "
+                         "provide a number of instances for each template")
+            check_instances = tuple(check_instances * templates_count
+                                    if len(check_instances) == 1
+                                    else check_instances)
+
+        simulate_instances = args.simulate_instances
+        if simulate_instances is not None:
+            if len(simulate_instances) > 1 and \
+                    len(simulate_instances) != templates_count:
+                sys.exit("Invalid number of instances to simulate: Please "
+                         "provide a number of instances for each template")
+            simulate_instances = tuple(simulate_instances * templates_count
+                                       if len(simulate_instances) == 1
+                                       else simulate_instances)
+
         # set other parameters
         bosy.encoder_type = [SMTEncoder.STATE_GUARD_ENCODER,
                              SMTEncoder.LABEL_GUARD_ENCODER][args.label_guards]
         bosy.test_mode = args.test
+        bosy.incremental = args.incremental
+        bosy.split_properties = args.split_properties
+        bosy.search_strategy = args.search_strategy
+        bosy.use_result_cache = args.use_result_cache
+        bosy.count_ast_size = args.stats_path is not None
         bosy.encoder_optimization = [EncodingOptimization.NONE,
                                      EncodingOptimization.LAMBDA_SCC][args.optimization]
+        if args.grounded:
+            bosy.encoder_optimization |= EncodingOptimization.GROUNDED
+        if args.symmetry_reduction:
+            bosy.encoder_optimization |= \
+                EncodingOptimization.SYMMETRY_REDUCTION
+        if args.symmetry_breaking:
+            bosy.encoder_optimization |= \
+                EncodingOptimization.SYMMETRY_BREAKING
+        if args.aux_bisection:
+            bosy.encoder_optimization |= \
+                EncodingOptimization.AUX_LABEL_BISECTION
+        if args.lazy_transitions:
+            bosy.encoder_optimization |= \
+                EncodingOptimization.LAZY_TRANSITIONS
+        if args.constraint_ir:
+            config.IR_DUMP_PATH = args.ir_dump_path
+            bosy.encoder_optimization |= EncodingOptimization.CONSTRAINT_IR
+        if args.smt2:
+            config.EXTERNAL_SOLVER_PATH = args.solver_path
+            config.EXTERNAL_SOLVER_TIMEOUT = args.solver_timeout
+            config.SMT2_DUMP_PATH = args.smt2_dump_path
+            bosy.encoder_optimization |= EncodingOptimization.EXTERNAL_SOLVER
+        if args.sat:
+            config.SAT_SOLVER_PATH = args.sat_solver_path
+            config.SAT_SOLVER_TIMEOUT = args.solver_timeout
+            config.SAT_RANK_WIDTH = args.rank_width
+            config.DIMACS_DUMP_PATH = args.dimacs_dump_path
+            bosy.encoder_optimization |= EncodingOptimization.SAT_SOLVER
 
         print("Start finding a solution for problem \'%s\'" % bosy.spec_filename)
         print("Number of templates: %s" % str(bosy.spec.templates_count))
@@ -177,11 +377,41 @@ USAGE
         print("Number of instances: %s" % str(bosy.instance_count))
         print("System type:         %s" % str(args.system_type))
 
-        t = time.clock()
-
-        model = bosy.solve()
-
-        elapsed_time = time.clock() - t
+        if args.dry_run:
+            print(bosy.estimate())
+            return 0
+
+        t = time.perf_counter()
+        t_cpu = time.process_time()
+
+        if args.portfolio and args.bound_lattice:
+            sys.exit("The portfolio mode and the bound lattice search "
+                     "cannot be combined")
+
+        if args.portfolio:
+            portfolio = PortfolioSynthesis(
+                bosy,
+                get_portfolio_configurations(args.seeds,
+                                             bosy.encoder_optimization),
+                jobs=args.jobs,
+                record_filepath=args.portfolio_record)
+            model = portfolio.solve()
+            print("Winning configuration: %s" % portfolio.winner)
+        elif args.bound_lattice:
+            lattice_search = BoundLatticeSearch(bosy, jobs=args.jobs)
+            model = lattice_search.solve()
+            print("Lattice rounds: %d (unknown: %d), pruned bound "
+                  "vectors: %d" %
+                  (len(lattice_search.sat_bounds) +
+                   len(lattice_search.unsat_bounds) +
+                   len(lattice_search.unknown_bounds),
+                   len(lattice_search.unknown_bounds),
+                   lattice_search.pruned_count))
+        else:
+            model = bosy.solve()
+
+        elapsed_time = time.perf_counter() - t
+        elapsed_cpu_time = time.process_time() - t_cpu
 
         print("==============================================================")
         print("Initial bound was %s; "
@@ -191,9 +421,54 @@ USAGE
         if model is not None:
             print("\n".join([str(template_model)
                              for template_model in model.values()]))
-        print("Elapsed time: %ss" % elapsed_time)
+        print("Elapsed time: %ss (CPU: %ss)" % (elapsed_time,
+                                                 elapsed_cpu_time))
+        # rounds whose result is taken from the result cache do not call
+        # the solver
+        counter_totals = bosy.statistics.get_counter_totals()
+        print("Solver calls: %d" %
+              (len(bosy.statistics.rounds) -
+               counter_totals.get(COUNTER_CACHED_ROUNDS, 0)))
+        for phase, measurement in \
+                sorted(bosy.statistics.get_phase_totals().items()):
+            print("  %-17s %.3fs (CPU: %.3fs, children: %.3fs)" %
+                  (phase + ":", measurement["wall"], measurement["cpu"],
+                   measurement["children_cpu"]))
+        for counter, value in sorted(counter_totals.items()):
+            print("  %-17s %d" % (counter + ":", value))
         print("==============================================================")
 
+        if model is not None and check_instances is not None:
+            checker = ExplicitStateModelChecker(bosy.spec, bosy.arch, model,
+                                                bosy.ltl2ucw)
+            t = time.perf_counter()
+            results = checker.check(check_instances)
+            print("Model checking for %s instances (%.3fs):" %
+                  (str(check_instances), time.perf_counter() - t))
+            for result in results:
+                print("  " + str(result))
+                if not result.holds:
+                    print("    trace: " + " -> ".join(result.trace))
+            print("==========================================================="
+                  "===")
+
+        if model is not None and simulate_instances is not None:
+            simulation = BulkSimulation(bosy.spec, bosy.arch, model,
+                                        simulate_instances,
+                                        runs=args.simulation_runs)
+            monitors = [OutputCountMonitor(output, int(max_count))
+                        for output, max_count in args.simulation_monitors]
+            t = time.perf_counter()
+            statistics = simulation.run(args.simulation_steps, monitors)
+            print(statistics)
+            print("  simulation time: %.3fs" % (time.perf_counter() - t))
+            print("==========================================================="
+                  "===")
+
+        if args.stats_path is not None:
+            bosy.statistics.write_json_lines(
+                args.stats_path, spec=os.path.basename(ltl_filepath))
+
         dot_path = args.dot_path
         if model is not None and dot_path is not None:
             # extend by directory of specification if relative
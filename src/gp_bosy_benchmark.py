@@ -23,12 +23,15 @@ import time
 from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 from itertools import product
-from multiprocessing import Process, Queue
+from multiprocessing.connection import wait
 
 from helpers.logging_helper import verbosity_to_log_level
+from helpers.process_job import ProcessJob
+from helpers.instrumentation import PHASES, COUNTER_ASSERTIONS, \
+    COUNTER_AUTOMATON_STATES, COUNTER_CACHED_ROUNDS
 from helpers.benchmark_config import read_config_file
 from architecture.guarded_system import GuardedArchitecture
-from bosy import BoundedSynthesis
+from bosy import BoundedSynthesis, SEARCH_STRATEGIES, SEARCH_LINEAR
 from smt.encoder_base import SMTEncoder, EncodingOptimization
 from helpers import benchmark_config
 from visualization import dotvisualization
@@ -72,6 +75,10 @@ class BenchmarkTestRequest(object):
         self.use_label_guards = None
         self.use_test_mode = None
         self.use_scc = None
+        self.use_symmetry_breaking = False
+        self.search_strategy = SEARCH_LINEAR
+        self.use_result_cache = False
+        self.count_ast_size = False
 
         self.benchmark_index = None
         self.run_index = None
@@ -98,6 +105,8 @@ class BenchmarkTestResult(object):
         self.is_satisfiable = None
         self.current_bound = None
         self.description = None
+        self.wall_time = None
+        self.statistics = None
 
     @property
     def current_bound_sum(self):
@@ -137,10 +146,9 @@ class BenchmarkTestInvalidExitResult(BenchmarkTestControllerResult):
         self.description = "Exit code: %s" % exit_code
 
 
-def _execute_benchmark_test(queue):
+def _execute_benchmark_test(request, connection):
     try:
         log = logging.getLogger("bm-runner")
-        request = queue.get()
 
         arch_type = GuardedArchitecture.get_type_by_id(request.guard_type)
         bosy = BoundedSynthesis(request.spec_filepath, arch_type)
@@ -173,10 +181,18 @@ def _execute_benchmark_test(queue):
         bosy.encoder_optimization = \
             [EncodingOptimization.NONE,
              EncodingOptimization.LAMBDA_SCC][request.use_scc]
-
-        t = time.clock()
+        if request.use_symmetry_breaking:
+            bosy.encoder_optimization |= \
+                EncodingOptimization.SYMMETRY_BREAKING
+        bosy.search_strategy = request.search_strategy
+        bosy.use_result_cache = request.use_result_cache
+        bosy.count_ast_size = request.count_ast_size
+
+        wall_time = time.perf_counter()
+        t = time.process_time()
         model = bosy.solve()
-        t = time.clock() - t
+        t = time.process_time() - t
+        wall_time = time.perf_counter() - wall_time
         try:
             if model is not None and request.save_dot:
                 dotvisualization.model_to_dot(
@@ -189,76 +205,154 @@ def _execute_benchmark_test(queue):
         result = BenchmarkTestResult()
         result.request = request
         result.runtime = t
+        result.wall_time = wall_time
+        result.statistics = bosy.statistics
         result.current_bound = bosy.spec.bound
         result.is_satisfiable = (model is not None)
-        queue.put(result)
+        connection.send(result)
     except Exception as ex:
-        queue.put(ex)
+        connection.send(ex)
         sys.exit(1)
 
 
+class BenchmarkRunGroup(object):
+    '''
+    Runs of a benchmark item for one instance count and bound
+
+    Once a run is invalid (timeout, invalid exit), no further runs of the
+    group are started. Results are released in run order, and results of
+    runs after the invalid run are dropped, such that the reported results
+    match a sequential execution of the runs.
+    '''
+    def __init__(self, config_filepath, benchmark_item, instance_count,
+                 min_bound, requests):
+        self.config_filepath = config_filepath
+        self.benchmark_item = benchmark_item
+        self.instance_count = instance_count
+        self.min_bound = min_bound
+        self.running_count = 0
+
+        self._requests = requests
+        self._next_run_index = 0
+        self._next_report_index = 0
+        self._results = {}
+        self.invalid_run_index = None
+
+    @property
+    def has_pending_request(self):
+        return self.invalid_run_index is None and \
+            self._next_run_index < len(self._requests)
+
+    @property
+    def is_finished(self):
+        last_run_index = len(self._requests) - 1 \
+            if self.invalid_run_index is None else self.invalid_run_index
+        return self._next_report_index > last_run_index
+
+    def pop_request(self):
+        request = self._requests[self._next_run_index]
+        self._next_run_index += 1
+        return request
+
+    def is_obsolete(self, request):
+        '''
+        Returns whether the given run follows an invalid run
+        '''
+        return self.invalid_run_index is not None and \
+            request.run_index > self.invalid_run_index
+
+    def add_result(self, request, result, is_invalid):
+        '''
+        Stores the result of a run and returns the list of
+        (request, result) tuples which can be reported now
+
+        :param request: request of the finished run
+        :param result: result of the finished run
+        :param is_invalid: whether the run is invalid
+        '''
+        if self.is_obsolete(request):
+            return []
+
+        if is_invalid:
+            self.invalid_run_index = request.run_index
+            self._results = {run_index: run_result for run_index, run_result
+                             in self._results.items()
+                             if run_index < request.run_index}
+        self._results[request.run_index] = (request, result)
+
+        reportable_results = []
+        while self._next_report_index in self._results:
+            reportable_results.append(
+                self._results.pop(self._next_report_index))
+            self._next_report_index += 1
+        return reportable_results
+
+
+class BenchmarkJob(ProcessJob):
+    '''
+    Single benchmark run executed in a separate process
+
+    The result is the tuple (result, is_invalid) of the run.
+    '''
+    def __init__(self, group, request, timeout):
+        self.group = group
+        self.request = request
+        super().__init__(_execute_benchmark_test, (request,), timeout)
+
+    def _on_result(self, result):
+        # an exception of the run is reported like a result, only timeouts
+        # and invalid exits stop the group
+        return result, False
+
+    def _on_exit(self, exitcode):
+        return BenchmarkTestInvalidExitResult(self.request, exitcode), True
+
+    def _on_timeout(self):
+        return BenchmarkTestTimeoutResult(self.request), True
+
+
 class BenchmarkExecution:
     def __init__(self, config_filepaths, csv_filepath, log_filepath,
-                 dot_directory, timeout=None):
+                 dot_directory, timeout=None, jobs=1, stats_filepath=None,
+                 search_strategy=SEARCH_LINEAR, use_result_cache=False):
         self._csv_filepath = csv_filepath
+        self._stats_filepath = stats_filepath
         self._log_filepath = log_filepath
         self._dot_directory = dot_directory
         self._timeout = timeout
+        self._jobs = max(jobs, 1)
+        self._search_strategy = search_strategy
+        self._use_result_cache = use_result_cache
         self._log = logging.getLogger("bm-ctrl")
         self._benchmark_index = 0
+        self._csv_fh = None
 
         self._benchmarks = []
         for config_path in config_filepaths:
             benchmark_config = read_config_file(config_path)
             self._benchmarks.append((config_path, benchmark_config))
 
-    def _execute_benchmark(self, benchmark_item):
+    def _get_benchmark_groups(self, config_filepath, benchmark_item):
         instance_counts = product(*benchmark_item.instances)
         min_bounds = [benchmark_item.min_bounds]  # product(*benchmark_item.min_bounds)
 
+        groups = []
         for instance_count in instance_counts:
             for min_bound in min_bounds:
                 self._benchmark_index += 1
-                invalid_run = False
-                run_index = 0
-                while not invalid_run and run_index < benchmark_item.run_count:
-                    # start test
-                    queue = Queue()
+                requests = []
+                for run_index in range(benchmark_item.run_count):
                     request = self._get_benchmark_request(benchmark_item,
-                                                     instance_count,
-                                                     min_bound)
+                                                          instance_count,
+                                                          min_bound)
                     request.benchmark_index = self._benchmark_index
                     request.run_index = run_index
-                    queue.put(request)
-
-                    proc = Process(target=_execute_benchmark_test,
-                                   args=(queue,))
-                    proc.start()
-                    proc.join(self._timeout)
-
-                    if proc.is_alive():
-                        proc.terminate()
-                        proc.join()
-                        result = BenchmarkTestTimeoutResult(request)
-                        invalid_run = True
-                    elif queue.empty():
-                        result = BenchmarkTestInvalidExitResult(request,
-                                                                proc.exitcode)
-                        invalid_run = True
-                    else:
-                        result = queue.get()
-
-                    if isinstance(result, Exception):
-                        self._log.critical(result)
-
-                    self._report_benchmark_result(request, result)
-                    run_index += 1
-                self._log.debug("Finished runs for spec %s, "
-                                "instance count %s, bound %s "
-                                "(invalid run: %s)",
-                                os.path.basename(benchmark_item.filename),
-                                str(instance_count), str(min_bound),
-                                ["no", "yes"][invalid_run])
+                    requests.append(request)
+                groups.append(BenchmarkRunGroup(config_filepath,
+                                                benchmark_item,
+                                                instance_count, min_bound,
+                                                requests))
+        return groups
 
     def _get_benchmark_request(self, benchmark_item,
                                instance_count,
@@ -279,20 +373,120 @@ class BenchmarkExecution:
             benchmark_item.is_setting_active(benchmark_config.SCC_FLAG)
         request.use_test_mode = \
             benchmark_item.is_setting_active(benchmark_config.TEST_MODE_FLAG)
+        request.use_symmetry_breaking = \
+            benchmark_item.is_setting_active(
+                benchmark_config.SYMMETRY_BREAKING_FLAG, default=False)
+        request.search_strategy = self._search_strategy
+        # cache hits take almost no solving time, thus the cache is only
+        # used if it is switched on globally or by the cache setting of
+        # the item (no-cache overrides the global switch)
+        request.use_result_cache = benchmark_item.is_setting_active(
+            benchmark_config.CACHE_FLAG, default=self._use_result_cache)
+        # the term counts are only reported in the statistics file
+        request.count_ast_size = self._stats_filepath is not None
 
         return request
 
     def execute_benchmarks(self):
+        groups = []
         for config_filepath, benchmark_items in self._benchmarks:
-            self._log.info("Start benchmarks for '%s'", config_filepath)
-
             for benchmark_item in benchmark_items:
-                self._execute_benchmark(benchmark_item)
-
-            self._log.info("Finished benchmarks for '%s'", config_filepath)
+                groups.extend(self._get_benchmark_groups(config_filepath,
+                                                         benchmark_item))
+        remaining_groups_count = {config_filepath: 0
+                                  for config_filepath, _ in self._benchmarks}
+        for group in groups:
+            remaining_groups_count[group.config_filepath] += 1
+
+        started_configs = set()
+        running_jobs = []
+        with open(self._csv_filepath, 'a+') as self._csv_fh:
+            while groups or running_jobs:
+                # fill up the workers, prefer groups without running jobs
+                while len(running_jobs) < self._jobs:
+                    group = self._get_next_group(groups)
+                    if group is None:
+                        break
+                    if group.config_filepath not in started_configs:
+                        started_configs.add(group.config_filepath)
+                        self._log.info("Start benchmarks for '%s'",
+                                       group.config_filepath)
+                    group.running_count += 1
+                    running_jobs.append(BenchmarkJob(group,
+                                                     group.pop_request(),
+                                                     self._timeout))
+
+                self._wait_for_jobs(running_jobs)
+
+                for job in list(running_jobs):
+                    job_result = job.get_result()
+                    if job_result is None:
+                        continue
+                    running_jobs.remove(job)
+                    job.group.running_count -= 1
+                    self._handle_job_result(job, *job_result)
+
+                # stop runs that follow an invalid run of the same group
+                for job in list(running_jobs):
+                    if job.group.is_obsolete(job.request):
+                        job.terminate()
+                        running_jobs.remove(job)
+                        job.group.running_count -= 1
+
+                for group in [group for group in groups
+                              if group.is_finished]:
+                    groups.remove(group)
+                    self._log.debug("Finished runs for spec %s, "
+                                    "instance count %s, bound %s "
+                                    "(invalid run: %s)",
+                                    os.path.basename(
+                                        group.benchmark_item.filename),
+                                    str(group.instance_count),
+                                    str(group.min_bound),
+                                    ["no", "yes"][group.invalid_run_index
+                                                  is not None])
+                    remaining_groups_count[group.config_filepath] -= 1
+                    if remaining_groups_count[group.config_filepath] == 0:
+                        self._log.info("Finished benchmarks for '%s'",
+                                       group.config_filepath)
+        self._csv_fh = None
+
+    @staticmethod
+    def _get_next_group(groups):
+        '''
+        Returns the next group with a pending run, groups without
+        running jobs are preferred
+        '''
+        pending_groups = [group for group in groups
+                          if group.has_pending_request]
+        for group in pending_groups:
+            if group.running_count == 0:
+                return group
+        return pending_groups[0] if pending_groups else None
+
+    def _wait_for_jobs(self, running_jobs):
+        '''
+        Blocks until one of the given jobs has finished or the earliest
+        deadline is reached
+        '''
+        if not running_jobs:
+            return
+        deadlines = [job.deadline for job in running_jobs
+                     if job.deadline is not None]
+        timeout = max(min(deadlines) - time.time(), 0) if deadlines else None
+        wait([wait_object for job in running_jobs
+              for wait_object in job.wait_objects], timeout)
+
+    def _handle_job_result(self, job, result, is_invalid):
+        if isinstance(result, Exception):
+            self._log.critical(result)
+
+        for request, reported_result in \
+                job.group.add_result(job.request, result, is_invalid):
+            self._report_benchmark_result(request, reported_result)
 
     def _report_benchmark_result(self, request, result=None):
-        cols = [""] * 15
+        cols = [""] * (23 + len(PHASES))
         cols[0] = str(request.benchmark_index)
         cols[1] = str(request.run_index)
         cols[2] = os.path.basename(request.spec_filepath)
@@ -303,6 +497,9 @@ class BenchmarkExecution:
         cols[7] = ["no-labels", "labels"][request.use_label_guards]
         cols[8] = ["no-scc", "scc"][request.use_scc]
         cols[9] = ["no-test", "test"][request.use_test_mode]
+        cols[21 + len(PHASES)] = \
+            ["no-symmetry-breaking",
+             "symmetry-breaking"][request.use_symmetry_breaking]
 
         if isinstance(result, BenchmarkTestResult):
             cols[10] = str(result.current_bound)
@@ -311,14 +508,55 @@ class BenchmarkExecution:
             cols[13] = str(result.runtime)
             if result.description is not None:
                 cols[14] = str(result.description)
+            if result.statistics is not None:
+                self._add_statistics_columns(cols, result)
         else:
             cols[14] = str(result)
 
         line = ";".join(cols)
 
-        with open(self._csv_filepath, 'a+') as csv_fh:
-            csv_fh.write(line)
-            csv_fh.write(os.linesep)
+        # results are written by the controlling process only
+        self._csv_fh.write(line)
+        self._csv_fh.write(os.linesep)
+        self._csv_fh.flush()
+
+        if self._stats_filepath is not None and \
+                isinstance(result, BenchmarkTestResult) and \
+                result.statistics is not None:
+            result.statistics.write_json_lines(
+                self._stats_filepath,
+                benchmark_index=request.benchmark_index,
+                run_index=request.run_index,
+                spec=os.path.basename(request.spec_filepath),
+                instance_count=list(request.instance_count),
+                search_strategy=request.search_strategy,
+                symmetry_breaking=request.use_symmetry_breaking)
+
+    @staticmethod
+    def _add_statistics_columns(cols, result):
+        '''
+        Fills the columns 15.. with the wall time, CPU time of ltl3ba,
+        peak RSS (KiB), counters, wall time per phase, and the number of
+        rounds whose result was taken from the result cache
+        '''
+        statistics = result.statistics
+        phase_totals = statistics.get_phase_totals()
+        counter_totals = statistics.get_counter_totals()
+        # each run has its own process
+        peak_rss = max([round_statistics["process_peak_rss"] or 0
+                        for round_statistics in statistics.rounds] + [0])
+
+        cols[15] = str(result.wall_time)
+        cols[16] = str(sum(measurement["children_cpu"]
+                           for measurement in phase_totals.values()))
+        cols[17] = str(peak_rss)
+        cols[18] = str(len(statistics.rounds))
+        cols[19] = str(counter_totals.get(COUNTER_ASSERTIONS, 0))
+        cols[20] = str(counter_totals.get(COUNTER_AUTOMATON_STATES, 0))
+        for phase_index, phase in enumerate(PHASES):
+            cols[21 + phase_index] = str(phase_totals[phase]["wall"])
+        cols[22 + len(PHASES)] = \
+            str(counter_totals.get(COUNTER_CACHED_ROUNDS, 0))
 
 
 def get_argparser():
@@ -359,6 +597,23 @@ USAGE
                         default=None, dest="timeout",
                         help="timeout for a single test run "
                         "[default: %(default)s]")
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=1, dest="jobs",
+                        help="number of test runs executed in parallel "
+                        "[default: %(default)s]")
+    parser.add_argument('-s', '--stats-path', dest="stats_path",
+                        default=None,
+                        help="file to which per-round timing statistics "
+                        "are appended as JSON lines")
+    parser.add_argument('--search', dest="search_strategy",
+                        choices=SEARCH_STRATEGIES, default=SEARCH_LINEAR,
+                        help="order in which the bound increments are "
+                        "tried [default: %(default)s]")
+    parser.add_argument('--result-cache', dest="use_result_cache",
+                        action='store_true',
+                        help="reuse the results of rounds that are stored "
+                        "in the result cache (runtimes of cached rounds "
+                        "are not measured) [default: %(default)s]")
     parser.add_argument(dest="paths",
                         help="paths to configuration file(s)", nargs='+')
     return parser
@@ -389,7 +644,10 @@ def main(argv=None):
                             format=config.LOG_FORMAT)
 
         benchmark_exec = BenchmarkExecution(paths, csv_path, log_path,
-                                            dot_path, timeout)
+                                            dot_path, timeout, args.jobs,
+                                            args.stats_path,
+                                            args.search_strategy,
+                                            args.use_result_cache)
         benchmark_exec.execute_benchmarks()
 
         return 0
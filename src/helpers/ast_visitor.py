@@ -19,10 +19,17 @@ class ASTInstantiateFormulaVisitor:
     :class:`datastructures.specification.SpecFormula`,
     i.e. replace all Forall expressions by conjunctions
     '''
-    def __init__(self, spec):
+    def __init__(self, spec, scheduled_as_active=False):
+        '''
+        :param scheduled_as_active: replace is_scheduled_k_i by the signal
+                                    active_k_i instead of the Boolean
+                                    scheduling variables
+        '''
         self._spec = spec
-        self._schedule_values = dict(spec.get_schedule_values())
-        self._schedule_variable_names = spec.get_scheduling_signals()
+        self._scheduled_as_active = scheduled_as_active
+        if not scheduled_as_active:
+            self._schedule_values = dict(spec.get_schedule_values())
+            self._schedule_variable_names = spec.get_scheduling_signals()
 
     @v.on('node')
     def visit(self, node, index_value_dict):
@@ -125,6 +132,11 @@ class ASTInstantiateFormulaVisitor:
             # we currently only allow one index for template signals
             assert(len(node.binding_indices) == 1)
 
+            if self._scheduled_as_active:
+                return InstanceSignal('active', node.template_index,
+                                      index_value_dict[
+                                          node.binding_indices[0]])
+
             schedule_var_assignments = \
                 self._schedule_values[
                     (node.template_index,
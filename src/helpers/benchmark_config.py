@@ -19,6 +19,8 @@ LABEL_FLAG = "labels"
 TEST_MODE_FLAG = "test"
 SCC_FLAG = "scc"
 DOT_FLAG = "dot"
+CACHE_FLAG = "cache"
+SYMMETRY_BREAKING_FLAG = "symmetry-breaking"
 
 
 class BenchmarkConfigException(Exception):
@@ -36,11 +38,13 @@ class BenchmarkConfigItem:
         self.settings = None
         self.run_count = None
 
-    def is_setting_active(self, name):
+    def is_setting_active(self, name, default=None):
         if self.settings.__contains__(name):
             return True
         elif self.settings.__contains__(NEGATED_FLAG_TEMPLATE % name):
             return False
+        elif default is not None:
+            return default
         raise BenchmarkConfigException("Setting '%s' is not specified "
                                        "for config item!" % name)
 
@@ -0,0 +1,172 @@
+'''
+Persistent content-addressed cache on disk
+
+Entries are identified by the SHA-256 hash of their key parts and stored
+as zlib compressed pickles, one file per entry. Entries are written to a
+temporary file first which is then atomically renamed, such that several
+processes can read and write the same cache directory concurrently.
+When the total size of the entries exceeds the size limit, the least
+recently used entries are removed.
+'''
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+
+LOG = logging.getLogger("disk_cache")
+
+_ENTRY_SUFFIX = ".entry"
+_TEMP_SUFFIX = ".tmp"
+
+
+def get_cache_key(*parts):
+    '''
+    Returns the hexadecimal content hash of the given key parts
+
+    :param parts: strings (or objects with a stable string representation)
+    '''
+    sha = hashlib.sha256()
+    for part in parts:
+        encoded_part = str(part).encode("utf-8")
+        # length prefix avoids collisions of different splits
+        sha.update(str(len(encoded_part)).encode("ascii") + b":")
+        sha.update(encoded_part)
+    return sha.hexdigest()
+
+
+class DiskCache(object):
+    '''
+    Cache directory that maps content keys to picklable values
+    '''
+    def __init__(self, directory, max_size):
+        '''
+        :param directory: cache directory (created if it does not exist)
+        :param max_size: maximum total size of the entries in bytes
+        '''
+        self.directory = directory
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key, default=None):
+        '''
+        Returns the cached value of the given key or the default value if
+        the key is not cached (or the entry cannot be read)
+        '''
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, 'rb') as entry_fh:
+                data = entry_fh.read()
+            value = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (OSError, zlib.error, pickle.UnpicklingError,
+                EOFError, AttributeError, ValueError) as error:
+            LOG.warning("Discard unreadable cache entry %s: %s",
+                        entry_path, error)
+            self._remove(entry_path)
+            self.misses += 1
+            return default
+
+        # the modification time marks the last use for the eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        '''
+        Stores the value of the given key and evicts the least recently
+        used entries if the cache exceeds its size limit
+        '''
+        entry_path = self._get_entry_path(key)
+        data = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if len(data) > self.max_size:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(
+                suffix=_TEMP_SUFFIX, dir=os.path.dirname(entry_path))
+            try:
+                with os.fdopen(temp_fd, 'wb') as temp_fh:
+                    temp_fh.write(data)
+                os.replace(temp_path, entry_path)
+            except BaseException:
+                self._remove(temp_path)
+                raise
+        except OSError as error:
+            LOG.warning("Cannot write cache entry %s: %s", entry_path, error)
+            return
+
+        self._evict()
+
+    def _get_entries(self):
+        '''
+        Returns the list of (last use, size, path) of all entries
+        '''
+        entries = []
+        try:
+            subdirectories = os.listdir(self.directory)
+        except OSError:
+            return entries
+
+        for subdirectory in subdirectories:
+            try:
+                filenames = os.listdir(os.path.join(self.directory,
+                                                    subdirectory))
+            except OSError:
+                continue
+            for filename in filenames:
+                if not filename.endswith(_ENTRY_SUFFIX):
+                    continue
+                entry_path = os.path.join(self.directory, subdirectory,
+                                          filename)
+                try:
+                    entry_stat = os.stat(entry_path)
+                except OSError:
+                    # removed by a concurrent process
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size,
+                                entry_path))
+        return entries
+
+    def get_size(self):
+        '''
+        Returns the total size of the cached entries in bytes
+        '''
+        return sum(size for _, size, _ in self._get_entries())
+
+    def _evict(self):
+        entries = self._get_entries()
+        total_size = sum(size for _, size, _ in entries)
+        if total_size <= self.max_size:
+            return
+
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            LOG.debug("Evict cache entry %s", entry_path)
+            self._remove(entry_path)
+            total_size -= size
+
+    def clear(self):
+        for _, _, entry_path in self._get_entries():
+            self._remove(entry_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
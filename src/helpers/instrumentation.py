@@ -0,0 +1,316 @@
+'''
+Collects timing information and counters of the synthesis phases
+
+For each synthesis round and phase, the wall time, the CPU time of the
+process, and the CPU time of terminated child processes (e.g., ltl3ba)
+are measured. Nested phases are accounted exclusively, i.e., the time
+of a nested phase is not contained in the time of the enclosing phase.
+
+The peak resident set size of each round and phase is the high-water
+mark of the process (VmHWM), which is reset at each phase boundary via
+/proc/self/clear_refs (Linux only, the peaks are None otherwise). The
+peak of a phase includes its nested phases.
+'''
+import json
+import os
+import time
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PHASE_CUTOFF = "cutoff"
+PHASE_INSTANTIATION = "instantiation"
+PHASE_TRANSLATION = "translation"
+PHASE_ENCODE = "encode"
+PHASE_ENCODE_AUTOMATA = "encode_automata"
+PHASE_CHECK = "check"
+PHASE_MODEL_EXTRACTION = "model_extraction"
+
+PHASES = [PHASE_CUTOFF, PHASE_INSTANTIATION, PHASE_TRANSLATION,
+          PHASE_ENCODE, PHASE_ENCODE_AUTOMATA, PHASE_CHECK,
+          PHASE_MODEL_EXTRACTION]
+
+COUNTER_ASSERTIONS = "assertions"
+COUNTER_AST_SIZE = "ast_size"
+COUNTER_AUTOMATON_STATES = "automaton_states"
+COUNTER_CACHED_ROUNDS = "cached_rounds"
+COUNTER_LAZY_CONSTRAINTS = "lazy_constraints"
+COUNTER_ADDED_LAZY_CONSTRAINTS = "added_lazy_constraints"
+COUNTER_LAZY_CHECKS = "lazy_checks"
+COUNTER_DUPLICATE_CONSTRAINTS = "duplicate_constraints"
+
+
+def _get_children_cpu_time():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# highest high-water mark before a reset by :func:`reset_rss_high_water_mark`
+_peak_rss_before_reset = 0
+
+
+def get_peak_rss():
+    '''
+    Returns the peak resident set size of the process since its start in
+    KiB (or None if it cannot be determined)
+    '''
+    if resource is None:
+        return None
+    # the resets of the high-water mark also reset ru_maxrss
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               _peak_rss_before_reset)
+
+
+def get_rss_high_water_mark():
+    '''
+    Returns the peak resident set size of the process since its start or
+    the last :func:`reset_rss_high_water_mark` in KiB (or None if it cannot
+    be determined, e.g., without /proc)
+    '''
+    try:
+        with open("/proc/self/status") as status_fh:
+            for line in status_fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def reset_rss_high_water_mark():
+    '''
+    Resets the high-water mark of the resident set size to the current
+    resident set size
+
+    :return: whether the mark could be reset
+    '''
+    global _peak_rss_before_reset
+    peak_rss = get_rss_high_water_mark()
+    if peak_rss is None:
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs_fh:
+            clear_refs_fh.write("5")
+    except OSError:
+        return False
+    _peak_rss_before_reset = max(_peak_rss_before_reset, peak_rss)
+    return True
+
+
+def get_current_rss():
+    '''
+    Returns the current resident set size of the process in KiB
+    (or None if it cannot be determined, e.g., without /proc)
+    '''
+    try:
+        with open("/proc/self/statm") as statm_fh:
+            resident_pages = int(statm_fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class _Measurement(object):
+    '''
+    Wall, CPU, and child process CPU time snapshot
+    '''
+    def __init__(self, wall=None, cpu=None, children_cpu=None):
+        self.wall = time.perf_counter() if wall is None else wall
+        self.cpu = time.process_time() if cpu is None else cpu
+        self.children_cpu = _get_children_cpu_time() \
+            if children_cpu is None else children_cpu
+
+    def __sub__(self, other):
+        return _Measurement(self.wall - other.wall,
+                            self.cpu - other.cpu,
+                            self.children_cpu - other.children_cpu)
+
+    def __add__(self, other):
+        return _Measurement(self.wall + other.wall,
+                            self.cpu + other.cpu,
+                            self.children_cpu + other.children_cpu)
+
+    def to_dict(self):
+        return {"wall": self.wall, "cpu": self.cpu,
+                "children_cpu": self.children_cpu}
+
+
+def _zero_measurement():
+    return _Measurement(0.0, 0.0, 0.0)
+
+
+class SynthesisStatistics(object):
+    '''
+    Statistics of one synthesis run, see :meth:`to_dict` for the format
+    '''
+    def __init__(self):
+        self.rounds = []
+        self._round = None
+        self._round_start = None
+        # stack of (phase name, start measurement, nested measurement,
+        # peak RSS)
+        self._phase_stack = []
+        self._has_peak_rss = reset_rss_high_water_mark()
+
+    def _update_peak_rss(self):
+        '''
+        Adds the high-water mark of the resident set size since the last
+        update to the current round and the open phases, and resets the
+        mark, such that the next update only covers the following period
+        '''
+        if not self._has_peak_rss:
+            return
+        peak_rss = get_rss_high_water_mark()
+        if peak_rss is None or not reset_rss_high_water_mark():
+            self._has_peak_rss = False
+            return
+        if self._round is not None:
+            self._round["peak_rss"] = max(self._round["peak_rss"], peak_rss)
+        for phase_entry in self._phase_stack:
+            phase_entry[3] = max(phase_entry[3], peak_rss)
+
+    def start_round(self, bound):
+        '''
+        Starts the statistics of a new synthesis round
+
+        :param bound: template bound of the round
+        '''
+        self.end_round()
+        self._update_peak_rss()
+        self._round = {"round": len(self.rounds),
+                       "bound": list(bound),
+                       "cutoff": None,
+                       "status": None,
+                       "phases": {},
+                       "phases_peak_rss": {},
+                       "peak_rss": 0,
+                       "counters": {}}
+        self._round_start = _Measurement()
+
+    def end_round(self, status=None):
+        '''
+        Finishes the statistics of the current round (if any)
+
+        :param status: synthesis result of the round
+        '''
+        if self._round is None:
+            return
+        assert not self._phase_stack
+
+        self._round["status"] = status
+        self._round.update((_Measurement() - self._round_start).to_dict())
+        self._update_peak_rss()
+        if not self._has_peak_rss:
+            self._round["peak_rss"] = None
+        # the peak of the process is monotone across rounds, the current
+        # size shows the memory that is still held after the round
+        self._round["rss"] = get_current_rss()
+        self._round["process_peak_rss"] = get_peak_rss()
+        self.rounds.append(self._round)
+        self._round = None
+
+    def set_cutoff(self, cutoff):
+        if self._round is not None:
+            self._round["cutoff"] = list(cutoff)
+
+    def add_counter(self, name, value):
+        '''
+        Adds the given value to the counter of the current round
+
+        :param name: counter name
+        :param value: counter increment
+        '''
+        if self._round is not None:
+            counters = self._round["counters"]
+            counters[name] = counters.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        Context manager that measures the enclosed phase of the current round
+
+        :param name: phase name, see :data:`PHASES`
+        '''
+        self._update_peak_rss()
+        self._phase_stack.append([name, _Measurement(), _zero_measurement(),
+                                  0])
+        try:
+            yield
+        finally:
+            elapsed = _Measurement() - self._phase_stack[-1][1]
+            self._update_peak_rss()
+            _, _, nested, peak_rss = self._phase_stack.pop()
+            if self._phase_stack:
+                self._phase_stack[-1][2] = self._phase_stack[-1][2] + elapsed
+
+            if self._round is not None:
+                phases = self._round["phases"]
+                phases[name] = (elapsed - nested +
+                                phases.get(name, _zero_measurement()))
+                # a phase may be entered several times per round
+                phases_peak_rss = self._round["phases_peak_rss"]
+                phases_peak_rss[name] = \
+                    max(phases_peak_rss.get(name, 0), peak_rss) \
+                    if self._has_peak_rss else None
+
+    def get_phase_totals(self):
+        '''
+        Returns a dictionary phase name -> measurement dictionary that
+        contains the sums over all rounds
+        '''
+        totals = {name: _zero_measurement() for name in PHASES}
+        for round_statistics in self.rounds:
+            for name, measurement in round_statistics["phases"].items():
+                totals[name] = totals.get(name, _zero_measurement()) + \
+                    measurement
+        return {name: measurement.to_dict()
+                for name, measurement in totals.items()}
+
+    def get_counter_totals(self):
+        totals = {}
+        for round_statistics in self.rounds:
+            for name, value in round_statistics["counters"].items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def to_dict(self):
+        return {"rounds": [self._round_to_dict(round_statistics)
+                           for round_statistics in self.rounds],
+                "phases": self.get_phase_totals(),
+                "counters": self.get_counter_totals(),
+                "process_peak_rss": get_peak_rss()}
+
+    @staticmethod
+    def _round_to_dict(round_statistics):
+        result = dict(round_statistics)
+        result["phases"] = {name: measurement.to_dict() for name, measurement
+                            in round_statistics["phases"].items()}
+        return result
+
+    def to_json_lines(self, **record_fields):
+        '''
+        Returns one JSON line for each round
+
+        :param record_fields: additional fields that are added to each line
+        '''
+        lines = []
+        for round_statistics in self.rounds:
+            record = dict(record_fields)
+            record.update(self._round_to_dict(round_statistics))
+            lines.append(json.dumps(record, sort_keys=True))
+        return lines
+
+    def write_json_lines(self, filepath, **record_fields):
+        '''
+        Appends the JSON lines of :meth:`to_json_lines` to the given file
+        '''
+        with open(filepath, 'a') as json_fh:
+            for line in self.to_json_lines(**record_fields):
+                json_fh.write(line)
+                json_fh.write("\n")
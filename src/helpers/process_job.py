@@ -0,0 +1,85 @@
+'''
+Functions executed in separate processes
+
+The function of a job gets the sending end of a pipe as its last argument
+and sends exactly one result (or the exception it raised) before it
+exits. The parent waits on the :attr:`ProcessJob.wait_objects` of its jobs
+(see :func:`multiprocessing.connection.wait`) and polls the finished jobs
+with :meth:`ProcessJob.get_result`.
+'''
+import time
+
+from multiprocessing import Process, Pipe
+
+
+class ProcessJob(object):
+    '''
+    Function executed in a separate process with an optional deadline
+
+    Subclasses convert the received result, an exit without result, and
+    an exceeded deadline into their result values.
+    '''
+    def __init__(self, target, args, timeout=None):
+        '''
+        :param target: function of the process, called with the given
+                       arguments and the sending connection
+        :param timeout: seconds until the process is terminated
+                        (no deadline if None)
+        '''
+        self.connection, child_connection = Pipe(duplex=False)
+        self.process = Process(target=target,
+                               args=tuple(args) + (child_connection,))
+        self.process.start()
+        child_connection.close()
+
+        self.deadline = None if timeout is None else time.time() + timeout
+
+    @property
+    def wait_objects(self):
+        return [self.connection, self.process.sentinel]
+
+    def get_result(self):
+        '''
+        Returns the result of the job if it is finished or has exceeded
+        its deadline, None otherwise
+        '''
+        if self.connection.poll():
+            try:
+                result = self.connection.recv()
+            except EOFError:
+                result = None
+            if result is not None:
+                self.process.join()
+                return self._on_result(result)
+
+        if not self.process.is_alive():
+            self.process.join()
+            return self._on_exit(self.process.exitcode)
+
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.terminate()
+            return self._on_timeout()
+        return None
+
+    def _on_result(self, result):
+        '''
+        Returns the result value of the received result
+        '''
+        return result
+
+    def _on_exit(self, exitcode):
+        '''
+        Returns the result value of a process that exited without result
+        '''
+        return Exception("Process exited with code %s" % exitcode)
+
+    def _on_timeout(self):
+        '''
+        Returns the result value of a terminated process
+        '''
+        return Exception("Process exceeded its deadline")
+
+    def terminate(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
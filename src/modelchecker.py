@@ -0,0 +1,554 @@
+'''
+Explicit-state model checking of synthesized guarded systems
+
+Builds the composition of the synthesized templates for a given number of
+instances per template and checks the instantiated UCWs of the
+specification on it. In contrast to the SMT encoding, the number of
+instances is not restricted by a cut-off, thus the checker validates a
+model for the system size it is deployed with.
+
+Processes whose signals do not occur in a checked automaton are
+indistinguishable and are only represented by the number of processes in
+each local state (counter abstraction). Guard sets are bitsets, i.e., the
+disjunction of the state bits of the occupied local states, and guards are
+evaluated as defined by :meth:`ArchitectureEncoder.define_eval_guard`.
+Fair scheduling is not encoded into the checked formulas but handled by the
+search for fair cycles.
+'''
+import logging
+
+from collections import deque, namedtuple
+from itertools import product
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from helpers import automata_helper
+from helpers.ast_visitor import ASTInstantiateFormulaVisitor
+from interfaces.parser_expr import and_expressions
+
+LOG = logging.getLogger("modelchecker")
+
+# no fairness (safety properties)
+NO_FAIRNESS = 0
+# each process is scheduled infinitely often (GF is_scheduled_k_i)
+SCHEDULING_FAIRNESS = 1
+# each process is enabled and scheduled infinitely often
+# (GF enabled_k_i * is_scheduled_k_i, architecture assumption)
+MOVING_FAIRNESS = 2
+
+
+class CheckResult(namedtuple("CheckResult",
+                             ["description", "holds", "trace"])):
+    '''
+    Result of a checked property
+
+    ``trace`` is ``None`` if the property holds, otherwise it is the list of
+    global states from the initial state to a global state on a violating
+    (fair) cycle or to a deadlock.
+    '''
+    def __str__(self):
+        return "%s: %s" % (["violated", "holds"][self.holds],
+                           self.description)
+
+
+class _TemplateSystem(object):
+    '''
+    Lookup tables of a synthesized template, where local states are
+    represented by their index in the state list of the template model
+    '''
+    def __init__(self, template, template_model):
+        self.template_index = template.template_index
+        self.state_names = list(template_model.states)
+        state_indices = {name: index
+                         for index, name in enumerate(self.state_names)}
+
+        state_bits = template_model.get_state_guard_bits()
+        self.state_bits = [state_bits.get(name, 0)
+                           for name in self.state_names]
+
+        self.input_names = [signal.name for signal in template.inputs]
+        self.outputs = {signal.name: [template_model.outputs[str(signal)][name]
+                                      for name in self.state_names]
+                        for signal in template.outputs}
+
+        self.input_assignments = \
+            list(product((False, True), repeat=len(self.input_names)))
+
+        # transitions[state][input assignment] = [(guard, successor)]
+        self.transitions = [{assignment: [] for assignment
+                             in self.input_assignments}
+                            for _ in self.state_names]
+        for transition, guard in template_model.num_guards.items():
+            assignment = tuple(bool(value) for value in transition[1:-1])
+            self.transitions[state_indices[transition[0]]][assignment] \
+                .append((guard, state_indices[transition[-1]]))
+
+
+class ExplicitStateModelChecker(object):
+    '''
+    Checks the specification on the guarded system that consists of the
+    given number of instances of each synthesized template
+    '''
+    def __init__(self, spec, arch, model, ltl2ucw):
+        '''
+        :param spec: specification the model was synthesized for
+        :param arch: guarded architecture
+        :param model: dictionary that maps template indices to template
+                      models (as returned by
+                      :meth:`bosy.BoundedSynthesis.solve`)
+        :param ltl2ucw: :class:`translation2uct.ltl2automaton.Ltl2UCW`
+        '''
+        self.spec = spec
+        self.arch = arch
+        self.ltl2ucw = ltl2ucw
+        self._templates = [_TemplateSystem(template,
+                                           model[template.template_index])
+                           for template in spec.templates]
+        self._is_conjunctive = isinstance(arch,
+                                          ConjunctiveGuardedArchitecture)
+
+    def check(self, instance_count):
+        '''
+        Checks deadlock freedom and all properties returned by
+        :meth:`get_properties` and returns a list of :class:`CheckResult`
+
+        :param instance_count: number of instances of each template
+        '''
+        instance_count = tuple(instance_count)
+        assert(len(instance_count) == len(self._templates))
+
+        results = [self.check_deadlock_freedom(instance_count)]
+        for description, automaton, fairness in \
+                self.get_properties(instance_count):
+            results.append(self.check_automaton(automaton, instance_count,
+                                                fairness, description))
+        return results
+
+    def get_properties(self, instance_count):
+        '''
+        Returns a list of tuples (description, automaton, fairness) for the
+        specification guarantees and the architecture specific properties
+
+        All processes of a template are symmetric, thus the properties are
+        only instantiated for representative instances (see
+        :meth:`GuardedArchitecture.determine_guarantee_instances_dict`).
+        Assumptions are not part of the formulas, but the fairness with
+        which the automaton is checked. The scheduling signal
+        is_scheduled_k_i is instantiated as active_k_i, such that only the
+        representatives are tracked individually.
+
+        :param instance_count: number of instances of each template
+        '''
+        ast_visitor = ASTInstantiateFormulaVisitor(self.spec,
+                                                   scheduled_as_active=True)
+
+        def instantiate(formula, instances_dict):
+            instances_dict = {k: range(min(len(instances), instance_count[k]))
+                              for k, instances in instances_dict.items()}
+            conjuncts = list(ast_visitor.visit(formula, instances_dict))
+            if not conjuncts:
+                return None
+            return and_expressions(conjuncts)
+
+        properties = []
+        template_indices = range(len(self._templates))
+        representatives = {k: range(1) for k in template_indices}
+
+        for guarantee in self.spec.guarantees:
+            formula = instantiate(
+                guarantee,
+                self.arch.determine_guarantee_instances_dict(guarantee))
+            if formula is None:
+                continue
+            automaton = self.ltl2ucw.convert(formula)
+            fairness = [MOVING_FAIRNESS, NO_FAIRNESS][
+                automata_helper.is_safety_automaton(automaton)]
+            properties.append((str(guarantee), automaton, fairness))
+
+        for guarantee in self.arch.get_architecture_guarantees(
+                template_indices):
+            formula = instantiate(guarantee, representatives)
+            properties.append((str(formula),
+                               self.ltl2ucw.convert(formula),
+                               MOVING_FAIRNESS))
+
+        for _, guarantee in self.arch.get_architecture_properties(
+                template_indices):
+            formula = instantiate(guarantee, representatives)
+            properties.append((str(formula),
+                               self.ltl2ucw.convert(formula),
+                               SCHEDULING_FAIRNESS))
+        return properties
+
+    def check_deadlock_freedom(self, instance_count):
+        '''
+        Checks that no global state is reachable in which no process has an
+        enabled transition for any input
+
+        :param instance_count: number of instances of each template
+        '''
+        instance_count = tuple(instance_count)
+        initial_state = self._get_initial_system_state((), instance_count)
+
+        parents = {initial_state: None}
+        queue = deque([initial_state])
+        while queue:
+            state = queue.popleft()
+            steps = self._get_system_steps(state, (), ())
+            if not any(moved for _, _, moved, _ in steps):
+                return CheckResult("deadlock freedom", False,
+                                   self._get_trace(parents, state, ()))
+            for _, _, _, successor in steps:
+                if successor not in parents:
+                    parents[successor] = state
+                    queue.append(successor)
+
+        LOG.info("Deadlock freedom: %d global states", len(parents))
+        return CheckResult("deadlock freedom", True, None)
+
+    def check_automaton(self, automaton, instance_count,
+                        fairness=NO_FAIRNESS, description=None):
+        '''
+        Checks whether the system satisfies the given universal co-Buechi
+        automaton, i.e., whether there is no (fair) path that visits
+        rejecting nodes infinitely often
+
+        :param automaton: instantiated UCW
+        :param instance_count: number of instances of each template
+        :param fairness: :data:`NO_FAIRNESS`, :data:`SCHEDULING_FAIRNESS`,
+                         or :data:`MOVING_FAIRNESS`
+        :param description: description of the checked property
+        '''
+        instance_count = tuple(instance_count)
+        if description is None:
+            description = automaton.name
+
+        # signals of the automaton labels
+        signals = sorted({signal for node in automaton.nodes
+                          for label in node.transitions
+                          for signal in label},
+                         key=str)
+        signal_indices = {signal: index
+                          for index, signal in enumerate(signals)}
+
+        named = sorted({(signal.template_index, signal.instance_index)
+                        for signal in signals})
+
+        # list of (label literals, flagged successor nodes) for each node
+        node_transitions = \
+            {node: [(tuple((signal_indices[signal], value)
+                           for signal, value in label.items()),
+                     target_node_infos[0])
+                    for label, target_node_infos
+                    in node.transitions.items()]
+             for node in automaton.nodes}
+
+        # explore the product of automaton and system
+        assert(len(automaton.initial_sets_list) == 1)
+        initial_state = self._get_initial_system_state(named, instance_count)
+        product_states = {}
+        parents = []
+        edges = []
+        queue = deque()
+
+        def add_state(product_state, parent):
+            if product_state not in product_states:
+                product_states[product_state] = len(parents)
+                parents.append(parent)
+                edges.append([])
+                queue.append(product_state)
+            return product_states[product_state]
+
+        for node in automaton.initial_sets_list[0]:
+            add_state((node, initial_state), None)
+
+        system_steps = {}
+        while queue:
+            node, state = queue.popleft()
+            index = product_states[(node, state)]
+            if state not in system_steps:
+                system_steps[state] = \
+                    self._get_system_steps(state, named, signals)
+            for valuation, mover, moved, successor in system_steps[state]:
+                for literals, target_nodes in node_transitions[node]:
+                    if any(valuation[signal_index] != value
+                           for signal_index, value in literals):
+                        continue
+                    for target_node, is_rejecting in target_nodes:
+                        target_index = add_state((target_node, successor),
+                                                 index)
+                        edges[index].append((target_index, is_rejecting,
+                                             mover, moved))
+
+        LOG.info("%s: %d product states, %d named processes",
+                 description, len(parents), len(named))
+
+        states = [None] * len(parents)
+        for (_, state), index in product_states.items():
+            states[index] = state
+
+        cycle_index = self._find_fair_cycle(edges, states, named, fairness)
+        if cycle_index is None:
+            return CheckResult(description, True, None)
+
+        trace = []
+        while cycle_index is not None:
+            trace.append(self._format_state(states[cycle_index], named))
+            cycle_index = parents[cycle_index]
+        return CheckResult(description, False, list(reversed(trace)))
+
+    def _get_initial_system_state(self, named, instance_count):
+        '''
+        Returns the initial global state, which is a tuple of the local
+        states of the named processes and the tuples of process counts per
+        local state for each template
+        '''
+        counts = []
+        for k, template in enumerate(self._templates):
+            unnamed_count = instance_count[k] - \
+                len([1 for process in named if process[0] == k])
+            counts.append((unnamed_count,) +
+                          (0,) * (len(template.state_names) - 1))
+        return (0,) * len(named), tuple(counts)
+
+    def _eval_guard(self, guard_set, guard):
+        if self._is_conjunctive:
+            return guard != 0 and guard_set | guard == guard
+        return guard_set & guard != 0
+
+    def _get_guard_set(self, state, named, excluded):
+        '''
+        Returns the guard set of the other processes, where the excluded
+        process is either the position of a named process or a tuple
+        (k, local state) of an unnamed process
+        '''
+        local_states, counts = state
+        guard_set = 0
+        for position, (k, _) in enumerate(named):
+            if position != excluded:
+                guard_set |= self._templates[k].state_bits[
+                    local_states[position]]
+        for k, template_counts in enumerate(counts):
+            for local_state, count in enumerate(template_counts):
+                if count > int(excluded == (k, local_state)):
+                    guard_set |= self._templates[k].state_bits[local_state]
+        return guard_set
+
+    def _get_successors(self, template, local_state, inputs, guard_set):
+        return [successor for guard, successor
+                in template.transitions[local_state][inputs]
+                if self._eval_guard(guard_set, guard)]
+
+    def _get_system_steps(self, state, named, signals):
+        '''
+        Returns the list of steps of the global state, i.e., tuples
+        (signal valuation, mover, moved, successor state)
+
+        The mover identifies the scheduled process, which is either the
+        position of a named process or a tuple (k, local state) for an
+        unnamed process, and moved is True if the scheduled process took an
+        enabled transition.
+        '''
+        local_states, counts = state
+        named_templates = [self._templates[k] for k, _ in named]
+        named_guard_sets = [self._get_guard_set(state, named, position)
+                            for position in range(len(named))]
+
+        movers = [(position, named_templates[position],
+                   local_states[position], named_guard_sets[position])
+                  for position in range(len(named))]
+        movers += [((k, local_state), self._templates[k], local_state,
+                    self._get_guard_set(state, named, (k, local_state)))
+                   for k, template_counts in enumerate(counts)
+                   for local_state, count in enumerate(template_counts)
+                   if count > 0]
+
+        steps = set()
+        for named_inputs in product(*[template.input_assignments
+                                      for template in named_templates]):
+            enabled = [bool(self._get_successors(named_templates[position],
+                                                 local_states[position],
+                                                 named_inputs[position],
+                                                 named_guard_sets[position]))
+                       for position in range(len(named))]
+
+            for mover, template, local_state, guard_set in movers:
+                valuation = tuple(
+                    self._evaluate_signal(signal, state, named, named_inputs,
+                                          enabled, mover)
+                    for signal in signals)
+
+                # inputs of unnamed processes do not occur in the valuation
+                if type(mover) is int:
+                    mover_inputs = [named_inputs[mover]]
+                else:
+                    mover_inputs = template.input_assignments
+
+                for inputs in mover_inputs:
+                    successors = self._get_successors(template, local_state,
+                                                      inputs, guard_set)
+                    for successor in successors or [local_state]:
+                        steps.add((valuation, mover, bool(successors),
+                                   self._get_successor_state(
+                                       state, mover, successor)))
+        return list(steps)
+
+    def _get_successor_state(self, state, mover, successor):
+        local_states, counts = state
+        if type(mover) is int:
+            local_states = local_states[:mover] + (successor,) + \
+                local_states[mover + 1:]
+            return local_states, counts
+
+        k, local_state = mover
+        template_counts = list(counts[k])
+        template_counts[local_state] -= 1
+        template_counts[successor] += 1
+        return local_states, \
+            counts[:k] + (tuple(template_counts),) + counts[k + 1:]
+
+    def _evaluate_signal(self, signal, state, named, named_inputs, enabled,
+                         mover):
+        '''
+        Returns the value of the given label signal for the current step
+        '''
+        local_states, _ = state
+        position = named.index((signal.template_index,
+                                signal.instance_index))
+        template = self._templates[signal.template_index]
+        if signal.name in template.outputs:
+            return template.outputs[signal.name][local_states[position]]
+        if signal.name in template.input_names:
+            return named_inputs[position][
+                template.input_names.index(signal.name)]
+        if signal.name == 'enabled':
+            return enabled[position]
+        if signal.name == 'active':
+            return mover == position
+        if signal.name == 'init':
+            return local_states[position] == 0
+        raise ValueError("Unknown signal %s" % signal)
+
+    def _find_fair_cycle(self, edges, states, named, fairness):
+        '''
+        Returns the index of a product state on a reachable cycle that visits
+        a rejecting node and satisfies the fairness, or None if there is no
+        such cycle
+
+        Every named process must be scheduled (or move) in the strongly
+        connected component. For unnamed processes, each local state that is
+        occupied in the component must be left by a scheduled (or moving)
+        process, otherwise the product states in which it is occupied cannot
+        be part of a fair cycle and are removed.
+        '''
+        candidates = [set(range(len(edges)))]
+        while candidates:
+            for component in _get_sccs(edges, candidates.pop()):
+                internal_edges = [(index, edge) for index in component
+                                  for edge in edges[index]
+                                  if edge[0] in component]
+                if not any(is_rejecting for _, (_, is_rejecting, _, _)
+                           in internal_edges):
+                    continue
+                if fairness == NO_FAIRNESS:
+                    return min(component)
+
+                fair_movers = {mover for _, (_, _, mover, moved)
+                               in internal_edges
+                               if moved or fairness == SCHEDULING_FAIRNESS}
+                if any(position not in fair_movers
+                       for position in range(len(named))):
+                    continue
+
+                unfair_states = \
+                    {(k, local_state) for index in component
+                     for k, template_counts in enumerate(states[index][1])
+                     for local_state, count in enumerate(template_counts)
+                     if count > 0} - fair_movers
+                if not unfair_states:
+                    return min(component)
+
+                remaining = {index for index in component
+                             if all(states[index][1][k][local_state] == 0
+                                    for k, local_state in unfair_states)}
+                if remaining:
+                    candidates.append(remaining)
+        return None
+
+    def _format_state(self, state, named):
+        local_states, counts = state
+        named_str = ["%d.%d: %s" % (k, i,
+                                    self._templates[k].state_names[
+                                        local_states[position]])
+                     for position, (k, i) in enumerate(named)]
+        counts_str = ["%s: %d" % (self._templates[k].state_names[local_state],
+                                  count)
+                      for k, template_counts in enumerate(counts)
+                      for local_state, count in enumerate(template_counts)
+                      if count > 0]
+        return "{%s}" % ", ".join(named_str + counts_str)
+
+    def _get_trace(self, parents, state, named):
+        trace = []
+        while state is not None:
+            trace.append(self._format_state(state, named))
+            state = parents[state]
+        return list(reversed(trace))
+
+
+def _get_sccs(edges, indices):
+    '''
+    Returns the strongly connected components (as sets) of the subgraph
+    induced by the given node indices (iterative version of Tarjan's
+    algorithm)
+
+    :param edges: list of outgoing edges (target index, ...) for each node
+    :param indices: set of node indices
+    '''
+    index_counter = 0
+    node_index = {}
+    low_link = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in indices:
+        if root in node_index:
+            continue
+        work = [(root, iter(edges[root]))]
+        node_index[root] = low_link[root] = index_counter
+        index_counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, successors = work[-1]
+            for edge in successors:
+                successor = edge[0]
+                if successor not in indices:
+                    continue
+                if successor not in node_index:
+                    node_index[successor] = low_link[successor] = \
+                        index_counter
+                    index_counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(edges[successor])))
+                    break
+                if successor in on_stack:
+                    low_link[node] = min(low_link[node],
+                                         node_index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_link[parent] = min(low_link[parent], low_link[node])
+                if low_link[node] == node_index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
@@ -92,5 +92,34 @@ class Visitor:
         return ForallExpr(binding_indices_visited, quantified_expr_visited)
 
 
+class ASTNormalizedStringVisitor(Visitor):
+    '''
+    Visitor that converts a formula into a fully parenthesized string, i.e.,
+    formulas with different structure yield different strings
+    '''
+    def visit_binary_op(self, binary_op):
+        return '(%s %s %s)' % (self.dispatch(binary_op.arg1), binary_op.name,
+                               self.dispatch(binary_op.arg2))
+
+    def visit_unary_op(self, unary_op):
+        return '%s(%s)' % (unary_op.name, self.dispatch(unary_op.arg))
+
+    def visit_bool(self, bool_const):
+        return str(bool_const)
+
+    def visit_signal(self, signal):
+        return str(signal)
+
+    def visit_number(self, number):
+        return str(number)
+
+    def visit_tuple(self, node):
+        return ','.join(map(str, node))
+
+    def visit_forall(self, node):
+        return 'Forall(%s) %s' % (self.dispatch(node.arg1),
+                                  self.dispatch(node.arg2))
+
+
 def get_log_bits(nof_processes):
     return int(max(1, math.ceil(math.log(nof_processes, 2))))
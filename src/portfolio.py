@@ -0,0 +1,251 @@
+'''
+Portfolio synthesis
+
+Races several encoder configurations (encoder type, encoding optimization,
+and Z3 random seed) for the same specification in separate processes. The
+first configuration that finishes the bounded synthesis wins, all other
+processes are terminated. The winning configuration of each specification
+can be recorded in a JSON file, such that later runs start with it.
+'''
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from collections import namedtuple
+from itertools import product
+from multiprocessing.connection import wait
+
+from z3 import set_param
+
+from bosy import BoundedSynthesis
+from helpers.process_job import ProcessJob
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+LOG = logging.getLogger("portfolio")
+
+
+class PortfolioConfiguration(namedtuple("PortfolioConfiguration",
+                                        ["encoder_type",
+                                         "encoder_optimization",
+                                         "seed"])):
+    '''
+    Encoder type, encoding optimization and Z3 random seed of one
+    portfolio entry
+    '''
+    def __str__(self):
+        return "%s guards, optimization %d, seed %d" % \
+            (self.encoder_type, self.encoder_optimization, self.seed)
+
+
+def get_portfolio_configurations(seeds=(0,),
+                                 optimization=EncodingOptimization.NONE):
+    '''
+    Returns the configurations of all combinations of encoder types,
+    LAMBDA_SCC switched on and off, and the given seeds
+
+    :param seeds: Z3 random seeds
+    :param optimization: further encoding optimizations that are used by
+                         all configurations
+    '''
+    optimization &= ~EncodingOptimization.LAMBDA_SCC
+    return [PortfolioConfiguration(encoder_type,
+                                   optimization | scc_optimization,
+                                   seed)
+            for encoder_type, scc_optimization, seed in
+            product([SMTEncoder.STATE_GUARD_ENCODER,
+                     SMTEncoder.LABEL_GUARD_ENCODER],
+                    [EncodingOptimization.NONE,
+                     EncodingOptimization.LAMBDA_SCC],
+                    seeds)]
+
+
+def _execute_configuration(spec_filename, architecture, settings,
+                           configuration, connection):
+    try:
+        set_param("smt.random_seed", configuration.seed)
+        set_param("sat.random_seed", configuration.seed)
+
+        bosy = BoundedSynthesis(spec_filename, architecture)
+        bosy.apply_settings(settings)
+        bosy.encoder_type = configuration.encoder_type
+        bosy.encoder_optimization = configuration.encoder_optimization
+
+        model = bosy.solve()
+        connection.send((model, bosy.spec.bound, bosy.statistics))
+    except Exception as ex:
+        connection.send(ex)
+        sys.exit(1)
+
+
+class PortfolioJob(ProcessJob):
+    '''
+    Synthesis run of one configuration in a separate process
+
+    The result is the tuple (model, bound, statistics) or the exception of
+    the configuration.
+    '''
+    def __init__(self, bosy, configuration):
+        self.configuration = configuration
+        super().__init__(_execute_configuration,
+                         (bosy.spec_filename, type(bosy.arch),
+                          bosy.get_settings(), configuration))
+
+    def _on_exit(self, exitcode):
+        return Exception("Configuration '%s' exited with code %s" %
+                         (self.configuration, exitcode))
+
+
+class PortfolioSynthesis(object):
+    '''
+    Races the given configurations on the problem of a bounded synthesis
+    instance
+
+    The settings of the synthesis instance (bounds, instance count, ...)
+    are used by all configurations, the encoder type and the encoding
+    optimization of the instance are replaced by the configurations.
+    '''
+    def __init__(self, bosy, configurations, jobs=None, timeout=None,
+                 record_filepath=None):
+        '''
+        :param bosy: :class:`BoundedSynthesis` instance
+        :param configurations: list of :class:`PortfolioConfiguration`
+        :param jobs: maximum number of parallel processes
+                     (default: one per configuration)
+        :param timeout: timeout of the whole race in seconds
+        :param record_filepath: JSON file that stores the winning
+                                configuration of each specification
+        '''
+        self.bosy = bosy
+        self.configurations = list(configurations)
+        self.jobs = len(self.configurations) if jobs is None else \
+            max(jobs, 1)
+        self.timeout = timeout
+        self.record_filepath = record_filepath
+
+        self.winner = None
+        self.failures = []
+        # configurations that found no model within the bound increments
+        self.no_model_configurations = []
+
+    def _get_spec_key(self):
+        return os.path.abspath(self.bosy.spec_filename)
+
+    def read_records(self):
+        '''
+        Returns the dictionary specification path -> winning configuration
+        '''
+        if self.record_filepath is None or \
+                not os.path.exists(self.record_filepath):
+            return {}
+        try:
+            with open(self.record_filepath, 'r') as record_fh:
+                records = json.load(record_fh)
+        except (OSError, ValueError) as ex:
+            LOG.warning("Cannot read portfolio records: %s", ex)
+            return {}
+        return {spec_key: PortfolioConfiguration(**record)
+                for spec_key, record in records.items()}
+
+    def _write_record(self, configuration):
+        records = {spec_key: record._asdict() for spec_key, record
+                   in self.read_records().items()}
+        records[self._get_spec_key()] = configuration._asdict()
+
+        # replace the file atomically, other runs may read it concurrently
+        record_directory = os.path.dirname(
+            os.path.abspath(self.record_filepath))
+        temp_fd, temp_path = tempfile.mkstemp(dir=record_directory,
+                                              suffix=".tmp")
+        with os.fdopen(temp_fd, 'w') as record_fh:
+            json.dump(records, record_fh, indent=2, sort_keys=True)
+        os.replace(temp_path, self.record_filepath)
+
+    def get_ordered_configurations(self):
+        '''
+        Returns the configurations, starting with the recorded winner of
+        the specification
+        '''
+        recorded = self.read_records().get(self._get_spec_key())
+        if recorded is None or recorded not in self.configurations:
+            return list(self.configurations)
+        LOG.info("Start with recorded configuration '%s'", recorded)
+        return [recorded] + [configuration for configuration
+                             in self.configurations
+                             if configuration != recorded]
+
+    def solve(self):
+        '''
+        Races the configurations and returns the model of the first
+        configuration that finds one (None if no model was found)
+
+        A configuration that finds no model within the bound increments
+        does not end the race, since the encodings are not equally
+        realizable for a given bound. None is only returned if all
+        configurations agree (or on timeout).
+
+        The bound and the statistics of the winner are stored in the
+        synthesis instance, the winning configuration in :attr:`winner`.
+        '''
+        pending = self.get_ordered_configurations()
+        running = []
+        deadline = None if self.timeout is None else \
+            time.time() + self.timeout
+
+        self.winner = None
+        self.failures = []
+        self.no_model_configurations = []
+        try:
+            while pending or running:
+                while pending and len(running) < self.jobs:
+                    configuration = pending.pop(0)
+                    LOG.info("Start configuration '%s'", configuration)
+                    running.append(PortfolioJob(self.bosy, configuration))
+
+                wait_timeout = None if deadline is None else \
+                    max(deadline - time.time(), 0)
+                wait([wait_object for job in running
+                      for wait_object in job.wait_objects], wait_timeout)
+
+                for job in list(running):
+                    result = job.get_result()
+                    if result is None:
+                        continue
+                    running.remove(job)
+                    if isinstance(result, Exception):
+                        LOG.warning("Configuration '%s' failed: %s",
+                                    job.configuration, result)
+                        self.failures.append((job.configuration, result))
+                        continue
+                    if result[0] is None:
+                        LOG.info("Configuration '%s' found no model",
+                                 job.configuration)
+                        self.no_model_configurations.append(
+                            job.configuration)
+                        continue
+                    return self._set_winner(job.configuration, *result)
+
+                if deadline is not None and time.time() >= deadline:
+                    LOG.info("Portfolio timeout")
+                    return None
+        finally:
+            for job in running:
+                job.terminate()
+
+        # no configuration finished successfully
+        if self.failures:
+            raise self.failures[0][1]
+        return None
+
+    def _set_winner(self, configuration, model, bound, statistics):
+        LOG.info("Configuration '%s' wins", configuration)
+        self.winner = configuration
+        self.bosy.spec.bound = bound
+        self.bosy.statistics = statistics
+        self.bosy.encoder_type = configuration.encoder_type
+        self.bosy.encoder_optimization = configuration.encoder_optimization
+        if self.record_filepath is not None:
+            self._write_record(configuration)
+        return model
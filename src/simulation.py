@@ -0,0 +1,341 @@
+'''
+Bulk simulation of synthesized guarded systems
+
+Simulates many random schedules of the system that consists of the
+synthesized templates in parallel, e.g., to observe the behavior of a model
+for instance counts far beyond the cut-off. The local states of all runs
+are stored in a run x process matrix, the number of processes per local
+state in a run x state matrix, and guard sets are bitmasks that are
+evaluated against the numeric guards of the template models for all runs
+at once. In each step, the scheduler picks a process uniformly at random
+(i.e., the schedules are fair with probability 1) and the environment picks
+random inputs of the scheduled process.
+
+The simulation requires NumPy, which is an optional dependency.
+'''
+import logging
+
+from itertools import product
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+
+LOG = logging.getLogger("simulation")
+
+
+class OutputCountMonitor(object):
+    '''
+    Safety monitor which is violated if more than ``max_count`` processes
+    set the given output at the same time (e.g., mutual exclusion)
+
+    Monitors are called in each step with a dictionary that maps output
+    names (e.g., ``g_0``) to arrays that contain the number of processes
+    which set the output in each run, and return an array that flags the
+    runs in which the monitor is violated.
+    '''
+    def __init__(self, output_name, max_count=1):
+        self.output_name = output_name
+        self.max_count = max_count
+
+    def __call__(self, output_counts):
+        return output_counts[self.output_name] > self.max_count
+
+    def __str__(self):
+        return "#%s <= %d" % (self.output_name, self.max_count)
+
+
+class SimulationStatistics(object):
+    '''
+    Statistics of a bulk simulation
+
+    For each output, the number of processes that set the output is
+    averaged over all steps and runs, a grant is a step in which the
+    scheduled process sets the output which it did not set before, and
+    the starvation length is the number of steps a process waits for its
+    next grant (or its first grant).
+    '''
+    def __init__(self, runs, steps, instance_count):
+        self.runs = runs
+        self.steps = steps
+        self.instance_count = instance_count
+        # fraction of steps in which the scheduled process was enabled
+        self.move_rate = 0.0
+        # average fraction of enabled processes
+        self.enabledness = 0.0
+        # number of runs that reached a global deadlock
+        self.deadlocked_runs = 0
+        # output name -> average number of processes setting the output
+        self.output_counts = {}
+        # output name -> average number of grants per step
+        self.grants_per_step = {}
+        # output name -> (mean, maximal) starvation length
+        self.starvation = {}
+        # monitor description -> (violating runs, earliest violation step)
+        self.violations = {}
+
+    def __str__(self):
+        lines = ["Simulation of %d runs with %d steps for %s instances" %
+                 (self.runs, self.steps, str(self.instance_count)),
+                 "  moves per step:      %.3f" % self.move_rate,
+                 "  enabled processes:   %.3f" % self.enabledness,
+                 "  deadlocked runs:     %d" % self.deadlocked_runs]
+        for output in sorted(self.output_counts):
+            lines.append("  %-20s avg. count %.3f, grants per step %.4f, "
+                         "starvation avg. %.1f / max. %d" %
+                         (output + ":", self.output_counts[output],
+                          self.grants_per_step[output],
+                          self.starvation[output][0],
+                          self.starvation[output][1]))
+        for monitor, (violating_runs, first_step) in \
+                sorted(self.violations.items()):
+            lines.append("  monitor %s: %s" %
+                         (monitor, "violated in %d runs (first in step %d)" %
+                          (violating_runs, first_step)
+                          if violating_runs else "not violated"))
+        return "\n".join(lines)
+
+
+class BulkSimulation(object):
+    '''
+    Simulates the given number of instances of the synthesized templates
+    '''
+    def __init__(self, spec, arch, model, instance_count, runs=100,
+                 seed=None):
+        '''
+        :param spec: specification the model was synthesized for
+        :param arch: guarded architecture
+        :param model: dictionary that maps template indices to template
+                      models (as returned by
+                      :meth:`bosy.BoundedSynthesis.solve`)
+        :param instance_count: number of instances of each template
+        :param runs: number of runs that are simulated in parallel
+        :param seed: seed of the random number generator
+        '''
+        if numpy is None:
+            raise ImportError("The bulk simulation requires NumPy")
+
+        self.instance_count = tuple(instance_count)
+        self.runs = runs
+        self._is_conjunctive = isinstance(arch,
+                                          ConjunctiveGuardedArchitecture)
+        self._random = numpy.random.default_rng(seed)
+        self._init_tables(spec, model)
+
+    def _init_tables(self, spec, model):
+        '''
+        Numbers the local states of all templates consecutively and
+        initializes the state bits, outputs, and transition tables indexed
+        by these global state numbers
+        '''
+        state_offsets = []
+        state_bits = []
+        state_templates = []
+        input_assignments = []
+        for template in spec.templates:
+            template_model = model[template.template_index]
+            state_offsets.append(len(state_bits))
+            guard_bits = template_model.get_state_guard_bits()
+            state_bits += [guard_bits.get(state, 0)
+                           for state in template_model.states]
+            state_templates += [template.template_index] * \
+                len(template_model.states)
+            input_assignments.append(
+                list(product((False, True), repeat=len(template.inputs))))
+
+        if max(state_bits) >= 2 ** 63 or \
+                any(guard >= 2 ** 63 for template_model in model.values()
+                    for guard in template_model.num_guards.values()):
+            raise ValueError("Guards exceed 63 bits")
+
+        state_count = len(state_bits)
+        self._state_bits = numpy.array(state_bits, dtype=numpy.int64)
+
+        # transitions[state][input assignment index] = [(guard, successor)]
+        transitions = [[[] for _ in range(len(input_assignments[k]))]
+                       for k in state_templates]
+        for template in spec.templates:
+            k = template.template_index
+            template_model = model[k]
+            state_indices = {state: state_offsets[k] + index for index, state
+                             in enumerate(template_model.states)}
+            for transition, guard in template_model.num_guards.items():
+                assignment = tuple(bool(value)
+                                   for value in transition[1:-1])
+                transitions[state_indices[transition[0]]][
+                    input_assignments[k].index(assignment)].append(
+                        (guard, state_indices[transition[-1]]))
+
+        # pad missing transitions (and input assignments of templates with
+        # fewer inputs) with guard 0, which is never satisfied
+        max_assignments = max(len(assignments)
+                              for assignments in input_assignments)
+        max_transitions = max([1] + [len(state_transitions)
+                                     for transitions_by_input in transitions
+                                     for state_transitions
+                                     in transitions_by_input])
+        self._guards = numpy.zeros(
+            (state_count, max_assignments, max_transitions),
+            dtype=numpy.int64)
+        self._successors = numpy.repeat(
+            numpy.arange(state_count), max_assignments * max_transitions) \
+            .reshape(self._guards.shape)
+        for state, transitions_by_input in enumerate(transitions):
+            for assignment, state_transitions in \
+                    enumerate(transitions_by_input):
+                for index, (guard, successor) in \
+                        enumerate(state_transitions):
+                    self._guards[state, assignment, index] = guard
+                    self._successors[state, assignment, index] = successor
+
+        # output name -> states that set the output
+        self._outputs = {}
+        for template in spec.templates:
+            k = template.template_index
+            for signal in template.outputs:
+                values = numpy.zeros(state_count, dtype=bool)
+                for index, state in enumerate(model[k].states):
+                    values[state_offsets[k] + index] = \
+                        model[k].outputs[str(signal)][state]
+                self._outputs[str(signal)] = values
+
+        # processes
+        self._process_templates = numpy.array(
+            [k for k in range(len(self.instance_count))
+             for _ in range(self.instance_count[k])], dtype=numpy.int64)
+        self._initial_states = numpy.array(
+            [state_offsets[k] for k in self._process_templates],
+            dtype=numpy.int64)
+        self._input_counts = numpy.array(
+            [len(input_assignments[k]) for k in self._process_templates],
+            dtype=numpy.int64)
+        self._output_templates = {str(signal): template.template_index
+                                  for template in spec.templates
+                                  for signal in template.outputs}
+
+    def _eval_guards(self, guard_sets, guards):
+        if self._is_conjunctive:
+            return (guards != 0) & ((guard_sets | guards) == guards)
+        return (guard_sets & guards) != 0
+
+    def _get_guard_sets(self, occupied):
+        '''
+        Returns the disjunction of the state bits of the occupied states
+        along the last axis
+        '''
+        return numpy.bitwise_or.reduce(
+            numpy.where(occupied, self._state_bits, 0), axis=-1)
+
+    def run(self, steps, monitors=()):
+        '''
+        Simulates the given number of steps and returns the
+        :class:`SimulationStatistics`
+
+        :param steps: number of steps of each run
+        :param monitors: safety monitors, see :class:`OutputCountMonitor`
+        '''
+        runs = self.runs
+        process_count = len(self._process_templates)
+        state_count = len(self._state_bits)
+        run_indices = numpy.arange(runs)
+        identity = numpy.eye(state_count, dtype=numpy.int64)
+
+        local_states = numpy.tile(self._initial_states, (runs, 1))
+        counts = numpy.tile(numpy.bincount(self._initial_states,
+                                           minlength=state_count),
+                            (runs, 1))
+
+        moves = 0
+        enabled_sum = 0.0
+        deadlocked = numpy.zeros(runs, dtype=bool)
+        output_count_sums = {output: 0 for output in self._outputs}
+        grants = {output: 0 for output in self._outputs}
+        last_grants = {output: numpy.zeros((runs, process_count),
+                                           dtype=numpy.int64)
+                       for output in self._outputs}
+        starvation_sums = {output: 0 for output in self._outputs}
+        starvation_max = {output: 0 for output in self._outputs}
+        first_violations = [numpy.full(runs, -1) for _ in monitors]
+
+        for step in range(1, steps + 1):
+            # enabledness of all processes, i.e., for each occupied state
+            # whether a transition is enabled for some input
+            others = counts[:, None, :] - identity[None, :, :] > 0
+            state_guard_sets = self._get_guard_sets(others)
+            enabled_states = self._eval_guards(
+                state_guard_sets[:, :, None, None],
+                self._guards[None, :, :, :]).any(axis=(2, 3))
+            enabled_processes = (counts * enabled_states).sum(axis=1)
+            enabled_sum += enabled_processes.sum() / process_count
+            deadlocked |= enabled_processes == 0
+
+            # schedule a random process with random inputs
+            movers = self._random.integers(process_count, size=runs)
+            states = local_states[run_indices, movers]
+            inputs = self._random.integers(self._input_counts[movers])
+            guards = self._guards[states, inputs]
+            enabled = self._eval_guards(
+                state_guard_sets[run_indices, states][:, None], guards)
+            moved = enabled.any(axis=1)
+            successors = numpy.where(
+                moved,
+                self._successors[states, inputs, enabled.argmax(axis=1)],
+                states)
+            moves += moved.sum()
+
+            counts[run_indices, states] -= 1
+            counts[run_indices, successors] += 1
+            local_states[run_indices, movers] = successors
+
+            output_counts = {}
+            for output, values in self._outputs.items():
+                output_counts[output] = counts[:, values].sum(axis=1)
+                output_count_sums[output] += output_counts[output].sum()
+
+                granted = values[successors] & ~values[states]
+                if granted.any():
+                    granted_runs = run_indices[granted]
+                    granted_movers = movers[granted]
+                    waiting = step - \
+                        last_grants[output][granted_runs, granted_movers]
+                    grants[output] += len(waiting)
+                    starvation_sums[output] += waiting.sum()
+                    starvation_max[output] = max(starvation_max[output],
+                                                 waiting.max())
+                    last_grants[output][granted_runs, granted_movers] = step
+
+            for monitor, first_violation in zip(monitors, first_violations):
+                first_violation[(first_violation < 0) &
+                                monitor(output_counts)] = step
+
+        statistics = SimulationStatistics(runs, steps, self.instance_count)
+        statistics.move_rate = moves / float(runs * steps)
+        statistics.enabledness = enabled_sum / float(runs * steps)
+        statistics.deadlocked_runs = int(deadlocked.sum())
+        for output in self._outputs:
+            statistics.output_counts[output] = \
+                output_count_sums[output] / float(runs * steps)
+            statistics.grants_per_step[output] = \
+                grants[output] / float(runs * steps)
+
+            # processes that are still waiting are taken into account for
+            # the maximal starvation length
+            template_processes = \
+                self._process_templates == self._output_templates[output]
+            waiting = steps - last_grants[output][:, template_processes]
+            statistics.starvation[output] = \
+                (starvation_sums[output] / float(max(grants[output], 1)),
+                 int(max(starvation_max[output],
+                         waiting.max() if waiting.size else 0)))
+        for monitor, first_violation in zip(monitors, first_violations):
+            violating = first_violation >= 0
+            statistics.violations[str(monitor)] = \
+                (int(violating.sum()),
+                 int(first_violation[violating].min())
+                 if violating.any() else -1)
+
+        LOG.info("%s", statistics)
+        return statistics
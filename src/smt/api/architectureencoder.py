@@ -11,6 +11,7 @@ from z3 import Function, BoolSort, BitVecSort, ForAll, BitVecs, BitVecVal, \
 
 from architecture.guarded_system import DisjunctiveGuardedArchitecture, \
     ConjunctiveGuardedArchitecture, GuardedArchitecture
+from smt.encoder_base import EncodingOptimization
 
 
 class ArchitectureEncoder(object):
@@ -26,10 +27,14 @@ class ArchitectureEncoder(object):
         self._encoder_info = encoder_info
         self._architecture = architecture
 
-    def define_eval_guard(self):
+    def define_eval_guard(self, add_definition=True):
         '''
         Defines the guard evaluation function for disjunctive and
         conjunctive guarded systems
+
+        :param add_definition: Whether the function body must be added to
+                               the solver (False if the solver already
+                               contains the definition for this guard size)
         '''
         self._encoder_info.eval_guard = \
             Function('eval_guard',
@@ -37,6 +42,9 @@ class ArchitectureEncoder(object):
                      BitVecSort(self._encoder_info.guard_size),
                      BoolSort())
 
+        if not add_definition:
+            return
+
         state_set, guard = BitVecs('state_set guard',
                                    self._encoder_info.guard_size)
 
@@ -54,6 +62,16 @@ class ArchitectureEncoder(object):
                        And(guard != BitVecVal(0, self._encoder_info.guard_size),
                            ((state_set | guard) == guard))))
 
+    def _get_enabling_state_set(self):
+        '''
+        Returns a global state set that enables each non-empty guard
+        '''
+        if isinstance(self._architecture, DisjunctiveGuardedArchitecture):
+            return BitVecVal((1 << self._encoder_info.guard_size) - 1,
+                             self._encoder_info.guard_size)
+        assert isinstance(self._architecture, ConjunctiveGuardedArchitecture)
+        return BitVecVal(0, self._encoder_info.guard_size)
+
     def add_guard_constraints(self):
         '''
         Adds architecture specific guard constraints for each template
@@ -101,6 +119,20 @@ class ArchitectureEncoder(object):
                 successor_state_1 = Const('t_next1', template_function.state_sort)
                 successor_state_2 = Const('t_next2', template_function.state_sort)
 
+                forall_parameters = \
+                    guard_parameters + \
+                    [successor_state_1,
+                     successor_state_2,
+                     global_state_parameter]
+
+                if self._encoder_info.encoding_optimization & \
+                        EncodingOptimization.GROUNDED:
+                    # avoid quantification over the guard set bit vector
+                    # (two guards are enabled by some global state set
+                    # iff they are enabled by this particular set)
+                    global_state_parameter = self._get_enabling_state_set()
+                    forall_parameters = forall_parameters[:-1]
+
                 function_parameters_1 = \
                     guard_parameters + \
                     [successor_state_1, global_state_parameter]
@@ -109,12 +141,6 @@ class ArchitectureEncoder(object):
                     guard_parameters + \
                     [successor_state_2, global_state_parameter]
 
-                forall_parameters = \
-                    guard_parameters + \
-                    [successor_state_1,
-                     successor_state_2,
-                     global_state_parameter]
-
                 # there is only one enabled transition for a given tuple (current state, inputs, guard set)
                 constraint = ForAll(
                     forall_parameters,
@@ -146,6 +172,8 @@ class ArchitectureEncoder(object):
                                  initial_bv == initial_bv)))
                     self._encoder_info.solver.add(constraint)
 
-        logging.debug("Solver satisfiability after adding "
-                      "architecture constraints: %s",
-                      str(self._encoder_info.solver.check()))
+        # checking is expensive, thus only done if the result is logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Solver satisfiability after adding "
+                          "architecture constraints: %s",
+                          str(self._encoder_info.solver.check()))
@@ -9,10 +9,20 @@ from itertools import product
 from abc import abstractmethod, ABCMeta  # pylint: disable=unused-import
 from z3 import Datatype, Bool, Function, BoolSort, BitVecSort, \
     ForAll, And, IntSort, Const, Or, Exists, Implies, \
-    Not, UGE, UGT, Tactic, Then
+    Not, UGE, UGT, Tactic, If, Sum
 
+from helpers.instrumentation import SynthesisStatistics
+import config
 from helpers.rejecting_states_finder import build_state_to_rejecting_scc
+from interfaces.parser_expr import InstanceSignal
 from smt.api.architectureencoder import ArchitectureEncoder
+from smt.api.external import ExternalSolver
+from smt.api.grounding import GroundingSolver
+from smt.api.irsolver import IRSolver
+from smt.api.lazy import LazyConstraintSolver
+from smt.api.satsolver import SATSolver
+from smt.api.solverprofile import create_solver, create_incremental_solver
+from smt.costmodel import CostEstimator, AutomatonInfo
 from smt.encoder_base import SMTEncoder, EncodingOptimization
 
 
@@ -28,6 +38,107 @@ class PyZ3EncoderInfo:
         self.architecture_encoder = None
         self.template_functions = None
         self.spec = None
+        self.encoding_optimization = None
+        # (template index, instance index, cut-off) -> step function
+        self.step_functions = {}
+
+
+class PyZ3IncrementalContext:
+    '''
+    Keeps a single solver alive across synthesis rounds that share the
+    same cut-off
+
+    Definitions that only depend on the cut-off (scheduling, guard
+    evaluation) are asserted once on the base level of the solver. All
+    template size dependent constraints are asserted within a push/pop
+    scope that only lives for one round.
+    '''
+    def __init__(self):
+        self.solver = None
+        self.cutoff = None
+        self._base_definitions = set()
+        self._in_round = False
+
+    def begin_round(self, cutoff, create_solver):
+        '''
+        Returns the solver for the next round
+
+        A new solver is created if the cut-off differs from the cut-off
+        of the previous round.
+
+        :param cutoff: cut-off of the new round
+        :param create_solver: function which returns a fresh solver
+        '''
+        self.end_round()
+        if self.solver is None or tuple(cutoff) != self.cutoff:
+            self.solver = create_solver()
+            self.cutoff = tuple(cutoff)
+            self._base_definitions = set()
+            logging.debug("Incremental solving: new solver for cut-off %s",
+                          self.cutoff)
+        return self.solver
+
+    def add_base_definition(self, key):
+        '''
+        Registers a base level definition
+
+        :param key: hashable identifier of the definition
+        :return: True if the definition has not been asserted before and
+                 thus must be added to the solver
+        '''
+        assert not self._in_round
+        if key in self._base_definitions:
+            return False
+        self._base_definitions.add(key)
+        return True
+
+    def open_scope(self):
+        '''
+        Opens the scope for the round specific constraints
+        '''
+        self.solver.push()
+        self._in_round = True
+
+    def end_round(self):
+        '''
+        Removes all round specific constraints from the solver
+        '''
+        if self._in_round:
+            self.solver.pop()
+            self._in_round = False
+
+
+# kinds of the signals in automaton transition labels
+(_INPUT_SIGNAL, _OUTPUT_SIGNAL, _SCHEDULING_SIGNAL, _ENABLED_SIGNAL,
+ _ACTIVE_SIGNAL, _INIT_SIGNAL) = range(6)
+
+_PLACEHOLDER_SIGNAL_KINDS = {'enabled': _ENABLED_SIGNAL,
+                             'active': _ACTIVE_SIGNAL,
+                             'init': _INIT_SIGNAL}
+
+
+class _ProcessContext(object):
+    '''
+    Expressions of the transition constraints of an automaton that only
+    depend on the moving process
+    '''
+    def __init__(self, template_function, instance_index):
+        self.template_function = template_function
+        self.template_index = template_function.template_index
+        self.instance_index = instance_index
+        self.current_local_state = None
+        self.next_local_state = None
+        # local states of all other processes
+        self.others_global_state = None
+        # universally quantified variables of the transition constraints
+        self.forall_arguments = None
+        # lambda function arguments after the process moved
+        self.next_lambda_arguments = None
+        # scheduling variable assignment if the process is scheduled
+        self.sched_assignment = None
+        self.sched_assignment_dict = None
+        # application of the step relation of the process
+        self.step_expr = None
 
 
 class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
@@ -35,10 +146,17 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
     Encodes the bounded synthesis problem using the Python Z3 API
     '''
     def __init__(self, spec, architecture,
-                 encoding_optimization=EncodingOptimization.NONE):
+                 encoding_optimization=EncodingOptimization.NONE,
+                 incremental_context=None):
         super(PyZ3Encoder, self).__init__(spec, architecture,
                                           encoding_optimization)
         self.encoder_info = None
+        self._incremental_context = incremental_context
+        # phase measurements, replaced by the synthesis instance
+        self.statistics = SynthesisStatistics()
+        # tuned tactics and parameters of the in-process solver of the
+        # quantified encoding (None: (then qe smt) with default parameters)
+        self.solver_profile = None
 
     @classmethod
     def get_encoder_type(cls):
@@ -52,10 +170,16 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         Adds architectural and template specific constraints to the SMT problem
         '''
         self.encoder_info = PyZ3EncoderInfo()
-        self.encoder_info.solver = Then(Tactic("qe"), Tactic("smt")).solver()
+        if self._incremental_context is None:
+            self.encoder_info.solver = self._create_solver()
+        else:
+            self.encoder_info.solver = \
+                self._incremental_context.begin_round(self.spec.cutoff,
+                                                      self._create_solver)
 
         self.encoder_info.sched_size = self.spec.get_scheduling_size()
         self.encoder_info.spec = self.spec
+        self.encoder_info.encoding_optimization = self._encoding_optimization
         self.encoder_info.architecture_encoder = \
                 ArchitectureEncoder(self.encoder_info, self.architecture)
 
@@ -65,6 +189,10 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         self._define_eval_guard()
         self._define_is_scheduled()
 
+        # everything below depends on the template sizes
+        if self._incremental_context is not None:
+            self._incremental_context.open_scope()
+
         self._encode_template_functions()
 
         for templ_func in self.encoder_info.template_functions:
@@ -72,6 +200,85 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
 
         self.encoder_info.architecture_encoder.add_guard_constraints()
 
+    def _create_solver(self):
+        '''
+        Returns a new solver instance
+
+        The grounded encoding is quantifier-free and thus does not require
+        quantifier elimination. The in-process solver of the quantified
+        encoding uses the solver profile if there is one. Solvers that are
+        checked repeatedly (see :meth:`_is_solver_reused`) are incremental
+        in-process solvers instead of tactic pipelines. An external
+        solver uses the check command of the configuration. The SAT
+        backend always solves the grounded encoding. With the constraint
+        IR, structurally identical constraints are only asserted once.
+        With lazy transitions, the solver is wrapped such that transition
+        constraints are only added if a candidate model violates them.
+        '''
+        grounded = self._encoding_optimization & EncodingOptimization.GROUNDED
+        if self._encoding_optimization & EncodingOptimization.SAT_SOLVER:
+            if self._encoding_optimization & \
+                    EncodingOptimization.SYMMETRY_REDUCTION:
+                # the process counters are integer sums, which cannot be
+                # bit-blasted
+                raise Exception("The SAT backend and the symmetry "
+                                "reduction cannot be combined")
+            # function definitions are inlined before the bit-blasting
+            solver = GroundingSolver(SATSolver(
+                config.SAT_SOLVER_PATH,
+                timeout=config.SAT_SOLVER_TIMEOUT,
+                dump_directory=config.DIMACS_DUMP_PATH,
+                rank_width=config.SAT_RANK_WIDTH))
+        elif self._encoding_optimization & \
+                EncodingOptimization.EXTERNAL_SOLVER:
+            solver = ExternalSolver(
+                config.EXTERNAL_SOLVER_PATH,
+                timeout=config.EXTERNAL_SOLVER_TIMEOUT,
+                dump_directory=config.SMT2_DUMP_PATH,
+                check_command=config.EXTERNAL_SOLVER_CHECK_COMMAND)
+            if grounded:
+                solver = GroundingSolver(solver)
+        elif grounded:
+            solver = GroundingSolver(create_incremental_solver()
+                                     if self._is_solver_reused()
+                                     else Tactic("smt").solver())
+        elif self._is_solver_reused():
+            solver = create_incremental_solver(self.solver_profile)
+        else:
+            solver = create_solver(self.solver_profile)
+
+        if self._encoding_optimization & EncodingOptimization.CONSTRAINT_IR:
+            solver = IRSolver(solver, dump_directory=config.IR_DUMP_PATH)
+        if self._encoding_optimization & \
+                EncodingOptimization.LAZY_TRANSITIONS:
+            return LazyConstraintSolver(solver)
+        return solver
+
+    def _is_solver_reused(self):
+        '''
+        Returns whether the solver is checked repeatedly, i.e., across the
+        rounds of an incremental context or for each refinement of lazy
+        transitions
+
+        Tactic solvers solve each check from scratch, such that nothing
+        that was learned survives a push/pop scope.
+        '''
+        return self._incremental_context is not None or \
+            bool(self._encoding_optimization &
+                 EncodingOptimization.LAZY_TRANSITIONS)
+
+    def _is_new_base_definition(self, key):
+        '''
+        Returns whether a definition that only depends on the cut-off
+        must be asserted
+
+        Without incremental solving, definitions are always asserted.
+
+        :param key: hashable identifier of the definition
+        '''
+        return self._incremental_context is None or \
+            self._incremental_context.add_base_definition(key)
+
     def _define_eval_guard(self):
         """Defines the function eval_guard: BitVec x BitVec -> Bool
 
@@ -80,7 +287,9 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         * s_s -- current global state set
         * s_g -- guard set
         """
-        self.encoder_info.architecture_encoder.define_eval_guard()
+        self.encoder_info.architecture_encoder.define_eval_guard(
+            self._is_new_base_definition(('eval_guard',
+                                          self.encoder_info.guard_size)))
 
     def _define_is_scheduled(self):
         """Defines the function is_scheduled: Int x Int x Sched -> Bool
@@ -98,6 +307,9 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         self.encoder_info.is_scheduled = Function('is_scheduled',
                                                   is_scheduled_arguments)
 
+        if not self._is_new_base_definition(('is_scheduled',)):
+            return
+
         forall_params = self.get_fresh_scheduling_variables()
 
         for sched_value_tuple in self.spec.get_schedule_values():
@@ -273,7 +485,7 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
             return [state for _, state in filtered_global_state_tuples]
 
     def _avoid_deadlocks(self, uct_sort, lambda_b_function,
-                         cutoff, global_cutoff):
+                         cutoff, global_cutoff, named_process_indices):
         '''
         Adds formula that ensures that for each global state s for which
         :math:`lambda^B(q, s)` is true, there exists at least one enabled local
@@ -283,6 +495,9 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         :param lambda_b_function: lambda^B function
         :param cutoff: cut-off for the currently encoded automaton
         :param global_cutoff: overall maximum system size
+        :param named_process_indices: processes whose local states are
+                                      lambda arguments, see
+                                      :meth:`_get_lambda_arguments`
         '''
         uct_state = Const('q', uct_sort)
         global_state_tuples = \
@@ -297,6 +512,10 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
                 cutoff=global_cutoff, include_indices=True)]
 
         composition_state = [uct_state] + global_state
+        lambda_arguments = \
+            [uct_state] + \
+            self._get_lambda_arguments(global_state_tuples,
+                                       named_process_indices)
 
         def build_enabled_call(self, k, i):
             templ_func = self.encoder_info.template_functions[k]
@@ -318,10 +537,109 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
 
         # pylint: disable=star-args
         constraint = ForAll(composition_state,
-                            Implies(lambda_b_function(composition_state),
+                            Implies(lambda_b_function(lambda_arguments),
                                     Or(*enabled_expressions)))
         self.encoder_info.solver.add(constraint)
 
+    def _get_named_process_indices(self, automaton, cutoff):
+        '''
+        Returns the set of processes (k, i) whose local states are passed
+        to the lambda functions of the given automaton separately
+
+        With symmetry reduction, these are the processes that are referenced
+        by the automaton's transition labels. All other processes of a
+        template are interchangeable and only counted, see
+        :meth:`_get_lambda_arguments`. Without symmetry reduction, all
+        processes are named.
+
+        :param automaton: Automaton instance
+        :param cutoff: Cut-off associated with the automaton
+        '''
+        process_indices = set(self.get_process_indices(cutoff=cutoff))
+        if not self._encoding_optimization & \
+                EncodingOptimization.SYMMETRY_REDUCTION:
+            return process_indices
+
+        named_process_indices = set()
+        for node in automaton.nodes:
+            for label in node.transitions.keys():
+                for signal in label.keys():
+                    if not isinstance(signal, InstanceSignal):
+                        # scheduling signals identify particular processes
+                        return process_indices
+                    named_process_indices.add((signal.template_index,
+                                               signal.instance_index))
+
+        return named_process_indices & process_indices
+
+    def _get_lambda_arguments(self, global_state_tuples,
+                              named_process_indices):
+        '''
+        Returns the global state representation used as arguments of the
+        lambda functions
+
+        The representation consists of the local states of the named
+        processes followed by one counter per local state of each template
+        which counts the processes that are not named and reside in the
+        particular state (counter abstraction).
+
+        :param global_state_tuples: List of tuples ((k, i), state expression)
+        :param named_process_indices: Set of named processes (k, i)
+        '''
+        named_states = [state for k_i, state in global_state_tuples
+                        if k_i in named_process_indices]
+
+        counters = []
+        for templ_func in self.encoder_info.template_functions:
+            unnamed_states = \
+                [state for (k, i), state in global_state_tuples
+                 if k == templ_func.template_index and
+                 (k, i) not in named_process_indices]
+            if len(unnamed_states) == 0:
+                continue
+
+            state_sort = templ_func.state_sort
+            for constructor_index in range(state_sort.num_constructors()):
+                local_state = state_sort.constructor(constructor_index)()
+                counters.append(Sum([If(state == local_state, 1, 0)
+                                     for state in unnamed_states]))
+
+        return named_states + counters
+
+    def estimate(self, automata_infos, global_cutoff):
+        '''
+        Returns the predicted size of the encoding of the given automata
+        (see :meth:`encode_automata`) without encoding them
+
+        :return: :class:`smt.costmodel.CostEstimate`
+        '''
+        self.encoder_info = PyZ3EncoderInfo()
+        self.encoder_info.spec = self.spec
+        self.encoder_info.encoding_optimization = self._encoding_optimization
+        self._init_guard_size()
+
+        def get_scc_sizes(automaton):
+            if not self._encoding_optimization & \
+                    EncodingOptimization.LAMBDA_SCC:
+                return []
+            sccs = set(build_state_to_rejecting_scc(automaton).values())
+            return [len(scc) for scc in sccs]
+
+        estimator = CostEstimator(self.spec.bound,
+                                  [len(template.inputs)
+                                   for template in self.spec.templates],
+                                  self.encoder_info.guard_size,
+                                  self.spec.get_scheduling_size(),
+                                  self._encoding_optimization)
+        return estimator.estimate(
+            [AutomatonInfo(automaton, is_architecture_specific, cutoff,
+                           self._get_named_process_indices(automaton,
+                                                           cutoff),
+                           get_scc_sizes(automaton))
+             for automaton, _, is_architecture_specific, cutoff
+             in automata_infos],
+            global_cutoff)
+
     def encode_automata(self, automata_infos, global_cutoff):
         for automaton, automaton_index, is_architecture_specific, cutoff \
                 in automata_infos:
@@ -354,10 +672,23 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
                            getattr(uct_state, uct_state.constructor(i).name())
                            for i in range(len(nodes_list))}
 
+        global_state_tuples = \
+            self.get_fresh_global_state_variables(cutoff=cutoff,
+                                                  prefix="curr",
+                                                  include_indices=True)
+
+        # processes that are not named by the automaton are interchangeable
+        named_process_indices = \
+            self._get_named_process_indices(automaton, cutoff)
+        lambda_argument_sorts = \
+            [argument.sort() for argument in
+             self._get_lambda_arguments(global_state_tuples,
+                                        named_process_indices)]
+
         # declare lambda functions
         lambda_b_function_argument_sorts = \
             [uct_state] + \
-            self.get_fresh_global_state_sorts(cutoff=cutoff) + \
+            lambda_argument_sorts + \
             [BoolSort()]
 
         lambda_b_function = Function('lambda_b_%d' % (automaton_index),
@@ -365,7 +696,7 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
 
         lambda_s_function_argument_sorts = \
             [uct_state] + \
-            self.get_fresh_global_state_sorts(cutoff=cutoff) + \
+            lambda_argument_sorts + \
             [IntSort()]
 
         lambda_s_function = Function('lambda_s_%d' % (automaton_index),
@@ -374,19 +705,28 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         # avoid global deadlocks in case of the fairness property
         if is_architecture_specific:
             self._avoid_deadlocks(uct_state, lambda_b_function,
-                                  cutoff, global_cutoff)
+                                  cutoff, global_cutoff,
+                                  named_process_indices)
 
         assert(len(automaton.initial_sets_list) == 1)
         initial_uct_states = [uct_states_dict[node.name]
                               for node in automaton.initial_sets_list[0]]
+        # transitions that leave other nodes are added on demand
+        is_lazy = self._encoding_optimization & \
+            EncodingOptimization.LAZY_TRANSITIONS
         initial_system_states = self._get_initial_system_states(cutoff=cutoff)
 
         # list of tuples in format (q0, (t1, t2, ...))
         initial_state_tuples = product(*[initial_uct_states,
                                          initial_system_states])
         # merge tuples
-        initial_state_tuples = [tuple([item[0]] + list(item[1]))
-                                for item in initial_state_tuples]
+        process_indices = self.get_process_indices(cutoff=cutoff)
+        initial_state_tuples = \
+            [tuple([item[0]] +
+                   self._get_lambda_arguments(
+                       list(zip(process_indices, item[1])),
+                       named_process_indices))
+             for item in initial_state_tuples]
 
         logging.debug("Automaton %d   Initial states: %s",
                       automaton_index, initial_state_tuples)
@@ -409,23 +749,25 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
         scc_lambda_functions = \
             {scc: Function('lambda_s_%d_%d' % (automaton_index, scc_index),
                            [uct_state] +
-                           self.get_fresh_global_state_sorts(cutoff=cutoff) +
+                           lambda_argument_sorts +
                            [BitVecSort(len(scc))])
              for scc_index, scc in enumerate(sccs.values())}
 
         spec_cutoff_process_indices = \
             self.get_process_indices(cutoff=self.spec.cutoff)
 
-        global_state_tuples = \
-            self.get_fresh_global_state_variables(cutoff=cutoff,
-                                                  prefix="curr",
-                                                  include_indices=True)
+        # it suffices to encode the steps of a single representative of the
+        # processes of a template that are not named
+        represented_process_indices = set(named_process_indices)
+        counted_template_indices = set()
+        for k, i in process_indices:
+            if (k, i) not in named_process_indices and \
+                    k not in counted_template_indices:
+                represented_process_indices.add((k, i))
+                counted_template_indices.add(k)
 
         global_state_dict = dict(global_state_tuples)
 
-        current_global_state = [state_variable for _, state_variable
-                                in global_state_tuples]
-
         input_signals_set = {(t[0].template_index, t[1]):
                              t[0].get_input_signals(t[1])
                              for t in template_instance_index_tuples}
@@ -435,6 +777,8 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
 
         input_signal_expr_dict = {sig: Bool(str(sig))
                                   for sig in input_signals_list}
+        input_arguments = [input_signal_expr_dict[signal]
+                           for signal in input_signals_list]
 
         # dictionary of output signals -> function call
         output_signal_expr_dict = \
@@ -445,15 +789,98 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
              for signal_name, signal_function in
              template_function.get_output_signals_function_dict(instance_index).items()}
 
-        function_placeholder_signals_set = \
-             set(self.architecture.get_placeholder_signals(cutoff))
+        signal_kinds = self._classify_signals(input_signals_list,
+                                              output_signal_expr_dict.keys(),
+                                              scheduling_signals, cutoff)
+
+        current_lambda_arguments = \
+            self._get_lambda_arguments(global_state_tuples,
+                                       named_process_indices)
+
+        # the transition independent part of the constraints of each process
+        process_contexts = []
+        for templ_func, i in template_instance_index_tuples:
+            # we use k for the template index and i for the instance index
+            # as defined in the paper
+            k = templ_func.template_index
+            if (k, i) not in represented_process_indices:
+                continue
+
+            context = _ProcessContext(templ_func, i)
+            context.current_local_state = global_state_dict[(k, i)]
+            context.next_local_state = Const('t_next_%d_%d' % (k, i),
+                                             templ_func.state_sort)
+            context.others_global_state = \
+                [state for k_i, state in global_state_tuples if k_i != (k, i)]
+            context.forall_arguments = \
+                [context.current_local_state, context.next_local_state] + \
+                context.others_global_state + \
+                input_arguments
+            context.next_lambda_arguments = \
+                self._get_lambda_arguments(
+                    [(k_i, state if k_i != (k, i)
+                      else context.next_local_state)
+                     for k_i, state in global_state_tuples],
+                    named_process_indices)
+
+            # scheduling assignment if the process is scheduled
+            context.sched_assignment = schedule_values_dict[(k, i)]
+            context.sched_assignment_dict = \
+                dict(zip(scheduling_signals, context.sched_assignment))
+
+            step_function = self._get_step_function(templ_func, i, cutoff)
+            context.step_expr = \
+                step_function([context.current_local_state] +
+                              context.others_global_state +
+                              [input_signal_expr_dict[sig]
+                               for sig in input_signals_set[(k, i)]] +
+                              [context.next_local_state])
+            process_contexts.append(context)
+
+        # signal -> literal expression (active signals depend on the
+        # scheduled process and are built per process)
+        signal_exprs = {}
+
+        def get_signal_expr(signal, kind):
+            signal_expr = signal_exprs.get(signal)
+            if signal_expr is not None:
+                return signal_expr
+
+            if kind == _INPUT_SIGNAL:
+                signal_expr = input_signal_expr_dict[signal]
+            elif kind == _OUTPUT_SIGNAL:
+                signal_expr = output_signal_expr_dict[signal]
+            else:
+                ph_instance = (signal.template_index, signal.instance_index)
+                ph_template_func = \
+                    self.encoder_info.template_functions[signal.template_index]
+                ph_relative_current_local_state = \
+                    global_state_dict[ph_instance]
+                if kind == _ENABLED_SIGNAL:
+                    ph_gs = ph_template_func.guard_set(
+                        self._blowup_state_set(
+                            [(k_i, state) for k_i, state
+                             in global_state_tuples if k_i != ph_instance],
+                            spec_cutoff_process_indices,
+                            ph_instance))
+                    signal_expr = ph_template_func.is_any_enabled(
+                        [ph_relative_current_local_state] +
+                        [input_signal_expr_dict[sig]
+                         for sig in input_signals_set[ph_instance]] +
+                        [ph_gs])
+                else:
+                    req_initial_states = ph_template_func.get_initial_states()
+                    assert(len(req_initial_states) == 1)
+                    signal_expr = \
+                        ph_relative_current_local_state == req_initial_states[0]
+            signal_exprs[signal] = signal_expr
+            return signal_expr
 
         transitions = [(src_node, transition, target_node_info)
                        for src_node in automaton.nodes
                        for transition, target_node_infos
                        in src_node.transitions.items()
                        for target_node_info in target_node_infos[0]]
-        node = None
         for src_node, transition, target_node_info in transitions:
 
             target_node, is_rejecting_target_node = target_node_info
@@ -462,138 +889,51 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
                           automaton_index, src_node.name, target_node.name,
                           transition)
 
-            for templ_func, i in template_instance_index_tuples:
-                # we use k for the template index and i for the instance index
-                # as defined in the paper
-                k = templ_func.template_index
-
-                others_global_state_tuples = \
-                    [(k_i, state_variable)
-                     for k_i, state_variable in
-                     filter(lambda k_i_state_tuple: k_i_state_tuple[0] !=
-                            (k, i),
-                            global_state_tuples)]
-
-                others_global_state = [state for _, state
-                                       in others_global_state_tuples]
-
-                current_local_state = global_state_dict[(k, i)]
-
-                next_local_state = Const('t_next_%d_%d' % (k, i),
-                                         templ_func.state_sort)
-                next_global_state = [state
-                                     if k_i != (k, i)
-                                     else next_local_state
-                                     for k_i, state in global_state_tuples]
-
-                # get scheduling assignment if current instance is scheduled
-                sched_assignment = schedule_values_dict[(k, i)]
-                sched_assignment_dict = \
-                    {scheduling_signals[i]: sched_assignment[i]
-                     for i in range(0, len(scheduling_signals))}
+            # the condition of the transition label without the active
+            # placeholders, which depend on the scheduled process
+            label_condition = []
+            active_signals = []
+            for signal, value in transition.items():
+                kind = signal_kinds.get(signal)
+                if kind is None:
+                    raise Exception(signal)
+                if kind == _ACTIVE_SIGNAL:
+                    active_signals.append((signal, value))
+                elif kind != _SCHEDULING_SIGNAL:
+                    label_condition.append(get_signal_expr(signal, kind) ==
+                                           value)
+
+            current_combined_state_parameters = \
+                [uct_states_dict[src_node.name]] + current_lambda_arguments
+
+            for context in process_contexts:
+                k, i = context.template_index, context.instance_index
 
                 logging.debug("\tinstance: (%d, %d) sched=%s",
-                              k, i, sched_assignment)
-
-                # parameters for functions
-                guard_set_call_expr = \
-                    templ_func.guard_set(
-                        self._blowup_state_set(others_global_state_tuples,
-                                               spec_cutoff_process_indices,
-                                               (k, i)))
+                              k, i, context.sched_assignment)
 
                 # only add constraint if scheduling assignment
                 # matches the label
-                if not self._compare_scheduling(sched_assignment_dict,
+                if not self._compare_scheduling(context.sched_assignment_dict,
                                                 transition):
                     logging.debug("\tSKIP %s->%s, condition: %s, scheduling=%s"
                                   % (src_node.name, target_node.name,
-                                     transition, sched_assignment))
+                                     transition, context.sched_assignment))
                     continue
 
-                transition_keys = set(transition.keys())
-                used_input_signals = transition_keys.intersection(set(input_signals_list))
-                used_output_signals = transition_keys.intersection(output_signal_expr_dict.keys())
-                used_placeholder_signals = transition_keys.intersection(function_placeholder_signals_set)
-                used_scheduler_signals = transition_keys.intersection(set(scheduling_signals))
-
-                assert(len(used_input_signals) + \
-                       len(used_output_signals) + \
-                       len(used_placeholder_signals) + \
-                       len(used_scheduler_signals) == len(transition.items()))
-
-                condition = []
-
-                for input_signal in used_input_signals:
-                    condition.append(input_signal_expr_dict[input_signal] ==
-                                     transition[input_signal])
-
-                for output_signal in used_output_signals:
-                    condition.append(output_signal_expr_dict[output_signal] ==
-                                     transition[output_signal])
-
-                for placeholder_signal in used_placeholder_signals:
-                    ph_instance = (placeholder_signal.template_index,
-                                   placeholder_signal.instance_index)
-                    ph_relative_global_state_tuples = \
-                        list(filter(lambda x: x[0] !=
-                                    ph_instance, global_state_tuples))
-                    ph_template_func = self.encoder_info.template_functions[
-                        placeholder_signal.template_index]
-
-                    ph_gs = ph_template_func.guard_set(
-                        self._blowup_state_set(ph_relative_global_state_tuples,
-                                               spec_cutoff_process_indices,
-                                               ph_instance))
-
-                    ph_relative_current_local_state = global_state_dict[ph_instance]
-                    ph_relative_current_inputs = \
-                        [input_signal_expr_dict[sig]
-                         for sig in input_signals_set[ph_instance]]
-
-                    if placeholder_signal.name.startswith('enabled'):
-                        condition.append(ph_template_func.is_any_enabled(
-                            [ph_relative_current_local_state] + \
-                            ph_relative_current_inputs + \
-                            [ph_gs]) == transition[placeholder_signal])
-                    elif placeholder_signal.name.startswith('active'):
-                        condition.append(self.encoder_info.is_scheduled(
-                            [placeholder_signal.template_index,
-                             placeholder_signal.instance_index] + \
-                            sched_assignment) == transition[placeholder_signal])
-                    elif placeholder_signal.name.startswith('init'):
-                        req_initial_states = ph_template_func.get_initial_states()
-                        assert(len(req_initial_states) == 1)
-                        condition.append(
-                            (ph_relative_current_local_state == req_initial_states[0]) ==
-                            transition[placeholder_signal])
-                    else:
-                        raise Exception(placeholder_signal.name)
+                condition = label_condition + \
+                    [self.encoder_info.is_scheduled(
+                        [signal.template_index, signal.instance_index] +
+                        context.sched_assignment) == value
+                     for signal, value in active_signals]
 
                 condition_expression = True
                 if len(condition) > 0:
                     condition_expression = And(*condition)
 
-                current_local_input_arguments = [input_signal_expr_dict[sig]
-                                                 for sig in input_signals_set[(k, i)]]
-                input_arguments = [input_signal_expr_dict[signal]
-                                   for signal in input_signals_list]
-                forall_arguments = \
-                    [current_local_state, next_local_state] + \
-                    others_global_state + \
-                    input_arguments
-
-                current_combined_state_parameters = \
-                    [uct_states_dict[src_node.name]] + \
-                    current_global_state
                 next_combined_state_parameters = \
                     [uct_states_dict[target_node.name]] + \
-                    next_global_state
-
-                delta_enabled_function_parameters = [current_local_state] + \
-                                                    current_local_input_arguments + \
-                                                    [next_local_state] + \
-                                                    [guard_set_call_expr]
+                    context.next_lambda_arguments
 
                 lambda_s_req_expr = None
                 if self._encoding_optimization & EncodingOptimization.LAMBDA_SCC:
@@ -616,30 +956,107 @@ class PyZ3Encoder(SMTEncoder, metaclass=ABCMeta):
                             lambda_s_function(next_combined_state_parameters) >=
                             lambda_s_function(current_combined_state_parameters))
 
-                extended_condition_expr = \
-                    templ_func.delta_enabled_functions[i](
-                        delta_enabled_function_parameters)
-
-                extended_condition_expr = \
-                    Or(extended_condition_expr,
-                       And(current_local_state == next_local_state,
-                           Not(templ_func.is_any_enabled(
-                               [current_local_state] + \
-                               current_local_input_arguments + \
-                               [guard_set_call_expr]))))
-
-                expr = ForAll(forall_arguments, Implies(
+                expr = Implies(
                     And(lambda_b_function(current_combined_state_parameters),
                         condition_expression,
-                        extended_condition_expr),
+                        context.step_expr),
                     And(lambda_b_function(next_combined_state_parameters),
-                        lambda_s_req_expr)))
+                        lambda_s_req_expr))
 
                 logging.debug("\tADD  %s->%s, condition: %s, scheduling=%s",
                               src_node.name, target_node.name,
-                              transition, sched_assignment)
+                              transition, context.sched_assignment)
 
-                self.encoder_info.solver.add(expr)
+                if is_lazy and \
+                        src_node not in automaton.initial_sets_list[0]:
+                    self.encoder_info.solver.add_lazy(
+                        context.forall_arguments, expr)
+                else:
+                    self.encoder_info.solver.add(
+                        ForAll(context.forall_arguments, expr))
+
+    def _classify_signals(self, input_signals, output_signals,
+                          scheduling_signals, cutoff):
+        '''
+        Returns a dictionary that maps each signal which may occur in the
+        transition labels of an automaton with the given cut-off to its
+        kind (_INPUT_SIGNAL, _OUTPUT_SIGNAL, ...)
+        '''
+        signal_kinds = {signal: _INPUT_SIGNAL for signal in input_signals}
+        for signal in output_signals:
+            signal_kinds[signal] = _OUTPUT_SIGNAL
+        for signal in self.architecture.get_placeholder_signals(cutoff):
+            for name, kind in _PLACEHOLDER_SIGNAL_KINDS.items():
+                if signal.name.startswith(name):
+                    signal_kinds[signal] = kind
+        for signal in scheduling_signals:
+            signal_kinds[signal] = _SCHEDULING_SIGNAL
+        return signal_kinds
+
+    def _get_step_function(self, templ_func, instance_index, cutoff):
+        '''
+        Returns the step relation of the given process, which is shared by
+        the transition constraints of all automata with the same cut-off
+
+        step_k_i_c: T_k x T_others x I_k x T_k -> Bool
+        holds if the process moves from the current local state to the
+        next local state for the given inputs and local states of the other
+        processes, or if it stays in the current local state because no
+        transition is enabled.
+
+        :param templ_func: Template function of the process
+        :param instance_index: Instance index of the process
+        :param cutoff: Cut-off associated with the automata
+        '''
+        k = templ_func.template_index
+        key = (k, instance_index, tuple(cutoff))
+        step_function = self.encoder_info.step_functions.get(key)
+        if step_function is not None:
+            return step_function
+
+        global_state_tuples = \
+            self.get_fresh_global_state_variables(cutoff=cutoff,
+                                                  prefix="step",
+                                                  include_indices=True)
+        others_global_state_tuples = \
+            [(k_i, state) for k_i, state in global_state_tuples
+             if k_i != (k, instance_index)]
+        current_local_state = dict(global_state_tuples)[(k, instance_index)]
+        next_local_state = Const('t_step_next_%d_%d' % (k, instance_index),
+                                 templ_func.state_sort)
+        input_arguments = [Bool(str(signal)) for signal
+                           in templ_func.get_input_signals(instance_index)]
+
+        guard_set_call_expr = \
+            templ_func.guard_set(
+                self._blowup_state_set(
+                    others_global_state_tuples,
+                    self.get_process_indices(cutoff=self.spec.cutoff),
+                    (k, instance_index)))
+
+        parameters = [current_local_state] + \
+            [state for _, state in others_global_state_tuples] + \
+            input_arguments + \
+            [next_local_state]
+        step_function = \
+            Function('step_%d_%d_%s' % (k, instance_index,
+                                        "_".join(map(str, cutoff))),
+                     [parameter.sort() for parameter in parameters] +
+                     [BoolSort()])
+
+        function_body = \
+            Or(templ_func.delta_enabled_functions[instance_index](
+                [current_local_state] + input_arguments +
+                [next_local_state, guard_set_call_expr]),
+               And(current_local_state == next_local_state,
+                   Not(templ_func.is_any_enabled(
+                       [current_local_state] + input_arguments +
+                       [guard_set_call_expr]))))
+
+        self.encoder_info.solver.add(
+            ForAll(parameters, step_function(parameters) == function_body))
+        self.encoder_info.step_functions[key] = step_function
+        return step_function
 
     def _blowup_state_set(self, others_global_state_tuples,
                           global_state_tuples, absent_template_index=None):
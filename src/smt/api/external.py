@@ -0,0 +1,400 @@
+'''
+External SMT solver backend
+
+The assertions are collected in-process, serialized to an SMT-LIB2 script
+for each check, and solved by an external solver binary in a subprocess
+with a hard timeout. The model that is returned by the solver is parsed
+back into Z3 expressions, such that template models can be extracted as
+from an in-process model.
+'''
+import itertools
+import logging
+import os
+import subprocess
+import tempfile
+
+from z3 import Solver, BoolVal, IntVal, BitVecVal, Var, \
+    is_app, is_quantifier, get_var_index, \
+    parse_smt2_string, simplify, substitute, substitute_funs, \
+    substitute_vars, sat, unsat, unknown, Z3_OP_UNINTERPRETED, \
+    Z3_BOOL_SORT, Z3_INT_SORT, Z3_BV_SORT, Z3_DATATYPE_SORT
+
+LOG = logging.getLogger("external")
+
+# index of the scripts written by this process
+_script_index = itertools.count()
+
+# first line of a kept script that records the result of its check
+_STATUS_INFO = "(set-info :status %s)\n"
+
+
+def parse_sexpr(text):
+    '''
+    Parses the given text into nested lists of atoms (strings)
+
+    :return: list of the top-level s-expressions
+    '''
+    tokens = []
+    token = []
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if char == '|':
+            # quoted symbol
+            end = text.index('|', position + 1)
+            token.append(text[position:end + 1])
+            position = end
+        elif char == '"':
+            end = position + 1
+            while text[end] != '"' or text[end + 1:end + 2] == '"':
+                end += 2 if text[end] == '"' else 1
+            token.append(text[position:end + 1])
+            position = end
+        elif char in '()' or char.isspace():
+            if token:
+                tokens.append("".join(token))
+                token = []
+            if char in '()':
+                tokens.append(char)
+        else:
+            token.append(char)
+        position += 1
+    if token:
+        tokens.append("".join(token))
+
+    stack = [[]]
+    for token in tokens:
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            expr = stack.pop()
+            stack[-1].append(expr)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def to_sexpr(expr):
+    if isinstance(expr, list):
+        return "(%s)" % " ".join(to_sexpr(item) for item in expr)
+    return expr
+
+
+def read_script_status(script_path):
+    '''
+    Returns the result ("sat" or "unsat") that is recorded in a kept
+    SMT-LIB2 script or None
+    '''
+    with open(script_path, 'r') as script_fh:
+        first_line = script_fh.readline()
+    for status in ("sat", "unsat"):
+        if first_line == _STATUS_INFO % status:
+            return status
+    return None
+
+
+def _get_default_value(sort):
+    '''
+    Returns the value of the given sort that is used for symbols without
+    interpretation (model completion)
+    '''
+    if sort.kind() == Z3_BOOL_SORT:
+        return BoolVal(False)
+    if sort.kind() == Z3_INT_SORT:
+        return IntVal(0)
+    if sort.kind() == Z3_BV_SORT:
+        return BitVecVal(0, sort.size())
+    if sort.kind() == Z3_DATATYPE_SORT and sort.constructor(0).arity() == 0:
+        return sort.constructor(0)()
+    return None
+
+
+def _collect_symbols(expressions):
+    '''
+    Returns the dictionaries name -> uninterpreted declaration and
+    name -> sort of all declarations and sorts used in the expressions
+    '''
+    decls = {}
+    sorts = {}
+    seen = {}
+    stack = list(expressions)
+    while stack:
+        expr = stack.pop()
+        if expr.get_id() in seen:
+            continue
+        # the term is kept referenced, Z3 reuses the ids of freed terms
+        seen[expr.get_id()] = expr
+        if is_quantifier(expr):
+            for var_index in range(expr.num_vars()):
+                sort = expr.var_sort(var_index)
+                sorts[sort.name()] = sort
+            stack.append(expr.body())
+        elif is_app(expr):
+            decl = expr.decl()
+            if decl.kind() == Z3_OP_UNINTERPRETED:
+                decls[decl.name()] = decl
+            for sort in [decl.range()] + \
+                    [decl.domain(i) for i in range(decl.arity())]:
+                if sort.kind() == Z3_DATATYPE_SORT:
+                    sorts[sort.name()] = sort
+            stack.extend(expr.children())
+    return decls, sorts
+
+
+class ExternalModel(object):
+    '''
+    Model that was returned by an external solver
+
+    Expressions are evaluated by inlining the function definitions of the
+    model and simplifying the result.
+    '''
+    def __init__(self, definitions, constants):
+        '''
+        :param definitions: list of tuples (function declaration, body),
+                            Var(i) denotes the i-th argument in the body
+        :param constants: list of tuples (constant, value)
+        '''
+        self._definitions = definitions
+        self._constants = constants
+
+    @classmethod
+    def from_sexpr(cls, model_sexpr, decls, sorts):
+        '''
+        Parses the define-fun entries of the given model s-expression
+
+        :param decls: dictionary name -> declaration of the problem
+        :param sorts: dictionary name -> sort of the problem
+        '''
+        entries = [entry for entry in model_sexpr
+                   if isinstance(entry, list) and entry and
+                   entry[0] == "define-fun"]
+
+        # auxiliary functions of the solver are declared first
+        script = ["(declare-fun %s (%s) %s)" %
+                  (name, " ".join(to_sexpr(sort)
+                                  for _, sort in arguments),
+                   to_sexpr(range_sort))
+                  for _, name, arguments, range_sort, _ in entries
+                  if name not in decls]
+        for _, name, arguments, _, body in entries:
+            if arguments:
+                argument_names = " ".join(argument for argument, _
+                                          in arguments)
+                script.append("(assert (forall (%s) (= (%s %s) %s)))" %
+                              (" ".join(to_sexpr(argument)
+                                        for argument in arguments),
+                               name, argument_names, to_sexpr(body)))
+            else:
+                script.append("(assert (= %s %s))" % (name, to_sexpr(body)))
+
+        definitions = []
+        constants = []
+        assertions = parse_smt2_string("\n".join(script), sorts=sorts,
+                                       decls=decls)
+        for entry, assertion in zip(entries, assertions):
+            equation = assertion.body() if is_quantifier(assertion) \
+                else assertion
+            application, body = equation.arg(0), equation.arg(1)
+            if application.decl().name() != entry[1].strip('|'):
+                application, body = body, application
+
+            if is_quantifier(assertion):
+                # Var(i) of the body shall denote the i-th argument
+                var_count = assertion.num_vars()
+                substitution = [None] * var_count
+                for argument_index, argument in \
+                        enumerate(application.children()):
+                    substitution[get_var_index(argument)] = \
+                        Var(argument_index, argument.sort())
+                definitions.append((application.decl(),
+                                    substitute_vars(body, *substitution)))
+            else:
+                constants.append((application, body))
+        return cls(definitions, constants)
+
+    def decls(self):
+        # function interpretations are not available, all values are
+        # retrieved by evaluation
+        return []
+
+    def __getitem__(self, item):
+        return None
+
+    def evaluate(self, expr, model_completion=False):
+        result = expr
+        # bodies may contain auxiliary functions of the solver
+        for _ in range(len(self._definitions) + 1):
+            expanded = substitute_funs(result, *self._definitions) \
+                if self._definitions else result
+            if self._constants:
+                expanded = substitute(expanded, *self._constants)
+            if expanded.eq(result):
+                break
+            result = expanded
+        result = simplify(result)
+
+        if model_completion:
+            # symbols without interpretation get default values
+            decls, _ = _collect_symbols([result])
+            completion = [(decl, _get_default_value(decl.range()))
+                          for decl in decls.values()]
+            completion = [(decl, value) for decl, value in completion
+                          if value is not None]
+            if completion:
+                result = simplify(substitute_funs(result, *completion))
+        return result
+
+    eval = evaluate
+
+    def __repr__(self):
+        return "\n".join(["%s = %s" % (constant, value)
+                          for constant, value in self._constants] +
+                         ["%s = %s" % (decl.name(), body)
+                          for decl, body in self._definitions])
+
+
+class ExternalSolver(object):
+    '''
+    Solver that runs an external SMT solver binary for each check
+    '''
+    def __init__(self, solver_path, timeout=None, dump_directory=None,
+                 check_command="(check-sat)"):
+        '''
+        :param solver_path: path of the solver binary, which is called with
+                            the SMT-LIB2 script as single argument
+        :param timeout: hard timeout of each check in seconds, the result
+                        is unknown if the solver is killed
+        :param dump_directory: directory where the SMT-LIB2 scripts are
+                               kept (they are deleted if None)
+        :param check_command: SMT-LIB2 command that checks satisfiability
+        '''
+        self._solver = Solver()
+        self.solver_path = solver_path
+        self.timeout = timeout
+        self.dump_directory = dump_directory
+        self.check_command = check_command
+
+        self._model = None
+        self._reason_unknown = ""
+
+    def add(self, *constraints):
+        self._solver.add(*constraints)
+
+    append = add
+
+    def push(self):
+        self._solver.push()
+
+    def pop(self):
+        self._solver.pop()
+
+    def assertions(self):
+        return self._solver.assertions()
+
+    def reason_unknown(self):
+        return self._reason_unknown
+
+    def to_smt2(self, *assumptions):
+        '''
+        Returns the SMT-LIB2 script of the current assertions (and the
+        given assumptions)
+        '''
+        self._solver.push()
+        try:
+            self._solver.add(*assumptions)
+            script = self._solver.to_smt2()
+        finally:
+            self._solver.pop()
+
+        # replace the check command of the generated script
+        check_position = script.rfind("(check-sat)")
+        if check_position >= 0:
+            script = script[:check_position]
+        return script + self.check_command + "\n(get-model)\n"
+
+    def _get_script_path(self):
+        if self.dump_directory is None:
+            script_fd, script_path = tempfile.mkstemp(suffix=".smt2")
+            os.close(script_fd)
+            return script_path
+
+        os.makedirs(self.dump_directory, exist_ok=True)
+        return os.path.join(self.dump_directory, "check_%d_%04d.smt2" %
+                            (os.getpid(), next(_script_index)))
+
+    def check(self, *assumptions):
+        self._model = None
+        script_path = self._get_script_path()
+        try:
+            with open(script_path, 'w') as script_fh:
+                script_fh.write(self.to_smt2(*assumptions))
+            LOG.debug("Run %s on %s", self.solver_path, script_path)
+
+            try:
+                process = subprocess.run([self.solver_path, script_path],
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE,
+                                         timeout=self.timeout,
+                                         universal_newlines=True)
+            except subprocess.TimeoutExpired:
+                LOG.info("External solver timeout after %ss", self.timeout)
+                self._reason_unknown = "timeout"
+                return unknown
+            except FileNotFoundError:
+                raise Exception("External solver '%s' not found, set "
+                                "config.EXTERNAL_SOLVER_PATH to the solver "
+                                "binary" % self.solver_path)
+        finally:
+            if self.dump_directory is None:
+                os.remove(script_path)
+
+        result = self._parse_output(process.stdout, process.stderr)
+        if self.dump_directory is not None and result != unknown:
+            self._record_status(script_path, result)
+        return result
+
+    def _record_status(self, script_path, result):
+        '''
+        Prepends the result of the check to the kept script, such that
+        replays of the script can be verified (see solver_tuning.py)
+        '''
+        with open(script_path, 'r') as script_fh:
+            script = script_fh.read()
+        with open(script_path, 'w') as script_fh:
+            script_fh.write(_STATUS_INFO % result)
+            script_fh.write(script)
+
+    def _parse_output(self, output, error_output):
+        sexprs = parse_sexpr(output)
+        errors = [to_sexpr(sexpr) for sexpr in sexprs
+                  if isinstance(sexpr, list) and sexpr and
+                  sexpr[0] == "error"]
+        if not sexprs or sexprs[0] not in ("sat", "unsat", "unknown"):
+            raise Exception("Unexpected output of external solver: %s %s" %
+                            (output, error_output))
+
+        if sexprs[0] == "unsat":
+            return unsat
+        if sexprs[0] == "unknown":
+            self._reason_unknown = "; ".join(errors)
+            return unknown
+
+        models = [sexpr for sexpr in sexprs[1:] if isinstance(sexpr, list)
+                  and not (sexpr and sexpr[0] == "error")]
+        if errors or not models:
+            raise Exception("External solver returned no model: %s" %
+                            "; ".join(errors))
+        model_sexpr = models[0]
+        # older solvers prefix the model by the keyword model
+        if model_sexpr and model_sexpr[0] == "model":
+            model_sexpr = model_sexpr[1:]
+
+        decls, sorts = _collect_symbols(self._solver.assertions())
+        self._model = ExternalModel.from_sexpr(model_sexpr, decls, sorts)
+        return sat
+
+    def model(self):
+        return self._model
+
+    def __repr__(self):
+        return repr(self._solver)
@@ -0,0 +1,296 @@
+'''
+Quantifier-free (grounded) encoding of the synthesis problem
+
+All quantified variables of the synthesis encoding range over finite
+domains (state datatypes, Boolean inputs and bit vectors). This module
+provides a solver wrapper that expands the quantifiers before the
+assertions reach the underlying solver, such that the plain smt tactic
+can be used instead of quantifier elimination.
+'''
+import logging
+from itertools import product
+
+from z3 import And, Or, BoolVal, BitVecVal, is_app, is_eq, is_quantifier, \
+    is_var, get_var_index, substitute_vars, Z3_OP_UNINTERPRETED, \
+    Z3_BOOL_SORT, Z3_BV_SORT, Z3_DATATYPE_SORT
+
+LOG = logging.getLogger("grounding")
+
+# maximum width of quantified bit vectors that are expanded
+DEFAULT_MAX_BITVECTOR_WIDTH = 8
+
+
+def count_terms(expressions):
+    '''
+    Returns the number of distinct terms (DAG nodes) of the given
+    expressions
+
+    :param expressions: iterable of Z3 expressions
+    '''
+    # keep the visited terms referenced, Z3 reuses the ids of freed terms
+    seen = {}
+    stack = list(expressions)
+    while stack:
+        expr = stack.pop()
+        expr_id = expr.get_id()
+        if expr_id in seen:
+            continue
+        seen[expr_id] = expr
+        if is_quantifier(expr):
+            stack.append(expr.body())
+        elif is_app(expr):
+            stack.extend(expr.children())
+    return len(seen)
+
+
+class GroundedModel(object):
+    '''
+    Wraps a model of a :class:`GroundingSolver` such that expressions which
+    contain macro functions can still be evaluated
+    '''
+    def __init__(self, model, grounding_solver):
+        self._model = model
+        self._grounding_solver = grounding_solver
+
+    def evaluate(self, expr, model_completion=False):
+        return self._model.evaluate(self._grounding_solver.ground(expr),
+                                    model_completion)
+
+    eval = evaluate
+
+    def __getitem__(self, item):
+        return self._model[item]
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def __repr__(self):
+        return repr(self._model)
+
+
+class GroundingSolver(object):
+    '''
+    Solver wrapper that adds the quantifier-free expansion of each
+    assertion to the underlying solver
+
+    * Function definitions of the form ForAll(x, f(x) == body) are not
+      asserted, but stored as macros and inlined at each application of f.
+    * ForAll and Exists quantifiers over finite sorts are expanded into
+      conjunctions and disjunctions, respectively.
+
+    Quantifiers over sorts that are too large (or infinite) remain in the
+    assertions and are reported as residual quantifiers.
+    '''
+    def __init__(self, solver,
+                 max_bitvector_width=DEFAULT_MAX_BITVECTOR_WIDTH):
+        self._solver = solver
+        self._max_bitvector_width = max_bitvector_width
+
+        # function declaration id -> (variable count, argument variable
+        # indices, body)
+        self._macros = {}
+        self._scopes = []
+
+        self.quantified_terms = 0
+        self.grounded_terms = 0
+        self.residual_quantifiers = 0
+
+    def add(self, *constraints):
+        '''
+        Adds the grounded constraints to the underlying solver
+        '''
+        for constraint in _flatten(constraints):
+            self.quantified_terms += count_terms([constraint])
+            if self._define_macro(constraint):
+                continue
+            grounded_constraint = self.ground(constraint)
+            self.grounded_terms += count_terms([grounded_constraint])
+            self._solver.add(grounded_constraint)
+
+    append = add
+
+    def push(self):
+        self._scopes.append((dict(self._macros),
+                             self.quantified_terms,
+                             self.grounded_terms,
+                             self.residual_quantifiers))
+        self._solver.push()
+
+    def pop(self):
+        self._solver.pop()
+        (self._macros,
+         self.quantified_terms,
+         self.grounded_terms,
+         self.residual_quantifiers) = self._scopes.pop()
+
+    def check(self, *assumptions):
+        LOG.info("Grounding: %d terms before expansion, %d terms after "
+                 "expansion, %d residual quantifiers",
+                 self.quantified_terms, self.grounded_terms,
+                 self.residual_quantifiers)
+        return self._solver.check(*[self.ground(assumption)
+                                    for assumption in assumptions])
+
+    def model(self):
+        return GroundedModel(self._solver.model(), self)
+
+    def __getattr__(self, name):
+        return getattr(self._solver, name)
+
+    def __repr__(self):
+        return repr(self._solver)
+
+    def ground(self, expr, cache=None):
+        '''
+        Returns the quantifier-free expansion of the given expression
+
+        :param expr: Z3 expression
+        :param cache: dictionary of already expanded sub-expressions
+                      (term id -> (term, expansion))
+        '''
+        if cache is None:
+            cache = {}
+
+        expr_id = expr.get_id()
+        if expr_id in cache:
+            return cache[expr_id][1]
+
+        if is_quantifier(expr):
+            result = self._ground_quantifier(expr, cache)
+        elif is_app(expr):
+            children = [self.ground(child, cache)
+                        for child in expr.children()]
+            macro = self._macros.get(expr.decl().get_id())
+            if macro is not None:
+                result = self.ground(self._expand_macro(macro, children),
+                                     cache)
+            elif any(new.get_id() != old.get_id() for new, old
+                     in zip(children, expr.children())):
+                result = expr.decl()(*children)
+            else:
+                result = expr
+        else:
+            result = expr
+
+        # the term is kept referenced, Z3 reuses the ids of freed terms
+        cache[expr_id] = (expr, result)
+        return result
+
+    def _ground_quantifier(self, quantifier, cache):
+        if not (quantifier.is_forall() or quantifier.is_exists()):
+            return quantifier
+
+        var_count = quantifier.num_vars()
+        domains = [self._get_domain(quantifier.var_sort(i))
+                   for i in range(var_count)]
+        if any(domain is None for domain in domains):
+            LOG.debug("Keep quantifier over %s",
+                      [quantifier.var_sort(i) for i in range(var_count)])
+            self.residual_quantifiers += 1
+            return quantifier
+
+        # the variable declared first is the de-Bruijn variable with the
+        # highest index
+        body = quantifier.body()
+        instances = [self.ground(substitute_vars(body,
+                                                 *reversed(assignment)),
+                                 cache)
+                     for assignment in product(*domains)]
+
+        if quantifier.is_forall():
+            return And(instances) if len(instances) != 1 else instances[0]
+        return Or(instances) if len(instances) != 1 else instances[0]
+
+    def _get_domain(self, sort):
+        '''
+        Returns all values of the given finite sort or None if the sort is
+        not expanded
+        '''
+        if sort.kind() == Z3_BOOL_SORT:
+            return [BoolVal(False), BoolVal(True)]
+        if sort.kind() == Z3_DATATYPE_SORT and \
+                all(sort.constructor(i).arity() == 0
+                    for i in range(sort.num_constructors())):
+            return [sort.constructor(i)()
+                    for i in range(sort.num_constructors())]
+        if sort.kind() == Z3_BV_SORT and \
+                sort.size() <= self._max_bitvector_width:
+            return [BitVecVal(value, sort.size())
+                    for value in range(2 ** sort.size())]
+        return None
+
+    def _define_macro(self, constraint):
+        '''
+        Stores a function definition ForAll(x, f(x) == body) as macro
+
+        :return: True if the constraint is a function definition
+        '''
+        if not is_quantifier(constraint) or not constraint.is_forall():
+            return False
+
+        body = constraint.body()
+        if not is_eq(body):
+            return False
+
+        # Z3 may have swapped both sides of the equation
+        for application, definition in [(body.arg(0), body.arg(1)),
+                                        (body.arg(1), body.arg(0))]:
+            macro = self._get_macro(constraint.num_vars(),
+                                    application, definition)
+            if macro is not None:
+                self._macros[application.decl().get_id()] = macro
+                return True
+        return False
+
+    @staticmethod
+    def _get_macro(var_count, application, definition):
+        if not is_app(application) or \
+                application.decl().kind() != Z3_OP_UNINTERPRETED:
+            return None
+
+        arguments = application.children()
+        if len(arguments) != var_count or \
+                not all(is_var(argument) for argument in arguments):
+            return None
+
+        var_indices = [get_var_index(argument) for argument in arguments]
+        if sorted(var_indices) != list(range(var_count)):
+            return None
+
+        # recursive definitions cannot be inlined
+        if _contains_function(definition, application.decl().get_id()):
+            return None
+
+        return (var_count, var_indices, definition)
+
+    def _expand_macro(self, macro, arguments):
+        var_count, var_indices, definition = macro
+        substitution = [None] * var_count
+        for var_index, argument in zip(var_indices, arguments):
+            substitution[var_index] = argument
+        return substitute_vars(definition, *substitution)
+
+
+def _contains_function(expr, decl_id):
+    seen = {}
+    stack = [expr]
+    while stack:
+        current = stack.pop()
+        if current.get_id() in seen:
+            continue
+        seen[current.get_id()] = current
+        if is_quantifier(current):
+            stack.append(current.body())
+        elif is_app(current):
+            if current.decl().get_id() == decl_id:
+                return True
+            stack.extend(current.children())
+    return False
+
+
+def _flatten(constraints):
+    for constraint in constraints:
+        if isinstance(constraint, (list, tuple)):
+            yield from _flatten(constraint)
+        else:
+            yield constraint
@@ -0,0 +1,398 @@
+'''
+Z3 lowering of the constraint IR and deduplicating solver wrapper
+
+The encoders build Z3 expressions. :class:`IRSolver` lifts each assertion
+into the hash-consed IR (see :mod:`smt.ir`) before it reaches the
+underlying solver, such that structurally identical constraints (e.g.,
+definitions and transition constraints that are emitted by several
+automata) are only asserted once. The lifted constraints can be dumped as
+a replay corpus, lowered to SMT-LIB2 text (:func:`smt.ir.to_smt2`) or to
+CNF (:mod:`smt.cnf`), and lowered back to Z3 expressions by
+:class:`Z3Translator`.
+'''
+import itertools
+import logging
+import operator
+import os
+import pickle
+import time
+
+from functools import reduce
+
+from z3 import And, Or, Not, Implies, Xor, If, Distinct, BoolVal, IntVal, \
+    BitVecVal, BoolSort, IntSort, BitVecSort, Datatype, Function, Var, \
+    RotateLeft, ULE, ULT, UGE, UGT, Sum, Product, BoolRef, QuantifierRef, \
+    is_and, is_app, is_quantifier, get_var_index, to_symbol, \
+    Z3_OP_UNINTERPRETED, Z3_OP_TRUE, Z3_OP_FALSE, Z3_OP_AND, Z3_OP_OR, \
+    Z3_OP_NOT, Z3_OP_IMPLIES, Z3_OP_XOR, Z3_OP_EQ, Z3_OP_DISTINCT, \
+    Z3_OP_ITE, Z3_OP_BNUM, Z3_OP_BAND, Z3_OP_BOR, Z3_OP_BNOT, Z3_OP_BXOR, \
+    Z3_OP_BADD, Z3_OP_ULEQ, Z3_OP_ULT, Z3_OP_UGEQ, Z3_OP_UGT, \
+    Z3_OP_EXT_ROTATE_LEFT, Z3_OP_ANUM, Z3_OP_ADD, Z3_OP_SUB, Z3_OP_MUL, \
+    Z3_OP_LE, Z3_OP_LT, Z3_OP_GE, Z3_OP_GT, Z3_OP_DT_CONSTRUCTOR, \
+    Z3_BOOL_SORT, Z3_INT_SORT, Z3_BV_SORT, Z3_DATATYPE_SORT
+from z3 import z3core, z3types
+
+from smt.cnf import UnsupportedTermError
+from smt.ir import IRContext, FunctionDeclaration, BOOL, INT, CONST, VAR, \
+    APP, FORALL, EXISTS, bitvector_sort, enum_sort, dump_terms
+
+LOG = logging.getLogger("irsolver")
+
+# index of the dumps written by this process
+_dump_index = itertools.count()
+
+_OPERATOR_NAMES = {
+    Z3_OP_AND: "and", Z3_OP_OR: "or", Z3_OP_NOT: "not", Z3_OP_IMPLIES: "=>",
+    Z3_OP_XOR: "xor", Z3_OP_EQ: "=", Z3_OP_DISTINCT: "distinct",
+    Z3_OP_ITE: "ite",
+    Z3_OP_BAND: "bvand", Z3_OP_BOR: "bvor", Z3_OP_BNOT: "bvnot",
+    Z3_OP_BXOR: "bvxor", Z3_OP_BADD: "bvadd", Z3_OP_ULEQ: "bvule",
+    Z3_OP_ULT: "bvult", Z3_OP_UGEQ: "bvuge", Z3_OP_UGT: "bvugt",
+    Z3_OP_EXT_ROTATE_LEFT: "ext_rotate_left",
+    Z3_OP_ADD: "+", Z3_OP_SUB: "-", Z3_OP_MUL: "*", Z3_OP_LE: "<=",
+    Z3_OP_LT: "<", Z3_OP_GE: ">=", Z3_OP_GT: ">"}
+
+
+def _relation(mk_function):
+    # Python calls the reflected comparison of a numeral on the right-hand
+    # side first, which would swap the arguments
+    return lambda expr_1, expr_2: BoolRef(
+        mk_function(expr_1.ctx.ref(), expr_1.as_ast(), expr_2.as_ast()),
+        expr_1.ctx)
+
+
+_equals = _relation(z3core.Z3_mk_eq)
+
+
+_OPERATOR_FUNCTIONS = {
+    "and": And, "or": Or, "not": lambda args: Not(args[0]),
+    "=>": lambda args: Implies(*args), "xor": lambda args: reduce(Xor, args),
+    "=": lambda args: _equals(*args) if len(args) == 2 else
+    And([_equals(arg_1, arg_2) for arg_1, arg_2 in zip(args, args[1:])]),
+    "distinct": lambda args: Distinct(*args),
+    "ite": lambda args: If(*args),
+    "bvand": lambda args: reduce(operator.and_, args),
+    "bvor": lambda args: reduce(operator.or_, args),
+    "bvnot": lambda args: ~args[0],
+    "bvxor": lambda args: reduce(operator.xor, args),
+    "bvadd": lambda args: reduce(operator.add, args),
+    "bvule": lambda args: ULE(*args), "bvult": lambda args: ULT(*args),
+    "bvuge": lambda args: UGE(*args), "bvugt": lambda args: UGT(*args),
+    "ext_rotate_left": lambda args: RotateLeft(*args),
+    "+": lambda args: Sum(args),
+    "-": lambda args: -args[0] if len(args) == 1 else
+    reduce(operator.sub, args),
+    "*": lambda args: Product(args),
+    "<=": lambda args: _relation(z3core.Z3_mk_le)(*args),
+    "<": lambda args: _relation(z3core.Z3_mk_lt)(*args),
+    ">=": lambda args: _relation(z3core.Z3_mk_ge)(*args),
+    ">": lambda args: _relation(z3core.Z3_mk_gt)(*args)}
+
+
+class Z3Translator(object):
+    '''
+    Translates between Z3 expressions and terms of an :class:`IRContext`
+
+    The Z3 sorts and function declarations that occur in lifted expressions
+    are recorded, such that lowering a lifted term yields the same Z3
+    symbols. Unknown symbols (e.g., of loaded terms) are declared.
+    '''
+    def __init__(self, context=None):
+        self.context = IRContext() if context is None else context
+        # IR sort -> Z3 sort, IR declaration -> Z3 function declaration
+        self._z3_sorts = {BOOL: BoolSort(), INT: IntSort()}
+        self._z3_functions = {}
+        # Z3 sort id -> (Z3 sort, IR sort), Z3 declaration id ->
+        # (Z3 declaration, IR declaration), the Z3 objects are kept
+        # referenced, Z3 reuses the ids of freed objects
+        self._sorts = {}
+        self._declarations = {}
+
+    def get_sort(self, z3_sort):
+        cached = self._sorts.get(z3_sort.get_id())
+        if cached is not None:
+            return cached[1]
+
+        kind = z3_sort.kind()
+        if kind == Z3_BOOL_SORT:
+            sort = BOOL
+        elif kind == Z3_INT_SORT:
+            sort = INT
+        elif kind == Z3_BV_SORT:
+            sort = bitvector_sort(z3_sort.size())
+        elif kind == Z3_DATATYPE_SORT and \
+                all(z3_sort.constructor(i).arity() == 0
+                    for i in range(z3_sort.num_constructors())):
+            sort = enum_sort(z3_sort.name(),
+                             [z3_sort.constructor(i).name()
+                              for i in range(z3_sort.num_constructors())])
+        else:
+            raise UnsupportedTermError("Unsupported sort %s" % z3_sort)
+        self._sorts[z3_sort.get_id()] = (z3_sort, sort)
+        self._z3_sorts.setdefault(sort, z3_sort)
+        return sort
+
+    def _get_declaration(self, z3_declaration):
+        cached = self._declarations.get(z3_declaration.get_id())
+        if cached is not None:
+            return cached[1]
+        declaration = FunctionDeclaration(
+            z3_declaration.name(),
+            tuple(self.get_sort(z3_declaration.domain(i))
+                  for i in range(z3_declaration.arity())),
+            self.get_sort(z3_declaration.range()))
+        self._declarations[z3_declaration.get_id()] = (z3_declaration,
+                                                       declaration)
+        self._z3_functions.setdefault(declaration, z3_declaration)
+        return declaration
+
+    def lift(self, expr, cache=None):
+        '''
+        Returns the term of the given Z3 expression
+
+        :param cache: dictionary of already lifted sub-expressions
+                      (expression id -> (expression, term))
+        '''
+        if cache is None:
+            cache = {}
+        expr_id = expr.get_id()
+        if expr_id in cache:
+            return cache[expr_id][1]
+
+        context = self.context
+        if is_quantifier(expr):
+            if not (expr.is_forall() or expr.is_exists()):
+                raise UnsupportedTermError("Unsupported quantifier %s" %
+                                           expr)
+            result = context.quantifier(
+                FORALL if expr.is_forall() else EXISTS,
+                [self.get_sort(expr.var_sort(i))
+                 for i in range(expr.num_vars())],
+                self.lift(expr.body(), cache))
+        elif not is_app(expr):
+            result = context.var(get_var_index(expr),
+                                 self.get_sort(expr.sort()))
+        else:
+            kind = expr.decl().kind()
+            if kind in (Z3_OP_TRUE, Z3_OP_FALSE):
+                result = context.const(kind == Z3_OP_TRUE, BOOL)
+            elif kind in (Z3_OP_BNUM, Z3_OP_ANUM):
+                result = context.const(expr.as_long(),
+                                       self.get_sort(expr.sort()))
+            elif kind == Z3_OP_DT_CONSTRUCTOR and expr.num_args() == 0:
+                result = context.const(expr.decl().name(),
+                                       self.get_sort(expr.sort()))
+            elif kind == Z3_OP_UNINTERPRETED:
+                result = context.app(self._get_declaration(expr.decl()),
+                                     [self.lift(child, cache)
+                                      for child in expr.children()])
+            elif kind in _OPERATOR_NAMES:
+                result = context.apply(_OPERATOR_NAMES[kind],
+                                       [self.lift(child, cache)
+                                        for child in expr.children()],
+                                       self.get_sort(expr.sort()))
+            else:
+                raise UnsupportedTermError("Unsupported operator %s" %
+                                          expr.decl())
+
+        # the expression is kept referenced, Z3 reuses the ids of freed
+        # expressions
+        cache[expr_id] = (expr, result)
+        return result
+
+    def get_z3_sort(self, sort):
+        z3_sort = self._z3_sorts.get(sort)
+        if z3_sort is None:
+            if sort.kind == "bv":
+                z3_sort = BitVecSort(sort.width)
+            else:
+                datatype = Datatype(sort.name)
+                for value in sort.values:
+                    datatype.declare(value)
+                z3_sort = datatype.create()
+            self._z3_sorts[sort] = z3_sort
+        return z3_sort
+
+    def _get_z3_function(self, declaration):
+        function = self._z3_functions.get(declaration)
+        if function is None:
+            function = Function(declaration.name,
+                                *[self.get_z3_sort(sort) for sort
+                                  in declaration.domain + (declaration.range,)])
+            self._z3_functions[declaration] = function
+        return function
+
+    def lower(self, term, cache=None):
+        '''
+        Returns the Z3 expression of the given term
+
+        :param cache: dictionary of already lowered sub-terms
+        '''
+        if cache is None:
+            cache = {}
+        result = cache.get(term.id)
+        if result is not None:
+            return result
+
+        if term.op == CONST:
+            if term.sort.kind == "bool":
+                result = BoolVal(term.payload)
+            elif term.sort.kind == "int":
+                result = IntVal(term.payload)
+            elif term.sort.kind == "bv":
+                result = BitVecVal(term.payload, term.sort.width)
+            else:
+                z3_sort = self.get_z3_sort(term.sort)
+                result = z3_sort.constructor(
+                    term.sort.values.index(term.payload))()
+        elif term.op == VAR:
+            result = Var(term.payload, self.get_z3_sort(term.sort))
+        elif term.op in (FORALL, EXISTS):
+            result = self._mk_quantifier(term.op == FORALL,
+                                         [self.get_z3_sort(sort)
+                                          for sort in term.payload],
+                                         self.lower(term.args[0], cache))
+        else:
+            args = [self.lower(arg, cache) for arg in term.args]
+            if term.op == APP:
+                result = self._get_z3_function(term.payload)(*args)
+            else:
+                result = _OPERATOR_FUNCTIONS[term.op](args)
+        cache[term.id] = result
+        return result
+
+    @staticmethod
+    def _mk_quantifier(is_forall, z3_sorts, body):
+        '''
+        Returns the quantifier over the de-Bruijn variables of the body
+        '''
+        count = len(z3_sorts)
+        ctx = body.ctx
+        sorts = (z3types.Sort * count)()
+        names = (z3types.Symbol * count)()
+        for index, z3_sort in enumerate(z3_sorts):
+            sorts[index] = z3_sort.ast
+            names[index] = to_symbol("x!%d" % index, ctx)
+        return QuantifierRef(z3core.Z3_mk_quantifier(
+            ctx.ref(), is_forall, 1, 0, None, count, sorts, names,
+            body.as_ast()), ctx)
+
+
+def _flatten_conjunctions(constraints):
+    stack = list(reversed(constraints))
+    while stack:
+        constraint = stack.pop()
+        if isinstance(constraint, (list, tuple)):
+            stack.extend(reversed(constraint))
+        elif is_and(constraint):
+            stack.extend(reversed(constraint.children()))
+        else:
+            yield constraint
+
+
+class IRSolver(object):
+    '''
+    Solver wrapper that asserts structurally identical constraints only once
+
+    Conjunctions are split into their conjuncts. Each conjunct is lifted
+    into the IR and only added to the underlying solver if no identical
+    constraint has been asserted in the current or an enclosing scope.
+    Conjuncts that cannot be lifted are added without deduplication.
+    '''
+    def __init__(self, solver, dump_directory=None, translator=None):
+        '''
+        :param solver: underlying solver
+        :param dump_directory: directory where the lifted assertions of each
+                               check are pickled (None: no dumps)
+        :param translator: :class:`Z3Translator` (e.g., shared between
+                           rounds)
+        '''
+        self._solver = solver
+        self.dump_directory = dump_directory
+        self.translator = Z3Translator() if translator is None \
+            else translator
+
+        # asserted terms (term id -> term) in assertion order
+        self._asserted = {}
+        # number of asserted constraints that cannot be lifted
+        self.unlifted_count = 0
+        self._scopes = []
+        # the lifted expressions are kept referenced
+        self._lift_cache = {}
+
+        self.constraint_count = 0
+        self.duplicate_count = 0
+
+    @property
+    def context(self):
+        return self.translator.context
+
+    def add(self, *constraints):
+        for constraint in _flatten_conjunctions(constraints):
+            try:
+                term = self.translator.lift(constraint, self._lift_cache)
+            except UnsupportedTermError as error:
+                LOG.debug("Constraint is not deduplicated: %s", error)
+                self.unlifted_count += 1
+                self._solver.add(constraint)
+                continue
+            self.constraint_count += 1
+            if term.id in self._asserted:
+                self.duplicate_count += 1
+                continue
+            self._asserted[term.id] = term
+            self._solver.add(constraint)
+
+    append = add
+
+    def get_terms(self):
+        '''
+        Returns the asserted (distinct) terms
+        '''
+        return list(self._asserted.values())
+
+    def push(self):
+        self._scopes.append((len(self._asserted), self.constraint_count,
+                             self.duplicate_count, self.unlifted_count))
+        self._solver.push()
+
+    def pop(self):
+        self._solver.pop()
+        asserted_count, self.constraint_count, self.duplicate_count, \
+            self.unlifted_count = self._scopes.pop()
+        self._asserted = dict(itertools.islice(self._asserted.items(),
+                                               asserted_count))
+
+    def check(self, *assumptions):
+        LOG.info("Constraint IR: %d of %d constraints are duplicates, "
+                 "%d distinct terms", self.duplicate_count,
+                 self.constraint_count, len(self.context))
+        start_time = time.perf_counter()
+        result = self._solver.check(*assumptions)
+        if self.dump_directory is not None:
+            if self.unlifted_count > 0:
+                # the replay of an incomplete dump may have another result
+                LOG.warning("Constraints not dumped, %d constraints cannot "
+                            "be lifted", self.unlifted_count)
+            else:
+                self._dump(result, time.perf_counter() - start_time)
+        return result
+
+    def _dump(self, result, check_time):
+        os.makedirs(self.dump_directory, exist_ok=True)
+        dump_path = os.path.join(self.dump_directory, "check_%d_%04d.pickle" %
+                                 (os.getpid(), next(_dump_index)))
+        with open(dump_path, "wb") as dump_file:
+            pickle.dump({"assertions": dump_terms(self.get_terms()),
+                         "result": str(result),
+                         "time": check_time}, dump_file)
+        LOG.debug("Constraints written to %s", dump_path)
+
+    def model(self):
+        return self._solver.model()
+
+    def __getattr__(self, name):
+        return getattr(self._solver, name)
+
+    def __repr__(self):
+        return repr(self._solver)
@@ -5,8 +5,9 @@ Created on 15.05.2014
 '''
 import logging
 
-from z3 import And, BoolVal, Not, Or, sat
+from z3 import Not, sat, unknown
 
+from helpers.instrumentation import PHASE_MODEL_EXTRACTION
 from smt.api.encoder import PyZ3Encoder
 from smt.api.labelguarded.templatemodel import LabelGuardedTemplateModel
 from smt.encoder_base import EncodingOptimization, SMTEncoder
@@ -14,28 +15,38 @@ from smt.encoder_base import EncodingOptimization, SMTEncoder
 
 class LabelGuardedPyZ3Encoder(PyZ3Encoder):
     def __init__(self, spec, architecture,
-                 encoding_optimization=EncodingOptimization.NONE):
+                 encoding_optimization=EncodingOptimization.NONE,
+                 incremental_context=None):
         super(LabelGuardedPyZ3Encoder, self).__init__(spec,
                                                       architecture,
-                                                      encoding_optimization)
+                                                      encoding_optimization,
+                                                      incremental_context)
 
     @classmethod
     def get_encoder_type(cls):
         return SMTEncoder.LABEL_GUARD_ENCODER
 
+    def _is_solver_reused(self):
+        # the auxiliary label counts are checked one after another
+        return True
+
     def _handle_result(self, solver, result):
         logging.info("Solver result: %s" % result)
         logging.debug("Formulas")
         logging.debug(solver)
         if result == sat:
-            model = {}
-            bits_to_states_dict = {}
-            for t in self.encoder_info.template_functions:
-                template_model = LabelGuardedTemplateModel(solver.model(), t)
-                bits_to_states_dict.update(template_model.output_bit_state_dict)
-                model[t.template_index] = template_model
+            with self.statistics.phase(PHASE_MODEL_EXTRACTION):
+                model = {}
+                bits_to_states_dict = {}
+                for t in self.encoder_info.template_functions:
+                    template_model = LabelGuardedTemplateModel(solver.model(),
+                                                               t)
+                    bits_to_states_dict.update(
+                        template_model.output_bit_state_dict)
+                    model[t.template_index] = template_model
                 for template_model in model.values():
-                    template_model.init_labeled_transitions(bits_to_states_dict)
+                    template_model.init_labeled_transitions(
+                        bits_to_states_dict)
 
             logging.debug("Model")
             logging.debug(solver.model())
@@ -53,23 +64,82 @@ class LabelGuardedPyZ3Encoder(PyZ3Encoder):
         aux_switch_list = [aux_var for template_aux_vars in aux_var_switches
                         for aux_var in template_aux_vars]
 
-        if aux_switch_list:
-            for aux_index in range(len(aux_switch_list)):
-                s.push()
+        if not aux_switch_list:
+            result = s.check()
+            self.has_unknown_result = result == unknown
+            model = self._handle_result(s, result)
+            return (model is not None, model)
 
-                s.append(And([BoolVal(True)] + aux_switch_list[:aux_index]))
-                s.append(Not(Or([BoolVal(False)] +
-                                aux_switch_list[aux_index:])))
+        # the candidates are checked under assumptions on the incremental
+        # solver (see _is_solver_reused), which keeps learned clauses
+        # between the candidates
+        if self._encoding_optimization & \
+                EncodingOptimization.AUX_LABEL_BISECTION:
+            aux_count, checked_aux_count = \
+                self._bisect_aux_label_count(s, aux_switch_list)
+        else:
+            aux_count, checked_aux_count = \
+                self._find_aux_label_count(s, aux_switch_list)
 
-                res = s.check()
-                model = self._handle_result(s, res)
-                s.pop()
-                if model is not None:
-                    return (True, model)
+        if aux_count is None:
             return (False, None)
-        else:
-            model = self._handle_result(s, s.check())
-            return (model is not None, model)
+
+        # the model of the solver belongs to the last checked candidate
+        if aux_count != checked_aux_count:
+            self._check_aux_label_count(s, aux_switch_list, aux_count)
+        return (True, self._handle_result(s, sat))
+
+    def _check_aux_label_count(self, solver, aux_switch_list, aux_count):
+        '''
+        Checks whether there is a solution that only uses the first
+        aux_count auxiliary labels
+
+        :param solver: Solver instance
+        :param aux_switch_list: Auxiliary label switch constants
+        :param aux_count: Number of enabled auxiliary labels
+        '''
+        assumptions = [aux_switch if aux_index < aux_count
+                       else Not(aux_switch)
+                       for aux_index, aux_switch in enumerate(aux_switch_list)]
+        result = solver.check(*assumptions)
+        logging.info("Solver result for %d auxiliary labels: %s",
+                     aux_count, result)
+        if result == unknown:
+            self.has_unknown_result = True
+        return result == sat
+
+    def _find_aux_label_count(self, solver, aux_switch_list):
+        '''
+        Returns the smallest number of enabled auxiliary labels that
+        yields a solution (or None) and the last checked number
+        '''
+        aux_count = None
+        for aux_count in range(len(aux_switch_list)):
+            if self._check_aux_label_count(solver, aux_switch_list,
+                                           aux_count):
+                return aux_count, aux_count
+        return None, aux_count
+
+    def _bisect_aux_label_count(self, solver, aux_switch_list):
+        '''
+        Returns the smallest number of enabled auxiliary labels that
+        yields a solution (or None) and the last checked number
+
+        Binary search that relies on the fact that enabling additional
+        auxiliary labels does not remove solutions.
+        '''
+        lower, upper = 0, len(aux_switch_list) - 1
+        aux_count = None
+        checked_aux_count = None
+        while lower <= upper:
+            checked_aux_count = (lower + upper) // 2
+            if self._check_aux_label_count(solver, aux_switch_list,
+                                           checked_aux_count):
+                aux_count = checked_aux_count
+                upper = checked_aux_count - 1
+            else:
+                lower = checked_aux_count + 1
+        return aux_count, checked_aux_count
 
     def _init_guard_size(self):
         self.encoder_info.guard_slice_sizes = \
@@ -3,9 +3,9 @@ Created on 15.05.2014
 
 @author: simon
 '''
-from z3 import is_true, And
+from z3 import is_true
 
-from smt.api.templatemodel import ApiTemplateModel
+from smt.api.templatemodel import ApiTemplateModel, get_function_values
 
 
 class LabelGuardedTemplateModel(ApiTemplateModel):
@@ -21,17 +21,30 @@ class LabelGuardedTemplateModel(ApiTemplateModel):
             {i: self._get_output_functions(i)
              for i in range(templatefunction.num_label_guard_vars)}
 
+        # output (and auxiliary label) values of each state
+        state_output_values = \
+            {func: [is_true(value) for value in
+                    get_function_values(model, func, [self._internal_states])]
+             for func in templatefunction.output_aux_functions}
+
         # check whether state matches guard label
-        def _state_matches_guard(t, i):
-            expr = And([func_call(t) == func_res
-                        for func_call, func_res in guard_output_funcs[i]])
-            return is_true(model.eval(expr))
+        def _state_matches_guard(state_index, i):
+            return all(state_output_values[func][state_index] == func_res
+                       for func, func_res in guard_output_funcs[i])
 
         self.output_bit_state_dict = \
             {2 ** (bit_offset + i):
-             [str(t) for t in self._internal_states if _state_matches_guard(t, i)]
+             [str(t) for state_index, t in enumerate(self._internal_states)
+              if _state_matches_guard(state_index, i)]
              for i in range(templatefunction.num_label_guard_vars)}
 
+    def get_state_guard_bits(self):
+        state_bits = {state: 0 for state in self.states}
+        for bit, states in self.output_bit_state_dict.items():
+            for state in states:
+                state_bits[state] |= bit
+        return state_bits
+
     def _get_output_functions(self, guard_bit):
         bit_assignment = guard_bit
         guard_conjuncts = \
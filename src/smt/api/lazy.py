@@ -0,0 +1,137 @@
+'''
+Lazy (counterexample-guided) addition of constraints
+
+Most automaton transition constraints do not restrict the final model.
+This module provides a solver wrapper that keeps such constraints pending
+until a candidate model violates them: after each satisfiable check, the
+pending constraints are evaluated in the candidate model, the violated
+constraints are added to the underlying solver, and the check is repeated
+until the candidate satisfies all constraints or the problem becomes
+unsatisfiable.
+'''
+import logging
+
+from z3 import ForAll, Not, Or, Solver, unsat, sat
+
+LOG = logging.getLogger("lazy")
+
+
+class LazyConstraintSolver(object):
+    '''
+    Solver wrapper that adds lazy constraints on demand
+
+    A lazy constraint ForAll(variables, body) is violated by a model if
+    the negation of the body, where all functions are replaced by their
+    interpretation in the model, is satisfiable. Functions without
+    interpretation remain uninterpreted, i.e., constraints on them are
+    considered violated unless they hold for any interpretation.
+    '''
+    def __init__(self, solver):
+        self._solver = solver
+
+        # pending constraints (variables, body) of each scope and the
+        # constraints of lower scopes that were added within the scope
+        self._pending = [[]]
+        self._added = [[]]
+        self._scopes = []
+
+        self.lazy_count = 0
+        self.added_count = 0
+        self.iterations = 0
+
+    def add(self, *constraints):
+        self._solver.add(*constraints)
+
+    append = add
+
+    def add_lazy(self, variables, body):
+        '''
+        Adds the constraint ForAll(variables, body) as soon as a candidate
+        model violates it
+
+        :param variables: list of constants that are universally quantified
+        :param body: Boolean expression over the variables
+        '''
+        self._pending[-1].append((variables, body))
+        self.lazy_count += 1
+
+    def push(self):
+        self._scopes.append((self.lazy_count, self.added_count,
+                             self.iterations))
+        self._pending.append([])
+        self._added.append([])
+        self._solver.push()
+
+    def pop(self):
+        self._solver.pop()
+        self._pending.pop()
+        # constraints of lower scopes become pending again
+        for scope_index, constraint in self._added.pop():
+            self._pending[scope_index].append(constraint)
+        self.lazy_count, self.added_count, self.iterations = \
+            self._scopes.pop()
+
+    def check(self, *assumptions):
+        while True:
+            result = self._solver.check(*assumptions)
+            self.iterations += 1
+            if result != sat:
+                break
+
+            violated = self._get_violated_constraints(self._solver.model())
+            if not violated:
+                break
+            LOG.info("Lazy constraints: add %d violated constraints",
+                     len(violated))
+
+            violated_ids = {id(constraint) for _, constraint in violated}
+            self._pending = [[constraint for constraint in pending
+                              if id(constraint) not in violated_ids]
+                             for pending in self._pending]
+            for scope_index, constraint in violated:
+                if scope_index != len(self._pending) - 1:
+                    self._added[-1].append((scope_index, constraint))
+                variables, body = constraint
+                self._solver.add(ForAll(variables, body)
+                                 if variables else body)
+                self.added_count += 1
+
+        LOG.info("Lazy constraints: %d of %d added after %d checks",
+                 self.added_count, self.lazy_count, self.iterations)
+        return result
+
+    def _get_violated_constraints(self, model):
+        '''
+        Returns the list of pending constraints (scope index, constraint)
+        that are violated by the given model
+        '''
+        negations = [(scope_index, constraint,
+                      Not(model.evaluate(constraint[1])))
+                     for scope_index, pending in enumerate(self._pending)
+                     for constraint in pending]
+        if not negations:
+            return []
+
+        checker = Solver()
+        checker.add(Or([negation for _, _, negation in negations]))
+        if checker.check() == unsat:
+            return []
+
+        violated = []
+        checker = Solver()
+        for scope_index, constraint, negation in negations:
+            checker.push()
+            checker.add(negation)
+            if checker.check() != unsat:
+                violated.append((scope_index, constraint))
+            checker.pop()
+        return violated
+
+    def model(self):
+        return self._solver.model()
+
+    def __getattr__(self, name):
+        return getattr(self._solver, name)
+
+    def __repr__(self):
+        return repr(self._solver)
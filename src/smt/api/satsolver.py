@@ -0,0 +1,438 @@
+'''
+Bit-blasted SAT backend
+
+The assertions are collected in-process. For each check, they are lifted
+into the constraint IR (see :mod:`smt.ir`), bit-blasted to CNF (see
+:class:`smt.cnf.BitBlastEncoder`), and solved either in-process by Z3's
+sat tactic or by an external SAT solver binary on a DIMACS file. The
+satisfying assignment is mapped back to the uninterpreted functions, such
+that template models can be extracted as from an in-process model.
+
+The assertions must not contain function definitions that are quantified
+over large sorts, i.e., the solver is meant to be wrapped by a
+:class:`smt.api.grounding.GroundingSolver`.
+
+Integers are bit-blasted with a fixed width. The ranks lambda_s of the
+encoding are only compared with each other and with 0 along the reachable
+product states, thus the ranks of a solution can be renumbered to values
+below the number of product states, i.e., the domain size of lambda_s.
+The rank width is derived from these domain sizes unless it is set
+explicitly; an unsatisfiable result for a smaller width is reported as
+unknown.
+'''
+import itertools
+import logging
+import os
+import subprocess
+import tempfile
+
+from itertools import product
+
+from z3 import Solver, Tactic, Bool, Or, Not, is_true, simplify, sat, \
+    unsat, unknown
+
+from smt.api.irsolver import Z3Translator
+from smt.cnf import BitBlastEncoder, UnsupportedTermError
+from smt.ir import CONST, APP, FORALL, EXISTS, get_symbols
+
+LOG = logging.getLogger("satsolver")
+
+# index of the DIMACS files written by this process
+_dimacs_index = itertools.count()
+
+
+def _get_default_value(sort):
+    '''
+    Returns the value of the given sort that is used for applications
+    without assignment (model completion)
+    '''
+    if sort.kind == "bool":
+        return False
+    if sort.kind == "enum":
+        return sort.values[0]
+    return 0
+
+
+def _get_domain_size(sort):
+    if sort.kind == "bool":
+        return 2
+    if sort.kind == "enum":
+        return len(sort.values)
+    if sort.kind == "bv":
+        return 2 ** sort.width
+    return None
+
+
+def get_rank_width(terms):
+    '''
+    Returns the number of bits that suffice for the values of all integer
+    functions of the given terms (at least 1), i.e., for the ranks below
+    the domain size of each function, or None if an integer function has
+    an argument of an infinite sort
+    '''
+    width = 1
+    declarations, _ = get_symbols(terms)
+    for declaration in declarations:
+        if declaration.range.kind != "int":
+            continue
+        domain_size = 1
+        for sort in declaration.domain:
+            sort_size = _get_domain_size(sort)
+            if sort_size is None:
+                return None
+            domain_size *= sort_size
+        width = max(width, (domain_size - 1).bit_length())
+    return width
+
+
+class SATModel(object):
+    '''
+    Model that is given by a satisfying assignment of the CNF
+
+    Expressions are evaluated by replacing each ground application by its
+    value and simplifying the result. Applications to non-constant
+    arguments are replaced by a case split over the argument values.
+    '''
+    def __init__(self, encoder, assignment, translator):
+        '''
+        :param encoder: :class:`smt.cnf.BitBlastEncoder` of the CNF
+        :param assignment: list that maps each propositional variable to
+                           its value
+        :param translator: :class:`smt.api.irsolver.Z3Translator` that
+                           lifted the assertions
+        '''
+        self._encoder = encoder
+        self._assignment = assignment
+        self._translator = translator
+        # the lifted expressions are kept referenced
+        self._lift_cache = {}
+
+    def decls(self):
+        # function interpretations are not available, all values are
+        # retrieved by evaluation
+        return []
+
+    def __getitem__(self, item):
+        return None
+
+    def evaluate(self, expr, model_completion=False):
+        term = self._translator.lift(expr, self._lift_cache)
+        return simplify(self._translator.lower(
+            self._resolve(term, model_completion, {})))
+
+    eval = evaluate
+
+    def _get_value_term(self, application, model_completion):
+        '''
+        Returns the value of an application to constants or None
+        '''
+        declaration = application.payload
+        encoding = self._encoder.cnf.atoms.get(
+            (declaration, tuple(arg.payload for arg in application.args)))
+        if encoding is not None:
+            value = self._encoder.decode(encoding, declaration.range,
+                                         self._assignment)
+        elif model_completion:
+            value = _get_default_value(declaration.range)
+        else:
+            return None
+        return self._translator.context.const(value, declaration.range)
+
+    def _resolve(self, term, model_completion, cache):
+        if term.op == CONST or not term.args and term.op != APP:
+            return term
+        result = cache.get(term.id)
+        if result is not None:
+            return result
+
+        context = self._translator.context
+        if term.op in (FORALL, EXISTS):
+            result = self._resolve_quantifier(term, model_completion, cache)
+        elif term.op == APP:
+            args = [self._resolve(arg, model_completion, cache)
+                    for arg in term.args]
+            application = context.app(term.payload, args)
+            if all(arg.op == CONST for arg in args):
+                result = self._get_value_term(application, model_completion)
+            else:
+                result = self._resolve_case_split(application,
+                                                  model_completion, cache)
+            if result is None:
+                result = application
+        else:
+            result = context.term(term.op, term.sort,
+                                  [self._resolve(arg, model_completion,
+                                                 cache)
+                                   for arg in term.args],
+                                  term.payload)
+        cache[term.id] = result
+        return result
+
+    def _resolve_quantifier(self, quantifier, model_completion, cache):
+        context = self._translator.context
+        try:
+            domains = [self._encoder.get_domain(sort)
+                       for sort in quantifier.payload]
+        except UnsupportedTermError:
+            return quantifier
+        if not quantifier.is_ground:
+            return quantifier
+
+        # the variable declared last has the de-Bruijn index 0
+        instances = [self._resolve(
+            context.substitute(quantifier.args[0],
+                               list(reversed(assignment))),
+            model_completion, cache)
+            for assignment in product(*domains)]
+        if len(instances) == 1:
+            return instances[0]
+        return context.apply("and" if quantifier.op == FORALL else "or",
+                             instances)
+
+    def _resolve_case_split(self, application, model_completion, cache):
+        '''
+        Returns the if-then-else chain over the values of the non-constant
+        arguments of the given application or None
+        '''
+        context = self._translator.context
+        try:
+            domains = [self._encoder.get_domain(arg.sort)
+                       if arg.op != CONST else [arg]
+                       for arg in application.args]
+        except UnsupportedTermError:
+            return None
+        if not application.is_ground:
+            return None
+
+        result = None
+        for values in reversed(list(product(*domains))):
+            value_term = self._resolve(context.app(application.payload,
+                                                   values),
+                                       model_completion, cache)
+            if result is None:
+                result = value_term
+                continue
+            conditions = [context.apply("=", [arg, value])
+                          for arg, value in zip(application.args, values)
+                          if arg.op != CONST]
+            condition = conditions[0] if len(conditions) == 1 \
+                else context.apply("and", conditions)
+            result = context.apply("ite", [condition, value_term, result],
+                                   application.sort)
+        return result
+
+    def __repr__(self):
+        return "\n".join("%s%s = %s" % (declaration.name, list(arguments),
+                                        self._encoder.decode(
+                                            encoding, declaration.range,
+                                            self._assignment))
+                         for (declaration, arguments), encoding
+                         in self._encoder.cnf.atoms.items())
+
+
+class SATSolver(object):
+    '''
+    Solver that bit-blasts the assertions and runs a SAT solver for each
+    check
+    '''
+    def __init__(self, solver_path=None, timeout=None, dump_directory=None,
+                 rank_width=None):
+        '''
+        :param solver_path: path of a SAT solver binary, which is called
+                            with the DIMACS file as single argument and
+                            reports its result in the SAT competition
+                            format (None: Z3's sat tactic in-process)
+        :param timeout: timeout of each check in seconds, the result is
+                        unknown if the solver is stopped
+        :param dump_directory: directory where the DIMACS files are kept
+                               (they are deleted if None)
+        :param rank_width: number of bits of integers (ranks), derived
+                           from the assertions of each check if None (see
+                           :func:`get_rank_width`)
+        '''
+        self._solver = Solver()
+        self.solver_path = solver_path
+        self.timeout = timeout
+        self.dump_directory = dump_directory
+        self.rank_width = rank_width
+        self.translator = Z3Translator()
+
+        self.variable_count = 0
+        self.clause_count = 0
+        # rank width of the last check and whether it is sufficient
+        self.effective_rank_width = None
+        self.is_rank_width_sufficient = True
+
+        self._model = None
+        self._reason_unknown = ""
+
+    def add(self, *constraints):
+        self._solver.add(*constraints)
+
+    append = add
+
+    def push(self):
+        self._solver.push()
+
+    def pop(self):
+        self._solver.pop()
+
+    def assertions(self):
+        return self._solver.assertions()
+
+    def reason_unknown(self):
+        return self._reason_unknown
+
+    def to_cnf(self, *assumptions):
+        '''
+        Returns the encoder whose CNF contains the current assertions and
+        the list of literals of the given assumptions
+        '''
+        lift_cache = {}
+        terms = [self.translator.lift(assertion, lift_cache)
+                 for assertion in self._solver.assertions()]
+        assumption_terms = [self.translator.lift(assumption, lift_cache)
+                            for assumption in assumptions]
+
+        required_width = get_rank_width(terms + assumption_terms)
+        if self.rank_width is not None:
+            rank_width = self.rank_width
+        elif required_width is not None:
+            rank_width = required_width
+        else:
+            raise UnsupportedTermError("No finite rank width")
+        self.effective_rank_width = rank_width
+        self.is_rank_width_sufficient = required_width is not None and \
+            rank_width >= required_width
+
+        encoder = BitBlastEncoder(self.translator.context,
+                                  rank_width=rank_width)
+        for term in terms:
+            encoder.add(term)
+        assumption_literals = [encoder.encode(term)
+                               for term in assumption_terms]
+        return encoder, assumption_literals
+
+    def check(self, *assumptions):
+        self._model = None
+        try:
+            encoder, assumption_literals = self.to_cnf(*assumptions)
+        except UnsupportedTermError as error:
+            LOG.warning("No CNF encoding: %s", error)
+            self._reason_unknown = str(error)
+            return unknown
+
+        cnf = encoder.cnf
+        self.variable_count = cnf.variable_count
+        self.clause_count = len(cnf.clauses) + len(assumption_literals)
+        LOG.info("CNF: %d variables, %d clauses", self.variable_count,
+                 self.clause_count)
+        for literal in assumption_literals:
+            cnf.add_clause([literal])
+
+        if self.solver_path is None:
+            result, assignment = self._solve_in_process(cnf)
+        else:
+            result, assignment = self._solve_external(cnf)
+        if result == sat:
+            self._model = SATModel(encoder, assignment, self.translator)
+        elif result == unsat and not self.is_rank_width_sufficient:
+            # there may be a solution with larger ranks
+            LOG.info("Unsatisfiable with ranks of %d bits",
+                     self.effective_rank_width)
+            self._reason_unknown = "ranks truncated to %d bits" % \
+                self.effective_rank_width
+            return unknown
+        return result
+
+    def _solve_in_process(self, cnf):
+        variables = [None] + [Bool("x!%d" % variable) for variable
+                              in range(1, cnf.variable_count + 1)]
+        solver = Tactic("sat").solver()
+        if self.timeout is not None:
+            solver.set("timeout", int(self.timeout * 1000))
+        for clause in cnf.clauses:
+            solver.add(Or([variables[literal] if literal > 0
+                           else Not(variables[-literal])
+                           for literal in clause]))
+
+        result = solver.check()
+        if result == unknown:
+            self._reason_unknown = solver.reason_unknown()
+        if result != sat:
+            return result, None
+        model = solver.model()
+        return sat, [None] + [is_true(model.evaluate(variable,
+                                                     model_completion=True))
+                              for variable in variables[1:]]
+
+    def _get_dimacs_path(self):
+        if self.dump_directory is None:
+            dimacs_fd, dimacs_path = tempfile.mkstemp(suffix=".cnf")
+            os.close(dimacs_fd)
+            return dimacs_path
+
+        os.makedirs(self.dump_directory, exist_ok=True)
+        return os.path.join(self.dump_directory, "check_%d_%04d.cnf" %
+                            (os.getpid(), next(_dimacs_index)))
+
+    def _solve_external(self, cnf):
+        dimacs_path = self._get_dimacs_path()
+        try:
+            with open(dimacs_path, 'w') as dimacs_fh:
+                dimacs_fh.write(cnf.to_dimacs())
+            LOG.debug("Run %s on %s", self.solver_path, dimacs_path)
+
+            try:
+                process = subprocess.run([self.solver_path, dimacs_path],
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE,
+                                         timeout=self.timeout,
+                                         universal_newlines=True)
+            except subprocess.TimeoutExpired:
+                LOG.info("SAT solver timeout after %ss", self.timeout)
+                self._reason_unknown = "timeout"
+                return unknown, None
+        finally:
+            if self.dump_directory is None:
+                os.remove(dimacs_path)
+
+        return self._parse_output(process.stdout, process.stderr,
+                                  cnf.variable_count)
+
+    def _parse_output(self, output, error_output, variable_count):
+        '''
+        Parses the status line (s ...) and the value lines (v ...) of the
+        SAT competition output format
+        '''
+        status = None
+        literals = []
+        for line in output.splitlines():
+            if line.startswith("s "):
+                status = line[2:].strip()
+            elif line.startswith("v "):
+                literals.extend(int(literal) for literal in line[2:].split())
+
+        if status == "UNSATISFIABLE":
+            return unsat, None
+        if status not in ("SATISFIABLE", "UNKNOWN"):
+            raise Exception("Unexpected output of SAT solver: %s %s" %
+                            (output, error_output))
+        if status == "UNKNOWN":
+            self._reason_unknown = "unknown"
+            return unknown, None
+        if not literals:
+            raise Exception("SAT solver returned no assignment")
+
+        # variables without value are false
+        assignment = [False] * (variable_count + 1)
+        for literal in literals:
+            if 0 < literal <= variable_count:
+                assignment[literal] = True
+        return sat, assignment
+
+    def model(self):
+        return self._model
+
+    def __repr__(self):
+        return repr(self._solver)
@@ -0,0 +1,131 @@
+'''
+Solver profiles
+
+A solver profile is the tactic pipeline and the parameters of the Z3
+solver of the quantified encoding. Profiles are tuned per specification
+family by ``solver_tuning.py`` on a corpus of recorded checks and stored
+in a JSON file (family -> profile), which the synthesis loads via
+:data:`config.SOLVER_PROFILE_PATH`.
+'''
+import json
+import logging
+import os
+import re
+import tempfile
+
+from collections import namedtuple
+
+from z3 import Solver, Tactic, Then
+
+LOG = logging.getLogger("solverprofile")
+
+# tactic pipeline of the quantified encoding without profile
+DEFAULT_TACTICS = ("qe", "smt")
+
+
+class SolverProfile(namedtuple("SolverProfile", ["tactics", "parameters"])):
+    '''
+    Tactic names (applied in order) and solver parameters (name -> value)
+    '''
+    def __str__(self):
+        return "(then %s) %s" % \
+            (" ".join(self.tactics),
+             " ".join("%s=%s" % (name, value) for name, value
+                      in sorted(self.parameters.items())))
+
+
+def get_spec_family(spec_filename):
+    '''
+    Returns the family of a specification, i.e., the file name without
+    extension and without the index of the instance (e.g.,
+    conj_mutual_exclusion_in for conj_mutual_exclusion_in_1.ltl)
+    '''
+    name = os.path.splitext(os.path.basename(spec_filename))[0]
+    return re.sub(r"_\d+$", "", name)
+
+
+def read_solver_profiles(profile_filepath):
+    '''
+    Returns the dictionary family -> :class:`SolverProfile` of the given
+    profile file (empty if the file does not exist)
+    '''
+    if profile_filepath is None or not os.path.exists(profile_filepath):
+        return {}
+    try:
+        with open(profile_filepath, 'r') as profile_fh:
+            profiles = json.load(profile_fh)
+    except (OSError, ValueError) as ex:
+        LOG.warning("Cannot read solver profiles: %s", ex)
+        return {}
+    return {family: SolverProfile(tuple(profile["tactics"]),
+                                  profile["parameters"])
+            for family, profile in profiles.items()}
+
+
+def load_solver_profile(profile_filepath, family):
+    '''
+    Returns the :class:`SolverProfile` of the given family or None
+    '''
+    profile = read_solver_profiles(profile_filepath).get(family)
+    if profile is not None:
+        LOG.info("Solver profile of '%s': %s", family, profile)
+    return profile
+
+
+def write_solver_profiles(profile_filepath, profiles):
+    '''
+    Adds the given profiles (family -> :class:`SolverProfile`) to the
+    profile file, existing profiles of other families are kept
+    '''
+    records = read_solver_profiles(profile_filepath)
+    records.update(profiles)
+
+    # replace the file atomically, synthesis runs may read it concurrently
+    profile_directory = os.path.dirname(os.path.abspath(profile_filepath))
+    temp_fd, temp_path = tempfile.mkstemp(dir=profile_directory,
+                                          suffix=".tmp")
+    with os.fdopen(temp_fd, 'w') as profile_fh:
+        json.dump({family: {"tactics": list(profile.tactics),
+                            "parameters": profile.parameters}
+                   for family, profile in records.items()},
+                  profile_fh, indent=2, sort_keys=True)
+    os.replace(temp_path, profile_filepath)
+
+
+def create_solver(profile=None):
+    '''
+    Returns a new solver of the given :class:`SolverProfile` (the default
+    pipeline (then qe smt) if None)
+    '''
+    tactics = DEFAULT_TACTICS if profile is None else profile.tactics
+    if len(tactics) == 1:
+        tactic = Tactic(tactics[0])
+    else:
+        tactic = Then(*[Tactic(name) for name in tactics])
+    solver = tactic.solver()
+    if profile is not None:
+        for name, value in sorted(profile.parameters.items()):
+            solver.set(name, value)
+    return solver
+
+
+def create_incremental_solver(profile=None):
+    '''
+    Returns a new incremental solver with the parameters of the given
+    :class:`SolverProfile`
+
+    Solvers of tactic pipelines solve each check from scratch. The
+    incremental solver keeps learned lemmas across checks and push/pop
+    scopes, but it cannot apply a tactic pipeline, i.e., the tactics of the
+    profile are ignored (quantifiers over the finite sorts of the encoding
+    are instantiated by MBQI instead of being eliminated by qe).
+    '''
+    solver = Solver()
+    if profile is not None:
+        for name, value in sorted(profile.parameters.items()):
+            solver.set(name, value)
+    # Z3 solves the checks outside of any scope by a non-incremental solver
+    # until the assertions change, the base scope keeps all checks on the
+    # incremental kernel
+    solver.push()
+    return solver
@@ -5,8 +5,9 @@ Created on 15.05.2014
 '''
 import logging
 
-from z3 import sat
+from z3 import sat, unknown
 
+from helpers.instrumentation import PHASE_MODEL_EXTRACTION
 from smt.api.encoder import PyZ3Encoder
 from smt.encoder_base import SMTEncoder
 from smt.api.stateguarded.templatemodel import StateGuardedTemplateModel
@@ -37,15 +38,18 @@ class StateGuardedPyZ3Encoder(PyZ3Encoder):
         res = s.check()
         model = None
         is_sat = res == sat
+        self.has_unknown_result = res == unknown
         if is_sat:
-            model = {}
-            guard_bits = {}
-            for t in self.encoder_info.template_functions:
-                template_model = StateGuardedTemplateModel(s.model(), t)
-                guard_bits.update(template_model.guard_state_bits)
-                model[t.template_index] = template_model
-            for template_model in model.values():
-                template_model.apply_guard_state_bit_dictionary(guard_bits)
+            with self.statistics.phase(PHASE_MODEL_EXTRACTION):
+                model = {}
+                guard_bits = {}
+                for t in self.encoder_info.template_functions:
+                    template_model = StateGuardedTemplateModel(s.model(), t)
+                    guard_bits.update(template_model.guard_state_bits)
+                    model[t.template_index] = template_model
+                for template_model in model.values():
+                    template_model.apply_guard_state_bit_dictionary(
+                        guard_bits)
         logging.info("Solver result: %s", res)
         logging.debug("Formulas")
         logging.debug(s)
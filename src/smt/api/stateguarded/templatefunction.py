@@ -6,6 +6,7 @@ Created on 24.05.2014
 from z3 import Function, BitVecSort, BitVecVal, Const, ForAll, Implies, And
 
 from smt.api import templatefunction
+from smt.encoder_base import EncodingOptimization
 
 
 class TemplateFunction(templatefunction.TemplateFunction):
@@ -46,6 +47,19 @@ class TemplateFunction(templatefunction.TemplateFunction):
             ((1 << bit_offset) - 1)
         mask = BitVecVal(mask_value, self._spec.bound_sum)
 
+        self.state_guard = function_declaration
+
+        if self._encoder_info.encoding_optimization & \
+                EncodingOptimization.SYMMETRY_BREAKING:
+            # canonical one-hot layout: the i-th state is assigned the i-th
+            # bit of the template's bit range (any other one-hot layout is
+            # a permutation of the bits of the guards)
+            self._encoder_info.solver.add(
+                And([function_declaration(state) ==
+                     BitVecVal(1 << (bit_offset + i), self._spec.bound_sum)
+                     for i, state in enumerate(self.get_states())]))
+            return
+
         # assertions for function
         t_i = Const('ti', self.state_sort)
         t_j = Const('tj', self.state_sort)
@@ -64,4 +78,3 @@ class TemplateFunction(templatefunction.TemplateFunction):
                      BitVecVal(0, self._spec.bound_sum)),
                     (function_declaration(t_i) !=
                      BitVecVal(0, self._spec.bound_sum)))))
-        self.state_guard = function_declaration
@@ -3,7 +3,7 @@ Created on 15.05.2014
 
 @author: simon
 '''
-from smt.api.templatemodel import ApiTemplateModel
+from smt.api.templatemodel import ApiTemplateModel, get_function_values
 
 
 class StateGuardedTemplateModel(ApiTemplateModel):
@@ -14,10 +14,17 @@ class StateGuardedTemplateModel(ApiTemplateModel):
         super().__init__(model, templatefunction)
 
         # retrieve the bit assignments of the different states
+        state_guard_values = \
+            get_function_values(self.model,
+                                self._template_function.state_guard,
+                                [self._internal_states])
         self.guard_state_bits = \
-            {self.model.evaluate(
-                self._template_function.state_guard(state)).as_long():
-             str(state) for state in self._internal_states}
+            {value.as_long(): str(state) for state, value
+             in zip(self._internal_states, state_guard_values)}
+
+    def get_state_guard_bits(self):
+        return {state: value for value, state
+                in self.guard_state_bits.items()}
 
     def apply_guard_state_bit_dictionary(self, bit_to_state_dict):
         '''
@@ -2,9 +2,12 @@ import logging
 
 from abc import abstractmethod, ABCMeta
 from functools import reduce
+from itertools import product
 
 from z3 import BoolSort, Bool, Datatype, Function, BitVecSort, BitVec, \
-    BitVecVal, Const, ForAll, Exists, IntSort, And, Int, Implies, Or
+    BitVecVal, Const, ForAll, Exists, And, Implies, Not, Or
+
+from smt.encoder_base import EncodingOptimization
 
 
 class TemplateFunction(metaclass=ABCMeta):
@@ -55,7 +58,9 @@ class TemplateFunction(metaclass=ABCMeta):
         self.delta_enabled_functions = [self._get_delta_enabled_function(i)
                                         for i in range(0, template.cutoff)]
 
-#         self._define_optimizations()
+        if self._encoder_info.encoding_optimization & \
+                EncodingOptimization.SYMMETRY_BREAKING:
+            self._define_symmetry_breaking()
 
     def _define_guard(self):
         """Defines the guard function
@@ -304,6 +309,13 @@ class TemplateFunction(metaclass=ABCMeta):
         return [getattr(self.state_sort, self.state_sort.constructor(i).name())
                 for i in range(len(self._template.initial_states))]
 
+    def get_states(self):
+        '''
+        Returns Z3 consts that represent all states of the given template
+        '''
+        return [getattr(self.state_sort, self.state_sort.constructor(i).name())
+                for i in range(self._template.bound)]
+
     def get_input_signals(self, instance_index=None):
         '''
         Returns input signals for a particular instance or quantified signals
@@ -330,61 +342,43 @@ class TemplateFunction(metaclass=ABCMeta):
                 self.output_functions[i] for i
                 in range(0, len(self.output_functions))}
 
-    def _define_optimizations(self):
-        # add state order
-        idx_state_func = Function('state_index%d' % self.template_index,
-                                        IntSort(), self.state_sort)
-        state_indices = [(getattr(self.state_sort,
-                          self.state_sort.constructor(i).name()), i)
-                         for i in range(0, self._template.bound)]
-
-        state_order_conjuncts = \
-            [idx_state_func(index) == state
-             for state, index in state_indices]
-        self._encoder_info.solver.add(And(state_order_conjuncts))
-
-        # if t_i is connected some t_{j} with j>=i+2, then there
-        # must be a connection from t_i to t_{i+1} or there is some
-        # other incoming transition for the particular node
-        idx_curr_var = Int('idx_curr')
-        idx_next_var = Int('idx_next')
-        input_vars = self.get_fresh_input_variables()
-
-        guard_params = [idx_state_func(idx_curr_var)] + input_vars + \
-            [idx_state_func(idx_next_var)]
-        exists_transition2 = \
-            Exists(
-               input_vars + [idx_next_var],
-               And(idx_next_var > idx_curr_var + 1,
-                   (self.guard_function(guard_params) !=
-                    BitVecVal(0, self._encoder_info.guard_size))))
-
-        guard_params = [idx_state_func(idx_curr_var)] + input_vars + \
-            [idx_state_func(idx_curr_var + 1)]
-        exists_transition1 = \
-            Exists(
-               input_vars,
-               (self.guard_function(guard_params) !=
-                BitVecVal(0, self._encoder_info.guard_size)))
-
-        input_vars_other = self.get_fresh_input_variables(prefix="other")
-        idx_other_var = Int('idx_other')
-        guard_params = [idx_state_func(idx_other_var)] + input_vars_other + \
-            [idx_state_func(idx_curr_var + 1)]
-        exists_transition1_other = \
-            Exists(
-               [idx_other_var] + input_vars_other,
-               And(idx_other_var != idx_curr_var + 1,
-                   self.guard_function(guard_params) !=
-                   BitVecVal(0, self._encoder_info.guard_size)))
-
-#         self._encoder_info.solver.add(
-#             ForAll([idx_curr_var],
-#                Implies(
-#                    And([idx_curr_var >= 0,
-#                         idx_curr_var < self._template.bound - 2]),
-#                    Implies(exists_transition2,
-#                            Or(exists_transition1, exists_transition1_other)))))
+    def _define_symmetry_breaking(self):
+        '''
+        Adds constraints that order the states of the template in
+        breadth-first search order
+
+        Any permutation of the non-initial states maps a solution to a
+        solution. Let the parent of a state t_j be the smallest state t_i
+        (i < j) that has a transition to t_j. Each solution can be renumbered
+        such that the non-initial states are visited in the order of a
+        breadth-first search from the initial states, which is continued
+        with the smallest unvisited state if no further state is reachable.
+        Then, the parents of two consecutive states t_j, t_{j+1} that both
+        have a parent are ordered, i.e., parent(t_j) <= parent(t_{j+1}).
+        '''
+        solver = self._encoder_info.solver
+        zero = BitVecVal(0, self._encoder_info.guard_size)
+        states = self.get_states()
+        input_assignments = list(product(*self.get_fresh_input_assignments()))
+
+        # edges[j][i]: some transition from t_i to t_j (i < j)
+        edges = []
+        for j, state in enumerate(states):
+            edges.append([])
+            for i in range(j):
+                edge = Bool('bfs_edge_%d_%d_%d' % (self.template_index, i, j))
+                solver.add(edge == Or([self.guard_function(
+                    [states[i]] + list(assignment) + [state]) != zero
+                                       for assignment in input_assignments]))
+                edges[j].append(edge)
+
+        for j in range(len(self._template.initial_states), len(states) - 1):
+            for i in range(j):
+                # t_i is the parent of t_{j+1} and t_j has some parent
+                is_parent = And([edges[j + 1][i]] +
+                                [Not(edge) for edge in edges[j + 1][:i]])
+                solver.add(Implies(And(is_parent, Or(edges[j])),
+                                   Or(edges[j][:i + 1])))
 
     @property
     def template_index(self):
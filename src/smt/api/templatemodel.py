@@ -1,9 +1,171 @@
+from abc import abstractmethod, ABCMeta
 from itertools import product
 
-from z3 import is_true
+from z3 import BoolVal, is_true, is_var, is_app, is_and, is_or, is_not, \
+    is_eq, is_app_of, is_quantifier, get_var_index, simplify, \
+    substitute_vars, Z3_OP_ITE
 
 
-class ApiTemplateModel(object):
+def get_function_values(model, function, argument_values):
+    '''
+    Returns the values of the given function for all combinations of the
+    given argument values in the order of :func:`itertools.product`
+
+    The interpretation of the function is read from the model once and
+    decoded in a single pass (explicit entries first, then the else-value)
+    instead of evaluating each combination separately.
+
+    :param model: Z3 model
+    :param function: Z3 function declaration
+    :param argument_values: list that contains a list of Z3 values
+                            for each function argument
+    '''
+    combinations = list(product(*argument_values))
+
+    # Z3 returns an empty interpretation object for functions that are
+    # not part of the model
+    interpretation = model[function] \
+        if function in model.decls() else None
+    if interpretation is None:
+        # functions without interpretation (e.g., inlined definitions
+        # of the grounded encoding or unconstrained outputs) are
+        # evaluated separately
+        return [model.evaluate(function(*combination),
+                               model_completion=True)
+                for combination in combinations]
+
+    # argument value id -> value index, for each argument
+    value_indices = [{value.get_id(): value_index
+                      for value_index, value in enumerate(values)}
+                     for values in argument_values]
+    index_combinations = list(product(*[range(len(values))
+                                        for values in argument_values]))
+    cell_dict = {index_combination: cell for cell, index_combination
+                 in enumerate(index_combinations)}
+
+    table = [None] * len(combinations)
+
+    def _set_value(cell, value):
+        if _has_variables(value):
+            value = simplify(substitute_vars(value, *combinations[cell]))
+        table[cell] = value
+
+    entries = interpretation.as_list()
+    for entry in entries[:-1]:
+        index_combination = \
+            tuple(value_indices[argument_index].get(argument.get_id())
+                  for argument_index, argument in enumerate(entry[:-1]))
+        cell = cell_dict.get(index_combination)
+        if cell is not None:
+            _set_value(cell, entry[-1])
+
+    # the else-value of a tactic model is usually a chain
+    # If(cubes over the arguments, value, If(...))
+    else_value = entries[-1]
+    remaining_cells = [cell for cell, value in enumerate(table)
+                       if value is None]
+    while remaining_cells and is_app_of(else_value, Z3_OP_ITE):
+        cubes = _get_cubes(else_value.arg(0), value_indices)
+        if cubes is None:
+            break
+
+        unmatched_cells = []
+        for cell in remaining_cells:
+            index_combination = index_combinations[cell]
+            if any(all(index_combination[argument_index] == value_index
+                       for argument_index, value_index in cube.items())
+                   for cube in cubes):
+                _set_value(cell, else_value.arg(1))
+            else:
+                unmatched_cells.append(cell)
+
+        remaining_cells = unmatched_cells
+        else_value = else_value.arg(2)
+
+    for cell in remaining_cells:
+        _set_value(cell, else_value)
+
+    return table
+
+
+def _get_cubes(condition, value_indices):
+    '''
+    Returns the given condition over function arguments as list of cubes
+    (dictionaries argument index -> value index) or None if the condition
+    is not a disjunction of conjunctions of argument value tests
+    '''
+    disjuncts = condition.children() if is_or(condition) else [condition]
+
+    cubes = []
+    for disjunct in disjuncts:
+        literals = disjunct.children() if is_and(disjunct) else [disjunct]
+        cube = {}
+        for literal in literals:
+            argument_value = _get_argument_value(literal, value_indices)
+            if argument_value is None:
+                return None
+
+            argument_index, value_index = argument_value
+            if cube.get(argument_index, value_index) != value_index:
+                # contradictory cube
+                cube = None
+                break
+            cube[argument_index] = value_index
+
+        if cube is not None:
+            cubes.append(cube)
+    return cubes
+
+
+def _get_argument_value(literal, value_indices):
+    '''
+    Returns the tuple (argument index, value index) of a literal Var(i),
+    Not(Var(i)), or Var(i) == value, or None for other literals
+    '''
+    if is_var(literal):
+        variable, value = literal, BoolVal(True)
+    elif is_not(literal) and is_var(literal.arg(0)):
+        variable, value = literal.arg(0), BoolVal(False)
+    elif is_eq(literal) and is_var(literal.arg(0)):
+        variable, value = literal.arg(0), literal.arg(1)
+    elif is_eq(literal) and is_var(literal.arg(1)):
+        variable, value = literal.arg(1), literal.arg(0)
+    else:
+        return None
+
+    argument_index = get_var_index(variable)
+    if argument_index >= len(value_indices):
+        return None
+    value_index = value_indices[argument_index].get(value.get_id())
+    if value_index is None:
+        return None
+    return argument_index, value_index
+
+
+def _has_variables(expr):
+    stack = [expr]
+    while stack:
+        current = stack.pop()
+        if is_var(current) or is_quantifier(current):
+            return True
+        if is_app(current):
+            stack.extend(current.children())
+    return False
+
+
+class _DetachedTemplateFunction(object):
+    '''
+    Picklable stand-in for the template function of an extracted model
+    '''
+    def __init__(self, template_function):
+        self.template_index = template_function.template_index
+        self._input_signals = list(template_function.get_input_signals())
+
+    def get_input_signals(self):
+        return self._input_signals
+
+
+class ApiTemplateModel(metaclass=ABCMeta):
     '''
     Encapsulates information about a template model and
     provides functionality to extract this information from
@@ -45,11 +207,10 @@ class ApiTemplateModel(object):
         Stores the output assignments from the model to :data:`outputs` member
         '''
         def _get_output_assignment(output_function):
-            state_sort = self._template_function.state_sort
-            return {state_name:
-                    is_true(self.model.evaluate(
-                        output_function(getattr(state_sort, state_name))))
-                    for state_name in self.states}
+            values = get_function_values(self.model, output_function,
+                                         [self._internal_states])
+            return {state_name: is_true(value)
+                    for state_name, value in zip(self.states, values)}
 
         self.outputs = {str(output): _get_output_assignment(output)
                         for output in self._template_function.output_functions}
@@ -63,21 +224,47 @@ class ApiTemplateModel(object):
         '''
         self.num_guards = {}
 
-        transition_combinations = [self._internal_states] + \
-            list(self._template_function.get_fresh_input_assignments()) + \
-            [self._internal_states]
-
-        transition_combinations = product(*transition_combinations)
-        for transition_combination in transition_combinations:
-            string_transition_combination = \
-                tuple([str(transition_combination[0])] +
-                      list(transition_combination[1:-1]) +
-                      [str(transition_combination[-1])])
-            val = self.model.evaluate(self._template_function.guard_function(
-                transition_combination)).as_long()
+        input_assignments = \
+            list(self._template_function.get_fresh_input_assignments())
+
+        transition_combinations = [self.states] + \
+            input_assignments + \
+            [self.states]
+
+        guard_values = get_function_values(
+            self.model, self._template_function.guard_function,
+            [self._internal_states] +
+            [[BoolVal(value) for value in assignment]
+             for assignment in input_assignments] +
+            [self._internal_states])
+
+        for string_transition_combination, guard_value in \
+                zip(product(*transition_combinations), guard_values):
+            val = guard_value.as_long()
             if val != 0:
                 self.num_guards[string_transition_combination] = val
 
+    def __getstate__(self):
+        '''
+        Template models are pickled without the Z3 objects (e.g., to pass
+        synthesis results between processes), i.e., only the extracted
+        states, outputs, and transitions are kept
+        '''
+        state = dict(self.__dict__)
+        state["model"] = None
+        state["_internal_states"] = None
+        state["_template_function"] = \
+            _DetachedTemplateFunction(self._template_function)
+        return state
+
+    @abstractmethod
+    def get_state_guard_bits(self):
+        '''
+        Returns a dictionary that maps each state name to the bits the
+        state contributes to the guard set of the other processes
+        '''
+        pass
+
     @property
     def transitions_list(self):
         """
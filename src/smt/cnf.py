@@ -0,0 +1,497 @@
+'''
+Grounded CNF lowering of the constraint IR (see :mod:`smt.ir`)
+
+Quantifiers over finite sorts are expanded, Boolean connectives are
+translated by the Tseitin transformation, and every ground application of
+an uninterpreted function becomes a propositional variable (Boolean range)
+or a one-hot vector of propositional variables (enum range).
+Applications whose arguments are not constants are resolved by a case
+split over the possible argument values. :class:`BitBlastEncoder`
+additionally translates bit vectors and bounded integers bit by bit.
+'''
+import logging
+
+from itertools import product
+
+from smt.ir import CONST, APP, FORALL, EXISTS
+
+LOG = logging.getLogger("cnf")
+
+
+class UnsupportedTermError(Exception):
+    '''
+    Raised if a term cannot be translated to CNF or lifted into the
+    constraint IR
+    '''
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class CNF(object):
+    '''
+    Clauses over the propositional variables 1..variable_count
+
+    atoms maps the ground applications (function declaration, argument
+    constant values) to their literal (Boolean range) or to a dictionary
+    value -> literal (enum range).
+    '''
+    def __init__(self):
+        self.variable_count = 0
+        self.clauses = []
+        self.atoms = {}
+
+    def new_variable(self):
+        self.variable_count += 1
+        return self.variable_count
+
+    def add_clause(self, clause):
+        self.clauses.append(clause)
+
+    def to_dimacs(self):
+        '''
+        Returns the clauses in the DIMACS format
+        '''
+        lines = ["p cnf %d %d" % (self.variable_count, len(self.clauses))]
+        lines += ["%s 0" % " ".join(map(str, clause))
+                  for clause in self.clauses]
+        return "\n".join(lines) + "\n"
+
+
+class CNFEncoder(object):
+    '''
+    Translates ground (or finitely quantified) Boolean terms to CNF
+    '''
+    def __init__(self, context, cnf=None, max_domain_size=2 ** 16):
+        '''
+        :param context: :class:`smt.ir.IRContext` of the terms
+        :param cnf: :class:`CNF` the clauses are added to
+        :param max_domain_size: maximal number of instances of a quantifier
+        '''
+        self._context = context
+        self.cnf = CNF() if cnf is None else cnf
+        self.max_domain_size = max_domain_size
+
+        self._true = self.cnf.new_variable()
+        self.cnf.add_clause([self._true])
+
+        # term id -> (term, encoding), the term is kept referenced
+        self._cache = {}
+
+    @property
+    def true(self):
+        return self._true
+
+    @property
+    def false(self):
+        return -self._true
+
+    def add(self, term):
+        '''
+        Adds the clauses that assert the given Boolean term
+        '''
+        stack = [term]
+        while stack:
+            term = stack.pop()
+            if term.op == "and":
+                stack.extend(term.args)
+            elif term.op == FORALL:
+                stack.extend(self._get_instances(term))
+            else:
+                self.cnf.add_clause([self.encode(term)])
+
+    def encode(self, term):
+        '''
+        Returns the literal of a Boolean term, the dictionary value ->
+        literal of an enum term, or the encoding of other sorts as defined
+        by :meth:`_encode_other`
+        '''
+        cached = self._cache.get(term.id)
+        if cached is not None:
+            return cached[1]
+        if not term.is_ground:
+            raise UnsupportedTermError("Free variable in %s" % term)
+
+        if term.op == CONST:
+            result = self._encode_const(term)
+        elif term.op == APP:
+            result = self._encode_app(term)
+        elif term.op in (FORALL, EXISTS):
+            literals = [self.encode(instance)
+                        for instance in self._get_instances(term)]
+            result = self.conjunction(literals) if term.op == FORALL \
+                else self.disjunction(literals)
+        elif term.sort.kind == "bool" and term.op in ("and", "or", "not",
+                                                      "=>", "xor"):
+            result = self._encode_connective(term)
+        elif term.op in ("=", "distinct", "ite") and \
+                term.args[-1].sort.kind in ("bool", "enum"):
+            result = self._encode_finite_domain_operator(term)
+        else:
+            result = self._encode_other(term)
+        self._cache[term.id] = (term, result)
+        return result
+
+    def _encode_other(self, term):
+        raise UnsupportedTermError("Unsupported term %s of sort %s" %
+                                   (term.op, term.sort.name))
+
+    # connectives (Tseitin transformation)
+
+    def conjunction(self, literals):
+        literals = [literal for literal in literals if literal != self.true]
+        if self.false in literals:
+            return self.false
+        if not literals:
+            return self.true
+        if len(literals) == 1:
+            return literals[0]
+        result = self.cnf.new_variable()
+        for literal in literals:
+            self.cnf.add_clause([-result, literal])
+        self.cnf.add_clause([result] + [-literal for literal in literals])
+        return result
+
+    def disjunction(self, literals):
+        return -self.conjunction([-literal for literal in literals])
+
+    def equivalence(self, literal_1, literal_2):
+        if literal_1 == literal_2:
+            return self.true
+        if literal_1 == -literal_2:
+            return self.false
+        return self.conjunction([self.disjunction([-literal_1, literal_2]),
+                                 self.disjunction([literal_1, -literal_2])])
+
+    def if_then_else(self, condition, literal_1, literal_2):
+        if condition == self.true or literal_1 == literal_2:
+            return literal_1
+        if condition == self.false:
+            return literal_2
+        return self.disjunction([self.conjunction([condition, literal_1]),
+                                 self.conjunction([-condition, literal_2])])
+
+    def _encode_connective(self, term):
+        literals = [self.encode(arg) for arg in term.args]
+        if term.op == "and":
+            return self.conjunction(literals)
+        if term.op == "or":
+            return self.disjunction(literals)
+        if term.op == "not":
+            return -literals[0]
+        if term.op == "=>":
+            return self.disjunction([-literal for literal in literals[:-1]] +
+                                    [literals[-1]])
+        result = literals[0]
+        for literal in literals[1:]:
+            result = -self.equivalence(result, literal)
+        return result
+
+    # finite domains
+
+    def _encode_const(self, term):
+        if term.sort.kind == "bool":
+            return self.true if term.payload else self.false
+        if term.sort.kind == "enum":
+            return {value: self.true if value == term.payload else self.false
+                    for value in term.sort.values}
+        return self._encode_other(term)
+
+    def _encode_finite_domain_operator(self, term):
+        if term.op == "ite":
+            condition = self.encode(term.args[0])
+            then_value, else_value = [self.encode(arg)
+                                      for arg in term.args[1:]]
+            if term.sort.kind == "bool":
+                return self.if_then_else(condition, then_value, else_value)
+            return {value: self.if_then_else(condition, then_value[value],
+                                             else_value[value])
+                    for value in term.sort.values}
+
+        encodings = [self.encode(arg) for arg in term.args]
+        equalities = [self.equals(encoding_1, encoding_2)
+                      for index, encoding_1 in enumerate(encodings)
+                      for encoding_2 in encodings[index + 1:]]
+        if term.op == "=":
+            return self.conjunction(equalities)
+        return self.conjunction([-equality for equality in equalities])
+
+    def equals(self, encoding_1, encoding_2):
+        '''
+        Returns the literal that holds iff both encodings (literals or
+        one-hot dictionaries of the same sort) are equal
+        '''
+        if isinstance(encoding_1, dict):
+            return self.disjunction([self.conjunction([encoding_1[value],
+                                                       encoding_2[value]])
+                                     for value in encoding_1])
+        return self.equivalence(encoding_1, encoding_2)
+
+    def new_value(self, sort):
+        '''
+        Returns the encoding of a fresh unconstrained value of the sort
+        '''
+        if sort.kind == "bool":
+            return self.cnf.new_variable()
+        if sort.kind == "enum":
+            literals = [self.cnf.new_variable() for _ in sort.values]
+            self.cnf.add_clause(literals)
+            for index, literal in enumerate(literals):
+                for other_literal in literals[index + 1:]:
+                    self.cnf.add_clause([-literal, -other_literal])
+            return dict(zip(sort.values, literals))
+        raise UnsupportedTermError("Unsupported sort %s" % sort.name)
+
+    def decode(self, encoding, sort, assignment):
+        '''
+        Returns the value of the given encoding under an assignment of the
+        propositional variables
+
+        :param assignment: sequence that maps each variable to its value
+        '''
+        if sort.kind == "bool":
+            return _is_true(encoding, assignment)
+        if sort.kind == "enum":
+            for value in sort.values:
+                if _is_true(encoding[value], assignment):
+                    return value
+        raise UnsupportedTermError("Unsupported sort %s" % sort.name)
+
+    def get_domain(self, sort):
+        '''
+        Returns the constant terms of the given finite sort
+        '''
+        if sort.kind == "bool":
+            return [self._context.const(False, sort),
+                    self._context.const(True, sort)]
+        if sort.kind == "enum":
+            return [self._context.const(value, sort) for value in sort.values]
+        raise UnsupportedTermError("Quantifier over %s" % sort.name)
+
+    def _get_instances(self, quantifier):
+        '''
+        Returns the ground instances of the body of the given quantifier
+        '''
+        domains = [self.get_domain(sort) for sort in quantifier.payload]
+        size = 1
+        for domain in domains:
+            size *= len(domain)
+        if size > self.max_domain_size:
+            raise UnsupportedTermError("Quantifier with %d instances" % size)
+
+        body = quantifier.args[0]
+        # the variable declared last has the de-Bruijn index 0
+        return [self._context.substitute(body, list(reversed(assignment)))
+                for assignment in product(*domains)]
+
+    # uninterpreted functions
+
+    def _encode_app(self, term):
+        declaration = term.payload
+        if all(arg.op == CONST for arg in term.args):
+            key = (declaration, tuple(arg.payload for arg in term.args))
+            encoding = self.cnf.atoms.get(key)
+            if encoding is None:
+                encoding = self.new_value(declaration.range)
+                self.cnf.atoms[key] = encoding
+            return encoding
+
+        # case split over the values of the non-constant arguments
+        branches = []
+        for values in product(*[self.get_domain(arg.sort)
+                                if arg.op != CONST else [arg]
+                                for arg in term.args]):
+            condition = self.conjunction(
+                [self.equals(self.encode(arg), self.encode(value))
+                 for arg, value in zip(term.args, values)
+                 if arg.op != CONST])
+            branches.append((condition,
+                             self.encode(self._context.app(declaration,
+                                                           values))))
+        return self.select(branches, declaration.range)
+
+    def select(self, branches, sort):
+        '''
+        Returns the encoding of the value of the branch whose condition
+        holds
+
+        :param branches: list of tuples (condition literal, encoding of a
+                         value of the given sort), exactly one condition
+                         holds
+        '''
+        if sort.kind == "bool":
+            return self.disjunction([self.conjunction([condition, literal])
+                                     for condition, literal in branches])
+        return {value: self.disjunction([self.conjunction([condition,
+                                                           encoding[value]])
+                                         for condition, encoding in branches])
+                for value in sort.values}
+
+
+class BitBlastEncoder(CNFEncoder):
+    '''
+    Translates terms over bit vectors and bounded integers to CNF
+
+    Bit vectors and integers are encoded as lists of literals (least
+    significant bit first). Integers (e.g., the ranks lambda_s) are
+    unsigned numbers of the given rank width, i.e., satisfying assignments
+    are models of the original encoding, but unsatisfiability only holds
+    with respect to ranks below 2**rank_width.
+    '''
+    def __init__(self, context, cnf=None, max_domain_size=2 ** 16,
+                 rank_width=16):
+        super().__init__(context, cnf, max_domain_size)
+        self.rank_width = rank_width
+
+    def _get_width(self, sort):
+        if sort.kind == "bv":
+            return sort.width
+        if sort.kind == "int":
+            return self.rank_width
+        return None
+
+    def _encode_const(self, term):
+        width = self._get_width(term.sort)
+        if width is None:
+            return super()._encode_const(term)
+        value = term.payload
+        if not 0 <= value < 2 ** width:
+            raise UnsupportedTermError("Constant %d exceeds %d bits" %
+                                       (value, width))
+        return [self.true if value >> bit & 1 else self.false
+                for bit in range(width)]
+
+    def new_value(self, sort):
+        width = self._get_width(sort)
+        if width is None:
+            return super().new_value(sort)
+        return [self.cnf.new_variable() for _ in range(width)]
+
+    def equals(self, encoding_1, encoding_2):
+        if isinstance(encoding_1, list):
+            return self.conjunction([self.equivalence(bit_1, bit_2)
+                                     for bit_1, bit_2
+                                     in zip(encoding_1, encoding_2)])
+        return super().equals(encoding_1, encoding_2)
+
+    def select(self, branches, sort):
+        width = self._get_width(sort)
+        if width is None:
+            return super().select(branches, sort)
+        return [self.disjunction([self.conjunction([condition, bits[bit]])
+                                  for condition, bits in branches])
+                for bit in range(width)]
+
+    def decode(self, encoding, sort, assignment):
+        if isinstance(encoding, list):
+            return sum(1 << bit for bit, literal in enumerate(encoding)
+                       if _is_true(literal, assignment))
+        return super().decode(encoding, sort, assignment)
+
+    def get_domain(self, sort):
+        if sort.kind == "bv" and 2 ** sort.width <= self.max_domain_size:
+            return [self._context.const(value, sort)
+                    for value in range(2 ** sort.width)]
+        return super().get_domain(sort)
+
+    def _encode_other(self, term):
+        op = term.op
+        if term.args and self._get_width(term.args[-1].sort) is not None:
+            if op == "ite":
+                condition = self.encode(term.args[0])
+                return [self.if_then_else(condition, bit_1, bit_2)
+                        for bit_1, bit_2 in zip(self.encode(term.args[1]),
+                                                self.encode(term.args[2]))]
+            if op in ("=", "distinct"):
+                # the equalities compare the bits by :meth:`equals`
+                return self._encode_finite_domain_operator(term)
+
+        bits = [self.encode(arg) for arg in term.args]
+        if op in ("bvand", "bvor", "bvxor"):
+            combine = {"bvand": self.conjunction,
+                       "bvor": self.disjunction,
+                       "bvxor": self._parity}[op]
+            return [combine(list(column)) for column in zip(*bits)]
+        if op == "bvnot":
+            return [-bit for bit in bits[0]]
+        if op == "bvadd":
+            result = bits[0]
+            for summand in bits[1:]:
+                result = self._add(result, summand)
+            return result
+        if op == "ext_rotate_left":
+            return self._rotate_left(bits[0], bits[1])
+        if op in ("bvule", "bvult", "bvuge", "bvugt",
+                  "<=", "<", ">=", ">"):
+            if op in ("bvuge", "bvugt", ">=", ">"):
+                bits = list(reversed(bits))
+            return self._less_than(bits[0], bits[1],
+                                   op in ("bvule", "bvuge", "<=", ">="))
+        return super()._encode_other(term)
+
+    def _parity(self, literals):
+        result = literals[0]
+        for literal in literals[1:]:
+            result = -self.equivalence(result, literal)
+        return result
+
+    def _add(self, bits_1, bits_2):
+        '''
+        Returns the sum modulo 2**width (ripple-carry adder)
+        '''
+        carry = self.false
+        result = []
+        for bit_1, bit_2 in zip(bits_1, bits_2):
+            result.append(self._parity([bit_1, bit_2, carry]))
+            carry = self.disjunction([self.conjunction([bit_1, bit_2]),
+                                      self.conjunction([carry,
+                                                        self._parity(
+                                                            [bit_1, bit_2])])])
+        return result
+
+    def _less_than(self, bits_1, bits_2, or_equal):
+        '''
+        Returns the literal of the unsigned comparison bits_1 < bits_2
+        (or bits_1 <= bits_2)
+        '''
+        # compare from the least to the most significant bit
+        result = self.true if or_equal else self.false
+        for bit_1, bit_2 in zip(bits_1, bits_2):
+            result = self.disjunction(
+                [self.conjunction([-bit_1, bit_2]),
+                 self.conjunction([self.equivalence(bit_1, bit_2), result])])
+        return result
+
+    def _rotate_left(self, bits, amount_bits):
+        '''
+        Returns the bits rotated by the given amount (barrel shifter, one
+        stage for each bit of the amount)
+        '''
+        width = len(bits)
+        result = bits
+        for stage, amount_bit in enumerate(amount_bits):
+            shift = (1 << stage) % width
+            if shift == 0:
+                continue
+            rotated = result[-shift:] + result[:-shift]
+            result = [self.if_then_else(amount_bit, rotated_bit, bit)
+                      for rotated_bit, bit in zip(rotated, result)]
+        return result
+
+
+def _is_true(literal, assignment):
+    return assignment[abs(literal)] == (literal > 0)
+
+
+def to_cnf(context, terms):
+    '''
+    Returns the :class:`CNF` of the conjunction of the given terms
+
+    :param context: :class:`smt.ir.IRContext` of the terms
+    :param terms: Boolean terms
+    '''
+    encoder = CNFEncoder(context)
+    for term in terms:
+        encoder.add(term)
+    LOG.info("CNF: %d variables, %d clauses",
+             encoder.cnf.variable_count, len(encoder.cnf.clauses))
+    return encoder.cnf
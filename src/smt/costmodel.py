@@ -0,0 +1,302 @@
+'''
+Predicts the size of the encoding of a synthesis round
+
+The estimate is computed from the data that is known after the cut-off
+determination and the property translation (automaton sizes, cut-offs,
+template bounds, guard size, and input counts) without building any
+solver expressions. The numbers follow the structure of
+:class:`smt.api.encoder.PyZ3Encoder` and are meant to rank configurations
+(e.g., to skip or deprioritize hopeless rounds), not to be exact: the
+constraint counts follow the state guard encoder of conjunctive guarded
+systems, the AST node counts are within a factor of 2 of the distinct terms
+of small encodings (see test/costmodel_test.py).
+'''
+from collections import namedtuple
+from math import factorial
+
+from smt.encoder_base import EncodingOptimization
+
+# rough size of an AST node of the solver in bytes (term, hash table
+# entry, and reference counts)
+BYTES_PER_AST_NODE = 96
+
+# AST nodes per ground instance of a quantified constraint in the grounded
+# encoding: the instances share their function applications, definitions
+# are inlined, and many instances are simplified to constants, thus each
+# instance adds about one term instead of the node count of the quantified
+# constraint
+GROUND_NODES_PER_INSTANCE = 1
+
+# automaton of a round
+# * automaton: :class:`interfaces.automata.Automaton`
+# * is_architecture_specific: whether deadlocks are avoided for it
+# * cutoff: cut-off of the automaton
+# * named_process_indices: processes (k, i) whose local states are lambda
+#   arguments (all processes without symmetry reduction)
+# * scc_sizes: sizes of the rejecting SCCs (bit vector widths of the SCC
+#   rankings with the LAMBDA_SCC optimization)
+AutomatonInfo = namedtuple('AutomatonInfo',
+                           ['automaton', 'is_architecture_specific',
+                            'cutoff', 'named_process_indices', 'scc_sizes'])
+
+
+class CostEstimate(object):
+    '''
+    Predicted size of the encoding of one synthesis round
+    '''
+    def __init__(self):
+        self.bound = None
+        self.cutoff = None
+        # universally quantified constraints (function definitions and
+        # automaton constraints)
+        self.quantified_constraints = 0
+        # constraints after expanding all quantifiers over finite domains
+        self.ground_constraints = 0
+        # universally quantified transition constraints of the automata
+        self.transition_constraints = 0
+        # arity of lambda_b (including the automaton state) per automaton
+        self.lambda_arities = []
+        # number of (automaton state, global state) pairs the lambda
+        # functions are defined on, per automaton
+        self.lambda_domain_sizes = []
+        # bit vector width -> number of functions with that range
+        self.bitvector_widths = {}
+        self.ast_nodes = 0
+
+    @property
+    def max_lambda_arity(self):
+        return max(self.lambda_arities, default=0)
+
+    @property
+    def memory_bytes(self):
+        return self.ast_nodes * BYTES_PER_AST_NODE
+
+    def to_dict(self):
+        return {"bound": list(self.bound),
+                "cutoff": list(self.cutoff),
+                "quantified_constraints": self.quantified_constraints,
+                "ground_constraints": self.ground_constraints,
+                "transition_constraints": self.transition_constraints,
+                "lambda_arities": self.lambda_arities,
+                "lambda_domain_sizes": self.lambda_domain_sizes,
+                "bitvector_widths": {str(width): count for width, count
+                                     in sorted(self.bitvector_widths.items())},
+                "ast_nodes": self.ast_nodes,
+                "memory_bytes": self.memory_bytes}
+
+    def __repr__(self):
+        return "\n".join(
+            ["Bound: %s, cut-off: %s" % (self.bound, self.cutoff),
+             "  quantified constraints: %d (transitions: %d)" %
+             (self.quantified_constraints, self.transition_constraints),
+             "  ground constraints:     %d" % self.ground_constraints,
+             "  lambda_b arities:       %s" % self.lambda_arities,
+             "  lambda domain sizes:    %s" % self.lambda_domain_sizes,
+             "  bit vector widths:      %s" %
+             ", ".join("%d (x%d)" % (width, count) for width, count
+                       in sorted(self.bitvector_widths.items())),
+             "  estimated memory:       %.1f MiB" %
+             (self.memory_bytes / 2 ** 20)])
+    __str__ = __repr__
+
+
+class CostEstimator(object):
+    '''
+    Computes the :class:`CostEstimate` of a round
+    '''
+    def __init__(self, bound, input_counts, guard_size, scheduling_size,
+                 encoding_optimization=EncodingOptimization.NONE):
+        '''
+        :param bound: number of states of each template
+        :param input_counts: number of inputs of each template
+        :param guard_size: width of the guard bit vectors
+        :param scheduling_size: number of scheduling variables
+        :param encoding_optimization: encoding optimization flags
+        '''
+        self.bound = tuple(bound)
+        self.input_counts = tuple(input_counts)
+        self.guard_size = guard_size
+        self.scheduling_size = scheduling_size
+        self.encoding_optimization = encoding_optimization
+
+    def _is_grounded(self):
+        return bool(self.encoding_optimization &
+                    (EncodingOptimization.GROUNDED |
+                     EncodingOptimization.SAT_SOLVER))
+
+    def estimate(self, automata_infos, global_cutoff):
+        '''
+        Returns the :class:`CostEstimate` of the round
+
+        :param automata_infos: list of :class:`AutomatonInfo`
+        :param global_cutoff: cut-off of the specification
+        '''
+        estimate = CostEstimate()
+        estimate.bound = self.bound
+        estimate.cutoff = tuple(global_cutoff)
+
+        self._add_template_functions(estimate, global_cutoff)
+
+        step_cutoffs = set()
+        for info in automata_infos:
+            self._add_automaton(estimate, info)
+            step_cutoffs.add(tuple(info.cutoff))
+        for cutoff in step_cutoffs:
+            self._add_step_functions(estimate, cutoff, automata_infos)
+        return estimate
+
+    def _add(self, estimate, count, variable_domain_size, node_count):
+        '''
+        Adds the given number of quantified constraints
+
+        :param variable_domain_size: number of assignments of the
+                                     quantified variables of each constraint
+        :param node_count: AST nodes of each quantified constraint
+        '''
+        estimate.quantified_constraints += count
+        estimate.ground_constraints += count * variable_domain_size
+        if self._is_grounded():
+            node_count = variable_domain_size * GROUND_NODES_PER_INSTANCE
+        estimate.ast_nodes += count * node_count
+
+    def _add_width(self, estimate, width, count=1):
+        estimate.bitvector_widths[width] = \
+            estimate.bitvector_widths.get(width, 0) + count
+
+    def _add_template_functions(self, estimate, cutoff):
+        '''
+        Adds the definitions of the scheduling, the guard evaluation, and
+        the template functions
+        '''
+        # is_scheduled (per process) and eval_guard
+        self._add(estimate, sum(cutoff), 2 ** self.scheduling_size,
+                  2 * self.scheduling_size + 4)
+        self._add(estimate, 1, 2 ** (2 * self.guard_size), 8)
+        self._add_width(estimate, self.guard_size, 2)
+
+        for states, inputs, instances in zip(self.bound, self.input_counts,
+                                             cutoff):
+            transitions = states * 2 ** inputs * states
+            # guard bits of the states (disjoint and within the bits of
+            # the template) and the guard set of the states
+            self._add(estimate, 1, states * states, 10)
+            self._add(estimate, 2, states, 6)
+            # architecture constraints over the guards of all transitions
+            # (determinism, initial states in conjunctive guards, and
+            # non-blocking inputs)
+            self._add(estimate, 2 + (inputs > 0), transitions, inputs + 10)
+            # is_enabled, is_any_enabled, and delta_enabled of each
+            # instance, quantified over the guard set as well
+            self._add(estimate, 2 + instances,
+                      transitions * 2 ** self.guard_size, inputs + 10)
+            self._add_width(estimate, self.guard_size, 2 + instances)
+
+    def _get_lambda_arguments(self, info):
+        '''
+        Returns the tuple (arity of lambda_b, number of global states)
+        '''
+        named = info.named_process_indices
+        arity = 1 + len(named)
+        domain_size = 1
+        for k, i in named:
+            domain_size *= self.bound[k]
+        for k, instances in enumerate(info.cutoff):
+            unnamed = sum(1 for i in range(instances) if (k, i) not in named)
+            if unnamed == 0:
+                continue
+            # one counter per local state, counting the unnamed processes
+            arity += self.bound[k]
+            domain_size *= _count_multisets(unnamed, self.bound[k])
+        return arity, domain_size
+
+    def _get_represented_processes(self, info):
+        '''
+        Returns the processes whose steps are encoded, see
+        :meth:`PyZ3Encoder.encode_automaton`
+        '''
+        represented = set(info.named_process_indices)
+        for k, instances in enumerate(info.cutoff):
+            unnamed = [(k, i) for i in range(instances)
+                       if (k, i) not in info.named_process_indices]
+            if unnamed:
+                represented.add(unnamed[0])
+        return represented
+
+    def _get_global_state_size(self, cutoff):
+        '''
+        Returns the tuple (number of local state variables, number of
+        global states, number of input assignments)
+        '''
+        states = 1
+        inputs = 0
+        for k, instances in enumerate(cutoff):
+            states *= self.bound[k] ** instances
+            inputs += self.input_counts[k] * instances
+        return sum(cutoff), states, 2 ** inputs
+
+    def _add_automaton(self, estimate, info):
+        automaton = info.automaton
+        node_count = len(automaton.nodes)
+        edges = [(label, target)
+                 for node in automaton.nodes
+                 for label, target_infos in node.transitions.items()
+                 for target in target_infos[0]]
+        label_size = sum(len(label) for label, _ in edges) // \
+            max(len(edges), 1)
+
+        arity, domain_size = self._get_lambda_arguments(info)
+        estimate.lambda_arities.append(arity)
+        estimate.lambda_domain_sizes.append(node_count * domain_size)
+
+        if self.encoding_optimization & EncodingOptimization.LAMBDA_SCC:
+            for width in info.scc_sizes:
+                self._add_width(estimate, width)
+
+        process_count, global_states, input_assignments = \
+            self._get_global_state_size(info.cutoff)
+
+        # lambda_b and lambda_s of each initial state
+        initial_count = len(automaton.initial_sets_list[0])
+        self._add(estimate, 2 * initial_count, 1, arity + 2)
+
+        if info.is_architecture_specific:
+            self._add(estimate, 1, node_count * global_states,
+                      process_count * (arity + 4))
+
+        # one constraint per edge and represented process, quantified over
+        # the current global state, the next local state, and the inputs
+        # (the lambda applications of the current global state are shared
+        # by the constraints of all edges)
+        represented = self._get_represented_processes(info)
+        estimate.transition_constraints += len(edges) * len(represented)
+        for k, _ in represented:
+            self._add(estimate, len(edges),
+                      global_states * self.bound[k] * input_assignments,
+                      process_count + 2 * arity + label_size + 4)
+
+    def _add_step_functions(self, estimate, cutoff, automata_infos):
+        '''
+        Adds the step relations of the represented processes of the given
+        cut-off, which are shared by the automata
+        '''
+        represented = set()
+        for info in automata_infos:
+            if tuple(info.cutoff) == cutoff:
+                represented |= self._get_represented_processes(info)
+
+        process_count, global_states, _ = \
+            self._get_global_state_size(cutoff)
+        for k, _ in represented:
+            self._add(estimate, 1,
+                      global_states * 2 ** self.input_counts[k] *
+                      self.bound[k],
+                      process_count + self.input_counts[k] + 12)
+
+
+def _count_multisets(element_count, value_count):
+    '''
+    Returns the number of ways to distribute the given number of
+    interchangeable processes over the given number of local states
+    '''
+    return factorial(element_count + value_count - 1) // \
+        (factorial(element_count) * factorial(value_count - 1))
@@ -12,6 +12,14 @@ class EncodingOptimization:
     '''
     NONE = 0
     LAMBDA_SCC = 1
+    GROUNDED = 2
+    SYMMETRY_REDUCTION = 4
+    AUX_LABEL_BISECTION = 8
+    EXTERNAL_SOLVER = 16
+    LAZY_TRANSITIONS = 32
+    SYMMETRY_BREAKING = 64
+    CONSTRAINT_IR = 128
+    SAT_SOLVER = 256
 
 
 class SMTEncoder(metaclass=ABCMeta):
@@ -30,6 +38,8 @@ class SMTEncoder(metaclass=ABCMeta):
         self.spec = spec
         self.architecture = architecture
         self._encoding_optimization = encoding_optimization
+        # set by :meth:`check` if a solver call returned unknown
+        self.has_unknown_result = False
 
     @abstractmethod
     def encode(self):
@@ -66,7 +76,8 @@ class SMTEncoder(metaclass=ABCMeta):
         template model information is returned as part of a tuple.
 
         :return: (False, None) if the specification is not satisfiable
-        for the given bound
+        for the given bound (or if the solver returned unknown, see
+        :attr:`has_unknown_result`)
         :return: (True, model) if the specification is satisfiable
         '''
         pass
@@ -0,0 +1,352 @@
+'''
+Solver-independent intermediate representation of synthesis constraints
+
+Terms are hash-consed by an :class:`IRContext`: structurally identical
+terms are represented by the same :class:`Term` instance, such that
+identical constraints can be detected by identity. Quantified variables are
+de-Bruijn indexed (as in Z3), i.e., constraints that only differ in the
+names of their quantified variables are identical as well.
+
+The operators of built-in functions are the SMT-LIB2 function symbols
+(e.g., ``and``, ``=>``, ``bvand``), which makes the SMT-LIB2 lowering
+(:func:`to_smt2`) a plain traversal. Further lowerings are provided by
+:mod:`smt.api.irsolver` (Z3 API) and :mod:`smt.cnf` (grounded CNF).
+'''
+import re
+
+from collections import namedtuple
+
+# operators of terms that are not applications of built-in functions
+CONST = "const"
+VAR = "var"
+APP = "app"
+FORALL = "forall"
+EXISTS = "exists"
+
+# built-in functions (SMT-LIB2 symbols)
+BOOL_OPERATORS = frozenset(["and", "or", "not", "=>", "xor", "=", "distinct",
+                            "ite"])
+BITVECTOR_OPERATORS = frozenset(["bvand", "bvor", "bvnot", "bvxor", "bvadd",
+                                 "bvule", "bvult", "bvuge", "bvugt",
+                                 "ext_rotate_left"])
+ARITHMETIC_OPERATORS = frozenset(["+", "-", "*", "<=", "<", ">=", ">"])
+OPERATORS = BOOL_OPERATORS | BITVECTOR_OPERATORS | ARITHMETIC_OPERATORS
+
+_SIMPLE_SYMBOL_PATTERN = re.compile(r"^[A-Za-z~!@$%^&*_+=<>.?/-]"
+                                    r"[A-Za-z0-9~!@$%^&*_+=<>.?/-]*$")
+
+
+class Sort(namedtuple('Sort', ['kind', 'name', 'parameters'])):
+    '''
+    Sort of a term
+
+    kind is one of bool, int, bv (parameters: (width,)), or enum
+    (parameters: names of the values)
+    '''
+    __slots__ = ()
+
+    @property
+    def width(self):
+        return self.parameters[0]
+
+    @property
+    def values(self):
+        return self.parameters
+
+
+BOOL = Sort("bool", "Bool", ())
+INT = Sort("int", "Int", ())
+
+
+def bitvector_sort(width):
+    return Sort("bv", "(_ BitVec %d)" % width, (width,))
+
+
+def enum_sort(name, values):
+    return Sort("enum", name, tuple(values))
+
+
+# uninterpreted function (or constant if the domain is empty)
+FunctionDeclaration = namedtuple('FunctionDeclaration',
+                                 ['name', 'domain', 'range'])
+
+
+class Term(object):
+    '''
+    Hash-consed term, see :class:`IRContext`
+
+    * op: built-in operator or CONST (payload: value), VAR (payload:
+      de-Bruijn index), APP (payload: :class:`FunctionDeclaration`),
+      FORALL/EXISTS (payload: sorts of the variables in declaration order,
+      args: body)
+    * args: argument terms
+    '''
+    __slots__ = ('op', 'sort', 'payload', 'args', 'id', 'free_bound')
+
+    def __init__(self, op, sort, payload, args, term_id):
+        self.op = op
+        self.sort = sort
+        self.payload = payload
+        self.args = args
+        self.id = term_id
+        # 1 + the largest de-Bruijn index of the free variables
+        if op == VAR:
+            self.free_bound = payload + 1
+        elif op in (FORALL, EXISTS):
+            self.free_bound = max(args[0].free_bound - len(payload), 0)
+        else:
+            self.free_bound = max([0] + [arg.free_bound for arg in args])
+
+    @property
+    def is_ground(self):
+        '''
+        Whether the term does not contain free variables
+        '''
+        return self.free_bound == 0
+
+    def __repr__(self):
+        return to_smt2_term(self)
+
+
+class IRContext(object):
+    '''
+    Creates hash-consed terms
+
+    All terms of a context that are structurally identical are the same
+    instance, thus identity (or the term id) can be used for comparisons.
+    '''
+    def __init__(self):
+        self._terms = {}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def term(self, op, sort, args=(), payload=None):
+        args = tuple(args)
+        key = (op, sort, payload, tuple(arg.id for arg in args))
+        term = self._terms.get(key)
+        if term is None:
+            term = Term(op, sort, payload, args, len(self._terms))
+            self._terms[key] = term
+        return term
+
+    def const(self, value, sort):
+        '''
+        Returns a constant (bool, int, bit vector value or value name of an
+        enum sort)
+        '''
+        return self.term(CONST, sort, payload=value)
+
+    def var(self, index, sort):
+        return self.term(VAR, sort, payload=index)
+
+    def app(self, declaration, args=()):
+        return self.term(APP, declaration.range, args, declaration)
+
+    def apply(self, op, args, sort=BOOL):
+        assert op in OPERATORS, op
+        return self.term(op, sort, args)
+
+    def quantifier(self, op, sorts, body):
+        assert op in (FORALL, EXISTS)
+        return self.term(op, BOOL, (body,), tuple(sorts))
+
+    def load_terms(self, data):
+        '''
+        Returns the terms of this context that are stored in the given
+        output of :func:`dump_terms` (e.g., after unpickling)
+        '''
+        nodes, roots = data
+        terms = []
+        for op, sort, payload, arg_indices in nodes:
+            terms.append(self.term(op, sort, [terms[index]
+                                              for index in arg_indices],
+                                   payload))
+        return [terms[index] for index in roots]
+
+    def substitute(self, term, values, cache=None, depth=0):
+        '''
+        Replaces the free variables of the term by the given ground terms
+
+        values[i] replaces the variable with de-Bruijn index i (the variable
+        declared last by the innermost quantifier has index 0), variables
+        with larger indices are shifted accordingly.
+
+        :param term: term
+        :param values: list of ground terms
+        :param cache: dictionary of substituted sub-terms (only valid for
+                      the same values)
+        '''
+        if cache is None:
+            cache = {}
+        if term.is_ground:
+            return term
+        key = (term.id, depth)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        if term.op == VAR:
+            index = term.payload
+            if index < depth:
+                result = term
+            elif index - depth < len(values):
+                result = values[index - depth]
+            else:
+                result = self.var(index - len(values), term.sort)
+        elif term.op in (FORALL, EXISTS):
+            result = self.quantifier(
+                term.op, term.payload,
+                self.substitute(term.args[0], values, cache,
+                                depth + len(term.payload)))
+        else:
+            result = self.term(term.op, term.sort,
+                               [self.substitute(arg, values, cache, depth)
+                                for arg in term.args],
+                               term.payload)
+        cache[key] = result
+        return result
+
+
+def dump_terms(terms):
+    '''
+    Returns a flat, picklable representation of the given terms
+
+    Each distinct sub-term is stored once (children before parents), see
+    :meth:`IRContext.load_terms`.
+    '''
+    indices = {}
+    nodes = []
+    for root in terms:
+        stack = [(root, False)]
+        while stack:
+            term, is_expanded = stack.pop()
+            if term.id in indices:
+                continue
+            if not is_expanded:
+                stack.append((term, True))
+                stack.extend((arg, False) for arg in reversed(term.args))
+                continue
+            indices[term.id] = len(nodes)
+            nodes.append((term.op, term.sort, term.payload,
+                          tuple(indices[arg.id] for arg in term.args)))
+    return nodes, [indices[term.id] for term in terms]
+
+
+def get_symbols(terms):
+    '''
+    Returns the list of function declarations and the list of enum sorts
+    used by the given terms (in the order of their first occurrence)
+    '''
+    declarations = {}
+    sorts = {}
+
+    def add_sort(sort):
+        if sort.kind == "enum":
+            sorts.setdefault(sort.name, sort)
+
+    seen = set()
+    stack = list(reversed(list(terms)))
+    while stack:
+        term = stack.pop()
+        if term.id in seen:
+            continue
+        seen.add(term.id)
+        add_sort(term.sort)
+        if term.op == APP:
+            declarations.setdefault(term.payload.name, term.payload)
+            for sort in term.payload.domain:
+                add_sort(sort)
+        elif term.op in (FORALL, EXISTS):
+            for sort in term.payload:
+                add_sort(sort)
+        stack.extend(reversed(term.args))
+    return list(declarations.values()), list(sorts.values())
+
+
+def _symbol(name):
+    if _SIMPLE_SYMBOL_PATTERN.match(name):
+        return name
+    return "|%s|" % name
+
+
+def _sort_to_smt2(sort):
+    if sort.kind == "enum":
+        return _symbol(sort.name)
+    return sort.name
+
+
+def _const_to_smt2(term):
+    value = term.payload
+    if term.sort.kind == "bool":
+        return "true" if value else "false"
+    if term.sort.kind == "int":
+        return str(value) if value >= 0 else "(- %d)" % -value
+    if term.sort.kind == "bv":
+        return "(_ bv%d %d)" % (value, term.sort.width)
+    return _symbol(value)
+
+
+def to_smt2_term(term, names=(), cache=None):
+    '''
+    Returns the SMT-LIB2 representation of a single term
+
+    :param names: names of the variables bound by the enclosing
+                  quantifiers in declaration order
+    '''
+    if cache is None:
+        cache = {}
+    depth = len(names)
+    key = term.id if term.is_ground else (term.id, depth)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    if term.op == CONST:
+        result = _const_to_smt2(term)
+    elif term.op == VAR:
+        result = names[-1 - term.payload]
+    elif term.op in (FORALL, EXISTS):
+        variables = ["x!%d" % (depth + index)
+                     for index in range(len(term.payload))]
+        result = "(%s (%s) %s)" % (
+            term.op,
+            " ".join("(%s %s)" % (variable, _sort_to_smt2(sort))
+                     for variable, sort in zip(variables, term.payload)),
+            to_smt2_term(term.args[0], tuple(names) + tuple(variables),
+                         cache))
+    else:
+        op = _symbol(term.payload.name) if term.op == APP else term.op
+        if not term.args:
+            result = op
+        else:
+            result = "(%s %s)" % (op, " ".join(to_smt2_term(arg, names, cache)
+                                               for arg in term.args))
+    cache[key] = result
+    return result
+
+
+def to_smt2(terms, check_command="(check-sat)"):
+    '''
+    Returns an SMT-LIB2 script that declares all symbols and asserts the
+    given terms
+
+    :param terms: list of Boolean terms
+    :param check_command: command appended to the assertions (or None)
+    '''
+    terms = list(terms)
+    declarations, sorts = get_symbols(terms)
+    lines = ["(declare-datatypes ((%s 0)) ((%s)))" %
+             (_symbol(sort.name),
+              " ".join("(%s)" % _symbol(value) for value in sort.values))
+             for sort in sorts]
+    lines += ["(declare-fun %s (%s) %s)" %
+              (_symbol(declaration.name),
+               " ".join(_sort_to_smt2(sort) for sort in declaration.domain),
+               _sort_to_smt2(declaration.range))
+              for declaration in declarations]
+    cache = {}
+    lines += ["(assert %s)" % to_smt2_term(term, (), cache) for term in terms]
+    if check_command is not None:
+        lines.append(check_command)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,326 @@
+'''
+solver_tuning -- Tunes the Z3 tactics and parameters per specification family
+
+Replays a corpus of recorded checks with every candidate solver profile
+(tactic pipeline, random seed, MBQI, and relevancy) in parallel processes
+and writes the best profile of each specification family to a profile
+file, which the synthesis loads with --solver-profile (see
+:mod:`smt.api.solverprofile`).
+
+The corpus directory contains one sub-directory per family (e.g.,
+conj_mutual_exclusion_in) with the recorded checks of its specifications:
+pickled constraint IR dumps (--constraint-ir --ir-dump) or SMT-LIB2 scripts
+(--smt2 --smt2-dump). Only checks with a recorded sat or unsat result are
+replayed, such that the results of the profiles can be verified. A profile
+is better if it solves more checks, ties are broken by the PAR-2 score
+(unsolved checks count twice the timeout). Profiles that contradict a
+recorded result are never selected.
+'''
+import logging
+import os
+import pickle
+import sys
+import time
+
+from argparse import ArgumentParser
+from collections import namedtuple
+from itertools import product
+from multiprocessing.connection import wait
+
+from z3 import parse_smt2_file
+
+from helpers.logging_helper import verbosity_to_log_level
+from helpers.process_job import ProcessJob
+from smt.api.external import read_script_status
+from smt.api.irsolver import Z3Translator
+from smt.api.solverprofile import SolverProfile, create_solver, \
+    write_solver_profiles
+from smt.ir import IRContext
+
+LOG = logging.getLogger("tuning")
+
+# candidate tactic pipelines
+TACTIC_PIPELINES = [("qe", "smt"),
+                    ("simplify", "qe", "smt"),
+                    ("macro-finder", "qe", "smt"),
+                    ("simplify", "solve-eqs", "qe", "smt"),
+                    ("macro-finder", "simplify", "smt"),
+                    ("ufbv",),
+                    ("simplify", "ufbv"),
+                    ("macro-finder", "simplify", "solve-eqs", "sat")]
+
+# additional time until a job is terminated if Z3 misses its timeout
+_TERMINATION_GRACE = 5
+
+# recorded check of the corpus
+# * path: pickled IR dump or SMT-LIB2 script
+# * expected: recorded result ("sat" or "unsat")
+TuningInstance = namedtuple("TuningInstance", ["path", "expected"])
+
+
+def get_candidate_profiles(pipelines=TACTIC_PIPELINES, seeds=(0,),
+                           mbqi_values=(True, False),
+                           relevancy_values=(2, 0)):
+    '''
+    Returns the profiles of all combinations of the given tactic pipelines
+    and parameter values
+
+    The MBQI and relevancy parameters only exist for pipelines that end
+    with an SMT core, pipelines that end with the sat tactic only vary the
+    seed.
+    '''
+    profiles = []
+    for tactics in pipelines:
+        if tactics[-1] == "sat":
+            parameter_sets = [{"random_seed": seed} for seed in seeds]
+        else:
+            parameter_sets = [{"random_seed": seed, "mbqi": mbqi,
+                               "relevancy": relevancy}
+                              for seed, mbqi, relevancy
+                              in product(seeds, mbqi_values,
+                                         relevancy_values)]
+        profiles.extend(SolverProfile(tuple(tactics), parameters)
+                        for parameters in parameter_sets)
+    return profiles
+
+
+def read_corpus(corpus_directory, families=None):
+    '''
+    Returns the dictionary family -> list of :class:`TuningInstance`
+
+    Recorded checks without sat or unsat result (e.g., timeouts) are
+    skipped.
+
+    :param families: names of the families to read (default: all)
+    '''
+    corpus = {}
+    for family in sorted(os.listdir(corpus_directory)):
+        family_directory = os.path.join(corpus_directory, family)
+        if not os.path.isdir(family_directory) or \
+                (families is not None and family not in families):
+            continue
+        instances = []
+        for filename in sorted(os.listdir(family_directory)):
+            path = os.path.join(family_directory, filename)
+            if filename.endswith(".pickle"):
+                with open(path, "rb") as dump_file:
+                    result = pickle.load(dump_file).get("result")
+            elif filename.endswith(".smt2"):
+                result = read_script_status(path)
+            else:
+                continue
+            if result in ("sat", "unsat"):
+                instances.append(TuningInstance(path, result))
+            else:
+                LOG.info("Skip %s without recorded result", path)
+        if instances:
+            corpus[family] = instances
+    return corpus
+
+
+def load_assertions(path):
+    '''
+    Returns the assertions of a recorded check
+    '''
+    if path.endswith(".smt2"):
+        return list(parse_smt2_file(path))
+    with open(path, "rb") as dump_file:
+        data = pickle.load(dump_file)
+    translator = Z3Translator(IRContext())
+    cache = {}
+    return [translator.lower(term, cache) for term
+            in translator.context.load_terms(data["assertions"])]
+
+
+def _execute_instance(instance, profile, timeout, connection):
+    try:
+        assertions = load_assertions(instance.path)
+        solver = create_solver(profile)
+        solver.set("timeout", int(timeout * 1000))
+        solver.add(assertions)
+
+        start_time = time.perf_counter()
+        result = solver.check()
+        connection.send((str(result), time.perf_counter() - start_time))
+    except Exception as ex:
+        connection.send(ex)
+        sys.exit(1)
+
+
+class TuningJob(ProcessJob):
+    '''
+    Check of one instance with one profile in a separate process
+
+    The result is the tuple (result, time), the exception of the check, or
+    ("unknown", None) if the job has exceeded its deadline.
+    '''
+    def __init__(self, family, instance, profile, timeout):
+        self.family = family
+        self.instance = instance
+        self.profile = profile
+        super().__init__(_execute_instance, (instance, profile, timeout),
+                         timeout + _TERMINATION_GRACE)
+
+    def _on_exit(self, exitcode):
+        return Exception("Check exited with code %s" % exitcode)
+
+    def _on_timeout(self):
+        return "unknown", None
+
+
+class ProfileScore(object):
+    '''
+    Solved checks and PAR-2 score of a profile on the checks of a family
+    '''
+    def __init__(self, profile, timeout):
+        self.profile = profile
+        self.timeout = timeout
+        self.solved_count = 0
+        self.par2 = 0.0
+        self.wrong_count = 0
+
+    def add_result(self, instance, result, check_time):
+        if result in ("sat", "unsat") and result != instance.expected:
+            LOG.warning("Profile '%s' reports %s instead of %s for %s",
+                        self.profile, result, instance.expected,
+                        instance.path)
+            self.wrong_count += 1
+        elif result in ("sat", "unsat"):
+            self.solved_count += 1
+            self.par2 += check_time
+            return
+        self.par2 += 2 * self.timeout
+
+    @property
+    def key(self):
+        '''
+        Sort key, the best profile has the smallest key
+        '''
+        return (-self.solved_count, self.par2)
+
+    def __str__(self):
+        return "%s: %d solved, %d wrong, PAR-2 %.2f s" % \
+            (self.profile, self.solved_count, self.wrong_count, self.par2)
+
+
+class SolverTuning(object):
+    '''
+    Replays the checks of a corpus with each candidate profile
+    '''
+    def __init__(self, corpus, profiles, timeout, jobs=None):
+        '''
+        :param corpus: dictionary family -> list of :class:`TuningInstance`
+        :param profiles: candidate :class:`SolverProfile` list
+        :param timeout: timeout of each check in seconds
+        :param jobs: maximum number of parallel processes (default: CPUs)
+        '''
+        self.corpus = corpus
+        self.profiles = list(profiles)
+        self.timeout = timeout
+        self.jobs = (os.cpu_count() or 1) if jobs is None else max(jobs, 1)
+
+        # family -> list of ProfileScore in order of the profiles
+        self.scores = {}
+
+    def run(self):
+        '''
+        Replays all checks and returns the dictionary family -> best
+        :class:`SolverProfile` (families without solved checks keep the
+        default solver and are omitted)
+
+        Profiles with wrong results are disqualified.
+        '''
+        self.scores = {family: [ProfileScore(profile, self.timeout)
+                                for profile in self.profiles]
+                       for family in self.corpus}
+        pending = [(family, instance, score)
+                   for family, instances in sorted(self.corpus.items())
+                   for instance in instances
+                   for score in self.scores[family]]
+        running = []
+        try:
+            while pending or running:
+                while pending and len(running) < self.jobs:
+                    family, instance, score = pending.pop(0)
+                    running.append((TuningJob(family, instance,
+                                              score.profile, self.timeout),
+                                    score))
+
+                wait([wait_object for job, _ in running
+                      for wait_object in job.wait_objects],
+                     self.timeout + _TERMINATION_GRACE)
+
+                for job, score in list(running):
+                    result = job.get_result()
+                    if result is None:
+                        continue
+                    running.remove((job, score))
+                    if isinstance(result, Exception):
+                        LOG.warning("Profile '%s' failed on %s: %s",
+                                    job.profile, job.instance.path, result)
+                        result = "unknown", None
+                    LOG.debug("%s, %s: %s", job.instance.path, job.profile,
+                              result[0])
+                    score.add_result(job.instance, *result)
+        finally:
+            for job, _ in running:
+                job.terminate()
+
+        best_profiles = {}
+        for family, scores in self.scores.items():
+            correct_scores = [score for score in scores
+                              if score.wrong_count == 0]
+            if not correct_scores:
+                LOG.warning("All profiles of %s report wrong results",
+                            family)
+                continue
+            best_score = min(correct_scores, key=lambda score: score.key)
+            if best_score.solved_count > 0:
+                best_profiles[family] = best_score.profile
+        return best_profiles
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Tunes the Z3 tactics and "
+                            "parameters per specification family on a "
+                            "corpus of recorded checks")
+    parser.add_argument("corpus_directory",
+                        help="Directory with one sub-directory of recorded "
+                        "checks (*.pickle, *.smt2) per family")
+    parser.add_argument("profile_filepath",
+                        help="JSON file the best profiles are added to")
+    parser.add_argument("--families", nargs='+', default=None,
+                        help="Families to tune [default: all]")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="Timeout of each check in seconds "
+                        "[default: %(default)s]")
+    parser.add_argument("--seeds", type=int, nargs='+', default=[0],
+                        help="Z3 random seeds [default: %(default)s]")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of parallel processes "
+                        "[default: one per CPU]")
+    parser.add_argument("-v", "--verbose", dest="verbose", action="count",
+                        help="set verbosity level [default: %(default)s]")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=verbosity_to_log_level(args.verbose))
+
+    corpus = read_corpus(args.corpus_directory, args.families)
+    if not corpus:
+        sys.exit("No recorded checks in %s" % args.corpus_directory)
+
+    tuning = SolverTuning(corpus, get_candidate_profiles(seeds=args.seeds),
+                          args.timeout, jobs=args.jobs)
+    best_profiles = tuning.run()
+    for family, scores in sorted(tuning.scores.items()):
+        print("%s (%d checks)" % (family, len(corpus[family])))
+        for score in sorted(scores, key=lambda score: score.key):
+            print("  %s" % score)
+        print("  best: %s" % (best_profiles.get(family, "default"),))
+
+    write_solver_profiles(args.profile_filepath, best_profiles)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
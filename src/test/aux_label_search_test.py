@@ -0,0 +1,86 @@
+'''
+Tests the search for the smallest number of auxiliary labels
+'''
+import unittest
+
+from z3 import Bool, Solver
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from smt.api.labelguarded.encoder import LabelGuardedPyZ3Encoder
+from smt.encoder_base import EncodingOptimization
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+class AuxLabelSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        spec = Specification(content=_SPEC)
+        self.encoder = LabelGuardedPyZ3Encoder(
+            spec, ConjunctiveGuardedArchitecture(spec),
+            EncodingOptimization.AUX_LABEL_BISECTION)
+        self.switches = [Bool("use_aux_0_%d" % i) for i in range(7)]
+
+    def _create_solver(self, required_count):
+        '''
+        Returns a solver that requires the first required_count auxiliary
+        labels (unsatisfiable if the count exceeds the number of labels)
+        '''
+        solver = Solver()
+        if required_count > len(self.switches):
+            solver.add(False)
+        elif required_count > 0:
+            solver.add(self.switches[required_count - 1])
+        return solver
+
+    def _get_check_count(self, solver):
+        return solver.statistics().get_key_value("num checks")
+
+    def testLinearSearch(self):
+        for required_count in range(len(self.switches)):
+            solver = self._create_solver(required_count)
+            self.assertEqual(self.encoder._find_aux_label_count(
+                solver, self.switches), (required_count, required_count))
+            self.assertEqual(self._get_check_count(solver),
+                             required_count + 1)
+
+        aux_count, _ = self.encoder._find_aux_label_count(
+            self._create_solver(len(self.switches) + 1), self.switches)
+        self.assertIsNone(aux_count)
+
+    def testBisection(self):
+        for required_count in range(len(self.switches)):
+            solver = self._create_solver(required_count)
+            aux_count, checked_aux_count = \
+                self.encoder._bisect_aux_label_count(solver, self.switches)
+            self.assertEqual(aux_count, required_count)
+            self.assertLessEqual(self._get_check_count(solver), 3)
+            # the model of the solver belongs to the checked count, which
+            # must be checked again if it differs from the result
+            self.assertEqual(self.encoder._check_aux_label_count(
+                solver, self.switches, checked_aux_count),
+                checked_aux_count >= required_count)
+
+        aux_count, _ = self.encoder._bisect_aux_label_count(
+            self._create_solver(len(self.switches) + 1), self.switches)
+        self.assertIsNone(aux_count)
+
+    def testIncrementalSolver(self):
+        self.assertTrue(self.encoder._is_solver_reused())
+
+
+if __name__ == "__main__":
+    unittest.main()
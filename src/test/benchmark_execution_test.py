@@ -0,0 +1,71 @@
+'''
+Tests the ordering of benchmark results of parallel runs
+'''
+import unittest
+
+from multiprocessing.connection import wait
+
+from gp_bosy_benchmark import BenchmarkRunGroup, BenchmarkTestRequest, \
+    BenchmarkJob
+
+
+def _create_group(run_count):
+    requests = []
+    for run_index in range(run_count):
+        request = BenchmarkTestRequest()
+        request.run_index = run_index
+        requests.append(request)
+    return BenchmarkRunGroup("bm.cfg", None, (2,), [1], requests)
+
+
+class BenchmarkRunGroupTest(unittest.TestCase):
+
+    def testResultsInRunOrder(self):
+        group = _create_group(3)
+        requests = [group.pop_request() for _ in range(3)]
+
+        self.assertEqual(group.add_result(requests[1], "r1", False), [])
+        self.assertEqual(group.add_result(requests[0], "r0", False),
+                         [(requests[0], "r0"), (requests[1], "r1")])
+        self.assertFalse(group.is_finished)
+        self.assertEqual(group.add_result(requests[2], "r2", False),
+                         [(requests[2], "r2")])
+        self.assertTrue(group.is_finished)
+
+    def testStopAfterInvalidRun(self):
+        group = _create_group(4)
+        requests = [group.pop_request() for _ in range(3)]
+
+        self.assertEqual(group.add_result(requests[2], "r2", False), [])
+        self.assertEqual(group.add_result(requests[1], "timeout", True), [])
+        self.assertFalse(group.has_pending_request)
+        self.assertTrue(group.is_obsolete(requests[2]))
+        self.assertEqual(group.add_result(requests[0], "r0", False),
+                         [(requests[0], "r0"), (requests[1], "timeout")])
+        self.assertTrue(group.is_finished)
+
+    def testExceptionIsValidRun(self):
+        group = _create_group(2)
+        request = group.pop_request()
+        request.spec_filepath = "does_not_exist.ltl"
+        request.guard_type = "conjunctive_guards"
+        request.min_bound = [1]
+        request.instance_count = [2]
+
+        job = BenchmarkJob(group, request, timeout=60)
+        result = None
+        while result is None:
+            wait(job.wait_objects, 1)
+            result = job.get_result()
+        result, is_invalid = result
+        self.assertIsInstance(result, Exception)
+        self.assertFalse(is_invalid)
+
+        # the remaining runs of the group continue
+        self.assertEqual(group.add_result(request, result, is_invalid),
+                         [(request, result)])
+        self.assertTrue(group.has_pending_request)
+
+
+if __name__ == "__main__":
+    unittest.main()
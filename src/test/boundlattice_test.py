@@ -0,0 +1,122 @@
+'''
+Tests the enumeration and the search of the bound lattice
+'''
+import os
+import time
+import unittest
+
+from multiprocessing.connection import wait
+
+import boundlattice
+
+from architecture.guarded_system import DisjunctiveGuardedArchitecture
+from bosy import BoundedSynthesis
+from boundlattice import BoundLatticeSearch, get_bound_vectors, is_dominated
+from helpers.process_job import ProcessJob
+
+_SPEC_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          "benchmarks", "disj_state_pair_no-in_0.ltl")
+
+
+def _execute_bound(spec_filename, architecture, settings, bound,
+                   connection):
+    '''
+    Finds a model iff both templates have at least two states
+    '''
+    model = "model %s" % (bound,) if min(bound) >= 2 else None
+    connection.send((model, False, None))
+
+
+def _execute_bound_unknown(spec_filename, architecture, settings, bound,
+                           connection):
+    '''
+    Finds a model for (1, 1) after a delay, the result of the larger
+    vectors is unknown
+    '''
+    if bound == (1, 1):
+        time.sleep(0.5)
+        connection.send(("model %s" % (bound,), False, None))
+    else:
+        connection.send((None, True, None))
+
+
+def _sleep(duration, connection):
+    time.sleep(duration)
+    connection.send(duration)
+
+
+class BoundLatticeTest(unittest.TestCase):
+
+    def testBoundVectorsOrderedByTotalSize(self):
+        vectors = get_bound_vectors((1, 2), 2)
+        self.assertEqual(len(vectors), 9)
+        self.assertEqual(vectors[0], (1, 2))
+        self.assertEqual(vectors[1:3], [(1, 3), (2, 2)])
+        self.assertEqual(vectors[-1], (3, 4))
+        self.assertEqual([sum(vector) for vector in vectors],
+                         sorted(sum(vector) for vector in vectors))
+
+    def testDominance(self):
+        self.assertTrue(is_dominated((1, 2), (1, 3)))
+        self.assertTrue(is_dominated((1, 3), (1, 3)))
+        self.assertFalse(is_dominated((2, 1), (1, 3)))
+
+
+class BoundLatticeSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.execute_bound = boundlattice._execute_bound
+        boundlattice._execute_bound = _execute_bound
+
+    def tearDown(self):
+        boundlattice._execute_bound = self.execute_bound
+
+    def testPruning(self):
+        bosy = BoundedSynthesis(_SPEC_PATH, DisjunctiveGuardedArchitecture)
+        bosy.min_bound = (1, 1)
+        bosy.max_increments = 3
+        search = BoundLatticeSearch(bosy, jobs=1)
+
+        self.assertEqual(search.solve(), "model (2, 2)")
+        self.assertEqual(bosy.spec.bound, (2, 2))
+        self.assertEqual(search.unsat_bounds,
+                         [(1, 1), (1, 2), (2, 1), (1, 3)])
+        self.assertEqual(search.sat_bounds, [(2, 2)])
+        self.assertEqual(search.unknown_bounds, [])
+        # each of the 16 vectors is either checked or pruned once
+        self.assertEqual(search.pruned_count, 16 - 5)
+
+    def testUnknownResultDoesNotPrune(self):
+        boundlattice._execute_bound = _execute_bound_unknown
+        bosy = BoundedSynthesis(_SPEC_PATH, DisjunctiveGuardedArchitecture)
+        bosy.min_bound = (1, 1)
+        bosy.max_increments = 1
+        search = BoundLatticeSearch(bosy, jobs=2)
+
+        # the unknown result of (1, 2) arrives while (1, 1) is running
+        self.assertEqual(search.solve(), "model (1, 1)")
+        self.assertEqual(bosy.spec.bound, (1, 1))
+        self.assertEqual(search.sat_bounds, [(1, 1)])
+        self.assertEqual(search.unsat_bounds, [])
+        self.assertIn((1, 2), search.unknown_bounds)
+
+
+class ProcessJobTest(unittest.TestCase):
+
+    def testResult(self):
+        job = ProcessJob(_sleep, (0,))
+        result = None
+        while result is None:
+            wait(job.wait_objects)
+            result = job.get_result()
+        self.assertEqual(result, 0)
+
+    def testTimeout(self):
+        job = ProcessJob(_sleep, (60,), timeout=0)
+        result = job.get_result()
+        self.assertIsInstance(result, Exception)
+        self.assertFalse(job.process.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
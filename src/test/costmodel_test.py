@@ -0,0 +1,141 @@
+'''
+Tests the prediction of the encoding size
+'''
+import unittest
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import InstanceSignal
+from smt.api.grounding import count_terms
+from smt.costmodel import CostEstimator, AutomatonInfo
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+def _build_automaton():
+    init = Node('init')
+    rejecting = Node('rejecting')
+    init.add_transition({}, {(init, False)})
+    init.add_transition({InstanceSignal('r', 0, 0): True},
+                        {(rejecting, True)})
+    rejecting.add_transition({InstanceSignal('g', 0, 0): False},
+                             {(rejecting, True)})
+    return Automaton([{init}], [rejecting], [init, rejecting])
+
+
+class CostEstimatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.automaton = _build_automaton()
+        self.cutoff = (3,)
+        self.all_processes = {(0, 0), (0, 1), (0, 2)}
+
+    def _estimate(self, named_process_indices, bound=(2,),
+                  encoding_optimization=EncodingOptimization.NONE):
+        estimator = CostEstimator(bound, [1], bound[0], 2,
+                                  encoding_optimization)
+        return estimator.estimate(
+            [AutomatonInfo(self.automaton, False, self.cutoff,
+                           named_process_indices, [1])],
+            self.cutoff)
+
+    def testLambdaArguments(self):
+        estimate = self._estimate(self.all_processes)
+        self.assertEqual(estimate.lambda_arities, [4])
+        # automaton states x local states of all processes
+        self.assertEqual(estimate.lambda_domain_sizes, [2 * 2 ** 3])
+        # one constraint per edge and process
+        self.assertEqual(estimate.transition_constraints, 3 * 3)
+
+        # one named process and two counted processes
+        reduced = self._estimate({(0, 0)},
+                                 encoding_optimization=EncodingOptimization.
+                                 SYMMETRY_REDUCTION)
+        self.assertEqual(reduced.lambda_arities, [4])
+        self.assertEqual(reduced.lambda_domain_sizes, [2 * 2 * 3])
+        self.assertEqual(reduced.transition_constraints, 3 * 2)
+
+    def testGrowth(self):
+        small = self._estimate(self.all_processes)
+        large = self._estimate(self.all_processes, bound=(4,))
+        self.assertEqual(small.quantified_constraints,
+                         large.quantified_constraints)
+        self.assertGreater(large.ground_constraints,
+                           small.ground_constraints)
+
+        grounded = self._estimate(self.all_processes,
+                                  encoding_optimization=EncodingOptimization.
+                                  GROUNDED)
+        self.assertGreater(grounded.memory_bytes, small.memory_bytes)
+        self.assertEqual(grounded.to_dict()["ground_constraints"],
+                         small.ground_constraints)
+
+    def testSccWidths(self):
+        estimate = self._estimate(self.all_processes,
+                                  encoding_optimization=EncodingOptimization.
+                                  LAMBDA_SCC)
+        self.assertEqual(estimate.bitvector_widths.get(1), 1)
+        self.assertNotIn(1, self._estimate(
+            self.all_processes).bitvector_widths)
+
+
+class CostCalibrationTest(unittest.TestCase):
+    '''
+    Compares the estimate with the encoding of a small specification
+    '''
+
+    def _encode(self, bound, encoding_optimization):
+        spec = Specification(content=_SPEC)
+        spec.bound = bound
+        spec.cutoff = (3,)
+        automata_infos = [(_build_automaton(), 0, False, spec.cutoff)]
+
+        def create_encoder():
+            return SMTEncoderFactory().create(
+                SMTEncoder.STATE_GUARD_ENCODER)(
+                    spec, ConjunctiveGuardedArchitecture(spec),
+                    encoding_optimization)
+        estimate = create_encoder().estimate(automata_infos, spec.cutoff)
+        encoder = create_encoder()
+        encoder.encode()
+        encoder.encode_automata(automata_infos, spec.cutoff)
+        return estimate, encoder.encoder_info.solver.assertions()
+
+    def _assertWithinFactor(self, estimated, actual, factor):
+        self.assertLessEqual(estimated, factor * actual)
+        self.assertGreaterEqual(factor * estimated, actual)
+
+    def testQuantifiedEncoding(self):
+        for bound in [(1,), (2,), (3,)]:
+            estimate, assertions = self._encode(bound,
+                                                EncodingOptimization.NONE)
+            self.assertEqual(estimate.quantified_constraints,
+                             len(assertions))
+            self._assertWithinFactor(estimate.ast_nodes,
+                                     count_terms(assertions), 2)
+
+    def testGroundedEncoding(self):
+        for bound in [(1,), (2,)]:
+            estimate, assertions = self._encode(
+                bound, EncodingOptimization.GROUNDED)
+            self._assertWithinFactor(estimate.ast_nodes,
+                                     count_terms(assertions), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+'''
+Tests the persistent translation cache
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from helpers.disk_cache import DiskCache, get_cache_key
+from interfaces.parser_expr import QuantifiedSignal
+from translation2uct.ltl2automaton import serialize_automaton, \
+    deserialize_automaton
+from translation2uct.ltl2ba import parse_ltl2ba_ba
+from interfaces.automata import Automaton
+
+_LTL3BA_OUTPUT = """never { /* !([](r -> <>g)) */
+T0_init :    /* init */
+    if
+    :: (1) -> goto T0_init
+    :: (!g && r) -> goto accept_S2
+    fi;
+accept_S2 :    /* 1 */
+    if
+    :: (!g) -> goto accept_S2
+    fi;
+}"""
+
+
+def _get_transitions(automaton):
+    return sorted((node.name, sorted((str(s), v) for s, v in label.items()),
+                   sorted(sorted((dst.name, is_rejecting)
+                                 for dst, is_rejecting in dst_set)
+                          for dst_set in dst_sets))
+                  for node in automaton.nodes
+                  for label, dst_sets in node.transitions.items())
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testGetPut(self):
+        cache = DiskCache(self.directory, 1024 * 1024)
+        key = get_cache_key("version", "G(r -> F(g))")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, ("value", [1, 2]))
+        self.assertEqual(DiskCache(self.directory, 1024 * 1024).get(key),
+                         ("value", [1, 2]))
+        self.assertNotEqual(key, get_cache_key("version2", "G(r -> F(g))"))
+
+    def testEvictLeastRecentlyUsed(self):
+        cache = DiskCache(self.directory, 1024 * 1024)
+        keys = [get_cache_key(i) for i in range(3)]
+        for time_index, key in enumerate(keys):
+            cache.put(key, os.urandom(1000))
+            os.utime(cache._get_entry_path(key), (time_index, time_index))
+        cache.max_size = cache.get_size() - 1
+
+        cache.put(keys[0], os.urandom(1000))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def testCorruptEntry(self):
+        cache = DiskCache(self.directory, 1024 * 1024)
+        key = get_cache_key("corrupt")
+        cache.put(key, "value")
+        with open(cache._get_entry_path(key), 'wb') as entry_fh:
+            entry_fh.write(b"garbage")
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(cache._get_entry_path(key)))
+
+
+class AutomatonSerializationTest(unittest.TestCase):
+
+    def testRoundTrip(self):
+        signal_by_name = {'r': QuantifiedSignal('r', (0,)),
+                          'g': QuantifiedSignal('g', (0,))}
+        automaton = Automaton(*parse_ltl2ba_ba(_LTL3BA_OUTPUT,
+                                               signal_by_name))
+
+        data = serialize_automaton(automaton, signal_by_name)
+        restored = deserialize_automaton(data, signal_by_name)
+
+        self.assertEqual(_get_transitions(automaton),
+                         _get_transitions(restored))
+        self.assertEqual(
+            sorted(n.name for n in restored.rejecting_nodes),
+            sorted(n.name for n in automaton.rejecting_nodes))
+        self.assertEqual(
+            [sorted(n.name for n in init) for init
+             in restored.initial_sets_list],
+            [sorted(n.name for n in init) for init
+             in automaton.initial_sets_list])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+'''
+Tests the parsing of models that are returned by an external solver
+'''
+import unittest
+
+from z3 import Datatype, Function, BoolSort, IntSort, Const, Int, \
+    is_true, is_false
+
+from smt.api.external import parse_sexpr, to_sexpr, ExternalModel, \
+    ExternalSolver, _collect_symbols
+
+_MODEL_OUTPUT = """sat
+(
+  (define-fun x () Int
+    3)
+  (define-fun delta ((x!0 Q) (x!1 Bool)) Q
+    (ite (and (= x!0 q_0) x!1) q_1 (delta!5 x!0)))
+  (define-fun delta!5 ((x!0 Q)) Q
+    q_0)
+  (define-fun out ((x!0 Q)) Bool
+    (= x!0 q_1))
+)
+"""
+
+
+class ExternalModelTest(unittest.TestCase):
+
+    def setUp(self):
+        state_sort = Datatype('Q')
+        state_sort.declare('q_0')
+        state_sort.declare('q_1')
+        self.state_sort = state_sort.create()
+        self.delta = Function('delta', self.state_sort, BoolSort(),
+                              self.state_sort)
+        self.out = Function('out', self.state_sort, BoolSort())
+        self.unused = Function('unused', self.state_sort, IntSort())
+        self.x = Int('x')
+        state = Const('q', self.state_sort)
+        self.assertions = [self.delta(state, True) != state,
+                           self.out(state), self.unused(state) == self.x]
+
+    def testParseSexpr(self):
+        sexprs = parse_sexpr('sat (a (|b c| "d "" e") ()) f')
+        self.assertEqual(['sat', ['a', ['|b c|', '"d "" e"'], []], 'f'],
+                         sexprs)
+        self.assertEqual('(a (|b c| "d "" e") ())', to_sexpr(sexprs[1]))
+
+    def testEvaluate(self):
+        sexprs = parse_sexpr(_MODEL_OUTPUT)
+        decls, sorts = _collect_symbols(self.assertions)
+        model = ExternalModel.from_sexpr(sexprs[1], decls, sorts)
+
+        q_0, q_1 = self.state_sort.constructor(0)(), \
+            self.state_sort.constructor(1)()
+        self.assertTrue(model.evaluate(self.delta(q_0, True)).eq(q_1))
+        self.assertTrue(model.evaluate(self.delta(q_1, True)).eq(q_0))
+        self.assertTrue(model.evaluate(self.delta(q_0, False)).eq(q_0))
+        self.assertTrue(is_true(model.evaluate(self.out(q_1))))
+        self.assertTrue(is_false(model.evaluate(self.out(q_0))))
+        self.assertEqual(3, model.evaluate(self.x).as_long())
+
+        self.assertEqual(0, model.evaluate(self.unused(q_0),
+                                           model_completion=True).as_long())
+        self.assertEqual([], model.decls())
+
+    def testMissingSolver(self):
+        solver = ExternalSolver("/does/not/exist/z3")
+        solver.add(self.assertions)
+        with self.assertRaisesRegex(Exception, "EXTERNAL_SOLVER_PATH"):
+            solver.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
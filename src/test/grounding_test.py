@@ -0,0 +1,147 @@
+'''
+Tests the quantifier-free expansion of the synthesis encoding
+'''
+import unittest
+
+from z3 import Datatype, Function, BoolSort, IntSort, Const, Int, Ints, \
+    ForAll, Exists, And, Or, Solver, is_quantifier, is_true, sat
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from smt.api.grounding import GroundingSolver, count_terms
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+from test.incremental_encoding_test import _SPEC, \
+    get_mutual_exclusion_automaton
+from test.property_split_test import _get_both_granted_automaton
+from test.symmetry_breaking_test import _get_some_granted_automaton
+
+
+def _has_quantifier(expr):
+    if is_quantifier(expr):
+        return True
+    return any(_has_quantifier(child) for child in expr.children())
+
+
+class CountTermsTest(unittest.TestCase):
+
+    def testSharedTerms(self):
+        x, y = Ints('x y')
+        # x, y, x + y, (x + y) * (x + y)
+        self.assertEqual(count_terms([(x + y) * (x + y)]), 4)
+        # x + y is shared between the expressions
+        self.assertEqual(count_terms([x + y, (x + y) * (x + y)]), 4)
+
+    def testQuantifier(self):
+        x, y = Ints('x y')
+        # quantifier, x > y (with the bound variable), variable, y
+        self.assertEqual(count_terms([ForAll([x], x > y)]), 4)
+
+
+class GroundingSolverTest(unittest.TestCase):
+
+    def setUp(self):
+        state_type = Datatype('GS')
+        for i in range(3):
+            state_type.declare('gs%d' % i)
+        self.state_sort = state_type.create()
+        self.states = [self.state_sort.constructor(i)() for i in range(3)]
+        self.solver = GroundingSolver(Solver())
+
+    def testMacro(self):
+        state = Const('s', self.state_sort)
+        is_final = Function('is_final', self.state_sort, BoolSort())
+        is_next = Function('is_next', self.state_sort, self.state_sort,
+                           BoolSort())
+        t0, t1, t2 = self.states
+        # the definition of is_final is inlined, not asserted
+        self.solver.add(ForAll([state], is_final(state) == (state == t2)))
+        self.assertEqual(len(self.solver.assertions()), 0)
+
+        self.solver.add(Exists([state], And(is_next(t0, state),
+                                            is_final(state))))
+        self.assertEqual(self.solver.residual_quantifiers, 0)
+        self.assertFalse(any(_has_quantifier(assertion) for assertion
+                             in self.solver.assertions()))
+
+        self.assertEqual(self.solver.check(), sat)
+        model = self.solver.model()
+        # macro applications are evaluated by their definition
+        self.assertTrue(is_true(model.evaluate(is_final(t2))))
+        self.assertFalse(is_true(model.evaluate(is_final(t1))))
+        self.assertTrue(is_true(model.evaluate(is_next(t0, t2))))
+
+    def testResidualQuantifier(self):
+        x = Int('x')
+        is_small = Function('is_small', IntSort(), BoolSort())
+        self.solver.add(ForAll([x], Or(is_small(x), x > 2)))
+        self.assertEqual(self.solver.residual_quantifiers, 1)
+        self.assertTrue(_has_quantifier(self.solver.assertions()[0]))
+
+    def testPushPop(self):
+        state = Const('s', self.state_sort)
+        is_final = Function('is_final', self.state_sort, BoolSort())
+        self.solver.push()
+        self.solver.add(ForAll([state],
+                               is_final(state) == (state == self.states[2])))
+        self.solver.pop()
+        # the macro is removed with its scope
+        self.solver.add(is_final(self.states[0]))
+        self.assertEqual(len(self.solver.assertions()), 1)
+        self.assertEqual(self.solver.check(), sat)
+
+
+class GroundedEncodingTest(unittest.TestCase):
+
+    def _encode(self, automata, encoding_optimization):
+        spec = Specification(content=_SPEC)
+        spec.bound = (2,)
+        spec.cutoff = (2,)
+        encoder = SMTEncoderFactory().create(
+            SMTEncoder.STATE_GUARD_ENCODER)(
+                spec, ConjunctiveGuardedArchitecture(spec),
+                encoding_optimization)
+        encoder.encode()
+        encoder.encode_automata([(automaton, i, False, spec.cutoff)
+                                 for i, automaton in enumerate(automata)],
+                                spec.cutoff)
+        return encoder
+
+    def _assertSameResult(self, automata, expected_status):
+        for encoding_optimization in [EncodingOptimization.NONE,
+                                      EncodingOptimization.GROUNDED]:
+            status, _ = self._encode(automata, encoding_optimization).check()
+            self.assertIs(status, expected_status)
+
+    def testSat(self):
+        self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                _get_some_granted_automaton()], True)
+
+    def testUnsat(self):
+        self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                _get_both_granted_automaton()], False)
+
+    def testModel(self):
+        automata = [get_mutual_exclusion_automaton(2),
+                    _get_some_granted_automaton()]
+        encoder = self._encode(automata, EncodingOptimization.GROUNDED)
+        solver = encoder.encoder_info.solver
+        self.assertIsInstance(solver, GroundingSolver)
+        self.assertEqual(solver.residual_quantifiers, 0)
+        self.assertEqual(solver.check(), sat)
+        model = solver.model()
+
+        # the grounded model satisfies the quantified encoding, whose
+        # template functions are evaluated through the inlined definitions
+        assertions = self._encode(automata, EncodingOptimization.NONE) \
+            .encoder_info.solver.assertions()
+        self.assertTrue(any(_has_quantifier(assertion)
+                            for assertion in assertions))
+        for assertion in assertions:
+            self.assertTrue(is_true(model.evaluate(assertion,
+                                                   model_completion=True)),
+                            str(assertion))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+Tests the reuse of the solver across synthesis rounds
+'''
+import unittest
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import InstanceSignal
+from smt.api.encoder import PyZ3IncrementalContext
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+def get_mutual_exclusion_automaton(process_count):
+    '''
+    Returns a UCW that rejects if two processes are granted at the same time
+    '''
+    init = Node('init')
+    init.add_transition({}, {(init, False)})
+    rejecting = Node('rejecting')
+    rejecting.add_transition({}, {(rejecting, True)})
+    for i in range(process_count):
+        for j in range(i + 1, process_count):
+            init.add_transition({InstanceSignal('g', 0, i): True,
+                                 InstanceSignal('g', 0, j): True},
+                                {(rejecting, True)})
+    return Automaton([{init}], [rejecting], [init, rejecting],
+                     name="mutual_exclusion")
+
+
+class IncrementalEncodingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = Specification(content=_SPEC)
+        self.spec.cutoff = (2,)
+        self.automaton = get_mutual_exclusion_automaton(2)
+        self.context = PyZ3IncrementalContext()
+
+    def _solve_round(self, bound):
+        self.spec.bound = bound
+        encoder = SMTEncoderFactory().create(
+            SMTEncoder.STATE_GUARD_ENCODER)(
+                self.spec, ConjunctiveGuardedArchitecture(self.spec),
+                EncodingOptimization.NONE,
+                incremental_context=self.context)
+        encoder.encode()
+        encoder.encode_automata([(self.automaton, 0, False,
+                                  self.spec.cutoff)], self.spec.cutoff)
+        status, _ = encoder.check()
+        self.context.end_round()
+        return status
+
+    def testDefinitionsAreAssertedOnce(self):
+        self.assertTrue(self._solve_round((1,)))
+        solver = self.context.solver
+        base_definitions = set(self.context._base_definitions)
+        base_assertions = [assertion.sexpr()
+                           for assertion in solver.assertions()]
+        self.assertTrue(base_definitions)
+        self.assertTrue(base_assertions)
+
+        self.assertTrue(self._solve_round((2,)))
+        self.assertIs(self.context.solver, solver)
+        # only the guard evaluation of the wider guards is new
+        self.assertEqual(self.context._base_definitions - base_definitions,
+                         {('eval_guard', 2)})
+        # the round constraints are popped, the definitions of the first
+        # round are kept and not asserted again
+        assertions = [assertion.sexpr() for assertion in solver.assertions()]
+        self.assertEqual(assertions[:len(base_assertions)], base_assertions)
+        self.assertEqual(len(assertions), len(base_assertions) + 1)
+        # both rounds were checked by the same incremental kernel
+        self.assertEqual(solver.statistics().get_key_value("num checks"), 2)
+
+    def testNewCutoffCreatesSolver(self):
+        self._solve_round((1,))
+        solver = self.context.solver
+        self.spec.cutoff = (3,)
+        self.automaton = get_mutual_exclusion_automaton(3)
+        self._solve_round((1,))
+        self.assertIsNot(self.context.solver, solver)
+
+
+if __name__ == "__main__":
+    unittest.main()
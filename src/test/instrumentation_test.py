@@ -0,0 +1,145 @@
+'''
+Tests the timing and memory statistics of the synthesis phases
+'''
+import json
+import time
+import unittest
+
+from helpers.instrumentation import SynthesisStatistics, \
+    PHASE_ENCODE, PHASE_ENCODE_AUTOMATA, PHASE_CHECK, COUNTER_ASSERTIONS, \
+    get_peak_rss, reset_rss_high_water_mark
+
+# size of the allocations of the memory tests
+_ALLOCATION_SIZE = 64 * 1024 * 1024
+
+
+def _allocate():
+    '''
+    Returns a buffer whose pages are resident
+    '''
+    data = bytearray(_ALLOCATION_SIZE)
+    for index in range(0, len(data), 4096):
+        data[index] = 1
+    return data
+
+
+def _busy_wait(duration):
+    end_time = time.process_time() + duration
+    while time.process_time() < end_time:
+        pass
+
+
+class SynthesisStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.statistics = SynthesisStatistics()
+
+    def testNestedPhases(self):
+        statistics = self.statistics
+        statistics.start_round((2,))
+        with statistics.phase(PHASE_ENCODE):
+            time.sleep(0.05)
+            with statistics.phase(PHASE_ENCODE_AUTOMATA):
+                time.sleep(0.1)
+        statistics.end_round(True)
+
+        round_statistics, = statistics.rounds
+        self.assertEqual(round_statistics["status"], True)
+        phases = round_statistics["phases"]
+        # the nested phase is not contained in the enclosing phase
+        self.assertGreaterEqual(phases[PHASE_ENCODE_AUTOMATA].wall, 0.1)
+        self.assertGreaterEqual(phases[PHASE_ENCODE].wall, 0.05)
+        self.assertLess(phases[PHASE_ENCODE].wall, 0.1)
+        self.assertGreaterEqual(round_statistics["wall"],
+                                phases[PHASE_ENCODE].wall +
+                                phases[PHASE_ENCODE_AUTOMATA].wall)
+
+    def testCpuTime(self):
+        statistics = self.statistics
+        statistics.start_round((2,))
+        with statistics.phase(PHASE_CHECK):
+            _busy_wait(0.1)
+        with statistics.phase(PHASE_ENCODE):
+            time.sleep(0.1)
+        statistics.end_round(False)
+
+        phases = statistics.rounds[0]["phases"]
+        self.assertGreaterEqual(phases[PHASE_CHECK].cpu, 0.1)
+        self.assertLess(phases[PHASE_ENCODE].cpu, 0.05)
+        self.assertGreaterEqual(phases[PHASE_ENCODE].wall, 0.1)
+
+    def testTotals(self):
+        statistics = self.statistics
+        for bound in [(1,), (2,)]:
+            statistics.start_round(bound)
+            with statistics.phase(PHASE_CHECK):
+                time.sleep(0.01)
+            statistics.add_counter(COUNTER_ASSERTIONS, 3)
+        statistics.end_round()
+
+        self.assertEqual(len(statistics.rounds), 2)
+        self.assertEqual(statistics.get_counter_totals(),
+                         {COUNTER_ASSERTIONS: 6})
+        totals = statistics.get_phase_totals()
+        self.assertGreaterEqual(totals[PHASE_CHECK]["wall"], 0.02)
+        self.assertEqual(totals[PHASE_ENCODE]["wall"], 0.0)
+
+        records = [json.loads(line) for line
+                   in statistics.to_json_lines(spec="spec.ltl")]
+        self.assertEqual([record["bound"] for record in records],
+                         [[1], [2]])
+        self.assertEqual(records[0]["spec"], "spec.ltl")
+        self.assertIn(PHASE_CHECK, records[1]["phases"])
+
+
+@unittest.skipIf(not reset_rss_high_water_mark(),
+                 "High-water mark of the RSS cannot be reset")
+class PeakMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.statistics = SynthesisStatistics()
+        self.allocation_kib = _ALLOCATION_SIZE // 1024
+
+    def testPhasePeaks(self):
+        statistics = self.statistics
+        statistics.start_round((2,))
+        with statistics.phase(PHASE_ENCODE):
+            with statistics.phase(PHASE_ENCODE_AUTOMATA):
+                data = _allocate()
+                del data
+        with statistics.phase(PHASE_CHECK):
+            pass
+        statistics.end_round(True)
+
+        round_statistics = statistics.rounds[0]
+        peaks = round_statistics["phases_peak_rss"]
+        # the memory is released before the check, whose peak is the
+        # current size only
+        self.assertGreater(peaks[PHASE_ENCODE_AUTOMATA],
+                           peaks[PHASE_CHECK] + self.allocation_kib // 2)
+        # nested phases are contained in the peak of the enclosing phase
+        self.assertGreaterEqual(peaks[PHASE_ENCODE],
+                                peaks[PHASE_ENCODE_AUTOMATA])
+        self.assertGreaterEqual(round_statistics["peak_rss"],
+                                peaks[PHASE_ENCODE])
+        self.assertGreaterEqual(round_statistics["process_peak_rss"],
+                                round_statistics["peak_rss"])
+
+    def testRoundPeaks(self):
+        statistics = self.statistics
+        statistics.start_round((1,))
+        data = _allocate()
+        del data
+        statistics.start_round((2,))
+        statistics.end_round()
+
+        first_round, second_round = statistics.rounds
+        # the peak of the first round does not carry over to later rounds
+        self.assertGreater(first_round["peak_rss"],
+                           second_round["peak_rss"] +
+                           self.allocation_kib // 2)
+        self.assertGreaterEqual(get_peak_rss(), first_round["peak_rss"])
+
+
+if __name__ == "__main__":
+    unittest.main()
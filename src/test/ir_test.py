@@ -0,0 +1,103 @@
+'''
+Tests the constraint IR and its lowerings
+'''
+import pickle
+import unittest
+
+from z3 import Datatype, Function, BoolSort, BitVecSort, Const, BitVec, \
+    Int, Real, ForAll, And, Not, Implies, UGT, RotateLeft, Solver, sat, \
+    unsat
+
+from smt.api.irsolver import IRSolver
+from smt.cnf import to_cnf
+from smt.ir import IRContext, to_smt2, dump_terms
+
+
+class ConstraintIRTest(unittest.TestCase):
+
+    def setUp(self):
+        state_type = Datatype('S')
+        for i in range(3):
+            state_type.declare('t%d' % i)
+        self.state_sort = state_type.create()
+        self.t0, self.t1, self.t2 = [self.state_sort.constructor(i)()
+                                     for i in range(3)]
+        self.f = Function('f', self.state_sort, BoolSort())
+        self.g = Function('g', self.state_sort, self.state_sort)
+        self.solver = IRSolver(Solver())
+
+    def testAlphaEquivalentConstraintsAreDeduplicated(self):
+        x = Const('x', self.state_sort)
+        y = Const('y', self.state_sort)
+        self.solver.add(ForAll(x, self.f(x) == (self.g(x) == self.t0)))
+        self.solver.add(ForAll(y, self.f(y) == (self.g(y) == self.t0)))
+        self.solver.add(And(self.f(self.t1), Not(self.f(self.t2))),
+                        self.f(self.t1))
+        self.assertEqual(self.solver.constraint_count, 5)
+        self.assertEqual(self.solver.duplicate_count, 2)
+        self.assertEqual(len(self.solver.assertions()), 3)
+
+    def testPop(self):
+        self.solver.add(self.f(self.t0))
+        self.solver.push()
+        self.solver.add(self.f(self.t1), self.f(self.t0))
+        self.assertEqual(self.solver.duplicate_count, 1)
+        self.solver.pop()
+        self.assertEqual(self.solver.duplicate_count, 0)
+        self.solver.add(self.f(self.t1))
+        self.assertEqual(self.solver.duplicate_count, 0)
+        self.assertEqual(len(self.solver.assertions()), 2)
+
+    def testUnsupportedConstraints(self):
+        # real sorts and integer division are not part of the IR
+        x = Real('x')
+        y = Int('y')
+        self.solver.add(x > 1, y / 2 == 3, self.f(self.t0))
+        self.solver.push()
+        self.solver.add(x > 1, x < 1)
+        self.assertEqual(self.solver.unlifted_count, 4)
+        self.assertEqual(self.solver.check(), unsat)
+        self.solver.pop()
+        self.assertEqual(self.solver.unlifted_count, 2)
+        self.assertEqual(self.solver.constraint_count, 1)
+        self.assertEqual(len(self.solver.assertions()), 3)
+        self.assertEqual(self.solver.check(), sat)
+
+    def testZ3RoundTrip(self):
+        x = Const('x', self.state_sort)
+        v = BitVec('v', 4)
+        h = Function('h', self.state_sort, BitVecSort(4))
+        expr = ForAll([x, v], Implies(UGT(v & h(x), 0),
+                                      RotateLeft(v, h(x)) | 1 == 3))
+        translator = self.solver.translator
+        term = translator.lift(expr)
+        self.assertIs(translator.lift(translator.lower(term)), term)
+
+    def testLowerings(self):
+        x = Const('x', self.state_sort)
+        self.solver.add(ForAll(x, self.f(x) == (self.g(x) == self.t0)))
+        self.solver.add(self.f(self.t1), self.g(self.g(self.t1)) != self.t0)
+        terms = self.solver.get_terms()
+
+        smt2_solver = Solver()
+        smt2_solver.from_string(to_smt2(terms, None))
+        self.assertEqual(smt2_solver.check(), sat)
+
+        # f(t1) implies g(g(t1)) = t0 if g(t1) = t1
+        cnf = to_cnf(self.solver.context, terms + [
+            self.solver.translator.lift(self.g(self.t1) == self.t1)])
+        cnf_solver = Solver()
+        cnf_solver.from_string(cnf.to_dimacs())
+        self.assertEqual(cnf_solver.check(), unsat)
+
+    def testDumpTerms(self):
+        self.solver.add(self.f(self.g(self.t0)), Not(self.f(self.t1)))
+        terms = self.solver.get_terms()
+        loaded_terms = IRContext().load_terms(
+            pickle.loads(pickle.dumps(dump_terms(terms))))
+        self.assertEqual([repr(term) for term in loaded_terms],
+                         [repr(term) for term in terms])
+
+
+if __name__ == "__main__":
+    unittest.main()
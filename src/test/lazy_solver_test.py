@@ -0,0 +1,77 @@
+'''
+Tests the lazy addition of constraints
+'''
+import unittest
+
+from z3 import Function, IntSort, Int, Solver, sat, unsat
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from smt.api.lazy import LazyConstraintSolver
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+from test.incremental_encoding_test import _SPEC, \
+    get_mutual_exclusion_automaton
+
+
+class LazyConstraintSolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.f = Function('f', IntSort(), IntSort())
+        self.x = Int('x')
+        self.solver = LazyConstraintSolver(Solver())
+
+    def testSatisfiedConstraintIsNotAdded(self):
+        self.solver.add(self.f(1) == 1)
+        self.solver.add_lazy([self.x], self.f(self.x) >= 0)
+        self.assertEqual(self.solver.check(), sat)
+        model = self.solver.model()
+        self.assertEqual(model.evaluate(self.f(1)).as_long(), 1)
+        self.assertLessEqual(self.solver.added_count, 1)
+
+    def testViolatedConstraintIsAdded(self):
+        self.solver.add(self.f(1) == 1)
+        self.solver.add_lazy([self.x], self.f(self.x) == self.x + 1)
+        self.assertEqual(self.solver.check(), unsat)
+        self.assertEqual(self.solver.added_count, 1)
+        self.assertEqual(self.solver.iterations, 2)
+
+    def testPop(self):
+        self.solver.add(self.f(1) == 1)
+        self.solver.add_lazy([self.x], self.f(self.x) == 2)
+        self.solver.push()
+        self.solver.add(self.f(2) == 3)
+        self.assertEqual(self.solver.check(), unsat)
+        self.solver.pop()
+        # the constraint added within the scope is pending again
+        self.assertEqual(self.solver.added_count, 0)
+        self.assertEqual(self.solver.check(), unsat)
+        self.assertEqual(self.solver.added_count, 1)
+
+
+class LazyTransitionEncodingTest(unittest.TestCase):
+
+    def testRefinementsOnIncrementalSolver(self):
+        spec = Specification(content=_SPEC)
+        spec.bound = (2,)
+        spec.cutoff = (2,)
+        encoder = SMTEncoderFactory().create(SMTEncoder.STATE_GUARD_ENCODER)(
+            spec, ConjunctiveGuardedArchitecture(spec),
+            EncodingOptimization.LAZY_TRANSITIONS)
+        encoder.encode()
+        encoder.encode_automata([(get_mutual_exclusion_automaton(2), 0,
+                                  False, spec.cutoff)], spec.cutoff)
+        status, model = encoder.check()
+        self.assertIs(status, True)
+        self.assertIsNotNone(model)
+
+        solver = encoder.encoder_info.solver
+        self.assertIsInstance(solver, LazyConstraintSolver)
+        # all refinements are checked by the same incremental kernel
+        self.assertEqual(
+            solver._solver.statistics().get_key_value("num checks"),
+            solver.iterations)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Tests the explicit-state model checker on a hand-written mutual exclusion
+template
+'''
+import unittest
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture, \
+    DisjunctiveGuardedArchitecture
+from datastructures.specification import Specification, \
+    ArchitectureGuarantee
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import InstanceSignal, ForallExpr, UnaryOp, \
+    QuantifiedTemplateSchedulerSignal
+from modelchecker import ExplicitStateModelChecker, NO_FAIRNESS, \
+    SCHEDULING_FAIRNESS, MOVING_FAIRNESS
+from smt.api.stateguarded.templatemodel import StateGuardedTemplateModel
+from test.result_cache_test import _SPEC
+
+
+def _get_model():
+    '''
+    Returns a template with the states idle (t0_0), waiting (t0_1), and
+    critical (t0_2), which enters the critical section if no other process
+    is critical
+    '''
+    template_model = StateGuardedTemplateModel.__new__(
+        StateGuardedTemplateModel)
+    template_model.states = ['t0_0', 't0_1', 't0_2']
+    template_model.outputs = {'g_0': {'t0_0': False, 't0_1': False,
+                                      't0_2': True}}
+    template_model.guard_state_bits = {1: 't0_0', 2: 't0_1', 4: 't0_2'}
+    template_model.num_guards = {('t0_0', False, 't0_0'): 7,
+                                 ('t0_0', True, 't0_1'): 7,
+                                 ('t0_1', False, 't0_2'): 3,
+                                 ('t0_1', True, 't0_2'): 3,
+                                 ('t0_2', False, 't0_0'): 7,
+                                 ('t0_2', True, 't0_0'): 7}
+    return {0: template_model}
+
+
+def _get_ucw(label, target_label):
+    '''
+    Returns a UCW that rejects if label holds and target_label is never
+    satisfied afterwards (or immediately if target_label is empty)
+    '''
+    init = Node('init')
+    init.add_transition({}, {(init, False)})
+    rejecting = Node('rejecting')
+    rejecting.add_transition(target_label, {(rejecting, True)})
+    init.add_transition({**label, **target_label}, {(rejecting, True)})
+    return Automaton([{init}], [rejecting], [init, rejecting])
+
+
+class _Ltl2UCW(object):
+    '''
+    Returns the hand-written UCWs of the instantiated formulas
+    '''
+    def __init__(self, automata):
+        self.automata = automata
+        self.formulas = []
+
+    def convert(self, formula):
+        self.formulas.append(str(formula))
+        return self.automata[str(formula)]
+
+
+class ExplicitStateModelCheckerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = Specification(content=_SPEC)
+        self.mutex = _get_ucw({InstanceSignal('g', 0, 0): True,
+                               InstanceSignal('g', 0, 1): True}, {})
+        self.response = _get_ucw({InstanceSignal('active', 0, 0): True,
+                                  InstanceSignal('r', 0, 0): True},
+                                 {InstanceSignal('g', 0, 0): False})
+
+    def _get_checker(self, arch_type):
+        return ExplicitStateModelChecker(self.spec, arch_type(self.spec),
+                                         _get_model(), None)
+
+    def testConjunctiveGuards(self):
+        checker = self._get_checker(ConjunctiveGuardedArchitecture)
+        self.assertTrue(checker.check_deadlock_freedom((20,)).holds)
+        self.assertTrue(checker.check_automaton(self.mutex, (20,)).holds)
+
+    def testDisjunctiveGuards(self):
+        # the critical state is enabled by any idle or waiting process
+        checker = self._get_checker(DisjunctiveGuardedArchitecture)
+        self.assertTrue(checker.check_automaton(self.mutex, (2,)).holds)
+        result = checker.check_automaton(self.mutex, (3,), NO_FAIRNESS)
+        self.assertFalse(result.holds)
+        self.assertEqual(result.trace[0], "{0.0: t0_0, 0.1: t0_0, t0_0: 1}")
+
+    def testFairness(self):
+        checker = self._get_checker(ConjunctiveGuardedArchitecture)
+        self.assertTrue(checker.check_automaton(self.response, (20,),
+                                                MOVING_FAIRNESS).holds)
+        # a waiting process may only be scheduled while it is disabled
+        self.assertFalse(checker.check_automaton(self.response, (20,),
+                                                 SCHEDULING_FAIRNESS).holds)
+
+    def testScheduledRepresentative(self):
+        # Forall (j) G(F(is_scheduled_0_j))
+        scheduled = QuantifiedTemplateSchedulerSignal(0, ('j'))
+        self.spec.guarantees = [ArchitectureGuarantee(ForallExpr(
+            ('j'), UnaryOp('G', UnaryOp('F', scheduled))))]
+        active_0, init_0, enabled_0 = [InstanceSignal(name, 0, 0) for name
+                                       in ['active', 'init', 'enabled']]
+        ltl2ucw = _Ltl2UCW({
+            'G(F(active_0_0))': _get_ucw({}, {active_0: False}),
+            'G(F(init_0_0))': _get_ucw({}, {init_0: False}),
+            'G(F(enabled_0_0))': _get_ucw({}, {enabled_0: False})})
+        checker = ExplicitStateModelChecker(
+            self.spec, ConjunctiveGuardedArchitecture(self.spec),
+            _get_model(), ltl2ucw)
+
+        # the scheduling literals of the representative are its active
+        # signal, thus the other processes are counted, not named
+        results = checker.check((20,))
+        self.assertEqual(sorted(ltl2ucw.formulas), sorted(ltl2ucw.automata))
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result.holds for result in results),
+                        [str(result) for result in results])
+
+
+if __name__ == "__main__":
+    unittest.main()
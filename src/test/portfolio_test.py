@@ -0,0 +1,68 @@
+'''
+Tests the race of the portfolio synthesis
+'''
+import os
+import time
+import unittest
+
+import portfolio
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from bosy import BoundedSynthesis
+from portfolio import PortfolioSynthesis, get_portfolio_configurations
+
+_SPEC_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          "benchmarks", "conj_mutual_exclusion_in_0.ltl")
+
+
+def _execute_configuration(spec_filename, architecture, settings,
+                           configuration, connection):
+    '''
+    Finds no model with seed 0, a model after a delay with seed 1
+    '''
+    if configuration.seed == 0:
+        connection.send((None, (2,), None))
+    else:
+        time.sleep(0.5)
+        connection.send(("model", (1,), None))
+
+
+def _execute_without_model(spec_filename, architecture, settings,
+                           configuration, connection):
+    connection.send((None, (2,), None))
+
+
+class PortfolioSynthesisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.execute_configuration = portfolio._execute_configuration
+        self.bosy = BoundedSynthesis(_SPEC_PATH,
+                                     ConjunctiveGuardedArchitecture)
+
+    def tearDown(self):
+        portfolio._execute_configuration = self.execute_configuration
+
+    def testModelWinsOverNoModel(self):
+        portfolio._execute_configuration = _execute_configuration
+        configurations = get_portfolio_configurations(seeds=(0, 1))[:2]
+        synthesis = PortfolioSynthesis(self.bosy, configurations)
+
+        self.assertEqual(synthesis.solve(), "model")
+        self.assertEqual(synthesis.winner.seed, 1)
+        self.assertEqual([configuration.seed for configuration
+                          in synthesis.no_model_configurations], [0])
+
+    def testAllConfigurationsWithoutModel(self):
+        portfolio._execute_configuration = _execute_without_model
+        configurations = get_portfolio_configurations(seeds=(0, 1))
+        synthesis = PortfolioSynthesis(self.bosy, configurations, jobs=2)
+
+        self.assertIsNone(synthesis.solve())
+        self.assertIsNone(synthesis.winner)
+        self.assertCountEqual(synthesis.no_model_configurations,
+                              configurations)
+        self.assertEqual(synthesis.failures, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+'''
+Tests the translation of the conjuncts of instantiated properties into
+separate automata
+'''
+import os
+import shutil
+import unittest
+
+import config
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from bosy import BoundedSynthesis, _get_conjuncts
+from datastructures.specification import Specification
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import BinOp, UnaryOp, Signal, InstanceSignal
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+from test.incremental_encoding_test import get_mutual_exclusion_automaton
+
+_SPEC_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          "benchmarks", "conj_mutual_exclusion_in_0.ltl")
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+def _is_liveness_property(guarantee):
+    '''
+    Classifies the instantiated guarantees of the test specification
+    without translating them into automata
+    '''
+    return "F(" in str(guarantee)
+
+
+def _get_never_granted_automaton():
+    '''
+    Returns a UCW that rejects if process 0 is granted
+    '''
+    init = Node('never_init')
+    init.add_transition({}, {(init, False)})
+    rejecting = Node('never_rejecting')
+    rejecting.add_transition({}, {(rejecting, True)})
+    init.add_transition({InstanceSignal('g', 0, 0): True},
+                        {(rejecting, True)})
+    return Automaton([{init}], [rejecting], [init, rejecting])
+
+
+def _get_both_granted_automaton():
+    '''
+    Returns a UCW that rejects unless both processes are eventually granted
+    at the same time
+    '''
+    init = Node('both_init')
+    for i in range(2):
+        init.add_transition({InstanceSignal('g', 0, i): False},
+                            {(init, True)})
+    return Automaton([{init}], [init], [init])
+
+
+def _get_conjunction_automaton(automata):
+    '''
+    Returns the UCW of the conjunction of the given UCWs, i.e., the union
+    of the UCWs that starts in all initial states
+    '''
+    return Automaton([set.union(*[initial_set for automaton in automata
+                                  for initial_set
+                                  in automaton.initial_sets_list])],
+                     set.union(*[set(automaton.rejecting_nodes)
+                                 for automaton in automata]),
+                     set.union(*[set(automaton.nodes)
+                                 for automaton in automata]))
+
+
+class ConjunctsTest(unittest.TestCase):
+
+    def testGloballyDistributed(self):
+        a, b, c, d = [Signal(name) for name in "abcd"]
+        formula = BinOp('*',
+                        UnaryOp('G', BinOp('*', a,
+                                           UnaryOp('G', BinOp('*', b, c)))),
+                        UnaryOp('F', BinOp('*', c, d)))
+        self.assertEqual([str(conjunct)
+                          for conjunct in _get_conjuncts(formula)],
+                         ["G(a)", "G(G(b))", "G(G(c))", "F(c * d)"])
+
+    def testNoConjunction(self):
+        a, b = Signal('a'), Signal('b')
+        formula = UnaryOp('G', BinOp('+', a, UnaryOp('F', b)))
+        self.assertEqual(_get_conjuncts(formula), [formula])
+
+
+class PropertyConjunctsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bosy = BoundedSynthesis(_SPEC_PATH,
+                                     ConjunctiveGuardedArchitecture)
+        self.bosy.is_liveness_property = _is_liveness_property
+        self.bosy.instance_count = (2,)
+        self.bosy.spec.bound = (2,)
+        self.properties, _ = self.bosy._get_round_properties()
+
+    def _instantiate(self, split_properties):
+        self.bosy.split_properties = split_properties
+        return self.bosy.instantiate_properties(self.properties,
+                                                self.bosy.spec.cutoff)
+
+    def testSplitIntoConjuncts(self):
+        liveness_count = 0
+        for formulas, (formula,) in zip(self._instantiate(True),
+                                        self._instantiate(False)):
+            if not _is_liveness_property(formula):
+                # safety properties are not guarded by the assumptions
+                self.assertEqual([str(split_formula)
+                                  for split_formula in formulas],
+                                 [str(conjunct) for conjunct
+                                  in _get_conjuncts(formula)])
+                continue
+
+            liveness_count += 1
+            self.assertEqual(formula.name, '->')
+            self.assertEqual([str(split_formula.arg2)
+                              for split_formula in formulas],
+                             [str(conjunct) for conjunct
+                              in _get_conjuncts(formula.arg2)])
+            # the assumptions are attached to every conjunct
+            for split_formula in formulas:
+                self.assertEqual(split_formula.name, '->')
+                self.assertEqual(split_formula.arg1, formula.arg1)
+        self.assertEqual(liveness_count, 3)
+
+    def testSafetyConjuncts(self):
+        self.bosy.is_liveness_property = lambda guarantee: False
+        for formulas, (formula,) in zip(self._instantiate(True),
+                                        self._instantiate(False)):
+            self.assertEqual([str(split_formula)
+                              for split_formula in formulas],
+                             [str(conjunct) for conjunct
+                              in _get_conjuncts(formula)])
+
+
+class SplitAutomataTest(unittest.TestCase):
+    '''
+    Checks that separate automata of the conjuncts yield the same result
+    as the automaton of the conjunction
+    '''
+
+    def _check(self, automata):
+        spec = Specification(content=_SPEC)
+        spec.bound = (2,)
+        spec.cutoff = (2,)
+        encoder = SMTEncoderFactory().create(
+            SMTEncoder.STATE_GUARD_ENCODER)(
+                spec, ConjunctiveGuardedArchitecture(spec),
+                EncodingOptimization.NONE)
+        encoder.encode()
+        encoder.encode_automata([(automaton, i, False, spec.cutoff)
+                                 for i, automaton in enumerate(automata)],
+                                spec.cutoff)
+        status, _ = encoder.check()
+        return status
+
+    def _assertSplitEquivalent(self, automata, expected_status):
+        self.assertIs(self._check(automata), expected_status)
+        self.assertIs(self._check([_get_conjunction_automaton(automata)]),
+                      expected_status)
+
+    def testSat(self):
+        self._assertSplitEquivalent([get_mutual_exclusion_automaton(2),
+                                     _get_never_granted_automaton()], True)
+
+    def testUnsat(self):
+        self._assertSplitEquivalent([get_mutual_exclusion_automaton(2),
+                                     _get_both_granted_automaton()], False)
+
+
+@unittest.skipIf(shutil.which(config.LTL3BA_PATH) is None,
+                 "ltl3ba is not available")
+class SplitSynthesisTest(unittest.TestCase):
+
+    def _solve_bound(self, bound, split_properties):
+        bosy = BoundedSynthesis(_SPEC_PATH, ConjunctiveGuardedArchitecture)
+        bosy.instance_count = (2,)
+        bosy.encoder_type = SMTEncoder.STATE_GUARD_ENCODER
+        bosy.encoder_optimization = EncodingOptimization.NONE
+        bosy.use_result_cache = False
+        bosy.split_properties = split_properties
+        return bosy.solve_bound(bound)
+
+    def testSameResult(self):
+        for bound in [(1,), (2,)]:
+            self.assertEqual(self._solve_bound(bound, True) is None,
+                             self._solve_bound(bound, False) is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
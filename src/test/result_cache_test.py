@@ -0,0 +1,122 @@
+'''
+Tests the keys of the persistent result cache
+'''
+import os
+import unittest
+
+import config
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from bosy import BoundedSynthesis
+from datastructures.specification import Specification
+from gp_bosy_benchmark import BenchmarkExecution
+from helpers import benchmark_config
+from smt.api.solverprofile import SolverProfile
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+_SPEC_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          "benchmarks", "conj_mutual_exclusion_in_0.ltl")
+
+_SPEC = """# Mutual exclusion
+[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+Forall (i) G((r_0_i=1 * g_0_i=0) -> F(g_0_i=1));
+"""
+
+
+class NormalizedSpecificationTest(unittest.TestCase):
+
+    def testFormattingIgnored(self):
+        reformatted = _SPEC.replace("# Mutual exclusion", "# other comment") \
+            .replace("Forall (i) G(", "Forall (i)   G(")
+        self.assertEqual(
+            Specification(content=_SPEC).get_normalized_content(),
+            Specification(content=reformatted).get_normalized_content())
+
+    def testStructureDistinguished(self):
+        # same operators and operands, but different nesting
+        regrouped = _SPEC.replace("G((r_0_i=1 * g_0_i=0) -> F(g_0_i=1))",
+                                  "G(r_0_i=1 * (g_0_i=0 -> F(g_0_i=1)))")
+        self.assertNotEqual(
+            Specification(content=_SPEC).get_normalized_content(),
+            Specification(content=regrouped).get_normalized_content())
+
+
+class CacheSettingTest(unittest.TestCase):
+
+    def _use_result_cache(self, settings, use_result_cache=False):
+        content = "spec.ltl conjunctive_guards 2:3 2 1 %s 5" % settings
+        item, = benchmark_config.parse_config(content)
+        execution = BenchmarkExecution([], None, None, None,
+                                       use_result_cache=use_result_cache)
+        return execution._get_benchmark_request(item, (2,), (1,)) \
+            .use_result_cache
+
+    def testDefaultSetting(self):
+        # cache hits would distort the measured runtimes
+        self.assertFalse(self._use_result_cache("scc,labels,no-test,no-dot"))
+        self.assertTrue(self._use_result_cache("scc,labels,no-test,no-dot,cache"))
+
+    def testGlobalSetting(self):
+        self.assertTrue(self._use_result_cache("scc,labels,no-test,no-dot",
+                                               use_result_cache=True))
+        self.assertFalse(self._use_result_cache("scc,labels,no-test,no-dot,no-cache",
+                                                use_result_cache=True))
+
+
+class ResultKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rank_width = config.SAT_RANK_WIDTH
+        self.check_command = config.EXTERNAL_SOLVER_CHECK_COMMAND
+        self.bosy = BoundedSynthesis(_SPEC_PATH,
+                                     ConjunctiveGuardedArchitecture)
+        self.bosy.spec.bound = (2,)
+        self.bosy.encoder_type = SMTEncoder.STATE_GUARD_ENCODER
+        self.round_key = ((2,), ((2,),))
+
+    def tearDown(self):
+        config.SAT_RANK_WIDTH = self.rank_width
+        config.EXTERNAL_SOLVER_CHECK_COMMAND = self.check_command
+
+    def _assertKeyChanged(self, change):
+        key = self.bosy._get_result_key(self.round_key)
+        change()
+        self.assertNotEqual(self.bosy._get_result_key(self.round_key), key)
+
+    def testSolverProfile(self):
+        self.bosy.encoder_optimization = EncodingOptimization.NONE
+        self._assertKeyChanged(lambda: setattr(
+            self.bosy, "solver_profile",
+            SolverProfile(("smt",), {"random_seed": 1})))
+
+    def testSatRankWidth(self):
+        self.bosy.encoder_optimization = EncodingOptimization.SAT_SOLVER
+        self._assertKeyChanged(lambda: setattr(config, "SAT_RANK_WIDTH", 8))
+
+    def testExternalCheckCommand(self):
+        self.bosy.encoder_optimization = \
+            EncodingOptimization.EXTERNAL_SOLVER
+        self._assertKeyChanged(lambda: setattr(
+            config, "EXTERNAL_SOLVER_CHECK_COMMAND",
+            "(check-sat-using smt)"))
+
+    def testUnusedBackendIgnored(self):
+        self.bosy.encoder_optimization = EncodingOptimization.NONE
+        key = self.bosy._get_result_key(self.round_key)
+        config.SAT_RANK_WIDTH = 8
+        self.assertEqual(self.bosy._get_result_key(self.round_key), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
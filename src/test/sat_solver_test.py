@@ -0,0 +1,150 @@
+'''
+Tests the bit-blasted SAT backend
+'''
+import unittest
+
+from z3 import Datatype, Function, BoolSort, IntSort, Const, Int, Bool, \
+    BitVec, BitVecVal, ForAll, Implies, Not, UGT, ULE, RotateLeft, If, Sum, \
+    is_true, is_false, sat, unsat, unknown
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from smt.api.grounding import GroundingSolver
+from smt.api.satsolver import SATSolver
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+
+_SPEC = """[GENERAL]
+templates: 1
+
+[INPUT_VARIABLES]
+r_0;
+
+[OUTPUT_VARIABLES]
+g_0;
+
+[ASSUMPTIONS]
+
+[GUARANTEES]
+"""
+
+
+class SATSolverTest(unittest.TestCase):
+
+    def setUp(self):
+        state_type = Datatype('S')
+        for i in range(3):
+            state_type.declare('t%d' % i)
+        self.state_sort = state_type.create()
+        self.states = [self.state_sort.constructor(i)() for i in range(3)]
+        self.delta = Function('delta', self.state_sort, BoolSort(),
+                              self.state_sort)
+        self.out = Function('out', self.state_sort, BoolSort())
+
+    def testBitVectors(self):
+        solver = SATSolver()
+        x = BitVec('x', 4)
+        y = BitVec('y', 4)
+        solver.add(x + 3 == 5, RotateLeft(BitVecVal(1, 4), y) == 8,
+                   ULE(y, 4), UGT(x | y, x))
+        self.assertEqual(solver.check(), sat)
+        model = solver.model()
+        self.assertEqual(model.evaluate(x).as_long(), 2)
+        self.assertEqual(model.evaluate(y).as_long(), 3)
+
+        solver.add(UGT(x & y, x))
+        self.assertEqual(solver.check(), unsat)
+
+    def testRankWidth(self):
+        rank = Function('lambda_s', self.state_sort, IntSort())
+        t0, t1, t2 = self.states
+        constraints = [rank(t0) == 0, rank(t1) > rank(t0),
+                       rank(t2) > rank(t1)]
+
+        solver = SATSolver(rank_width=2)
+        solver.add(constraints)
+        self.assertEqual(solver.check(), sat)
+        ranks = [solver.model().evaluate(rank(state)).as_long()
+                 for state in self.states]
+        self.assertEqual(ranks, sorted(set(ranks)))
+
+        # the ranks of the three states require two bits
+        solver = SATSolver(rank_width=1)
+        solver.add(constraints)
+        self.assertEqual(solver.check(), unknown)
+        self.assertEqual(solver.reason_unknown(), "ranks truncated to 1 bits")
+
+    def testDerivedRankWidth(self):
+        rank = Function('lambda_s', self.state_sort, BoolSort(), IntSort())
+        t0, t1, t2 = self.states
+        # a chain through all six states of the domain of the ranks
+        constraints = [rank(t0, False) == 0]
+        chain = [(state, value) for state in self.states
+                 for value in (False, True)]
+        constraints += [rank(*successor) > rank(*predecessor)
+                        for predecessor, successor in zip(chain, chain[1:])]
+
+        solver = SATSolver()
+        solver.add(constraints)
+        self.assertEqual(solver.check(), sat)
+        self.assertEqual(solver.effective_rank_width, 3)
+        ranks = [solver.model().evaluate(rank(*state)).as_long()
+                 for state in chain]
+        self.assertEqual(ranks, sorted(set(ranks)))
+
+        # a cycle has no ranks at all, i.e., unsat holds for any width
+        solver.add(rank(t0, False) > rank(t2, True))
+        self.assertEqual(solver.check(), unsat)
+
+    def testIntegerSums(self):
+        x, y = Bool('x'), Bool('y')
+        solver = SATSolver()
+        solver.add(Sum([If(x, 1, 0), If(y, 1, 0)]) == 1)
+        self.assertEqual(solver.check(), unknown)
+
+    def testSymmetryReductionRejected(self):
+        spec = Specification(content=_SPEC)
+        spec.bound = (2,)
+        spec.cutoff = (2,)
+        encoder = SMTEncoderFactory().create(SMTEncoder.STATE_GUARD_ENCODER)(
+            spec, ConjunctiveGuardedArchitecture(spec),
+            EncodingOptimization.SAT_SOLVER |
+            EncodingOptimization.SYMMETRY_REDUCTION)
+        with self.assertRaisesRegex(Exception, "symmetry reduction"):
+            encoder.encode()
+
+    def testInfiniteRankDomain(self):
+        rank = Function('rank', IntSort(), IntSort())
+        solver = SATSolver()
+        solver.add(rank(Int('i')) > 0)
+        self.assertEqual(solver.check(), unknown)
+
+    def testGroundedModel(self):
+        solver = GroundingSolver(SATSolver())
+        t0, t1, t2 = self.states
+        state = Const('q', self.state_sort)
+        signal = Bool('i')
+        # out is a definition that is inlined by the grounding solver
+        solver.add(ForAll(state, self.out(state) == (state == t2)))
+        solver.add(ForAll([state, signal],
+                          Implies(signal, self.delta(state, signal) != state)))
+        solver.add(self.delta(t0, True) == t1, self.delta(t1, True) == t2)
+        self.assertEqual(solver.check(), sat)
+
+        model = solver.model()
+        self.assertTrue(model.evaluate(self.delta(t0, True)).eq(t1))
+        self.assertTrue(is_true(model.evaluate(
+            self.out(self.delta(t1, True)))))
+        self.assertTrue(is_false(model.evaluate(self.out(t0))))
+        # the application is resolved by a case split over the arguments
+        self.assertTrue(is_true(model.evaluate(
+            Implies(signal, self.delta(t0, signal) != t0))))
+
+        escape = Bool('escape')
+        solver.add(Implies(escape, self.delta(t2, True) == t2))
+        self.assertEqual(solver.check(escape), unsat)
+        self.assertEqual(solver.check(Not(escape)), sat)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+Tests the order of the bounds of the search strategies
+'''
+import os
+import unittest
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from bosy import BoundedSynthesis, SEARCH_LINEAR, SEARCH_GALLOP, \
+    SEARCH_BISECT
+
+_SPEC_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          "benchmarks", "conj_mutual_exclusion_in_0.ltl")
+
+
+class SearchStrategyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bosy = BoundedSynthesis(_SPEC_PATH,
+                                     ConjunctiveGuardedArchitecture)
+        self.bosy.min_bound = (1,)
+        self.bosy.max_increments = 10
+        self.bosy._solve_bound = self._solve_bound
+        self.probed_bounds = []
+        # smallest bound with a model
+        self.model_bound = (6,)
+
+    def _solve_bound(self, bound):
+        '''
+        Replaces the synthesis round, models exist from
+        :attr:`model_bound` on
+        '''
+        self.probed_bounds.append(bound)
+        self.bosy.spec.bound = bound
+        self.bosy.spec.cutoff = (2 * bound[0],)
+        if bound >= self.model_bound:
+            return True, "model %s" % str(bound)
+        return False, None
+
+    def _solve(self, search_strategy):
+        self.bosy.search_strategy = search_strategy
+        return self.bosy.solve()
+
+    def testLinear(self):
+        self.assertEqual(self._solve(SEARCH_LINEAR), "model (6,)")
+        self.assertEqual(self.probed_bounds,
+                         [(1,), (2,), (3,), (4,), (5,), (6,)])
+
+    def testGallop(self):
+        self.assertEqual(self._solve(SEARCH_GALLOP), "model (6,)")
+        # increments 0, 1, 3, 7, then bisection between 4 and 7
+        self.assertEqual(self.probed_bounds,
+                         [(1,), (2,), (4,), (8,), (6,), (5,)])
+        self.assertEqual(self.bosy.spec.bound, (6,))
+        # the cut-off belongs to the returned model, not the last round
+        self.assertEqual(self.bosy.spec.cutoff, (12,))
+
+    def testGallopMaxIncrements(self):
+        self.bosy.max_increments = 4
+        self.model_bound = (5,)
+        self.assertEqual(self._solve(SEARCH_GALLOP), "model (5,)")
+        # the last increment is capped at max_increments
+        self.assertEqual(self.probed_bounds, [(1,), (2,), (4,), (5,)])
+        self.assertEqual(self.bosy.spec.cutoff, (10,))
+
+    def testBisect(self):
+        self.assertEqual(self._solve(SEARCH_BISECT), "model (6,)")
+        # bisection of the increments 0 to 10
+        self.assertEqual(self.probed_bounds, [(6,), (3,), (5,)])
+        self.assertEqual(self.bosy.spec.bound, (6,))
+        self.assertEqual(self.bosy.spec.cutoff, (12,))
+
+    def testNoModel(self):
+        self.bosy.max_increments = 3
+        self.assertIsNone(self._solve(SEARCH_GALLOP))
+        self.assertEqual(self.probed_bounds, [(1,), (2,), (4,)])
+
+        self.probed_bounds = []
+        self.assertIsNone(self._solve(SEARCH_BISECT))
+        self.assertEqual(self.probed_bounds, [(3,), (4,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
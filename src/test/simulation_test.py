@@ -0,0 +1,45 @@
+'''
+Tests the bulk simulation on a hand-written mutual exclusion template
+'''
+import unittest
+
+import simulation
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture, \
+    DisjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from simulation import BulkSimulation, OutputCountMonitor
+from test.modelchecker_test import _get_model
+from test.result_cache_test import _SPEC
+
+
+@unittest.skipIf(simulation.numpy is None, "NumPy is not available")
+class BulkSimulationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = Specification(content=_SPEC)
+
+    def _run(self, arch_type, instance_count):
+        bulk_simulation = BulkSimulation(self.spec, arch_type(self.spec),
+                                         _get_model(), instance_count,
+                                         runs=20, seed=0)
+        return bulk_simulation.run(500, [OutputCountMonitor('g_0', 1)])
+
+    def testConjunctiveGuards(self):
+        statistics = self._run(ConjunctiveGuardedArchitecture, (200,))
+        self.assertEqual(statistics.violations["#g_0 <= 1"], (0, -1))
+        self.assertEqual(statistics.deadlocked_runs, 0)
+        self.assertGreater(statistics.grants_per_step['g_0'], 0)
+        self.assertLessEqual(statistics.output_counts['g_0'], 1)
+
+    def testDisjunctiveGuards(self):
+        # the critical state is enabled by any idle or waiting process
+        statistics = self._run(DisjunctiveGuardedArchitecture, (200,))
+        violating_runs, first_step = statistics.violations["#g_0 <= 1"]
+        self.assertEqual(violating_runs, 20)
+        self.assertGreater(first_step, 0)
+        self.assertEqual(statistics.move_rate, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+'''
+Tests the solver profiles and their tuning on a corpus of checks
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from z3 import Datatype, Function, BoolSort, Const, ForAll, Not, sat, unsat
+
+import config
+
+from smt.api.external import ExternalSolver
+from smt.api.irsolver import IRSolver
+from smt.api.solverprofile import SolverProfile, get_spec_family, \
+    create_solver, read_solver_profiles, load_solver_profile, \
+    write_solver_profiles
+from solver_tuning import SolverTuning, read_corpus, load_assertions
+
+
+class SolverProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        state_type = Datatype('S')
+        for i in range(2):
+            state_type.declare('t%d' % i)
+        self.state_sort = state_type.create()
+        self.t0, self.t1 = [self.state_sort.constructor(i)()
+                            for i in range(2)]
+        self.f = Function('f', self.state_sort, BoolSort())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _get_constraints(self):
+        x = Const('x', self.state_sort)
+        return [ForAll(x, self.f(x) == (x == self.t1)), self.f(self.t1)]
+
+    def testSpecFamily(self):
+        self.assertEqual(get_spec_family("benchmarks/"
+                                         "conj_mutual_exclusion_in_1.ltl"),
+                         "conj_mutual_exclusion_in")
+        self.assertEqual(get_spec_family("disj_state_pair_no-in.ltl"),
+                         "disj_state_pair_no-in")
+
+    def testReadWrite(self):
+        profile_path = os.path.join(self.directory, "profiles.json")
+        self.assertIsNone(load_solver_profile(profile_path, "a"))
+
+        profile_a = SolverProfile(("simplify", "qe", "smt"),
+                                  {"mbqi": False, "random_seed": 1})
+        profile_b = SolverProfile(("ufbv",), {"relevancy": 0})
+        write_solver_profiles(profile_path, {"a": profile_a})
+        write_solver_profiles(profile_path, {"b": profile_b})
+        self.assertEqual(read_solver_profiles(profile_path),
+                         {"a": profile_a, "b": profile_b})
+        self.assertEqual(os.listdir(self.directory), ["profiles.json"])
+
+    def testCreateSolver(self):
+        for profile in [None, SolverProfile(("ufbv",), {}),
+                        SolverProfile(("macro-finder", "simplify", "smt"),
+                                      {"mbqi": False, "relevancy": 0})]:
+            solver = create_solver(profile)
+            solver.add(self._get_constraints())
+            self.assertEqual(solver.check(), sat)
+            solver.add(Not(self.f(self.t1)))
+            self.assertEqual(solver.check(), unsat)
+
+    def testTuning(self):
+        family_directory = os.path.join(self.directory, "family")
+        solver = IRSolver(create_solver(), dump_directory=family_directory)
+        solver.add(self._get_constraints())
+        self.assertEqual(solver.check(), sat)
+
+        corpus = read_corpus(self.directory)
+        self.assertEqual(list(corpus), ["family"])
+        self.assertEqual([instance.expected for instance in corpus["family"]],
+                         ["sat"])
+        self.assertEqual(len(load_assertions(corpus["family"][0].path)), 2)
+
+        # a pipeline that fails on quantifiers and a wrong recorded result
+        failing = SolverProfile(("sat",), {})
+        working = SolverProfile(("qe", "smt"), {"random_seed": 0})
+        tuning = SolverTuning(corpus, [failing, working], timeout=10, jobs=2)
+        self.assertEqual(tuning.run(), {"family": working})
+        scores = tuning.scores["family"]
+        self.assertEqual([score.solved_count for score in scores], [0, 1])
+
+        # the profile solves one check and contradicts another one
+        instance = corpus["family"][0]
+        corpus["family"] = [instance, instance._replace(expected="unsat")]
+        self.assertEqual(tuning.run(), {})
+        self.assertEqual(tuning.scores["family"][1].solved_count, 1)
+        self.assertEqual(tuning.scores["family"][1].wrong_count, 1)
+
+    @unittest.skipIf(shutil.which(config.EXTERNAL_SOLVER_PATH) is None,
+                     "External solver is not available")
+    def testTuningScripts(self):
+        family_directory = os.path.join(self.directory, "family")
+        solver = ExternalSolver(config.EXTERNAL_SOLVER_PATH,
+                                dump_directory=family_directory)
+        solver.add(self._get_constraints())
+        self.assertEqual(solver.check(), sat)
+        solver.add(Not(self.f(self.t1)))
+        self.assertEqual(solver.check(), unsat)
+
+        # scripts without recorded result are skipped
+        with open(os.path.join(family_directory, "check.smt2"), 'w') as fh:
+            fh.write("(check-sat)\n")
+
+        corpus = read_corpus(self.directory)
+        self.assertEqual([instance.expected for instance in corpus["family"]],
+                         ["sat", "unsat"])
+        self.assertEqual(len(load_assertions(corpus["family"][1].path)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+'''
+Tests the constraints that order the states of the templates
+'''
+import unittest
+
+from itertools import product
+
+from z3 import BitVecVal, And, Or, Not
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from interfaces.automata import Automaton, Node
+from interfaces.parser_expr import InstanceSignal
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+from test.incremental_encoding_test import _SPEC, \
+    get_mutual_exclusion_automaton
+from test.property_split_test import _get_both_granted_automaton
+
+
+def _get_some_granted_automaton():
+    '''
+    Returns a UCW that rejects unless some process is eventually granted
+    '''
+    init = Node('some_init')
+    init.add_transition({InstanceSignal('g', 0, 0): False,
+                         InstanceSignal('g', 0, 1): False},
+                        {(init, True)})
+    return Automaton([{init}], [init], [init])
+
+
+class SymmetryBreakingTest(unittest.TestCase):
+
+    def _check(self, automata, encoding_optimization, bound=(3,),
+               add_constraints=None):
+        spec = Specification(content=_SPEC)
+        spec.bound = bound
+        spec.cutoff = (2,)
+        encoder = SMTEncoderFactory().create(
+            SMTEncoder.STATE_GUARD_ENCODER)(
+                spec, ConjunctiveGuardedArchitecture(spec),
+                encoding_optimization)
+        encoder.encode()
+        encoder.encode_automata([(automaton, i, False, spec.cutoff)
+                                 for i, automaton in enumerate(automata)],
+                                spec.cutoff)
+        if add_constraints is not None:
+            add_constraints(encoder)
+        status, model = encoder.check()
+        return status, model, encoder.encoder_info.template_functions[0]
+
+    def _assertSameResult(self, automata, expected_status):
+        for encoding_optimization in [EncodingOptimization.NONE,
+                                      EncodingOptimization.SYMMETRY_BREAKING]:
+            status, _, _ = self._check(automata, encoding_optimization)
+            self.assertIs(status, expected_status)
+
+    def testSat(self):
+        self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                _get_some_granted_automaton()], True)
+
+    def testUnsat(self):
+        self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                _get_both_granted_automaton()], False)
+
+    def testStateOrder(self):
+        status, model, template_function = \
+            self._check([get_mutual_exclusion_automaton(2),
+                         _get_some_granted_automaton()],
+                        EncodingOptimization.SYMMETRY_BREAKING)
+        self.assertIs(status, True)
+        template_model = model[0]
+        states = template_model.states
+
+        # the initial state is the first state, i.e., the root of the
+        # breadth-first search
+        self.assertEqual([str(state) for state
+                          in template_function.get_initial_states()],
+                         states[:1])
+
+        # canonical one-hot guard bits
+        self.assertEqual(template_model.get_state_guard_bits(),
+                         {state: 1 << i for i, state in enumerate(states)})
+
+        # the parent of each state is its smallest predecessor, the
+        # parents of consecutive states are ordered
+        edges = {(transition[0], transition[-1])
+                 for transition in template_model.num_guards}
+        parents = [min([i for i in range(j) if (states[i], state) in edges],
+                       default=None)
+                   for j, state in enumerate(states)]
+        for parent, next_parent in zip(parents[1:], parents[2:]):
+            if parent is not None and next_parent is not None:
+                self.assertLessEqual(parent, next_parent)
+
+    def testUnorderedParents(self):
+        def add_unordered_parents(encoder):
+            # parent(t_2) = t_1 > parent(t_3) = t_0
+            template_function = encoder.encoder_info.template_functions[0]
+            states = template_function.get_states()
+            zero = BitVecVal(0, encoder.encoder_info.guard_size)
+            input_assignments = \
+                list(product(*template_function.get_fresh_input_assignments()))
+
+            def edge(i, j):
+                return Or([template_function.guard_function(
+                    [states[i]] + list(assignment) + [states[j]]) != zero
+                           for assignment in input_assignments])
+            encoder.encoder_info.solver.add(
+                And(edge(0, 1), Not(edge(0, 2)), edge(1, 2), edge(0, 3)))
+
+        # the layout is excluded only by the symmetry breaking constraints
+        for encoding_optimization, expected_status in \
+                [(EncodingOptimization.NONE, True),
+                 (EncodingOptimization.SYMMETRY_BREAKING, False)]:
+            status, _, _ = self._check([get_mutual_exclusion_automaton(2)],
+                                       encoding_optimization, bound=(4,),
+                                       add_constraints=add_unordered_parents)
+            self.assertIs(status, expected_status)
+
+
+if __name__ == "__main__":
+    unittest.main()
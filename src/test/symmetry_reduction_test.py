@@ -0,0 +1,72 @@
+'''
+Tests the counter abstraction of the processes that are not referenced by
+an automaton
+'''
+import unittest
+
+from architecture.guarded_system import ConjunctiveGuardedArchitecture
+from datastructures.specification import Specification
+from smt.encoder import SMTEncoderFactory
+from smt.encoder_base import SMTEncoder, EncodingOptimization
+from test.incremental_encoding_test import _SPEC, \
+    get_mutual_exclusion_automaton
+from test.property_split_test import _get_both_granted_automaton, \
+    _get_never_granted_automaton
+from test.symmetry_breaking_test import _get_some_granted_automaton
+
+
+class SymmetryReductionTest(unittest.TestCase):
+
+    def _check(self, automata, encoding_optimization, cutoff):
+        spec = Specification(content=_SPEC)
+        spec.bound = (2,)
+        spec.cutoff = cutoff
+        encoder = SMTEncoderFactory().create(
+            SMTEncoder.STATE_GUARD_ENCODER)(
+                spec, ConjunctiveGuardedArchitecture(spec),
+                encoding_optimization)
+        encoder.encode()
+        encoder.encode_automata([(automaton, i, False, spec.cutoff)
+                                 for i, automaton in enumerate(automata)],
+                                spec.cutoff)
+        status, _ = encoder.check()
+        return status, [encoder._get_named_process_indices(automaton,
+                                                           spec.cutoff)
+                        for automaton in automata]
+
+    def _assertSameResult(self, automata, expected_status, cutoff=(3,)):
+        status, named_process_indices = \
+            self._check(automata, EncodingOptimization.NONE, cutoff)
+        self.assertIs(status, expected_status)
+
+        status, reduced_process_indices = \
+            self._check(automata, EncodingOptimization.SYMMETRY_REDUCTION,
+                        cutoff)
+        self.assertIs(status, expected_status)
+        return named_process_indices, reduced_process_indices
+
+    def testSat(self):
+        named_process_indices, reduced_process_indices = \
+            self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                    _get_never_granted_automaton()], True)
+        all_process_indices = {(0, 0), (0, 1), (0, 2)}
+        self.assertEqual(named_process_indices, [all_process_indices] * 2)
+        # only the processes of the labels are named, the others are counted
+        self.assertEqual(reduced_process_indices, [{(0, 0), (0, 1)},
+                                                   {(0, 0)}])
+
+    def testUnsat(self):
+        self._assertSameResult([get_mutual_exclusion_automaton(2),
+                                _get_both_granted_automaton()], False)
+
+    def testCountedProcess(self):
+        automata = [get_mutual_exclusion_automaton(2),
+                    _get_some_granted_automaton()]
+        # without a third process, some process is granted eventually
+        self._assertSameResult(automata, True, cutoff=(2,))
+        # the counted third process may be granted instead
+        self._assertSameResult(automata, False, cutoff=(3,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+'''
+Tests the bulk extraction of function values from models
+'''
+import unittest
+
+from itertools import product
+
+from z3 import Datatype, Function, BoolSort, BitVecSort, BitVecVal, Const, \
+    Bool, BoolVal, BitVec, Var, ForAll, Implies, And, Or, Not, Solver, \
+    Tactic, Then, UGT, sat
+
+from smt.api.templatemodel import get_function_values, _get_cubes
+
+
+class FunctionValuesTest(unittest.TestCase):
+
+    def setUp(self):
+        state_type = Datatype('S')
+        for i in range(3):
+            state_type.declare('t%d' % i)
+        self.state_sort = state_type.create()
+        self.states = [self.state_sort.constructor(i)() for i in range(3)]
+        self.bools = [BoolVal(False), BoolVal(True)]
+        self.delta = Function('delta', self.state_sort, BoolSort(),
+                              self.state_sort)
+        self.guard = Function('guard', self.state_sort, BoolSort(),
+                              BitVecSort(2))
+        self.out = Function('out', self.state_sort, BoolSort())
+
+        state = Const('q', self.state_sort)
+        signal = Bool('i')
+        t0, t1, t2 = self.states
+        self.constraints = [
+            ForAll([state, signal],
+                   Implies(signal, self.delta(state, signal) != state)),
+            ForAll([state, signal],
+                   UGT(self.guard(state, signal), BitVecVal(0, 2)) ==
+                   Or(state == t1, signal)),
+            self.delta(t0, True) == t1,
+            self.out(t2)]
+
+    def _assertValuesEqual(self, model, function, argument_values):
+        values = get_function_values(model, function, argument_values)
+        expected = [model.evaluate(function(*combination),
+                                   model_completion=True)
+                    for combination in product(*argument_values)]
+        self.assertEqual(len(values), len(expected))
+        for value, expected_value in zip(values, expected):
+            self.assertTrue(value.eq(expected_value),
+                            "%s != %s" % (value, expected_value))
+
+    def _check_models(self, solver):
+        solver.add(self.constraints)
+        self.assertEqual(solver.check(), sat)
+        model = solver.model()
+        self._assertValuesEqual(model, self.delta, [self.states, self.bools])
+        self._assertValuesEqual(model, self.guard, [self.states, self.bools])
+        self._assertValuesEqual(model, self.out, [self.states])
+        # subset of the argument values
+        self._assertValuesEqual(model, self.delta,
+                                [self.states[1:], self.bools[1:]])
+
+    def testTacticModel(self):
+        self._check_models(Then(Tactic("qe"), Tactic("smt")).solver())
+
+    def testSolverModel(self):
+        self._check_models(Solver())
+
+    def testFunctionWithoutInterpretation(self):
+        solver = Solver()
+        solver.add(self.constraints)
+        self.assertEqual(solver.check(), sat)
+        unconstrained = Function('unconstrained', self.state_sort,
+                                 BoolSort())
+        self._assertValuesEqual(solver.model(), unconstrained, [self.states])
+
+    def testCubes(self):
+        value_indices = [{state.get_id(): index
+                          for index, state in enumerate(self.states)},
+                         {value.get_id(): index
+                          for index, value in enumerate(self.bools)}]
+        state = Var(0, self.state_sort)
+        signal = Var(1, BoolSort())
+        t0, t1, _ = self.states
+
+        self.assertEqual(_get_cubes(Or(And(state == t1, signal),
+                                       And(state == t0, Not(signal)),
+                                       And(state == t0, state == t1)),
+                                    value_indices),
+                         [{0: 1, 1: 1}, {0: 0, 1: 0}])
+        self.assertEqual(_get_cubes(t1 == state, value_indices), [{0: 1}])
+        # comparisons other than equality are not decoded
+        self.assertIsNone(_get_cubes(
+            UGT(BitVec('x', 2), BitVecVal(0, 2)), value_indices))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,19 @@ from parsing.helpers import Visitor
 
 
 class ConverterToLtl2BaFormatVisitor(Visitor):
-    def __init__(self):
+    def __init__(self, canonical_instances=False):
+        """
+        :param canonical_instances: rename the instances of each template in
+                                    the order of their first occurrence, such
+                                    that formulas which only differ in the
+                                    instance indices are converted to the same
+                                    string (signal_by_name still maps to the
+                                    original signals)
+        """
         self.signal_by_name = dict()
+        self.has_name_collision = False
+        self._canonical_instances = canonical_instances
+        self._canonical_instance_index = dict()
 
     def visit_binary_op(self, binary_op:BinOp):
         arg1 = self.dispatch(binary_op.arg1)
@@ -38,7 +49,10 @@ class ConverterToLtl2BaFormatVisitor(Visitor):
         return bool_const.name.lower()
 
     def visit_signal(self, signal):
-        if isinstance(signal, InstanceSignal): 
+        if isinstance(signal, InstanceSignal) and self._canonical_instances:
+            name = '%s_%d_%d' % (signal.name, signal.template_index,
+                                 self._get_canonical_instance_index(signal))
+        elif isinstance(signal, InstanceSignal): 
             name = str(signal)
         else:
             suffix = ''
@@ -46,10 +60,19 @@ class ConverterToLtl2BaFormatVisitor(Visitor):
                 suffix = '_' + '_'.join(map(str, signal.binding_indices))
 
             name = (signal.name + suffix).lower()  # ltl3ba treats upper letter wrongly
+        if self.signal_by_name.get(name, signal) != signal:
+            self.has_name_collision = True
         self.signal_by_name[name] = signal
 
         return name
 
+    def _get_canonical_instance_index(self, signal:InstanceSignal):
+        key = (signal.template_index, signal.instance_index)
+        if key not in self._canonical_instance_index:
+            self._canonical_instance_index[key] = \
+                len([k for k in self._canonical_instance_index if k[0] == signal.template_index])
+        return self._canonical_instance_index[key]
+
     def visit_number(self, number:Number):
         return number
 
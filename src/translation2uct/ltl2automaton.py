@@ -1,8 +1,9 @@
 from functools import lru_cache
 from itertools import chain
 import logging
+from helpers.disk_cache import DiskCache, get_cache_key
 from helpers.shell import execute_shell
-from interfaces.automata import Automaton
+from interfaces.automata import Automaton, Node
 from interfaces.parser_expr import UnaryOp, Expr, Signal
 from translation2uct.ast_to_ltl3ba import ConverterToLtl2BaFormatVisitor
 from translation2uct.ltl2ba import parse_ltl2ba_ba
@@ -19,31 +20,143 @@ def _assert_are_signals_in_labels(nodes):  # TODO: remove me after debugging pha
                 assert isinstance(s, Signal)
 
 
+def serialize_automaton(automaton:Automaton, signal_by_name:dict) -> tuple:
+    """
+    Return compact representation of the automaton which only consists of
+    node names, signal names and flags:
+    (initial name sets, rejecting names,
+     [(node name, [(label literals, [flagged destination names, ..]), ..]), ..])
+    """
+    name_by_signal = dict((s, n) for n, s in signal_by_name.items())
+
+    nodes = []
+    for node in sorted(automaton.nodes, key=lambda n: n.name):
+        transitions = []
+        for label, dst_sets in node.transitions.items():
+            literals = tuple(sorted((name_by_signal[s], v) for s, v in label.items()))
+            flagged_names = [tuple(sorted((dst.name, is_rejecting) for dst, is_rejecting in dst_set))
+                             for dst_set in dst_sets]
+            transitions.append((literals, flagged_names))
+        nodes.append((node.name, sorted(transitions)))
+
+    initial_sets = [sorted(n.name for n in init_set) for init_set in automaton.initial_sets_list]
+    rejecting = sorted(n.name for n in automaton.rejecting_nodes)
+    return initial_sets, rejecting, nodes
+
+
+def deserialize_automaton(data:tuple, signal_by_name:dict, name='') -> Automaton:
+    """ Inverse of serialize_automaton """
+    initial_sets, rejecting, serialized_nodes = data
+
+    node_by_name = dict((node_name, Node(node_name)) for node_name, _ in serialized_nodes)
+    for node_name, transitions in serialized_nodes:
+        node = node_by_name[node_name]
+        for literals, flagged_names in transitions:
+            label = dict((signal_by_name[s], v) for s, v in literals)
+            for flagged_dst_names in flagged_names:
+                node.add_transition(label, [(node_by_name[n], is_rejecting)
+                                            for n, is_rejecting in flagged_dst_names])
+
+    return Automaton([set(node_by_name[n] for n in init_set) for init_set in initial_sets],
+                     [node_by_name[n] for n in rejecting],
+                     node_by_name.values(),
+                     name=name)
+
+
 class Ltl2UCW:
-    def __init__(self, ltl2ba_path):
+    def __init__(self, ltl2ba_path, cache_path=None, cache_size=0):
+        """
+        :param ltl2ba_path: path of the ltl3ba executable
+        :param cache_path: directory of the persistent translation cache
+                           (None disables the cache)
+        :param cache_size: maximum size of the translation cache in bytes
+        """
+        self._ltl2ba_path = ltl2ba_path
         self._execute_cmd = ltl2ba_path + ' -M -f'
         self._logger = logging.getLogger(__name__)
 
+        self._disk_cache = DiskCache(cache_path, cache_size) if cache_path is not None else None
+        self._version = None
+
+        # ltl3ba formula -> serialized automaton
+        self._translations = {}
+        self.ltl3ba_calls = 0
+
+    def _get_version(self) -> str:
+        """ Return version output of ltl3ba, which is part of the cache key """
+        if self._version is None:
+            try:
+                rc, out, err = execute_shell('{0} -v'.format(self._ltl2ba_path))
+                self._version = (out + err).strip()
+            except OSError as error:
+                self._logger.debug('Ltl2UCW: cannot determine version: %s', error)
+                self._version = ''
+        return self._version
+
     @lru_cache()
     def convert(self, expr:Expr) -> Automaton:
+        """
+        Translates the negated expression into a UCW
+
+        The instances of the expression are renamed canonically before the
+        translation, thus properties that only differ in the instance
+        indices (e.g., G(!(g_0_0 * g_0_1)) and G(!(g_0_1 * g_0_2))) are
+        translated once and the automaton is copied with renamed labels.
+        """
         self._logger.debug('Ltl2UCW: converting..')
 
-        format_converter = ConverterToLtl2BaFormatVisitor()
-        property_in_ltl2ba_format = format_converter.dispatch(_negate(expr))
+        negated_expr = _negate(expr)
+        format_converter = ConverterToLtl2BaFormatVisitor(canonical_instances=True)
+        canonical_ltl2ba_format = format_converter.dispatch(negated_expr)
+        if format_converter.has_name_collision:
+            # renamed instance signals clash with other signals
+            format_converter = ConverterToLtl2BaFormatVisitor()
+            canonical_ltl2ba_format = format_converter.dispatch(negated_expr)
+
+        property_in_ltl2ba_format = ConverterToLtl2BaFormatVisitor().dispatch(negated_expr)
 	
         self._logger.debug("------------------------------------------")
         self._logger.debug(property_in_ltl2ba_format)
         self._logger.debug("------------------------------------------")
 
+        data = self._translate(canonical_ltl2ba_format, format_converter.signal_by_name)
+
+        return deserialize_automaton(data, format_converter.signal_by_name,
+                                     name=str(property_in_ltl2ba_format))
 
+    def _translate(self, property_in_ltl2ba_format:str, signal_by_name:dict) -> tuple:
+        """
+        Return the serialized automaton of the given ltl3ba formula,
+        ltl3ba is only called if the formula is neither in the in-memory nor in the disk cache
+        """
+        data = self._translations.get(property_in_ltl2ba_format)
+        if data is not None:
+            return data
+
+        cache_key = None
+        if self._disk_cache is not None:
+            cache_key = get_cache_key(self._get_version(), property_in_ltl2ba_format)
+            data = self._disk_cache.get(cache_key)
+            if data is not None:
+                self._logger.debug('Ltl2UCW: cache hit %s', cache_key)
+                self._translations[property_in_ltl2ba_format] = data
+                return data
+
+        self.ltl3ba_calls += 1
         rc, ba, err = execute_shell('{0} "{1}"'.format(self._execute_cmd, property_in_ltl2ba_format))
         assert rc == 0, str(rc) + ', err: ' + str(err) + ', out: ' + str(ba)
         assert (err == '') or err is None, err
         self._logger.debug(ba)
 
-        initial_nodes, rejecting_nodes, nodes = parse_ltl2ba_ba(ba, format_converter.signal_by_name)
+        initial_nodes, rejecting_nodes, nodes = parse_ltl2ba_ba(ba, signal_by_name)
 
         _assert_are_signals_in_labels(list(chain(*initial_nodes)) + rejecting_nodes + nodes)
 
-        automaton = Automaton(initial_nodes, rejecting_nodes, nodes, name=str(property_in_ltl2ba_format))
-        return automaton
+        automaton = Automaton(initial_nodes, rejecting_nodes, nodes)
+        data = serialize_automaton(automaton, signal_by_name)
+
+        self._translations[property_in_ltl2ba_format] = data
+        if cache_key is not None:
+            self._disk_cache.put(cache_key, data)
+
+        return data
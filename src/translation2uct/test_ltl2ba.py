@@ -1,5 +1,6 @@
 import unittest
-from interfaces.parser_expr import QuantifiedSignal
+from interfaces.parser_expr import QuantifiedSignal, InstanceSignal, BinOp, UnaryOp
+from translation2uct.ast_to_ltl3ba import ConverterToLtl2BaFormatVisitor
 from translation2uct.ltl2ba import _get_hacked_ucw, _unwind_label
 
 
@@ -158,6 +159,18 @@ class Test(unittest.TestCase):
             concrete_labels,
             [{'r': True, 'g': True}, {'r': True, 'g': False}])
 
+    def test_canonical_instances(self):
+        def mutex(i, j):
+            return UnaryOp('G', UnaryOp('!', BinOp('*', InstanceSignal('g', 0, i), InstanceSignal('g', 0, j))))
+
+        converter_01 = ConverterToLtl2BaFormatVisitor(canonical_instances=True)
+        converter_21 = ConverterToLtl2BaFormatVisitor(canonical_instances=True)
+
+        assert converter_01.dispatch(mutex(0, 1)) == converter_21.dispatch(mutex(2, 1))
+        assert converter_21.signal_by_name == {'g_0_0': InstanceSignal('g', 0, 2),
+                                               'g_0_1': InstanceSignal('g', 0, 1)}
+        assert not converter_21.has_name_collision
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']